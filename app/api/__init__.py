@@ -1,13 +1,16 @@
 from fastapi import FastAPI
 
-from .routes.auth import router as auth_router
-from .routes.billing import router as billing_router
-from .routes.credits import router as credits_router
-from .routes.subscriptions import router as subscriptions_router
-from .routes.videos import router as videos_router
-from .routes.coinbase import router as coinbase_router
 
 def init_routes(app: FastAPI):
+    # Legacy /api/v1 mounting, unused by app.main. Imported here rather than at
+    # module level so importing app.api.routes doesn't load these routers too.
+    from .routes.auth import router as auth_router
+    from .routes.billing import router as billing_router
+    from .routes.credits import router as credits_router
+    from .routes.subscriptions import router as subscriptions_router
+    from .routes.videos import router as videos_router
+    from .routes.coinbase import router as coinbase_router
+
     app.include_router(auth_router, prefix="/api/v1/auth")
     app.include_router(billing_router, prefix="/api/v1/billing")
     app.include_router(credits_router, prefix="/api/v1/credits")
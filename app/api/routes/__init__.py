@@ -11,6 +11,8 @@ from .me import router as me_router
 from .admin import router as admin_router
 from .stripe_routes import router as stripe_routes_router
 from .webhook_stripe import router as webhook_stripe_router
+from .coinbase import router as coinbase_router
+from .webhook_coinbase import router as webhook_coinbase_router
 
 def init_routes(app: FastAPI):
     # Global OPTIONS handler (must be first)
@@ -29,9 +31,12 @@ def init_routes(app: FastAPI):
     app.include_router(stripe_routes_router)  # ✅ FIXED: Don't override tags, use router's own
     # Billing (Legacy - consider deprecating)
     app.include_router(billing_router, prefix="/billing", tags=["Billing"])
+    # Coinbase Commerce (crypto credit packs) - router has its own prefix
+    app.include_router(coinbase_router)
     # Webhooks
     app.include_router(webhook_stripe_router, tags=["Stripe Webhooks"])  # Canonical v1.0 - router has its own prefix
     app.include_router(billing_webhook_router)  # Legacy
+    app.include_router(webhook_coinbase_router, tags=["Coinbase Webhooks"])
     # Subscription Change
     app.include_router(subscription_change_router)
     # Admin (testing only)
@@ -1,7 +1,12 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse, Response
 from pydantic import BaseModel
+from typing import Literal, Optional
+from app.core.config import settings
 from app.core.database import get_connection
+from app.core.security import require_admin
 import logging
+import os
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 logger = logging.getLogger(__name__)
@@ -19,31 +24,27 @@ async def grant_credits(payload: GrantCreditsRequest):
     USE FOR TESTING ONLY - NOT FOR PRODUCTION.
     """
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        
-        # Update credits
-        cur.execute(
-            "UPDATE users SET credits = %s WHERE email = %s",
-            (payload.credits, payload.email)
-        )
-        
-        if cur.rowcount == 0:
+        with get_connection() as conn:
+            cur = conn.cursor()
+            
+            # Update credits
+            cur.execute(
+                "UPDATE users SET credits = %s WHERE email = %s",
+                (payload.credits, payload.email)
+            )
+            
+            if cur.rowcount == 0:
+                raise HTTPException(status_code=404, detail=f"User {payload.email} not found")
+            
+            conn.commit()
+            
+            # Verify
+            cur.execute(
+                "SELECT email, credits FROM users WHERE email = %s",
+                (payload.email,)
+            )
+            result = cur.fetchone()
             cur.close()
-            conn.close()
-            raise HTTPException(status_code=404, detail=f"User {payload.email} not found")
-        
-        conn.commit()
-        
-        # Verify
-        cur.execute(
-            "SELECT email, credits FROM users WHERE email = %s",
-            (payload.email,)
-        )
-        result = cur.fetchone()
-        
-        cur.close()
-        conn.close()
         
         logger.info(f"[ADMIN] Granted {payload.credits} credits to {payload.email}")
         
@@ -57,3 +58,80 @@ async def grant_credits(payload: GrantCreditsRequest):
     except Exception as e:
         logger.error(f"[ADMIN] Error granting credits: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+# =========================================================
+# PROFILING (admin only, one worker per request)
+# =========================================================
+
+def _check_target_worker(pid: Optional[int]):
+    """
+    Requests land on whichever worker accepts them. Pass ?pid= to insist
+    on one worker; a mismatch returns 409 and closes the connection so the
+    retry can be accepted by another worker.
+    """
+    if pid is not None and pid != os.getpid():
+        raise HTTPException(
+            status_code=409,
+            detail=f"Request landed on worker {os.getpid()}, not {pid}; retry",
+            headers={"Connection": "close", "X-Worker-PID": str(os.getpid())},
+        )
+
+
+@router.get("/profile/cpu")
+async def profile_cpu(
+    seconds: float = Query(10, gt=0),
+    hz: int = Query(100, gt=0),
+    format: Literal["collapsed", "svg"] = "collapsed",
+    pid: Optional[int] = None,
+    admin: dict = Depends(require_admin),
+):
+    """
+    Sample every thread of this worker for `seconds` and return collapsed
+    stacks (feed to flamegraph.pl / speedscope) or an SVG flamegraph.
+    """
+    # Profiling is rare: keep the profiler (tracemalloc, sampler) out of worker startup
+    from app.core.profiler import ProfilerBusyError, collapsed, flamegraph_svg, profiler
+
+    _check_target_worker(pid)
+    seconds = min(seconds, settings.PROFILER_MAX_SECONDS)
+    hz = min(hz, settings.PROFILER_MAX_HZ)
+    logger.info(f"[ADMIN] CPU profile requested | By: {admin.get('email')} | PID: {os.getpid()} | Seconds: {seconds} | Hz: {hz}")
+
+    try:
+        stacks, samples = await profiler.cpu(seconds, hz)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    headers = {"X-Worker-PID": str(os.getpid()), "X-Profile-Samples": str(samples)}
+    if format == "svg":
+        title = f"CPU - worker {os.getpid()} - {seconds:g}s @ {hz}Hz - {samples} samples"
+        return Response(flamegraph_svg(stacks, title), media_type="image/svg+xml", headers=headers)
+    return PlainTextResponse(collapsed(stacks), headers=headers)
+
+
+@router.get("/profile/memory")
+async def profile_memory(
+    seconds: float = Query(30, gt=0),
+    top: int = Query(25, gt=0, le=500),
+    frames: int = Query(1, ge=1, le=50),
+    pid: Optional[int] = None,
+    admin: dict = Depends(require_admin),
+):
+    """
+    Take tracemalloc snapshots `seconds` apart on this worker and return
+    the allocation sites whose memory grew the most. frames > 1 groups by
+    traceback instead of line (slower, more detail).
+    """
+    from app.core.profiler import ProfilerBusyError, profiler
+
+    _check_target_worker(pid)
+    seconds = min(seconds, settings.PROFILER_MAX_SECONDS)
+    logger.info(f"[ADMIN] Memory profile requested | By: {admin.get('email')} | PID: {os.getpid()} | Seconds: {seconds}")
+
+    try:
+        lines = await profiler.memory(seconds, top, frames)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    return PlainTextResponse("\n".join(lines) + "\n", headers={"X-Worker-PID": str(os.getpid())})
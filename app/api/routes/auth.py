@@ -1,12 +1,15 @@
+from anyio import from_thread
 from fastapi import APIRouter, HTTPException
+from psycopg2.errors import UniqueViolation
 from pydantic import BaseModel, EmailStr
 from app.core.database import get_connection
+from app.core.replica import replica_router
 from app.core.security import hash_password, verify_password, create_access_token
+from app.core.metrics import record_credits_granted
+from app.services.stripe_gateway import stripe_gateway
 import traceback
 import logging
 
-logging.basicConfig(level=logging.INFO)
-
 router = APIRouter()
 
 
@@ -30,94 +33,108 @@ def register(data: RegisterRequest, session_id: str = None):
     - Link customer_id to user
     - Check for pending subscription
     - Award initial credits if subscription exists
+    
+    Emails are stored lowercased, and an address that matches an existing
+    account in any case is rejected (login matches case-insensitively).
     """
     try:
         from datetime import datetime
-        import stripe
-        from app.core.config import settings
         from app.utils.credit_logger import log_credit_event, log_pending_subscription
         
-        stripe.api_key = settings.STRIPE_SECRET_KEY
         stripe_customer_id = None
         
         # If session_id provided, retrieve Stripe session
         if session_id:
             try:
-                session = stripe.checkout.Session.retrieve(session_id)
-                stripe_customer_id = session.get("customer")
+                # Sync route (threadpool): run the gateway call on the event loop
+                session = from_thread.run(stripe_gateway.retrieve_checkout_session, session_id)
+                stripe_customer_id = getattr(session, "customer", None)
                 logging.info(f"[REGISTER] Stripe session found | SessionID: {session_id} | CustomerID: {stripe_customer_id}")
             except Exception as e:
                 logging.warning(f"[REGISTER] Failed to retrieve Stripe session | Error: {str(e)}")
 
+        email = data.email.strip().lower()
         hashed_password = hash_password(data.password)
 
-        conn = get_connection()
-        cur = conn.cursor()
+        with get_connection() as conn:
+            cur = conn.cursor()
 
-        # Create user with Stripe customer ID if available
-        cur.execute(
-            """
-            INSERT INTO users (email, password_hash, credits, stripe_customer_id, created_at)
-            VALUES (%s, %s, %s, %s, %s)
-            RETURNING id
-            """,
-            (data.email, hashed_password, 0, stripe_customer_id, datetime.utcnow())
-        )
+            # Accounts from before normalization may be stored mixed-case
+            # (idx_users_email_lower); two new registrations collide on UNIQUE(email)
+            cur.execute("SELECT 1 FROM users WHERE lower(email) = %s", (email,))
+            if cur.fetchone():
+                cur.close()
+                raise HTTPException(status_code=400, detail="Email already registered")
 
-        user_id = cur.fetchone()["id"]
-        
-        # Check for pending subscription
-        if stripe_customer_id:
+            # Create user with Stripe customer ID if available
             cur.execute(
                 """
-                SELECT id, credits_to_award, plan_name, stripe_subscription_id
-                FROM pending_subscriptions
-                WHERE stripe_customer_id = %s AND claimed_at IS NULL
+                INSERT INTO users (email, password_hash, credits, stripe_customer_id, created_at)
+                VALUES (%s, %s, %s, %s, %s)
+                RETURNING id
                 """,
-                (stripe_customer_id,)
+                (email, hashed_password, 0, stripe_customer_id, datetime.utcnow())
             )
-            pending_sub = cur.fetchone()
-            
-            if pending_sub:
-                # Award pending credits
-                credits_to_award = pending_sub["credits_to_award"]
-                plan_name = pending_sub["plan_name"]
-                subscription_id = pending_sub["stripe_subscription_id"]
-                
-                cur.execute(
-                    "UPDATE users SET credits = %s WHERE id = %s",
-                    (credits_to_award, user_id)
-                )
-                
-                # Mark pending subscription as claimed
+
+            user_id = cur.fetchone()["id"]
+        
+            # Check for pending subscription
+            if stripe_customer_id:
                 cur.execute(
                     """
-                    UPDATE pending_subscriptions 
-                    SET claimed_at = NOW(), claimed_by_user_id = %s
-                    WHERE id = %s
+                    SELECT id, credits_to_award, plan_name, stripe_subscription_id
+                    FROM pending_subscriptions
+                    WHERE stripe_customer_id = %s AND claimed_at IS NULL
                     """,
-                    (user_id, pending_sub["id"])
+                    (stripe_customer_id,)
                 )
+                pending_sub = cur.fetchone()
+            
+                if pending_sub:
+                    # Award pending credits
+                    credits_to_award = pending_sub["credits_to_award"]
+                    plan_name = pending_sub["plan_name"]
+                    subscription_id = pending_sub["stripe_subscription_id"]
                 
-                log_credit_event(
-                    "GRANT",
-                    user_id,
-                    credits_to_award,
-                    credits_to_award,
-                    "subscription",
-                    {"plan": plan_name, "subscription_id": subscription_id, "source": "pending_claim"}
-                )
-                log_pending_subscription("CLAIMED", stripe_customer_id, subscription_id, plan_name, credits_to_award, user_id)
+                    cur.execute(
+                        "UPDATE users SET credits = %s WHERE id = %s",
+                        (credits_to_award, user_id)
+                    )
                 
-                logging.info(f"[REGISTER] Pending subscription claimed | UserID: {user_id} | Credits: {credits_to_award}")
+                    # Mark pending subscription as claimed
+                    cur.execute(
+                        """
+                        UPDATE pending_subscriptions 
+                        SET claimed_at = NOW(), claimed_by_user_id = %s
+                        WHERE id = %s
+                        """,
+                        (user_id, pending_sub["id"])
+                    )
+                
+                    log_credit_event(
+                        "GRANT",
+                        user_id,
+                        credits_to_award,
+                        credits_to_award,
+                        "subscription",
+                        {"plan": plan_name, "subscription_id": subscription_id, "source": "pending_claim"}
+                    )
+                    log_pending_subscription("CLAIMED", stripe_customer_id, subscription_id, plan_name, credits_to_award, user_id)
+                    record_credits_granted("subscription", credits_to_award)
+                
+                    logging.info(f"[REGISTER] Pending subscription claimed | UserID: {user_id} | Credits: {credits_to_award}")
         
-        conn.commit()
-        cur.close()
-        conn.close()
+            conn.commit()
+            cur.close()
+        replica_router.pin_user(user_id)  # the new account isn't on the replica yet
 
-        token = create_access_token({"user_id": user_id, "email": data.email})
+        token = create_access_token({"user_id": user_id, "email": email})
         return {"access_token": token, "token_type": "bearer"}
 
+    except HTTPException:
+        raise
+    except UniqueViolation:
+        raise HTTPException(status_code=400, detail="Email already registered")
     except Exception as e:
         logging.error("REGISTER ERROR")
         logging.error(traceback.format_exc())
@@ -127,28 +144,20 @@ def register(data: RegisterRequest, session_id: str = None):
 @router.post("/login")
 def login(data: LoginRequest):
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-
-        cur.execute(
-            "SELECT id, email, password_hash FROM users WHERE email = %s",
-            (data.email,)
-        )
-        user = cur.fetchone()
-
-        if not user:
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                # Case-insensitive (idx_users_email_lower); an exact-case match wins
+                "SELECT id, email, password_hash FROM users WHERE lower(email) = lower(%s) "
+                "ORDER BY email = %s DESC LIMIT 1",
+                (data.email, data.email)
+            )
+            user = cur.fetchone()
             cur.close()
-            conn.close()
-            raise HTTPException(status_code=401, detail="Invalid credentials")
 
-        if not verify_password(data.password, user["password_hash"]):
-            cur.close()
-            conn.close()
+        if not user or not verify_password(data.password, user["password_hash"]):
             raise HTTPException(status_code=401, detail="Invalid credentials")
 
-        cur.close()
-        conn.close()
-
         token = create_access_token({"user_id": user["id"], "email": user["email"]})
         return {"access_token": token, "token_type": "bearer"}
 
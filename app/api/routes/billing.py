@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
+from app.services.stripe_gateway import StripeUnavailableError
 from app.services.stripe_service import stripe_service
 from app.core.security import get_current_user
 from app.core.config import settings
@@ -25,7 +26,7 @@ class CreditCheckoutRequest(BaseModel):
 
 
 @router.post("/create-checkout-session")
-def create_subscription_checkout(request: SubscriptionCheckoutRequest):
+async def create_subscription_checkout(request: SubscriptionCheckoutRequest):
     """
     Create Stripe checkout for monthly subscription (from landing page pricing).
     No authentication required - for new users.
@@ -37,7 +38,7 @@ def create_subscription_checkout(request: SubscriptionCheckoutRequest):
         raise HTTPException(status_code=400, detail=f"Invalid subscription price ID: {price_id}")
 
     try:
-        session = stripe_service.create_checkout_session(
+        session = await stripe_service.create_checkout_session(
             price_id=price_id,
             customer_email=None,  # User hasn't signed up yet
             user_id=None,
@@ -47,12 +48,14 @@ def create_subscription_checkout(request: SubscriptionCheckoutRequest):
         )
         
         return {"url": session["url"]}
+    except StripeUnavailableError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create checkout session: {str(e)}")
 
 
 @router.post("/checkout/credits")
-def create_credit_checkout(
+async def create_credit_checkout(
     request: CreditCheckoutRequest,
     current_user=Depends(get_current_user),
 ):
@@ -71,7 +74,7 @@ def create_credit_checkout(
     user_email = current_user.get("email", "unknown@example.com")
 
     try:
-        session = stripe_service.create_checkout_session(
+        session = await stripe_service.create_checkout_session(
             price_id=price_id,
             customer_email=user_email,
             user_id=user_id,
@@ -81,5 +84,7 @@ def create_credit_checkout(
         )
         
         return {"url": session["url"]}
+    except StripeUnavailableError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create checkout session: {str(e)}")
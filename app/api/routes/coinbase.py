@@ -1,7 +1,29 @@
-from fastapi import APIRouter
+"""
+Coinbase Commerce Checkout - Crypto Credit Packs
+Credits are granted by the charge:confirmed webhook (webhook_coinbase.py)
+"""
+import logging
+from fastapi import APIRouter, Depends, HTTPException
+from app.core.config import settings
+from app.core.subscription import require_active_subscription
+from app.schemas.billing_schemas import CoinbaseLinkRequest, CoinbaseLinkResponse
+from app.services.coinbase_service import coinbase_service
 
+logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/coinbase", tags=["Coinbase"])
 
-@router.get("")
-async def disabled():
-    return {"status": "coinbase_disabled"}
+
+@router.post("/charge", response_model=CoinbaseLinkResponse)
+async def create_coinbase_charge(
+    body: CoinbaseLinkRequest,
+    current_user=Depends(require_active_subscription),  # ← Same gate as Stripe credit packs
+):
+    """
+    Create a hosted Coinbase Commerce charge for a credit pack (+20% bonus).
+    """
+    if not settings.COINBASE_API_KEY:
+        raise HTTPException(status_code=503, detail="Crypto payments are not available")
+
+    return await coinbase_service.generate_checkout_link(
+        body.pack_key, current_user["user_id"], body.success_url, body.cancel_url
+    )
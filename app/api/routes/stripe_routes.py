@@ -5,6 +5,7 @@ Subscription-gated checkout with authentication
 import logging
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
+from app.services.stripe_gateway import StripeUnavailableError
 from app.services.stripe_service import stripe_service
 from app.core.security import get_current_user
 from app.core.subscription import require_active_subscription
@@ -96,7 +97,7 @@ async def create_subscription_checkout(
     try:
         logger.info(f"[CHECKOUT] 🚀 Calling StripeService.create_checkout_session()")
         
-        session = stripe_service.create_checkout_session(
+        session = await stripe_service.create_checkout_session(
             price_id=price_id,
             customer_email=user_email,  user_id=user_id,  # ← Link user immediately
             success_url=f"{settings.FRONTEND_URL}/checkout/success",
@@ -108,6 +109,9 @@ async def create_subscription_checkout(
         
         return {"url": session["url"]}
         
+    except StripeUnavailableError:
+        raise  # 503 + Retry-After (app.main)
+        
     except Exception as e:
         logger.error(f"[CHECKOUT] ❌ 500 ERROR | Subscription session creation failed | Error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to create checkout session: {str(e)}")
@@ -168,7 +172,7 @@ async def create_credit_checkout(
         logger.info(f"[CHECKOUT]   CANCEL:  {cancel_url}")
         logger.info(f"[CHECKOUT]   FRONTEND_URL: {settings.FRONTEND_URL}")
         
-        session = stripe_service.create_checkout_session(
+        session = await stripe_service.create_checkout_session(
             price_id=price_id,
             customer_email=user_email,
             user_id=user_id,
@@ -181,6 +185,9 @@ async def create_credit_checkout(
         
         return {"url": session["url"]}
         
+    except StripeUnavailableError:
+        raise  # 503 + Retry-After (app.main)
+        
     except Exception as e:
         logger.error(f"[CHECKOUT] ❌ 500 ERROR | Credit pack session creation failed | UserID: {user_id} | Error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to create checkout session: {str(e)}")
@@ -1,13 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends
 from app.core.security import get_current_user
 from app.models.subscription import Subscription
-from app.core.config import settings
-import stripe
+from app.services.stripe_gateway import StripeUnavailableError, stripe_gateway
 
 router = APIRouter(prefix="/subscription", tags=["Subscription"])
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
-
 
 @router.post("/change")
 async def change_subscription(
@@ -32,26 +29,21 @@ async def change_subscription(
 
     try:
         # Stripe subscription update (auto prorations)
-        # Note: In a real app we would await this if using async stripe client or run in threadpool
-        # But stripe python client is synchronous. FastAPI handles sync routes in threadpool if def (not async def)
-        # However, user provided `async def` and synchronous stripe call. 
-        # This will block the event loop, but for low volume it's 'ok'.
-        # ideally we'd wrap in run_in_executor or use async def without blocking calls.
-        # Following user snippet exactly.
-        
-        updated = stripe.Subscription.modify(
+        updated = await stripe_gateway.modify_subscription(
             sub.stripe_subscription_id,
-            items=[{
-                "id": sub.stripe_item_id,
-                "price": new_price_id
-            }],
-            proration_behavior="always_invoice"
+            {
+                "items": [{
+                    "id": sub.stripe_item_id,
+                    "price": new_price_id
+                }],
+                "proration_behavior": "always_invoice",
+            },
         )
 
         # Update local DB
         sub.price_id = new_price_id
         # Safely get nickname or fallback
-        sub.plan = updated["items"]["data"][0]["price"].get("nickname", "unknown")
+        sub.plan = getattr(updated["items"]["data"][0]["price"], "nickname", None) or "unknown"
         sub.save()
 
         return {
@@ -60,5 +52,7 @@ async def change_subscription(
             "proration_applied": True
         }
 
+    except StripeUnavailableError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
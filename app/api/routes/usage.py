@@ -1,6 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
 from app.core.security import get_current_user
 from app.core.database import get_connection
+from app.core.replica import ROUTE_REPLICA, replica_router
+from app.core.prepared import BALANCE_BY_ID, CONSUME_STATE_BY_ID, DEBIT_CREDITS
+from app.core.singleflight import read_coalescer
+from app.core.metrics import record_credits_consumed
+from fastapi.concurrency import run_in_threadpool
 from datetime import datetime
 
 router = APIRouter(prefix="/usage", tags=["Usage"])
@@ -9,28 +14,12 @@ router = APIRouter(prefix="/usage", tags=["Usage"])
 # ------------------------------------------------------------
 # CHECK USER BALANCE
 # ------------------------------------------------------------
-@router.get("/balance")
-async def get_balance(user=Depends(get_current_user)):
-    """
-    Returns the user's plan + credits.
-    Every frontend will call this before generation.
-    """
-    user_id = user.get("user_id")
-    
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    cur.execute(
-        """
-        SELECT plan, credits, subscription_status, renewal_date 
-        FROM users 
-        WHERE id = %s
-        """,
-        (user_id,)
-    )
-    user_data = cur.fetchone()
-    cur.close()
-    conn.close()
+def _fetch_balance(user_id):
+    with get_connection(ROUTE_REPLICA, user_id=user_id) as conn:
+        cur = conn.cursor()
+        cur.execute_prepared(BALANCE_BY_ID, (user_id,))
+        user_data = cur.fetchone()
+        cur.close()
     
     if not user_data:
         raise HTTPException(status_code=404, detail="User not found")
@@ -43,6 +32,21 @@ async def get_balance(user=Depends(get_current_user)):
     }
 
 
+@router.get("/balance")
+async def get_balance(user=Depends(get_current_user)):
+    """
+    Returns the user's plan + credits.
+    Every frontend will call this before generation.
+    Concurrent calls for the same user share one query.
+    """
+    user_id = user.get("user_id")
+    
+    return await read_coalescer.do(
+        ("usage.balance", user_id),
+        lambda: run_in_threadpool(_fetch_balance, user_id),
+    )
+
+
 # ------------------------------------------------------------
 # CONSUME CREDITS
 # ------------------------------------------------------------
@@ -56,51 +60,37 @@ async def consume_credits(
     """
     user_id = user.get("user_id")
     
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    # Get current user data
-    cur.execute(
-        """
-        SELECT credits, subscription_status 
-        FROM users 
-        WHERE id = %s
-        """,
-        (user_id,)
-    )
-    user_data = cur.fetchone()
-    
-    if not user_data:
-        cur.close()
-        conn.close()
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    current_credits = user_data["credits"] or 0
+    with get_connection() as conn:
+        cur = conn.cursor()
+        
+        # Get current user data
+        cur.execute_prepared(CONSUME_STATE_BY_ID, (user_id,))
+        user_data = cur.fetchone()
+        
+        if not user_data:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        # SUBSCRIPTIONS — OPTIONAL RULE (customizable)
+        if user_data["subscription_status"] == "active":
+            # *Example rule:*
+            # Subscriptions deduct 50% credits instead of full price
+            amount = int(amount * 0.5)
 
-    # SUBSCRIPTIONS — OPTIONAL RULE (customizable)
-    if user_data["subscription_status"] == "active":
-        # *Example rule:*
-        # Subscriptions deduct 50% credits instead of full price
-        amount = int(amount * 0.5)
+        # Block negative credits: the debit only applies if the balance covers it
+        cur.execute_prepared(DEBIT_CREDITS, (amount, amount, user_id))
+        debited = cur.fetchone()
+        if not debited:
+            raise HTTPException(
+                402,
+                "Not enough credits → redirect user to checkout"
+            )
 
-    # Block negative credits
-    if current_credits < amount:
+        new_balance = debited["credits"]
+        conn.commit()
         cur.close()
-        conn.close()
-        raise HTTPException(
-            402,
-            "Not enough credits → redirect user to checkout"
-        )
-
-    new_balance = current_credits - amount
-
-    cur.execute(
-        "UPDATE users SET credits = %s WHERE id = %s",
-        (new_balance, user_id)
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
+    read_coalescer.invalidate_user(user_id)
+    replica_router.pin_user(user_id)
+    record_credits_consumed("usage", amount)
 
     return {
         "status": "ok",
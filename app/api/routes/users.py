@@ -1,22 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from app.core.database import get_connection
+from app.core.replica import ROUTE_REPLICA
 from app.core.security import get_current_user
+from app.core.query_audit import statement_budget
+from app.core.singleflight import read_coalescer
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
-@router.get("/me")
-async def get_me(current_user: dict = Depends(get_current_user)):
-    """
-    Get current user info - NO FALLBACKS.
-    Returns exact database values for: id, email, credits, subscription_status, subscription_plan.
-    Raises 404 if user not found.
-    """
-    user_id = current_user.get("user_id")
-    
-    conn = get_connection()
+def _fetch_me(user_id):
+    conn = get_connection(ROUTE_REPLICA, user_id=user_id)
     cur = conn.cursor()
     
     try:
@@ -48,3 +44,20 @@ async def get_me(current_user: dict = Depends(get_current_user)):
         cur.close()
         conn.close()
 
+
+@router.get("/me")
+@statement_budget(1)
+async def get_me(current_user: dict = Depends(get_current_user)):
+    """
+    Get current user info - NO FALLBACKS.
+    Returns exact database values for: id, email, credits, subscription_status, subscription_plan.
+    Raises 404 if user not found.
+    Concurrent calls for the same user share one query.
+    """
+    user_id = current_user.get("user_id")
+    
+    return await read_coalescer.do(
+        ("users.me", user_id),
+        lambda: run_in_threadpool(_fetch_me, user_id),
+    )
+
@@ -6,6 +6,9 @@ from app.models.video_job import VideoJob
 from app.services.video_provider import mock_provider
 from app.services.video_credit_policy import credits_required
 from app.core.security import get_current_user
+from app.core.replica import replica_router
+from app.core.singleflight import read_coalescer
+from app.core.metrics import record_credits_consumed, record_video_job
 
 router = APIRouter()
 
@@ -25,26 +28,6 @@ async def generate_video(
     
     user_id = current_user.get("user_id")
     
-    # Get user's current credits from database
-    from app.core.database import get_connection
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    cur.execute("SELECT credits FROM users WHERE id = %s", (user_id,))
-    result = cur.fetchone()
-    
-    if not result:
-        cur.close()
-        conn.close()
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    current_credits = result["credits"] or 0
-
-    if current_credits < required:
-        cur.close()
-        conn.close()
-        raise HTTPException(status_code=400, detail="Not enough credits")
-
     # 2️⃣ Create job
     job_id = str(uuid.uuid4())
     now = datetime.utcnow()
@@ -60,13 +43,28 @@ async def generate_video(
         updated_at=now,
     )
 
-    # 3️⃣ Deduct credits immediately (IMPORTANT)
-    new_credits = current_credits - required
-    cur.execute(
-        "UPDATE users SET credits = %s WHERE id = %s",
-        (new_credits, user_id)
-    )
-    conn.commit()
+    # 3️⃣ Deduct credits immediately (IMPORTANT), only if the balance covers it
+    from app.core.database import get_connection
+    from app.core.prepared import CREDITS_BY_ID, DEBIT_CREDITS
+    with get_connection() as conn:
+        cur = conn.cursor()
+        
+        cur.execute_prepared(DEBIT_CREDITS, (required, required, user_id))
+        debited = cur.fetchone()
+        if not debited:
+            # Short balance or no such user: only a refusal pays for this read
+            cur.execute_prepared(CREDITS_BY_ID, (user_id,))
+            if not cur.fetchone():
+                raise HTTPException(status_code=404, detail="User not found")
+            raise HTTPException(status_code=402, detail="Not enough credits")
+        
+        new_credits = debited["credits"]
+        conn.commit()
+        cur.close()
+    read_coalescer.invalidate_user(user_id)
+    replica_router.pin_user(user_id)
+    record_credits_consumed("video_generate", required)
+    record_video_job("processing")
 
     # 4️⃣ Generate video
     try:
@@ -78,11 +76,9 @@ async def generate_video(
         job.status = "failed"
         job.error = str(e)
         thumbnail_url = None
+    record_video_job(job.status)
 
     job.updated_at = datetime.utcnow()
-    
-    cur.close()
-    conn.close()
 
     return {
         "job_id": job.id,
@@ -1,6 +1,10 @@
 from fastapi import APIRouter, Depends
 from app.core.database import get_connection
+from app.core.prepared import DEBIT_CREDITS
 from app.core.security import get_current_user
+from app.core.replica import replica_router
+from app.core.singleflight import read_coalescer
+from app.core.metrics import record_credits_consumed, record_video_job
 
 router = APIRouter()
 
@@ -30,28 +34,14 @@ async def create_video(
     if not script:
         return {"error": "Script is required"}, 400
     
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    try:
-        # Check credits
-        cur.execute(
-            "SELECT credits FROM users WHERE id = %s",
-            (user_id,)
-        )
-        user = cur.fetchone()
+    with get_connection() as conn:
+        cur = conn.cursor()
         
-        if not user or user.get("credits", 0) < 3:
-            cur.close()
-            conn.close()
+        # Deduct credits, only if the balance covers it
+        cur.execute_prepared(DEBIT_CREDITS, (3, 3, user_id))
+        if not cur.fetchone():
             return {"error": "Not enough credits"}, 400
         
-        # Deduct credits
-        cur.execute(
-            "UPDATE users SET credits = credits - 3 WHERE id = %s",
-            (user_id,)
-        )
-        
         # Create video record
         cur.execute(
             """
@@ -64,14 +54,10 @@ async def create_video(
         
         video_id = cur.fetchone()["id"]
         conn.commit()
-        
         cur.close()
-        conn.close()
-        
-        return {"id": video_id, "status": "queued"}
-        
-    except Exception as e:
-        conn.rollback()
-        cur.close()
-        conn.close()
-        raise
+    read_coalescer.invalidate_user(user_id)
+    replica_router.pin_user(user_id)
+    record_credits_consumed("video_create", 3)
+    record_video_job("queued")
+    
+    return {"id": video_id, "status": "queued"}
@@ -1,18 +1,60 @@
-from fastapi import APIRouter, Request
+"""
+Coinbase Commerce Webhook Handler
+charge:confirmed → credits, once per charge ID
+"""
+import json
+import logging
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from app.core.metrics import record_webhook_event
+from app.core.webhook_recorder import webhook_recorder
 from app.services.coinbase_service import coinbase_service
 
-router = APIRouter(prefix="/webhooks/coinbase")
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/webhook", tags=["Webhooks"])
 
-@router.post("")
-async def coinbase_webhook(payload: dict):
-    event = payload["event"]
 
-    if not coinbase_service.verify_event(event):
-        return {"status": "ignored"}
-
-    user_id = event["data"]["metadata"]["user_id"]
-    pack_key = event["data"]["metadata"]["pack_key"]
-
-    coinbase_service.process_payment(user_id, pack_key)
-
-    return {"status": "processed"}
+@router.post("/coinbase")
+async def coinbase_webhook(request: Request):
+    """
+    Coinbase Commerce webhook handler.
+    
+    Handles charge:confirmed only; other event types are acknowledged and ignored.
+    Redelivered events are acknowledged without granting again.
+    """
+    payload = await request.body()
+    
+    if not coinbase_service.verify_signature(payload, request.headers.get("X-CC-Webhook-Signature")):
+        record_webhook_event("coinbase", "unknown", "invalid_signature")
+        raise HTTPException(400, "Invalid webhook signature")
+    
+    try:
+        event = json.loads(payload)["event"]
+        event_type = event["type"]
+        event_id = event.get("id")
+    except (ValueError, KeyError, TypeError):
+        logger.error("[COINBASE WEBHOOK] Malformed payload")
+        record_webhook_event("coinbase", "unknown", "error")
+        raise HTTPException(400, "Invalid Coinbase payload")
+    
+    webhook_recorder.record("coinbase", payload, event_id, event_type)
+    
+    if event_type != "charge:confirmed":
+        logger.info(f"[COINBASE WEBHOOK] Ignoring event type: {event_type}")
+        record_webhook_event("coinbase", event_type, "ignored")
+        return {"status": "ok"}
+    
+    try:
+        result = await run_in_threadpool(coinbase_service.apply_confirmed_charge, event.get("data") or {})
+    except Exception as e:
+        logger.error(f"[COINBASE WEBHOOK] Processing failed | EventID: {event_id} | Error: {str(e)}", exc_info=True)
+        record_webhook_event("coinbase", event_type, "error")
+        # Retryable (e.g. database down): non-2xx makes Coinbase redeliver
+        raise HTTPException(500, "Webhook processing failed")
+    
+    outcome = result["outcome"]
+    record_webhook_event("coinbase", event_type, "processed" if outcome == "credited" else outcome)
+    if outcome == "invalid":
+        # Unrecoverable: acknowledge so Coinbase stops retrying
+        return {"status": "error", "message": "Unusable charge metadata"}
+    return {"status": "ok"}
@@ -3,17 +3,31 @@ Stripe Webhook Handler - Canonical v1.0
 Webhook-only credit grants with pending subscription support
 DEPLOYMENT TRIGGER: 2026-01-07 03:52 - Fixed RealDictCursor TypeError
 """
+import asyncio
+import json
 import logging
-import psycopg2
+from typing import Optional
 from fastapi import APIRouter, Request, HTTPException
-import stripe
+from fastapi.concurrency import run_in_threadpool
 from app.core.config import settings
+from app.core.database import get_connection
+from app.core.metrics import record_credits_granted, record_webhook_event
+from app.core.replica import replica_router
+from app.core.singleflight import read_coalescer
 from app.core.subscription_prices import SUBSCRIPTION_PRICES
+from app.services.checkout_sessions import find_checkout_session, mark_checkout_session_completed
+from app.services.stripe_gateway import stripe_gateway
+from app.core.webhook_partitions import webhook_partitions
+from app.core.webhook_registry import sniff_event_type, stripe_webhooks, webhook_handler
+from app.core.webhook_recorder import webhook_recorder
 from app.utils.credit_logger import (
     log_webhook_event,
     log_credit_event,
     log_pending_subscription
 )
+from app.utils.lazy_import import lazy_import
+
+stripe = lazy_import("stripe")
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/webhook", tags=["Webhooks"])
@@ -27,17 +41,6 @@ CREDIT_PACK_AMOUNTS = {
 }
 
 
-def get_db_connection():
-    """Get database connection with RealDictCursor for dict-like row access"""
-    from psycopg2.extras import RealDictCursor
-    conn = psycopg2.connect(
-        settings.DATABASE_URL,
-        cursor_factory=RealDictCursor,
-        sslmode="require"
-    )
-    return conn
-
-
 @router.post("/stripe")
 async def stripe_webhook(request: Request):
     """
@@ -46,43 +49,85 @@ async def stripe_webhook(request: Request):
     Handles:
     - invoice.paid: Monthly subscription renewals (carry-forward credits)
     - checkout.session.completed: First payment or one-time credit packs
+    - customer.subscription.deleted: Revoke access
     
     Credit grants are WEBHOOK-ONLY. Frontend receives NO credits.
     """
-    payload = await request.body()
+    return await process_stripe_webhook(request)
+
+
+async def process_stripe_webhook(request: Request):
+    """
+    Body of /webhook/stripe and the legacy /billing/webhook.
+    
+    Event types without a registered handler are acknowledged after a
+    header check and a type sniff: no signature verification, no parsing.
+    """
     sig = request.headers.get("stripe-signature")
+    if not sig:
+        record_webhook_event("stripe", "unknown", "invalid_signature")
+        raise HTTPException(400, "Invalid webhook signature")
+    
+    payload = await request.body()
+    sniffed_type = sniff_event_type(payload)
+    if sniffed_type is not None and stripe_webhooks.get(sniffed_type) is None:
+        record_webhook_event("stripe", sniffed_type, "ignored")
+        return {"status": "ok"}
     
     try:
-        event = stripe.Webhook.construct_event(
-            payload, sig, settings.STRIPE_WEBHOOK_SECRET
+        stripe.WebhookSignature.verify_header(
+            payload, sig, settings.STRIPE_WEBHOOK_SECRET, stripe.Webhook.DEFAULT_TOLERANCE
         )
+        # Plain dicts: handlers use .get(), which StripeObject doesn't have
+        event = json.loads(payload)
     except Exception as e:
         logger.error(f"[WEBHOOK] Invalid signature | Error: {str(e)}")
+        record_webhook_event("stripe", "unknown", "invalid_signature")
         raise HTTPException(400, "Invalid webhook signature")
     
     event_type = event["type"]
     event_id = event["id"]
+    webhook_recorder.record("stripe", payload, event_id, event_type)
+    
+    handler = stripe_webhooks.get(event_type)
+    if handler is None:
+        logger.info(f"[WEBHOOK] Ignoring event type: {event_type}")
+        record_webhook_event("stripe", event_type, "ignored")
+        return {"status": "ok"}
     
     logger.info(f"[WEBHOOK] Received event | Type: {event_type} | EventID: {event_id}")
     
     try:
-        if event_type == "invoice.paid":
-            await handle_invoice_paid(event)
-        elif event_type == "checkout.session.completed":
-            await handle_checkout_completed(event)
-        elif event_type == "customer.subscription.deleted":
-            await handle_subscription_deleted(event)  # ← Revoke access
-        else:
-            logger.info(f"[WEBHOOK] Ignoring event type: {event_type}")
-        
+        # One customer's events run one at a time, in arrival order
+        await webhook_partitions.submit(event_customer_id(event), lambda: handler.run(event))
+        record_webhook_event("stripe", event_type, "processed")
         return {"status": "ok"}
+    
+    except asyncio.TimeoutError:
+        logger.error(f"[WEBHOOK] Handler timed out | EventType: {event_type} | EventID: {event_id} | Timeout: {handler.timeout}s")
+        record_webhook_event("stripe", event_type, "timeout")
+        if handler.redeliver_on_timeout:
+            # Idempotent handler: let Stripe redeliver
+            raise HTTPException(500, "Webhook handler timed out")
+        return {"status": "error", "message": "Webhook handler timed out"}
         
     except Exception as e:
         logger.error(f"[WEBHOOK] Processing failed | EventType: {event_type} | Error: {str(e)}", exc_info=True)
+        record_webhook_event("stripe", event_type, "error")
         # Return 200 to prevent Stripe retries for unrecoverable errors
         return {"status": "error", "message": str(e)}
 
 
+def event_customer_id(event) -> Optional[str]:
+    """Stripe customer the event belongs to (its partition key), if any."""
+    obj = event["data"]["object"]
+    customer = obj["customer"] if "customer" in obj else None
+    if customer is not None and not isinstance(customer, str):
+        customer = customer["id"]  # expanded Customer object
+    return customer
+
+
+@webhook_handler("invoice.paid", max_in_flight=16, timeout=20.0, redeliver_on_timeout=True)
 async def handle_invoice_paid(event):
     """
     Handle subscription payment (invoice.paid) - STRIPE AUTHORITY
@@ -108,60 +153,77 @@ async def handle_invoice_paid(event):
         return
     
     plan_info = SUBSCRIPTION_PRICES[price_id]
-    credits_to_add = plan_info["monthly_credits"]
-    plan_name = plan_info["plan_name"]
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    await run_in_threadpool(
+        grant_invoice_credits, invoice_id, customer_id, subscription_id, plan_info["plan_name"], plan_info["monthly_credits"]
+    )
+
+
+def grant_invoice_credits(invoice_id: str, customer_id: str, subscription_id: str, plan_name: str, credits_to_add: int):
+    """invoice.paid DB work (blocking: run in the threadpool)."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        
         # Find user by customer_id
         logger.info(f"[WEBHOOK] Looking up user by stripe_customer_id: {customer_id}")
         cursor.execute(
-            "SELECT id, email, credits, stripe_subscription_id FROM users WHERE stripe_customer_id = %s",
+            "SELECT id, email FROM users WHERE stripe_customer_id = %s",
             (customer_id,)
         )
         user = cursor.fetchone()
         
-        if user:
-            user_id = user["id"]
-            current_credits = user["credits"]
-            
-#             # Check if invoice already processed (idempotency)
-            # TODO: Add processed_invoices table for idempotency
-            
-            # ACTIVATE subscription + ADD credits
-            new_balance = current_credits + credits_to_add
-            
-            cursor.execute("""
-                UPDATE users 
-                SET subscription_status = 'active',
-                    subscription_plan = %s,
-                    stripe_subscription_id = %s,
-                    credits = %s
-                WHERE id = %s
-            """, (plan_name, subscription_id, new_balance, user_id))
-            conn.commit()
-            
-            # Verify update by re-querying user
-            cursor.execute(
-                "SELECT email, subscription_status, subscription_plan FROM users WHERE id = %s",
-                (user_id,)
-            )
-            updated_user = cursor.fetchone()
-            
-            logger.info(f"[WEBHOOK] ✅ Subscription activated | UserID: {user_id} | Email: {updated_user['email'] if updated_user else 'NOT FOUND'}")
-            logger.info(f"[WEBHOOK]   Status: {updated_user['subscription_status'] if updated_user else 'NULL'} | Plan: {updated_user['subscription_plan'] if updated_user else 'NULL'} | Credits: +{credits_to_add} → {new_balance}")
-            
-        else:
+        if not user:
             logger.warning(f"[WEBHOOK] User not found for customer {customer_id} | Skipping (auth-first flow)")
             # In auth-first flow, user must exist BEFORE payment
-            
-    finally:
+            return
+        
+        user_id = user["id"]
+        
+        # Idempotency: one ledger row per invoice, written in the same
+        # statement as the grant; the increment is atomic, so a
+        # concurrent consume isn't overwritten
+        cursor.execute(
+            """
+            WITH granted AS (
+                INSERT INTO stripe_invoice_grants (invoice_id, user_id, credits)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (invoice_id) DO NOTHING
+                RETURNING user_id, credits
+            )
+            UPDATE users u
+            SET subscription_status = 'active',
+                subscription_plan = %s,
+                stripe_subscription_id = %s,
+                credits = u.credits + g.credits
+            FROM granted g
+            WHERE u.id = g.user_id
+            RETURNING u.credits
+            """,
+            (invoice_id, user_id, credits_to_add, plan_name, subscription_id)
+        )
+        granted = cursor.fetchone()
+        if granted is None:
+            logger.info(f"[WEBHOOK] Invoice already granted | InvoiceID: {invoice_id} | UserID: {user_id}")
+            return
+        
+        new_balance = granted["credits"]
+        conn.commit()
+        replica_router.pin_user(user_id)
+        read_coalescer.invalidate_user(user_id)
+        record_credits_granted("subscription_renewal", credits_to_add)
+        
+        # Verify update by re-querying user
+        cursor.execute(
+            "SELECT email, subscription_status, subscription_plan FROM users WHERE id = %s",
+            (user_id,)
+        )
+        updated_user = cursor.fetchone()
         cursor.close()
-        conn.close()
+    
+    logger.info(f"[WEBHOOK] ✅ Subscription activated | UserID: {user_id} | Email: {updated_user['email'] if updated_user else 'NOT FOUND'}")
+    logger.info(f"[WEBHOOK]   Status: {updated_user['subscription_status'] if updated_user else 'NULL'} | Plan: {updated_user['subscription_plan'] if updated_user else 'NULL'} | Credits: +{credits_to_add} → {new_balance}")
 
 
+@webhook_handler("customer.subscription.deleted", max_in_flight=16, timeout=10.0, redeliver_on_timeout=True)
 async def handle_subscription_deleted(event):
     """
     Handle subscription cancellation (customer.subscription.deleted) - STRIPE AUTHORITY
@@ -170,45 +232,52 @@ async def handle_subscription_deleted(event):
     Idempotent: safe to run multiple times.
     """
     subscription = event["data"]["object"]
-    subscription_id = subscription.get("id")
-    customer_id = subscription.get("customer")
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    await run_in_threadpool(revoke_subscription, subscription.get("customer"), subscription.get("id"))
+
+
+def revoke_subscription(customer_id: str, subscription_id: str):
+    """customer.subscription.deleted DB work (blocking: run in the threadpool)."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        
         # REVOKE subscription access (keep credits)
         cursor.execute("""
             UPDATE users 
             SET subscription_status = 'inactive'
             WHERE stripe_customer_id = %s
+            RETURNING id
         """, (customer_id,))
         
-        rows_affected = cursor.rowcount
+        revoked = [row["id"] for row in cursor.fetchall()]
         conn.commit()
-        
-        if rows_affected > 0:
-            logger.info(f"[WEBHOOK] ❌ Subscription canceled | CustomerID: {customer_id} | SubscriptionID: {subscription_id}")
-        else:
-            logger.warning(f"[WEBHOOK] User not found for canceled subscription | CustomerID: {customer_id}")
-        
-    finally:
         cursor.close()
-        conn.close()
+    for user_id in revoked:
+        replica_router.pin_user(user_id)
+        read_coalescer.invalidate_user(user_id)
+    
+    if revoked:
+        logger.info(f"[WEBHOOK] ❌ Subscription canceled | CustomerID: {customer_id} | SubscriptionID: {subscription_id}")
+    else:
+        logger.warning(f"[WEBHOOK] User not found for canceled subscription | CustomerID: {customer_id}")
 
 
+@webhook_handler("checkout.session.completed", max_in_flight=8, timeout=30.0, redeliver_on_timeout=True)  # May call Stripe
 async def handle_checkout_completed(event):
     """
     Handle checkout completion (checkout.session.completed)
     
     - Mode 'subscription': Store as pending (first payment before registration)
     - Mode 'payment': Award credit pack immediately
+    Idempotent: each grant claims the event ID in its own transaction.
     """
     session = event["data"]["object"]
     mode = session.get("mode")
     customer_id = session.get("customer")
     session_id = session["id"]
     
+    # Paid: never hand this session out again as a reusable checkout
+    await run_in_threadpool(mark_checkout_session_completed, session_id)
+    
     if mode == "subscription":
         # First subscription payment - user hasn't registered yet
         await handle_subscription_first_payment(session, event["id"])
@@ -222,27 +291,33 @@ async def handle_checkout_completed(event):
         log_webhook_event("checkout.session.completed", event["id"], mode, customer_id, None, False, "Unknown mode")
 
 
+async def resolve_checkout_price_id(session) -> str:
+    """
+    Price of a completed Checkout Session: line items in the event if
+    present, else the local session index (written at creation), else
+    Session.retrieve from Stripe. Raises KeyError/IndexError if none has it.
+    """
+    if "line_items" in session and session["line_items"]:
+        return session["line_items"]["data"][0]["price"]["id"]
+    
+    indexed = await run_in_threadpool(find_checkout_session, session["id"])
+    if indexed:
+        return indexed["price_id"]
+    
+    logger.info(f"[WEBHOOK] Session not in local index, asking Stripe | SessionID: {session['id']}")
+    expanded_session = await stripe_gateway.retrieve_checkout_session(session["id"], expand=["line_items"])
+    return expanded_session["line_items"]["data"][0]["price"]["id"]
+
+
 async def handle_subscription_first_payment(session, event_id):
     """
     Activate subscription immediately on first payment.
     No pending_subscriptions - directly update users table.
     """
     customer_id = session.get("customer")
-    subscription_id = session.get("subscription")
     
     try:
-        # Get price ID from line items
-        line_items = session.get("line_items", {}).get("data", [])
-        if not line_items:
-            # Expand line_items if not present
-            stripe.api_key = settings.STRIPE_SECRET_KEY
-            expanded_session = stripe.checkout.Session.retrieve(
-                session["id"],
-                expand=["line_items"]
-            )
-            line_items = expanded_session.get("line_items", {}).get("data", [])
-        
-        price_id = line_items[0]["price"]["id"]
+        price_id = await resolve_checkout_price_id(session)
     except (KeyError, IndexError) as e:
         logger.error(f"[WEBHOOK] Missing price ID in subscription checkout | Error: {str(e)}")
         log_webhook_event("checkout.session.completed", event_id, "subscription", customer_id, None, False, "Missing price ID")
@@ -254,41 +329,52 @@ async def handle_subscription_first_payment(session, event_id):
         return
     
     plan_info = SUBSCRIPTION_PRICES[price_id]
-    plan_name = plan_info["plan_name"]
-    credits_to_award = plan_info["monthly_credits"]
+    await run_in_threadpool(
+        activate_subscription, session, event_id, plan_info["plan_name"], plan_info["monthly_credits"]
+    )
+
+
+def claim_event(cursor, event_id: str, event_type: str) -> bool:
+    """
+    Record the event as processed, in the caller's grant transaction.
+    False if it already was: a redelivery, or the same event on the other
+    endpoint. A concurrent claim of the same event waits for this
+    transaction, so only one of them grants.
+    """
+    cursor.execute(
+        """
+        INSERT INTO stripe_webhook_events (event_id, event_type)
+        VALUES (%s, %s)
+        ON CONFLICT (event_id) DO NOTHING
+        RETURNING event_id
+        """,
+        (event_id, event_type)
+    )
+    return cursor.fetchone() is not None
+
+
+def activate_subscription(session, event_id, plan_name: str, credits_to_award: int):
+    """First subscription payment DB work (blocking: run in the threadpool)."""
+    customer_id = session.get("customer")
+    subscription_id = session.get("subscription")
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    # IDENTITY SOURCE OF TRUTH: client_reference_id ONLY
+    user_id = session.get("client_reference_id")
     
-    try:
-        # IDENTITY SOURCE OF TRUTH: client_reference_id ONLY
-        user_id = session.get("client_reference_id")
-        
-        if not user_id:
-            logger.error(f"[WEBHOOK] No client_reference_id in session | SessionID: {session.get('id')} | REJECTING")
-            log_webhook_event("checkout.session.completed", event_id, "subscription", customer_id, None, False, "Missing client_reference_id")
-            return
-        
-        # Direct lookup by user_id (NO fallback)
-        logger.info(f"[WEBHOOK] Looking up user by user_id (client_reference_id): {user_id}")
-        cursor.execute(
-            "SELECT id, email, credits FROM users WHERE id = %s",
-            (user_id,)
-        )
-        
-        user = cursor.fetchone()
+    if not user_id:
+        logger.error(f"[WEBHOOK] No client_reference_id in session | SessionID: {session.get('id')} | REJECTING")
+        log_webhook_event("checkout.session.completed", event_id, "subscription", customer_id, None, False, "Missing client_reference_id")
+        return
+    
+    with get_connection() as conn:
+        cursor = conn.cursor()
         
-        if not user:
-            logger.error(f"[WEBHOOK] User not found for user_id: {user_id} | REJECTING")
-            log_webhook_event("checkout.session.completed", event_id, "subscription", customer_id, user_id, False, "User not found")
+        if not claim_event(cursor, event_id, "checkout.session.completed"):
+            logger.info(f"[WEBHOOK] Event already processed | EventID: {event_id} | UserID: {user_id}")
             return
         
-        user_id = user["id"]
-        user_email = user["email"]
-        current_credits = user["credits"] or 0
-        new_balance = current_credits + credits_to_award
-        
         # DIRECT ACTIVATION - Update users table ONLY (NO pending_subscriptions)
+        # Atomic increment: a concurrent consume or grant isn't overwritten
         logger.info(f"[WEBHOOK] Activating subscription | UserID: {user_id} | Plan: {plan_name} | Credits: +{credits_to_award}")
         cursor.execute("""
             UPDATE users 
@@ -296,26 +382,28 @@ async def handle_subscription_first_payment(session, event_id):
                 subscription_plan = %s,
                 stripe_subscription_id = %s,
                 stripe_customer_id = %s,
-                credits = %s
+                credits = COALESCE(credits, 0) + %s
             WHERE id = %s
-        """, (plan_name, subscription_id, customer_id, new_balance, user_id))
-        conn.commit()
-        
-        # Verify update
-        cursor.execute(
-            "SELECT email, subscription_status, subscription_plan, credits FROM users WHERE id = %s",
-            (user_id,)
-        )
+            RETURNING id, email, credits
+        """, (plan_name, subscription_id, customer_id, credits_to_award, user_id))
         updated_user = cursor.fetchone()
         
-        logger.info(f"[WEBHOOK] ✅ Subscription activated | UserID: {user_id} | Email: {updated_user['email']}")
-        logger.info(f"[WEBHOOK]   Status: {updated_user['subscription_status']} | Plan: {updated_user['subscription_plan']} | Credits: {updated_user['credits']}")
-        
-        log_webhook_event("checkout.session.completed", event_id, "subscription", customer_id, user_id, True)
+        if not updated_user:
+            logger.error(f"[WEBHOOK] User not found for user_id: {user_id} | REJECTING")
+            log_webhook_event("checkout.session.completed", event_id, "subscription", customer_id, user_id, False, "User not found")
+            return
         
-    finally:
+        user_id = updated_user["id"]
+        conn.commit()
+        replica_router.pin_user(user_id)
+        read_coalescer.invalidate_user(user_id)
+        record_credits_granted("subscription", credits_to_award)
         cursor.close()
-        conn.close()
+    
+    logger.info(f"[WEBHOOK] ✅ Subscription activated | UserID: {user_id} | Email: {updated_user['email']}")
+    logger.info(f"[WEBHOOK]   Status: active | Plan: {plan_name} | Credits: +{credits_to_award} → {updated_user['credits']}")
+    
+    log_webhook_event("checkout.session.completed", event_id, "subscription", customer_id, user_id, True)
 
 
 async def handle_credit_pack_purchase(session, event_id):
@@ -329,17 +417,7 @@ async def handle_credit_pack_purchase(session, event_id):
         return
     
     try:
-        # Get price ID from line items
-        line_items = session.get("line_items", {}).get("data", [])
-        if not line_items:
-            stripe.api_key = settings.STRIPE_SECRET_KEY
-            expanded_session = stripe.checkout.Session.retrieve(
-                session["id"],
-                expand=["line_items"]
-            )
-            line_items = expanded_session.get("line_items", {}).get("data", [])
-        
-        price_id = line_items[0]["price"]["id"]
+        price_id = await resolve_checkout_price_id(session)
     except (KeyError, IndexError) as e:
         logger.error(f"[WEBHOOK] Missing price ID in credit pack | Error: {str(e)}")
         log_webhook_event("checkout.session.completed", event_id, "payment", customer_id, user_id, False, "Missing price ID")
@@ -350,14 +428,26 @@ async def handle_credit_pack_purchase(session, event_id):
         log_webhook_event("checkout.session.completed", event_id, "payment", customer_id, user_id, False, "Unknown price ID")
         return
     
-    credits_to_add = CREDIT_PACK_AMOUNTS[price_id]
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    await run_in_threadpool(grant_credit_pack, session, event_id, price_id, CREDIT_PACK_AMOUNTS[price_id])
+
+
+def grant_credit_pack(session, event_id, price_id: str, credits_to_add: int):
+    """Credit pack DB work (blocking: run in the threadpool)."""
+    user_id = session.get("client_reference_id")
+    customer_id = session.get("customer")
     
-    try:
-        # Get current credits
-        cursor.execute("SELECT credits FROM users WHERE id = %s", (user_id,))
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        
+        if not claim_event(cursor, event_id, "checkout.session.completed"):
+            logger.info(f"[WEBHOOK] Event already processed | EventID: {event_id} | UserID: {user_id}")
+            return
+        
+        # ADD credits (carry-forward), atomically: concurrent grants can't lose each other
+        cursor.execute(
+            "UPDATE users SET credits = credits + %s WHERE id = %s RETURNING credits",
+            (credits_to_add, user_id)
+        )
         result = cursor.fetchone()
         
         if not result:
@@ -365,28 +455,21 @@ async def handle_credit_pack_purchase(session, event_id):
             log_webhook_event("checkout.session.completed", event_id, "payment", customer_id, user_id, False, "User not found")
             return
         
-        current_credits = result[0]
-        new_balance = current_credits + credits_to_add
-        
-        # ADD credits (carry-forward)
-        cursor.execute(
-            "UPDATE users SET credits = %s WHERE id = %s",
-            (new_balance, user_id)
-        )
+        new_balance = result["credits"]
         conn.commit()
-        
-        log_credit_event(
-            "GRANT",
-            user_id,
-            credits_to_add,
-            new_balance,
-            "credit_pack",
-            {"price_id": price_id, "session_id": session["id"]}
-        )
-        log_webhook_event("checkout.session.completed", event_id, "payment", customer_id, user_id, True)
-        
-        logger.info(f"[WEBHOOK] Credit pack awarded | UserID: {user_id} | +{credits_to_add} → {new_balance}")
-        
-    finally:
+        replica_router.pin_user(user_id)
+        read_coalescer.invalidate_user(user_id)
+        record_credits_granted("credit_pack", credits_to_add)
         cursor.close()
-        conn.close()
+    
+    log_credit_event(
+        "GRANT",
+        user_id,
+        credits_to_add,
+        new_balance,
+        "credit_pack",
+        {"price_id": price_id, "session_id": session["id"]}
+    )
+    log_webhook_event("checkout.session.completed", event_id, "payment", customer_id, user_id, True)
+    
+    logger.info(f"[WEBHOOK] Credit pack awarded | UserID: {user_id} | +{credits_to_add} → {new_balance}")
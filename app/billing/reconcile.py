@@ -0,0 +1,453 @@
+"""
+Stripe Reconciliation - Drift Between Stripe and users
+Streams subscriptions and paid invoices from Stripe into staging
+tables, diffs them against users with set-based SQL and writes a repair
+plan; --apply executes it.
+
+Usage:
+    python -m app.billing.reconcile --output plan.jsonl            # dry run
+    python -m app.billing.reconcile --output plan.jsonl --apply
+
+- Bounded memory at any customer count: SDK auto-pagination (100 objects
+  per page) feeds COPY batches of --batch-size rows into TEMP tables, and
+  the plan is read back through a server-side cursor
+- Plan actions:
+    activate        live subscription at Stripe, user not active on that plan
+    deactivate      user active, their stripe_subscription_id is staged with a
+                    status that is no longer live, and the customer has no
+                    live subscription (credits kept, like
+                    customer.subscription.deleted)
+    grant_credits   paid subscription invoice with no stripe_invoice_grants row
+    orphan_invoice  paid subscription invoice for a customer with no user and
+                    no pending subscription (report only)
+- Subscriptions are staged from one status=all listing, so a subscription
+  changing status mid-stream is still seen once. A subscription created
+  after the listing passed it isn't staged at all, and an unstaged
+  subscription is never deactivated: the stream can take minutes, and
+  customers who subscribe meanwhile are paying
+- Credit checks cover invoices created after the grant ledger's first row
+  (migrations/006) and at least --settle-minutes ago, so invoices that
+  predate the ledger or whose webhook is in flight are never re-granted
+- --apply refuses to deactivate more than MAX_DEACTIVATE_SHARE of active
+  users (wrong Stripe account or key mode) unless --force is given
+- Uses STRIPE_API_BASE like the app: benchmarks/reconcile_drift.py runs it
+  against the local Stripe stand-in
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator, Optional
+
+from app.core.config import settings
+from app.core.database import get_connection
+from app.core.subscription_prices import SUBSCRIPTION_PRICES
+from app.utils.lazy_import import lazy_import
+
+stripe = lazy_import("stripe")
+
+logger = logging.getLogger(__name__)
+
+LIVE_STATUSES = ("active", "trialing", "past_due")  # Stripe still bills these
+ACTIVE_STATUSES = ("active", "trialing")  # ...and these grant access
+MAX_DEACTIVATE_SHARE = 0.2
+PAGE_SIZE = 100  # Stripe's maximum
+
+
+# =========================================================
+# SQL
+# =========================================================
+
+STAGING_DDL = """
+DROP TABLE IF EXISTS pg_temp.stg_subscriptions, pg_temp.stg_invoices, pg_temp.stg_prices, pg_temp.stg_live, pg_temp.reconcile_plan;
+CREATE TEMP TABLE stg_subscriptions (
+    subscription_id TEXT NOT NULL,
+    customer_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    price_id TEXT,
+    created TIMESTAMPTZ NOT NULL
+);
+CREATE TEMP TABLE stg_invoices (
+    invoice_id TEXT NOT NULL,
+    customer_id TEXT NOT NULL,
+    subscription_id TEXT,
+    price_id TEXT,
+    amount_paid INTEGER,
+    created TIMESTAMPTZ NOT NULL
+);
+CREATE TEMP TABLE stg_prices (
+    price_id TEXT PRIMARY KEY,
+    plan_name TEXT NOT NULL,
+    monthly_credits INTEGER NOT NULL
+);
+CREATE TEMP TABLE reconcile_plan (
+    action TEXT NOT NULL,
+    user_id UUID,
+    customer_id TEXT,
+    subscription_id TEXT,
+    invoice_id TEXT,
+    plan_name TEXT,
+    credits INTEGER,
+    current_status TEXT,
+    current_plan TEXT
+);
+"""
+
+# Newest live subscription per customer
+LIVE_SQL = """
+CREATE INDEX ON stg_subscriptions (customer_id);
+CREATE INDEX ON stg_subscriptions (subscription_id);
+CREATE INDEX ON stg_invoices (customer_id);
+CREATE UNIQUE INDEX ON stg_invoices (invoice_id);
+ANALYZE stg_subscriptions;
+ANALYZE stg_invoices;
+CREATE TEMP TABLE stg_live AS
+SELECT DISTINCT ON (s.customer_id) s.customer_id, s.subscription_id, s.status, p.plan_name
+FROM stg_subscriptions s
+LEFT JOIN stg_prices p ON p.price_id = s.price_id
+WHERE s.status IN %(live)s
+ORDER BY s.customer_id, s.created DESC;
+CREATE UNIQUE INDEX ON stg_live (customer_id);
+ANALYZE stg_live;
+"""
+
+PLAN_SQL = """
+INSERT INTO reconcile_plan (action, user_id, customer_id, subscription_id, plan_name, current_status, current_plan)
+SELECT 'activate', u.id, u.stripe_customer_id, l.subscription_id, l.plan_name,
+       u.subscription_status, u.subscription_plan
+FROM users u
+JOIN stg_live l ON l.customer_id = u.stripe_customer_id
+WHERE l.status IN %(active)s
+  AND l.plan_name IS NOT NULL
+  AND (u.subscription_status IS DISTINCT FROM 'active'
+       OR u.subscription_plan IS DISTINCT FROM l.plan_name
+       OR u.stripe_subscription_id IS DISTINCT FROM l.subscription_id);
+
+INSERT INTO reconcile_plan (action, user_id, customer_id, subscription_id, current_status, current_plan)
+SELECT 'deactivate', u.id, u.stripe_customer_id, u.stripe_subscription_id,
+       u.subscription_status, u.subscription_plan
+FROM users u
+WHERE u.subscription_status = 'active'
+  AND u.stripe_customer_id IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM stg_live l WHERE l.customer_id = u.stripe_customer_id)
+  AND EXISTS (
+      SELECT 1 FROM stg_subscriptions s
+      WHERE s.subscription_id = u.stripe_subscription_id
+        AND s.status NOT IN %(live)s
+  );
+"""
+
+CREDIT_PLAN_SQL = """
+INSERT INTO reconcile_plan (action, user_id, customer_id, subscription_id, invoice_id, plan_name, credits)
+SELECT 'grant_credits', u.id, i.customer_id, i.subscription_id, i.invoice_id, p.plan_name, p.monthly_credits
+FROM stg_invoices i
+JOIN stg_prices p ON p.price_id = i.price_id
+JOIN users u ON u.stripe_customer_id = i.customer_id
+WHERE i.created >= %(since)s
+  AND i.created < NOW() - make_interval(mins => %(settle_minutes)s)
+  AND NOT EXISTS (SELECT 1 FROM stripe_invoice_grants g WHERE g.invoice_id = i.invoice_id);
+
+INSERT INTO reconcile_plan (action, customer_id, subscription_id, invoice_id, plan_name, credits)
+SELECT 'orphan_invoice', i.customer_id, i.subscription_id, i.invoice_id, p.plan_name, p.monthly_credits
+FROM stg_invoices i
+JOIN stg_prices p ON p.price_id = i.price_id
+WHERE i.created >= %(since)s
+  AND i.created < NOW() - make_interval(mins => %(settle_minutes)s)
+  AND NOT EXISTS (SELECT 1 FROM users u WHERE u.stripe_customer_id = i.customer_id)
+  AND NOT EXISTS (SELECT 1 FROM pending_subscriptions ps WHERE ps.stripe_customer_id = i.customer_id);
+"""
+
+# Each statement re-checks the current row, so a webhook that fixed a user
+# since the plan was built is not overwritten
+APPLY_SQL = {
+    "activate": """
+        UPDATE users u
+        SET subscription_status = 'active',
+            subscription_plan = p.plan_name,
+            stripe_subscription_id = p.subscription_id
+        FROM reconcile_plan p
+        WHERE p.action = 'activate' AND u.id = p.user_id
+          AND u.stripe_customer_id = p.customer_id
+    """,
+    "deactivate": """
+        UPDATE users u
+        SET subscription_status = 'inactive'
+        FROM reconcile_plan p
+        WHERE p.action = 'deactivate' AND u.id = p.user_id
+          AND u.subscription_status = 'active'
+          AND u.stripe_subscription_id IS NOT DISTINCT FROM p.subscription_id
+    """,
+    # Only invoices this statement claims in the ledger are credited: a
+    # webhook that granted one meanwhile wins the ON CONFLICT
+    "grant_credits": """
+        WITH granted AS (
+            INSERT INTO stripe_invoice_grants (invoice_id, user_id, credits, source)
+            SELECT invoice_id, user_id, credits, 'reconcile'
+            FROM reconcile_plan
+            WHERE action = 'grant_credits'
+            ON CONFLICT (invoice_id) DO NOTHING
+            RETURNING user_id, credits
+        )
+        UPDATE users u
+        SET credits = u.credits + g.total
+        FROM (SELECT user_id, SUM(credits) AS total FROM granted GROUP BY user_id) g
+        WHERE u.id = g.user_id
+    """,
+}
+
+
+# =========================================================
+# STRIPE STREAMING
+# =========================================================
+
+def _id(value) -> Optional[str]:
+    """Expandable fields arrive as an id string or an expanded object."""
+    if value is None or isinstance(value, str):
+        return value
+    return value["id"]
+
+
+def _field(obj, *path):
+    for key in path:
+        if obj is None or key not in obj:
+            return None
+        obj = obj[key]
+    return obj
+
+
+def _timestamp(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+def _invoice_subscription(invoice) -> Optional[str]:
+    # API versions from 2025-03 moved it under parent.subscription_details
+    return _id(_field(invoice, "subscription")) or _id(_field(invoice, "parent", "subscription_details", "subscription"))
+
+
+def _line_price(line) -> Optional[str]:
+    # ...and the line's price under pricing.price_details
+    return _id(_field(line, "price")) or _id(_field(line, "pricing", "price_details", "price"))
+
+
+def _stripe_client():
+    return stripe.StripeClient(
+        settings.STRIPE_SECRET_KEY,
+        base_addresses={"api": settings.STRIPE_API_BASE} if settings.STRIPE_API_BASE else None,
+        max_network_retries=3,  # Batch job: let the SDK retry a failed page
+    )
+
+
+def stream_subscriptions(client) -> Iterator[tuple]:
+    # One listing, not one per status: a subscription moving between two
+    # statuses' listings (trialing -> active) would be missed by both
+    pages = client.v1.subscriptions.list({"status": "all", "limit": PAGE_SIZE})
+    for sub in pages.auto_paging_iter():
+        items = _field(sub, "items", "data") or []
+        yield (
+            sub["id"], _id(sub["customer"]), sub["status"],
+            _id(_field(items[0], "price")) if items else None,
+            _timestamp(sub["created"]),
+        )
+
+
+def stream_paid_invoices(client, since: datetime) -> Iterator[tuple]:
+    params = {"status": "paid", "created": {"gte": int(since.timestamp())}, "limit": PAGE_SIZE}
+    for invoice in client.v1.invoices.list(params).auto_paging_iter():
+        lines = _field(invoice, "lines", "data") or []
+        yield (
+            invoice["id"], _id(invoice["customer"]), _invoice_subscription(invoice),
+            _line_price(lines[0]) if lines else None,
+            _field(invoice, "amount_paid"),
+            _timestamp(invoice["created"]),
+        )
+
+
+# =========================================================
+# STAGING & DIFF
+# =========================================================
+
+def _stage(conn, table: str, columns: tuple, rows: Iterable[tuple], batch_size: int) -> int:
+    """COPY `rows` into `table` in batches, committing each; returns the row count."""
+    copy_sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    staged = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    pending = 0
+
+    def flush():
+        buffer.seek(0)
+        with conn.cursor() as cur:
+            cur.copy_expert(copy_sql, buffer)
+        conn.commit()
+        buffer.seek(0)
+        buffer.truncate()
+
+    for row in rows:
+        # None is written as an unquoted empty field, which COPY ... csv reads as NULL
+        writer.writerow(row)
+        pending += 1
+        if pending >= batch_size:
+            flush()
+            staged += pending
+            pending = 0
+            logger.info(f"[RECONCILE] Staged | Table: {table} | Rows: {staged}")
+    if pending:
+        flush()
+        staged += pending
+    return staged
+
+
+def _ledger_start(conn) -> Optional[datetime]:
+    with conn.cursor() as cur:
+        cur.execute("SELECT MIN(granted_at)::timestamptz AS started FROM stripe_invoice_grants")
+        row = cur.fetchone()
+    conn.commit()
+    return row["started"]
+
+
+def _plan_summary(conn) -> dict:
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT action, COUNT(*) AS count, SUM(credits) AS credits FROM reconcile_plan GROUP BY action ORDER BY action"
+        )
+        rows = cur.fetchall()
+    return {row["action"]: {"count": row["count"], "credits": row["credits"]} for row in rows}
+
+
+def _write_plan(conn, path: str, batch_size: int) -> int:
+    written = 0
+    with open(path, "w") as out, conn.cursor(name="reconcile_plan_out") as cur:
+        cur.itersize = batch_size
+        cur.execute("SELECT * FROM reconcile_plan ORDER BY action, customer_id, invoice_id")
+        for row in cur:
+            out.write(json.dumps({k: v for k, v in dict(row).items() if v is not None}, default=str) + "\n")
+            written += 1
+    conn.commit()
+    return written
+
+
+def _apply(conn, summary: dict, force: bool) -> dict:
+    deactivations = summary.get("deactivate", {}).get("count", 0)
+    if deactivations and not force:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) AS active FROM users WHERE subscription_status = 'active'")
+            active = cur.fetchone()["active"]
+        if deactivations > active * MAX_DEACTIVATE_SHARE:
+            conn.rollback()
+            raise RuntimeError(
+                f"Refusing to deactivate {deactivations} of {active} active users "
+                f"(> {MAX_DEACTIVATE_SHARE:.0%}); check the Stripe key/account, or pass --force"
+            )
+
+    applied = {}
+    with conn.cursor() as cur:
+        for action, sql in APPLY_SQL.items():
+            cur.execute(sql)
+            applied[action] = cur.rowcount
+    conn.commit()
+    return applied
+
+
+def reconcile(
+    output: str,
+    apply: bool = False,
+    invoice_days: int = 40,
+    settle_minutes: int = 15,
+    batch_size: int = 1000,
+    force: bool = False,
+    client=None,
+) -> dict:
+    """Stage Stripe, build the plan into `output` (JSON lines), optionally apply it; returns the report."""
+    started = time.perf_counter()
+    client = client or _stripe_client()
+    report = {"applied": None}
+
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(STAGING_DDL)
+            cur.executemany(
+                "INSERT INTO stg_prices (price_id, plan_name, monthly_credits) VALUES (%s, %s, %s)",
+                [(price_id, info["plan_name"], info["monthly_credits"]) for price_id, info in SUBSCRIPTION_PRICES.items()],
+            )
+        conn.commit()
+
+        report["staged_subscriptions"] = _stage(
+            conn, "stg_subscriptions", ("subscription_id", "customer_id", "status", "price_id", "created"),
+            stream_subscriptions(client), batch_size,
+        )
+
+        ledger_start = _ledger_start(conn)
+        if ledger_start is None:
+            logger.warning("[RECONCILE] Grant ledger is empty | Skipping credit checks")
+            report["staged_invoices"] = 0
+        else:
+            since = max(ledger_start, datetime.now(timezone.utc) - timedelta(days=invoice_days))
+            report["invoices_since"] = since.isoformat()
+            report["staged_invoices"] = _stage(
+                conn, "stg_invoices",
+                ("invoice_id", "customer_id", "subscription_id", "price_id", "amount_paid", "created"),
+                stream_paid_invoices(client, since), batch_size,
+            )
+        report["stripe_seconds"] = round(time.perf_counter() - started, 2)
+
+        with conn.cursor() as cur:
+            cur.execute(LIVE_SQL, {"live": LIVE_STATUSES})
+            cur.execute(PLAN_SQL, {"active": ACTIVE_STATUSES, "live": LIVE_STATUSES})
+            if ledger_start is not None:
+                cur.execute(CREDIT_PLAN_SQL, {"since": since, "settle_minutes": settle_minutes})
+        conn.commit()
+
+        summary = _plan_summary(conn)
+        report["plan"] = summary
+        report["plan_rows"] = _write_plan(conn, output, batch_size)
+        report["plan_file"] = output
+        logger.info(f"[RECONCILE] Plan built | {summary}")
+
+        if apply:
+            report["applied"] = _apply(conn, summary, force)
+            logger.info(f"[RECONCILE] Applied | {report['applied']}")
+
+        with conn.cursor() as cur:
+            cur.execute("DROP TABLE IF EXISTS pg_temp.stg_subscriptions, pg_temp.stg_invoices, pg_temp.stg_prices, pg_temp.stg_live, pg_temp.reconcile_plan")
+        conn.commit()
+    finally:
+        conn.close()
+
+    report["duration_s"] = round(time.perf_counter() - started, 2)
+    return report
+
+
+def main(argv=None) -> int:
+    from app.utils.logger import configure_logging, shutdown_logging
+
+    parser = argparse.ArgumentParser(prog="python -m app.billing.reconcile", description=__doc__.split("\n")[1])
+    parser.add_argument("--output", default="reconcile-plan.jsonl", help="Repair plan, one JSON object per line")
+    parser.add_argument("--apply", action="store_true", help="Execute the plan (default: dry run)")
+    parser.add_argument("--invoice-days", type=int, default=40, help="Check invoices paid in the last N days")
+    parser.add_argument("--settle-minutes", type=int, default=15, help="Skip invoices newer than this (webhook in flight)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per staging COPY and plan fetch")
+    parser.add_argument("--force", action="store_true", help=f"Apply even above {MAX_DEACTIVATE_SHARE:.0%} deactivations")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    try:
+        report = reconcile(
+            args.output, apply=args.apply, invoice_days=args.invoice_days,
+            settle_minutes=args.settle_minutes, batch_size=args.batch_size, force=args.force,
+        )
+    except RuntimeError as e:
+        logger.error(f"[RECONCILE] Aborted | Error: {str(e)}")
+        return 1
+    finally:
+        shutdown_logging()
+    print(json.dumps(report, indent=2, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,6 +18,16 @@ class Settings(BaseSettings):
     # DATABASE (POSTGRESQL)
     # ==============================
     DATABASE_URL: str
+    DB_POOL_MAX: int = 10  # Connections per worker process
+    DB_POOL_TIMEOUT_SECONDS: float = 10.0  # Wait this long for a free connection
+    DATABASE_SSLMODE: str = "require"  # libpq sslmode ("disable" for a local Postgres, e.g. benchmarks/)
+    DB_PREPARED_STATEMENTS: bool = True  # PREPARE hot statements per pooled connection (false behind PgBouncer transaction pooling)
+    DATABASE_READ_URL: str | None = None  # Read replica for replica-routed reads (unset = all reads on the primary)
+    DB_READ_POOL_MAX: int = 10  # Replica connections per worker process
+    DB_READ_POOL_TIMEOUT_SECONDS: float = 1.0  # Wait this long for a replica connection, then read from the primary
+    DB_REPLICA_MAX_LAG_SECONDS: float = 2.0  # Above this replay lag, replica-routed reads go to the primary
+    DB_REPLICA_LAG_CHECK_SECONDS: float = 1.0  # Re-measure replica lag at most this often per worker
+    DB_READ_YOUR_WRITES_SECONDS: float = 5.0  # A user's reads stay on the primary this long after their write
 
     # ==============================
     # JWT CONFIG
@@ -32,6 +42,16 @@ class Settings(BaseSettings):
     STRIPE_SECRET_KEY: str
     STRIPE_PUBLISHABLE_KEY: str
     STRIPE_WEBHOOK_SECRET: str
+    STRIPE_API_BASE: str = ""  # Override https://api.stripe.com (benchmarks/ Stripe stand-in only)
+    STRIPE_MAX_CONCURRENCY: int = 16  # Bulkhead: Stripe calls in flight per worker
+    STRIPE_BULKHEAD_WAIT_SECONDS: float = 0.5  # Wait this long for a free slot, then answer 503
+    STRIPE_BREAKER_FAILURES: int = 5  # Consecutive failed calls that open the circuit
+    STRIPE_BREAKER_RESET_SECONDS: float = 30.0  # Fail fast this long before probing Stripe again
+    CHECKOUT_REUSE_SECONDS: int = 900  # Hand a user their still-open session for this long (0 = always create)
+    CHECKOUT_IDEMPOTENCY_WINDOW_SECONDS: int = 10  # Identical creates in one window share a Stripe idempotency key
+    WEBHOOK_RECORD_DIR: str = ""  # Archive verified webhook bodies here for replay (empty = off)
+    WEBHOOK_PARTITIONS: int = 4  # Per-worker queues; one customer's events always share one, in order
+    WEBHOOK_CUSTOMER_LOCK: bool = True  # Also serialize a customer across workers (Postgres advisory lock)
 
     STRIPE_STARTER_PRICE_ID: str
     STRIPE_CREATOR_PRICE_ID: str
@@ -42,11 +62,94 @@ class Settings(BaseSettings):
     STRIPE_CREDIT_PACK_300_PRICE_ID: str | None = None
     STRIPE_CREDIT_PACK_1000_PRICE_ID: str | None = None
 
+    # ==============================
+    # COINBASE COMMERCE
+    # ==============================
+    COINBASE_API_KEY: str = ""  # Empty = crypto top-ups disabled (charge route answers 503)
+    COINBASE_WEBHOOK_SECRET: str = ""  # Empty = every webhook is rejected
+    COINBASE_API_BASE: str = "https://api.commerce.coinbase.com"
+    COINBASE_TIMEOUT_SECONDS: float = 10.0  # Per charge-create call
+    COINBASE_MAX_CONNECTIONS: int = 16  # Keep-alive pool per worker
+
+    # ==============================
+    # PERFORMANCE
+    # ==============================
+    SINGLEFLIGHT_RESULT_TTL_MS: int = 0  # Reuse a finished read for this long (0 = in-flight only)
+
+    # ==============================
+    # LOGGING
+    # ==============================
+    LOG_JSON: bool = True  # One JSON object per line (False = classic text lines)
+    LOG_QUEUE_SIZE: int = 10000  # Records buffered for the writer thread; overflow is dropped and counted
+    LOG_SAMPLE_RATES: str = "stripe.checkout=0.1"  # category=rate,... for DEBUG lines (INFO+ always kept)
+
+    # ==============================
+    # TRACING
+    # ==============================
+    TRACING_EXPORTER: str = "none"  # none | otlp | memory (tests)
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"  # OTLP/HTTP JSON collector
+    TRACING_SAMPLE_RATE: float = 0.05  # Fraction of requests traced (incoming sampled traceparent always wins)
+    TRACING_SERVICE_NAME: str = "studio-genie-api"
+
+    # ==============================
+    # SQL INSTRUMENTATION
+    # ==============================
+    SQL_SLOW_QUERY_MS: int = 200  # Log statements slower than this
+    SQL_STATEMENT_BUDGET: int = 20  # Default statements per request (@statement_budget overrides)
+    SQL_REPEAT_LIMIT: int = 5  # Same fingerprint more often than this in one request = likely N+1
+    SQL_STRICT_MODE: bool = False  # Raise QueryBudgetExceeded on violations (tests / CI)
+
+    # ==============================
+    # HEALTH CHECKS
+    # ==============================
+    HEALTH_REFRESH_INTERVAL_SECONDS: float = 5.0  # DB ping + snapshot rebuild
+    HEALTH_STRIPE_INTERVAL_SECONDS: float = 60.0  # Stripe reachability (counts against API rate limit)
+    HEALTH_LOOP_LAG_WARN_MS: int = 250  # Event-loop lag above this reports "degraded"
+    HEALTH_DB_PING_TIMEOUT_SECONDS: float = 2.0  # Connect/statement timeout of the DB ping (own connection, not pooled)
+
+    # ==============================
+    # EVENT LOOP MONITOR
+    # ==============================
+    LOOP_MONITOR_INTERVAL_MS: int = 100  # Heartbeat period used to measure lag
+    LOOP_BLOCK_THRESHOLD_MS: int = 300  # Log the loop thread's stack when blocked this long
+    LOOP_STRICT_MODE: bool = False  # Raise on blocking socket/psycopg2 calls in coroutines (tests / CI)
+
+    # ==============================
+    # STARTUP PROFILING
+    # ==============================
+    STARTUP_PROFILE_TOP: int = 15  # Slowest imports listed in the startup report (0 = summary only)
+
+    # ==============================
+    # PRODUCTION SERVER (python -m app.server)
+    # ==============================
+    HOST: str = "0.0.0.0"
+    PORT: int = 8000
+    WEB_CONCURRENCY: int = 0  # Worker processes (0 = size from CPUs and memory)
+    WORKER_MEMORY_MB: int = 160  # Expected RSS per worker, used for auto-sizing
+    WORKER_MAX_REQUESTS: int = 10000  # Recycle a worker after this many requests (0 = never)
+    WORKER_MAX_REQUESTS_JITTER: int = 1000  # Random extra requests so workers don't recycle together
+
+    # ==============================
+    # SHUTDOWN
+    # ==============================
+    SHUTDOWN_DRAIN_TIMEOUT_SECONDS: float = 25.0  # Keep below the platform's SIGKILL grace period
+
+    # ==============================
+    # ADMIN & PROFILING
+    # ==============================
+    ADMIN_EMAILS: str = ""  # CSV of emails allowed on admin-only endpoints
+    PROFILER_MAX_SECONDS: int = 60  # Longest CPU/memory profile one request may run
+    PROFILER_MAX_HZ: int = 250  # Upper bound on CPU sampling frequency
+
     # ==============================
     # CORS
     # ==============================
     CORS_ORIGINS: str = "*"
 
+    @property
+    def admin_emails_list(self):
+        return [e.strip().lower() for e in self.ADMIN_EMAILS.split(",") if e.strip()]
+
     @property
     def cors_origins_list(self):
         """
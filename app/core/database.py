@@ -1,14 +1,348 @@
 import os
+import threading
+import time
+import logging
 import psycopg2
+from psycopg2.extensions import connection as _PgConnection, TRANSACTION_STATUS_IDLE
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import PoolError
+from app.core.config import settings
+from app.core.metrics import observe_db
+from app.core.loop_monitor import check_blocking_call
+from app.core.query_audit import fingerprint, record_statement
+from app.core.replica import ROUTE_PRIMARY, ROUTE_REPLICA, replica_router
+from app.core.tracing import current_span, record_span
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-def get_connection():
-    conn = psycopg2.connect(
+logger = logging.getLogger(__name__)
+
+
+class PoolClosedError(RuntimeError):
+    """Raised when a connection is requested after shutdown closed the pool."""
+
+
+def _statement_kind(query) -> str:
+    if isinstance(query, bytes):
+        query = query.decode(errors="replace")
+    if not isinstance(query, str):
+        return "OTHER"
+    head = query.lstrip().split(None, 1)
+    return head[0].upper() if head else "OTHER"
+
+
+class InstrumentedCursor(RealDictCursor):
+    """
+    RealDictCursor that records statement latency, and fingerprint/rows
+    into the current request's query log (see app.core.query_audit).
+    """
+
+    def execute(self, query, vars=None):
+        return self._execute(query, vars, query)
+
+    def execute_prepared(self, statement, vars=()):
+        """
+        Run an app.core.prepared statement by name, PREPAREing it first if
+        this connection hasn't yet. Recorded under its SQL, not "EXECUTE".
+        """
+        prepared = getattr(self.connection, "_prepared", None)
+        if prepared is None or not settings.DB_PREPARED_STATEMENTS:
+            return self._execute(statement.sql, vars, statement.sql)
+        if statement.name in prepared:
+            return self._execute(statement.execute_sql, vars, statement.sql)
+
+        check_blocking_call("psycopg2 execute")
+        started = time.perf_counter()
+        super().execute(statement.prepare_sql)
+        prepared.add(statement.name)
+        result = self._execute(statement.execute_sql, vars, statement.sql)
+        logger.debug(
+            f"[DB] Prepared statement | Name: {statement.name} | "
+            f"Duration: {(time.perf_counter() - started) * 1000:.2f}ms"
+        )
+        return result
+
+    def _execute(self, query, vars, recorded):
+        check_blocking_call("psycopg2 execute")
+        started = time.perf_counter()
+        try:
+            result = super().execute(query, vars)
+        except Exception as e:
+            duration = time.perf_counter() - started
+            observe_db(_statement_kind(recorded), duration)
+            _trace_statement(recorded, duration, -1, f"{type(e).__name__}: {e}")
+            raise
+        duration = time.perf_counter() - started
+        observe_db(_statement_kind(recorded), duration)
+        _trace_statement(recorded, duration, self.rowcount)
+        record_statement(recorded, duration, self.rowcount)
+        return result
+
+
+def _trace_statement(query, duration: float, rowcount: int, error: str | None = None):
+    span = current_span()
+    if span is None or not span.sampled:
+        return
+    text = query.decode(errors="replace") if isinstance(query, bytes) else str(query)
+    record_span(
+        "db.query",
+        duration,
+        error=error,
+        **{
+            "db.system": "postgresql",
+            "db.operation": _statement_kind(query),
+            "db.statement": fingerprint(text),
+            "db.rows": rowcount,
+        },
+    )
+
+
+class PooledConnection(_PgConnection):
+    """
+    psycopg2 connection that returns itself to the pool on close().
+
+    Use it as a context manager so an exception can't leak the slot:
+
+        with get_connection() as conn:
+            ...
+
+    Unlike a plain psycopg2 connection, leaving the block doesn't commit:
+    it returns the connection, and any transaction left open (e.g. a SELECT
+    without commit, or work interrupted by an exception) is rolled back.
+    """
+    _pool = None
+    _checked_out = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.putconn(self)
+        else:
+            super().close()
+
+    def discard(self):
+        """Really close the socket and drop the connection from its pool."""
+        self._pool = None
+        super().close()
+
+
+class ConnectionPool:
+    """
+    Thread-safe, blocking connection pool.
+
+    Unlike psycopg2.pool.ThreadedConnectionPool, getconn() waits up to
+    `timeout` seconds for a connection instead of raising immediately, and
+    close() drains checked-out connections before closing everything.
+    """
+
+    def __init__(self, dsn: str, maxconn: int, timeout: float, **connect_kwargs):
+        self.dsn = dsn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.connect_kwargs = connect_kwargs
+        self._idle: list[PooledConnection] = []
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _connect(self) -> PooledConnection:
+        conn = psycopg2.connect(
+            self.dsn,
+            connection_factory=PooledConnection,
+            **self.connect_kwargs
+        )
+        conn._pool = self
+        conn._prepared = set()  # app.core.prepared names PREPAREd on this session
+        return conn
+
+    def getconn(self) -> PooledConnection:
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolClosedError("Connection pool is closed (shutting down)")
+                while self._idle:
+                    conn = self._idle.pop()
+                    if conn.closed:
+                        self._size -= 1
+                        continue
+                    conn._checked_out = True
+                    return conn
+                if self._size < self.maxconn:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolError(
+                        f"Timed out after {self.timeout}s waiting for a database connection"
+                    )
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+        # Open the new connection outside the lock
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        conn._checked_out = True
+        return conn
+
+    def putconn(self, conn: PooledConnection):
+        with self._cond:
+            if not conn._checked_out:
+                return  # Double close() - already back in the pool
+            conn._checked_out = False
+
+        keep = not conn.closed
+        if keep and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                keep = False
+
+        with self._cond:
+            if keep and not self._closed and len(self._idle) < self.maxconn:
+                self._idle.append(conn)
+            else:
+                self._size -= 1
+                if not conn.closed:
+                    conn.discard()
+            self._cond.notify()
+
+    def close(self, timeout: float = 0.0):
+        """
+        Stop handing out connections, wait up to `timeout` seconds for
+        checked-out connections to come back, then close every connection.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            while self._size > len(self._idle):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            in_use = self._size - len(self._idle)
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+
+        for conn in idle:
+            conn.discard()
+
+        if in_use:
+            logger.warning(f"[DB POOL] Closed with {in_use} connection(s) still checked out")
+        else:
+            logger.info(f"[DB POOL] Closed {len(idle)} idle connection(s)")
+
+    def status(self) -> dict:
+        with self._cond:
+            return {
+                "mode": "pooled",
+                "closed": self._closed,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "waiting": self._waiting,
+                "max": self.maxconn,
+            }
+
+
+_pool = None
+_replica_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    DATABASE_URL,
+                    maxconn=settings.DB_POOL_MAX,
+                    timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+                    cursor_factory=InstrumentedCursor,
+                    sslmode=settings.DATABASE_SSLMODE,
+                )
+    return _pool
+
+
+def _get_replica_pool() -> ConnectionPool:
+    global _replica_pool
+    if _replica_pool is None:
+        with _pool_lock:
+            if _replica_pool is None:
+                _replica_pool = ConnectionPool(
+                    settings.DATABASE_READ_URL,
+                    maxconn=settings.DB_READ_POOL_MAX,
+                    timeout=settings.DB_READ_POOL_TIMEOUT_SECONDS,
+                    cursor_factory=InstrumentedCursor,
+                    sslmode=settings.DATABASE_SSLMODE,
+                )
+    return _replica_pool
+
+
+def get_connection(route: str = ROUTE_PRIMARY, user_id=None):
+    """
+    Pooled connection; use as `with get_connection() as conn:` so it goes
+    back to the pool even when the block raises. ROUTE_REPLICA is a hint
+    for reads that tolerate replica lag: app.core.replica decides, and
+    falls back to the primary. Pass the reading user's ID so their recent
+    writes are visible.
+    """
+    check_blocking_call("psycopg2 get_connection")
+    if route == ROUTE_REPLICA and replica_router.enabled:
+        conn = replica_router.checkout(_get_replica_pool(), user_id)
+        if conn is not None:
+            return conn
+    return _get_pool().getconn()
+
+
+def connect_unpooled(timeout: float):
+    """
+    Plain connection outside the pool, for probes that must neither queue
+    behind request traffic nor take a slot from it; `timeout` bounds the
+    connect and every statement. The caller closes it.
+    """
+    check_blocking_call("psycopg2 connect")
+    return psycopg2.connect(
         DATABASE_URL,
-        cursor_factory=RealDictCursor,
-        sslmode="require"
+        connect_timeout=max(1, round(timeout)),  # libpq takes whole seconds
+        options=f"-c statement_timeout={int(timeout * 1000)}",
+        sslmode=settings.DATABASE_SSLMODE,
     )
-    return conn
 
+
+def pool_status() -> dict:
+    """Pool occupancy for health checks."""
+    if _pool is None:
+        status = {"mode": "pooled", "size": 0, "idle": 0, "in_use": 0, "waiting": 0, "max": settings.DB_POOL_MAX}
+    else:
+        status = _pool.status()
+    if replica_router.enabled:
+        replica = _replica_pool.status() if _replica_pool is not None else {"size": 0, "max": settings.DB_READ_POOL_MAX}
+        status["replica"] = {**replica, **replica_router.status()}
+    return status
+
+
+def close_pool(timeout: float = 0.0):
+    """Drain and close pooled connections (called on shutdown)."""
+    deadline = time.monotonic() + timeout
+    if _pool is not None:
+        _pool.close(timeout)
+    if _replica_pool is not None:
+        _replica_pool.close(max(0.0, deadline - time.monotonic()))
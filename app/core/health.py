@@ -0,0 +1,197 @@
+"""
+Deep Health Checks - Cached Dependency Status
+A background refresher probes the database, Stripe and the event loop on an
+interval; the health endpoint only serves the last precomputed snapshot.
+
+- The database is pinged over a dedicated connection with a short timeout
+  (HEALTH_DB_PING_TIMEOUT_SECONDS), not the request pool: a saturated pool
+  would otherwise time the ping out and report a reachable database as
+  unhealthy, pulling every worker out of rotation at once. Saturation (all
+  connections in use, or requests waiting) is reported as "degraded"
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Callable, Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.database import connect_unpooled, pool_status
+from app.core.lifecycle import shutdown_coordinator
+from app.core.loop_monitor import loop_monitor
+from app.core.subscription_prices import get_all_price_ids
+from app.services.stripe_gateway import stripe_gateway
+from app.utils.lazy_import import lazy_import
+
+stripe = lazy_import("stripe")
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """
+    Keeps a serialized health snapshot fresh in the background.
+
+    Status levels:
+        ok        - all dependencies reachable
+        degraded  - Stripe unreachable, DB pool saturated or event loop lagging (still serve traffic)
+        unhealthy - database unreachable or snapshot stale (take worker out of rotation)
+        draining  - shutdown in progress (take worker out of rotation)
+    """
+
+    def __init__(self):
+        self._queues: Dict[str, Callable[[], int]] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._db: dict = {"ok": False, "error": "not checked yet"}
+        self._db_conn = None  # ping connection, reopened after an error
+        self._stripe: dict = {"ok": None, "checked_at": None}
+        self._stripe_next_check = 0.0
+        self._refreshed_at: Optional[float] = None
+        self._status = "unhealthy"
+        self._body = json.dumps({"status": "starting"}).encode()
+
+    # ---------------------------------------------------------
+    # Registration
+    # ---------------------------------------------------------
+    def register_queue(self, name: str, depth: Callable[[], int]):
+        """Report a queue's depth in every snapshot (must be cheap and non-blocking)."""
+        self._queues[name] = depth
+
+    # ---------------------------------------------------------
+    # Lifecycle
+    # ---------------------------------------------------------
+    def start(self):
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._refresh_loop())]
+        logger.info(f"[HEALTH] Refresher started | Interval: {settings.HEALTH_REFRESH_INTERVAL_SECONDS}s")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        if self._db_conn is not None:
+            await run_in_threadpool(self._db_conn.close)
+            self._db_conn = None
+
+    # ---------------------------------------------------------
+    # Probe-facing read (no I/O)
+    # ---------------------------------------------------------
+    def snapshot(self) -> tuple[int, bytes]:
+        """Return (http_status, json_body) from the last refresh."""
+        if shutdown_coordinator.draining:
+            return 503, json.dumps({"status": "draining", "in_flight": shutdown_coordinator.in_flight}).encode()
+        if self._refreshed_at is None or (
+            time.monotonic() - self._refreshed_at > 3 * settings.HEALTH_REFRESH_INTERVAL_SECONDS
+        ):
+            return 503, json.dumps({"status": "unhealthy", "reason": "health snapshot stale"}).encode()
+        return (503 if self._status == "unhealthy" else 200), self._body
+
+    # ---------------------------------------------------------
+    # Background work
+    # ---------------------------------------------------------
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"[HEALTH] Refresh failed | Error: {str(e)}")
+            await asyncio.sleep(settings.HEALTH_REFRESH_INTERVAL_SECONDS)
+
+    async def refresh(self):
+        self._db = await run_in_threadpool(self._ping_database)
+        pool = pool_status()
+        pool_saturated = pool["waiting"] > 0 or pool["in_use"] >= pool["max"]
+
+        now = time.monotonic()
+        if now >= self._stripe_next_check:
+            self._stripe = await _ping_stripe()
+            self._stripe_next_check = now + settings.HEALTH_STRIPE_INTERVAL_SECONDS
+
+        queues = {}
+        for name, depth in self._queues.items():
+            try:
+                queues[name] = depth()
+            except Exception as e:
+                queues[name] = f"error: {str(e)}"
+
+        # Sampled by app.core.loop_monitor (must be started before this monitor)
+        lag_max_ms = loop_monitor.take_max_lag()
+
+        if not self._db["ok"]:
+            status = "unhealthy"
+        elif pool_saturated or self._stripe["ok"] is False or lag_max_ms > settings.HEALTH_LOOP_LAG_WARN_MS:
+            status = "degraded"
+        else:
+            status = "ok"
+
+        self._status = status
+        self._refreshed_at = time.monotonic()
+        self._body = json.dumps({
+            "status": status,
+            "environment": settings.ENVIRONMENT,
+            "checked_at": time.time(),
+            "database": {**self._db, "pool": pool, "pool_saturated": pool_saturated},
+            "stripe": self._stripe,
+            "event_loop": {
+                "lag_ms": round(loop_monitor.lag_ms, 2),
+                "max_lag_ms": round(lag_max_ms, 2),
+            },
+            "queues": queues,
+        }, default=str).encode()
+
+        if status != "ok":
+            logger.warning(
+                f"[HEALTH] Status: {status} | DB: {self._db['ok']} | PoolSaturated: {pool_saturated} "
+                f"| Stripe: {self._stripe['ok']} | MaxLag: {lag_max_ms:.0f}ms"
+            )
+
+    def _ping_database(self) -> dict:
+        """SELECT 1 on the dedicated ping connection (blocking: run in the threadpool)."""
+        started = time.perf_counter()
+        try:
+            if self._db_conn is None or self._db_conn.closed:
+                self._db_conn = connect_unpooled(settings.HEALTH_DB_PING_TIMEOUT_SECONDS)
+                self._db_conn.autocommit = True
+            with self._db_conn.cursor() as cur:
+                cur.execute("SELECT 1")
+                cur.fetchone()
+        except Exception as e:
+            if self._db_conn is not None:
+                self._db_conn.close()
+                self._db_conn = None
+            return {"ok": False, "error": str(e)}
+        return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+
+async def _ping_stripe() -> dict:
+    """
+    Same call the checkout preflight makes, against the first subscription
+    price, through the gateway: while the circuit is open this fails fast,
+    and once it half-opens this probe can close it again.
+    """
+    started = time.perf_counter()
+    try:
+        await stripe_gateway.retrieve_price(get_all_price_ids()[0])
+    except stripe.error.InvalidRequestError:
+        # Stripe answered; a missing price is a config problem, not connectivity
+        pass
+    except Exception as e:
+        return {"ok": False, "error": str(e), "checked_at": time.time(), "gateway": stripe_gateway.status()}
+    return {
+        "ok": True,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+        "checked_at": time.time(),
+        "gateway": stripe_gateway.status(),
+    }
+
+
+# Global health monitor instance
+health_monitor = HealthMonitor()
@@ -0,0 +1,176 @@
+"""
+Graceful Shutdown - Request Tracking & Connection Draining
+Coordinates shutdown so deploys don't kill webhooks or video generations
+mid-transaction:
+
+1. Stop accepting new work (new requests get 503 + Retry-After +
+   Connection: close, /health/deep reports draining)
+2. Run drain hooks (workers hand unclaimed queue items back), then wait for
+   in-flight requests and tracked background tasks
+3. Close pooled database connections
+
+Every step shares one deadline, set when draining begins. Under app.server
+draining begins on SIGTERM while uvicorn is still listening (steps 1-2), and
+uvicorn's own graceful stop and the lifespan shutdown (step 3) get what is
+left; run any other way, the lifespan shutdown does all three.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Coroutine, Dict, Optional, Set
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.database import close_pool
+
+logger = logging.getLogger(__name__)
+
+# Paths that keep answering while draining (load balancer probes)
+DRAIN_EXEMPT_PATHS = ("/health", "/health/deep")
+
+
+class ShutdownCoordinator:
+    """Tracks in-flight work for a worker and drains it on shutdown."""
+
+    def __init__(self):
+        self.draining = False
+        self.deadline: Optional[float] = None  # monotonic, set by begin_drain
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._drain_hooks: Dict[str, Callable[[float], Awaitable[None]]] = {}
+        self._work_drained = False
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def remaining(self) -> float:
+        """Seconds left of the drain budget (0 before draining begins)."""
+        return _remaining(self.deadline) if self.deadline is not None else 0.0
+
+    # ---------------------------------------------------------
+    # Request tracking (called by DrainMiddleware)
+    # ---------------------------------------------------------
+    def request_started(self):
+        self._in_flight += 1
+        self._idle.clear()
+
+    def request_finished(self):
+        self._in_flight -= 1
+        if self._in_flight == 0:
+            self._idle.set()
+
+    # ---------------------------------------------------------
+    # Background work
+    # ---------------------------------------------------------
+    def spawn(self, coro: Coroutine, name: Optional[str] = None) -> asyncio.Task:
+        """Start a background task that shutdown will wait for."""
+        task = asyncio.create_task(coro, name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def register_drain_hook(self, name: str, hook: Callable[[float], Awaitable[None]]):
+        """
+        Register a coroutine called during drain with the remaining seconds.
+        Workers use it to stop pulling work and return unclaimed items.
+        """
+        self._drain_hooks[name] = hook
+
+    # ---------------------------------------------------------
+    # Shutdown
+    # ---------------------------------------------------------
+    def begin_drain(self, timeout: float):
+        """
+        Stop accepting new work and start the `timeout`-second drain budget;
+        health checks start reporting draining. Later calls change nothing.
+        """
+        if not self.draining:
+            self.draining = True
+            self.deadline = time.monotonic() + timeout
+            logger.info(
+                f"[SHUTDOWN] Draining | InFlight: {self._in_flight} | "
+                f"BackgroundTasks: {len(self._tasks)} | Budget: {timeout}s"
+            )
+
+    async def drain_work(self):
+        """Run drain hooks, then wait for in-flight requests and background tasks (once)."""
+        if self._work_drained:
+            return
+        self._work_drained = True
+
+        for name, hook in self._drain_hooks.items():
+            try:
+                await asyncio.wait_for(hook(self.remaining), self.remaining)
+            except Exception as e:
+                logger.error(f"[SHUTDOWN] Drain hook failed | Hook: {name} | Error: {str(e)}")
+
+        try:
+            await asyncio.wait_for(self._idle.wait(), self.remaining)
+        except asyncio.TimeoutError:
+            logger.warning(f"[SHUTDOWN] Deadline hit with {self._in_flight} request(s) in flight")
+
+        if self._tasks:
+            done, pending = await asyncio.wait(set(self._tasks), timeout=self.remaining)
+            for task in pending:
+                logger.warning(f"[SHUTDOWN] Cancelling background task past deadline | Task: {task.get_name()}")
+                task.cancel()
+
+    async def drain(self, timeout: float):
+        """
+        Drain everything, then close the DB pool, within the budget started
+        by begin_drain (or `timeout` seconds if draining hasn't begun).
+        """
+        self.begin_drain(timeout)
+        await self.drain_work()
+
+        # Give checked-out connections the rest of the budget to come back
+        await run_in_threadpool(close_pool, self.remaining)
+        logger.info("[SHUTDOWN] Drain complete")
+
+
+def _remaining(deadline: float) -> float:
+    return max(0.0, deadline - time.monotonic())
+
+
+class DrainMiddleware:
+    """
+    Pure ASGI middleware counting in-flight HTTP requests.
+    Once draining, new requests are refused with 503 so clients and the load
+    balancer retry on another worker instead of being cut off mid-request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        coordinator = shutdown_coordinator
+        if coordinator.draining and scope["path"] not in DRAIN_EXEMPT_PATHS:
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"retry-after", b"1"),
+                    (b"connection", b"close"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"Server is shutting down"}'})
+            return
+
+        coordinator.request_started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            coordinator.request_finished()
+
+
+# Global coordinator for this worker process
+shutdown_coordinator = ShutdownCoordinator()
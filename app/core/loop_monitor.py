@@ -0,0 +1,180 @@
+"""
+Event-Loop Monitor - Lag Metric, Blocking Watchdog & Strict Mode
+A heartbeat task measures how late the event loop wakes it up (lag); a
+watchdog thread notices when the heartbeat stops altogether and logs the
+loop thread's stack while it is still blocked, pointing at the offender.
+
+- Lag is exported as the event_loop_lag_seconds histogram and feeds /health/deep
+- Blocks longer than LOOP_BLOCK_THRESHOLD_MS are logged once per episode
+  with the stack, and counted in event_loop_blocks_total
+- LOOP_STRICT_MODE (tests / CI) raises BlockingCallError when blocking
+  socket I/O or a psycopg2 statement runs on the event-loop thread
+"""
+import asyncio
+import logging
+import socket
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import EVENT_LOOP_BLOCKS, EVENT_LOOP_LAG
+
+logger = logging.getLogger(__name__)
+
+
+class BlockingCallError(RuntimeError):
+    """Raised in strict mode for blocking I/O on the event-loop thread."""
+
+
+class LoopMonitor:
+    def __init__(self):
+        self.lag_ms = 0.0
+        self._max_lag_ms = 0.0
+        self._last_beat = 0.0
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    # ---------------------------------------------------------
+    # Lifecycle (call from inside the running loop)
+    # ---------------------------------------------------------
+    def start(self):
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        if settings.LOOP_STRICT_MODE:
+            install_strict_mode()
+        logger.info(
+            f"[LOOP] Monitor started | Interval: {settings.LOOP_MONITOR_INTERVAL_MS}ms "
+            f"| BlockThreshold: {settings.LOOP_BLOCK_THRESHOLD_MS}ms | Strict: {settings.LOOP_STRICT_MODE}"
+        )
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        uninstall_strict_mode()
+
+    # ---------------------------------------------------------
+    # Readings
+    # ---------------------------------------------------------
+    def take_max_lag(self) -> float:
+        """Worst lag (ms) since the previous call; resets the window."""
+        worst, self._max_lag_ms = self._max_lag_ms, self.lag_ms
+        return worst
+
+    def on_loop_thread(self) -> bool:
+        return threading.get_ident() == self._loop_thread_id
+
+    # ---------------------------------------------------------
+    # Heartbeat (event loop) and watchdog (thread)
+    # ---------------------------------------------------------
+    async def _heartbeat(self):
+        loop = asyncio.get_running_loop()
+        interval = settings.LOOP_MONITOR_INTERVAL_MS / 1000
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            lag = max(0.0, loop.time() - expected)
+            self._last_beat = time.monotonic()
+            self.lag_ms = lag * 1000
+            self._max_lag_ms = max(self._max_lag_ms, self.lag_ms)
+            EVENT_LOOP_LAG.observe(lag)
+
+    def _watch(self):
+        interval = settings.LOOP_MONITOR_INTERVAL_MS / 1000
+        # The heartbeat is due every `interval`; anything beyond that is blocking
+        threshold = interval + settings.LOOP_BLOCK_THRESHOLD_MS / 1000
+        reported_beat = None
+        while not self._stopped.wait(interval / 2):
+            beat = self._last_beat
+            blocked_for = time.monotonic() - beat
+            if blocked_for < threshold or beat == reported_beat:
+                continue
+            reported_beat = beat  # one report per blocking episode
+            EVENT_LOOP_BLOCKS.inc()
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "<unavailable>"
+            logger.warning(
+                f"[LOOP] Event loop blocked for {blocked_for * 1000:.0f}ms+ | Stack of the blocking call:\n{stack}"
+            )
+
+
+# =========================================================
+# STRICT MODE
+# =========================================================
+
+_SOCKET_METHODS = ("connect", "connect_ex", "send", "sendall", "sendto", "recv", "recv_into", "recvfrom", "accept")
+_originals: dict = {}
+
+
+def check_blocking_call(what: str):
+    """Raise if a blocking call is made on the event-loop thread (strict mode only)."""
+    if not _originals:
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return  # Worker thread (run_in_threadpool) - blocking is fine here
+    raise BlockingCallError(
+        f"Blocking {what} on the event-loop thread; move it to run_in_threadpool or use an async client"
+    )
+
+
+def _guard(name: str, original):
+    def guarded(sock, *args, **kwargs):
+        # asyncio's own sockets are non-blocking (timeout 0.0)
+        if sock.gettimeout() != 0.0:
+            check_blocking_call(f"socket.{name}")
+        return original(sock, *args, **kwargs)
+    guarded.__name__ = name
+    return guarded
+
+
+def install_strict_mode():
+    if _originals:
+        return
+    for name in _SOCKET_METHODS:
+        # Remember whether socket.socket defined it or inherited it from _socket
+        _originals[name] = socket.socket.__dict__.get(name)
+        setattr(socket.socket, name, _guard(name, getattr(socket.socket, name)))
+
+    original_getaddrinfo = socket.getaddrinfo
+    _originals["getaddrinfo"] = original_getaddrinfo
+
+    def getaddrinfo(*args, **kwargs):
+        check_blocking_call("DNS lookup (socket.getaddrinfo)")
+        return original_getaddrinfo(*args, **kwargs)
+
+    socket.getaddrinfo = getaddrinfo
+    logger.warning("[LOOP] Strict mode on: blocking socket I/O on the event loop will raise")
+
+
+def uninstall_strict_mode():
+    if not _originals:
+        return
+    socket.getaddrinfo = _originals.pop("getaddrinfo")
+    for name, original in _originals.items():
+        if original is None:
+            delattr(socket.socket, name)
+        else:
+            setattr(socket.socket, name, original)
+    _originals.clear()
+
+
+# Global monitor for this worker's event loop
+loop_monitor = LoopMonitor()
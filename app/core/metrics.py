@@ -0,0 +1,341 @@
+"""
+Prometheus Metrics - Request, Dependency & Business Counters
+Exposed at GET /metrics in Prometheus text format.
+
+Multi-worker: when PROMETHEUS_MULTIPROC_DIR is set (app.server sets it before
+forking) every worker writes its samples to mmap files in that directory and
+/metrics aggregates all live workers, whichever worker serves the scrape.
+"""
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+from app.core.tracing import route_template, start_span
+
+# Buckets in seconds: fast DB reads up to slow Stripe round trips
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# =========================================================
+# HTTP
+# =========================================================
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by route template and status code",
+    ["method", "route", "status"],
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served",
+    multiprocess_mode="livesum",
+)
+
+# =========================================================
+# DEPENDENCIES
+# =========================================================
+
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "Database statement latency by statement kind",
+    ["statement"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_STATEMENTS_PER_REQUEST = Histogram(
+    "db_statements_per_request",
+    "SQL statements executed per HTTP request by route template",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds",
+    "Total SQL time per HTTP request by route template",
+    ["route"],
+    buckets=LATENCY_BUCKETS,
+)
+STRIPE_LATENCY = Histogram(
+    "stripe_request_duration_seconds",
+    "Stripe API call latency by operation and outcome",
+    ["operation", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+STRIPE_RETRIES = Counter(
+    "stripe_retries_total",
+    "Stripe API attempts retried after a timeout, connection error, 5xx or 429",
+    ["operation"],
+)
+STRIPE_REJECTED = Counter(
+    "stripe_requests_rejected_total",
+    "Stripe API calls failed fast without reaching Stripe",
+    ["operation", "reason"],
+)
+STRIPE_CIRCUIT_OPEN = Gauge(
+    "stripe_circuit_open",
+    "1 while a worker's Stripe circuit breaker is open or half-open",
+    multiprocess_mode="livemax",
+)
+COINBASE_LATENCY = Histogram(
+    "coinbase_request_duration_seconds",
+    "Coinbase Commerce API call latency by operation and outcome",
+    ["operation", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# =========================================================
+# RUNTIME
+# =========================================================
+
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop ran a timer that was due",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+EVENT_LOOP_BLOCKS = Counter(
+    "event_loop_blocks_total",
+    "Times the event loop was blocked beyond LOOP_BLOCK_THRESHOLD_MS",
+)
+
+# =========================================================
+# BUSINESS
+# =========================================================
+
+CREDITS_GRANTED = Counter(
+    "credits_granted_total",
+    "Credits added to user balances",
+    ["source"],
+)
+CREDITS_CONSUMED = Counter(
+    "credits_consumed_total",
+    "Credits deducted from user balances",
+    ["source"],
+)
+WEBHOOK_EVENTS = Counter(
+    "webhook_events_total",
+    "Webhook events by provider, type and outcome",
+    ["provider", "event_type", "outcome"],
+)
+WEBHOOK_PARTITION_LAG = Histogram(
+    "webhook_partition_lag_seconds",
+    "Time a webhook event waited in its customer partition before its handler started",
+    ["partition"],
+    buckets=LATENCY_BUCKETS,
+)
+WEBHOOK_PARTITION_DEPTH = Gauge(
+    "webhook_partition_depth",
+    "Webhook events queued or running per customer partition",
+    ["partition"],
+    multiprocess_mode="livesum",
+)
+DB_READ_ROUTES = Counter(
+    "db_read_routes_total",
+    "Replica-routed reads by where they ran and why (pinned, lag, replica_down, replica_busy)",
+    ["route", "reason"],
+)
+DB_REPLICA_LAG = Gauge(
+    "db_replica_lag_seconds",
+    "Last measured read replica replay lag (-1 = unknown or unreachable)",
+    multiprocess_mode="livemax",
+)
+CHECKOUT_INDEX_LOOKUPS = Counter(
+    "checkout_session_index_lookups_total",
+    "Webhook lookups of the local checkout session index (miss = Stripe call)",
+    ["result"],
+)
+CHECKOUT_SESSIONS_REUSED = Counter(
+    "checkout_sessions_reused_total",
+    "Checkout requests answered with the user's still-open session",
+    ["mode"],
+)
+VIDEO_JOBS = Counter(
+    "video_jobs_total",
+    "Video jobs by state transition",
+    ["state"],
+)
+SINGLEFLIGHT_CALLS = Counter(
+    "singleflight_calls_total",
+    "Coalesced calls by coalescer, route and outcome (executed, coalesced, window_hits, errors)",
+    ["coalescer", "route", "outcome"],
+)
+
+
+# =========================================================
+# LOW-OVERHEAD RECORDING
+# =========================================================
+
+# labels() takes a lock and builds a key on every call; the hot HTTP path
+# caches the bound children per (method, route, status) instead
+_http_children: Dict[Tuple[str, str, str], tuple] = {}
+
+
+def observe_http(method: str, route: str, status: int, duration: float):
+    key = (method, route, str(status))
+    children = _http_children.get(key)
+    if children is None:
+        children = _http_children[key] = (
+            HTTP_REQUESTS.labels(method, route, key[2]),
+            HTTP_LATENCY.labels(method, route),
+        )
+    children[0].inc()
+    children[1].observe(duration)
+
+
+_db_children: Dict[str, object] = {}
+
+
+def observe_db(statement: str, duration: float):
+    child = _db_children.get(statement)
+    if child is None:
+        child = _db_children[statement] = DB_QUERY_LATENCY.labels(statement)
+    child.observe(duration)
+
+
+@contextmanager
+def observe_stripe(operation: str):
+    """Time (and trace) a Stripe API call: `with observe_stripe("price.retrieve"): ...`"""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        with start_span(f"stripe {operation}", kind="client", **{"peer.service": "stripe"}):
+            yield
+        outcome = "ok"
+    finally:
+        STRIPE_LATENCY.labels(operation, outcome).observe(time.perf_counter() - started)
+
+
+@contextmanager
+def observe_coinbase(operation: str):
+    """Time (and trace) a Coinbase Commerce API call, like observe_stripe."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        with start_span(f"coinbase {operation}", kind="client", **{"peer.service": "coinbase"}):
+            yield
+        outcome = "ok"
+    finally:
+        COINBASE_LATENCY.labels(operation, outcome).observe(time.perf_counter() - started)
+
+
+def record_stripe_retry(operation: str):
+    STRIPE_RETRIES.labels(operation).inc()
+
+
+def record_stripe_rejected(operation: str, reason: str):
+    STRIPE_REJECTED.labels(operation, reason).inc()
+
+
+def set_stripe_circuit_open(is_open: bool):
+    STRIPE_CIRCUIT_OPEN.set(1 if is_open else 0)
+
+
+def record_credits_granted(source: str, amount: int):
+    if amount > 0:
+        CREDITS_GRANTED.labels(source).inc(amount)
+
+
+def record_credits_consumed(source: str, amount: int):
+    if amount > 0:
+        CREDITS_CONSUMED.labels(source).inc(amount)
+
+
+def record_checkout_index_lookup(result: str):
+    CHECKOUT_INDEX_LOOKUPS.labels(result).inc()
+
+
+def record_checkout_reused(mode: str):
+    CHECKOUT_SESSIONS_REUSED.labels(mode).inc()
+
+
+def record_webhook_event(provider: str, event_type: str, outcome: str):
+    WEBHOOK_EVENTS.labels(provider, event_type, outcome).inc()
+
+
+def observe_webhook_partition_lag(partition: int, seconds: float):
+    WEBHOOK_PARTITION_LAG.labels(str(partition)).observe(seconds)
+
+
+def set_webhook_partition_depth(partition: int, depth: int):
+    WEBHOOK_PARTITION_DEPTH.labels(str(partition)).set(depth)
+
+
+def record_db_read_route(route: str, reason: str):
+    DB_READ_ROUTES.labels(route, reason).inc()
+
+
+def set_db_replica_lag(seconds: float):
+    DB_REPLICA_LAG.set(seconds)
+
+
+def record_video_job(state: str):
+    VIDEO_JOBS.labels(state).inc()
+
+
+def record_singleflight_call(coalescer: str, route: str, outcome: str):
+    SINGLEFLIGHT_CALLS.labels(coalescer, route, outcome).inc()
+
+
+# =========================================================
+# EXPOSITION
+# =========================================================
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Prometheus text exposition, aggregated across workers when multiprocess."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency, status and in-flight requests.
+    Labels use the matched route template (/users/me, not the raw path) so
+    cardinality stays bounded; unmatched paths share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            template = route_template(scope)
+            observe_http(scope["method"], template, status_code, time.perf_counter() - started)
+            query_log = scope.get("query_log")
+            if query_log is not None:
+                DB_STATEMENTS_PER_REQUEST.labels(template).observe(len(query_log.statements))
+                DB_TIME_PER_REQUEST.labels(template).observe(query_log.total_seconds)
@@ -0,0 +1,404 @@
+"""
+Migration Runner - Versioned, Locked, Online-Safe Schema Changes
+Applies migrations/NNN_name.sql in version order and records each one in
+schema_migrations, so every environment knows exactly what it has.
+
+Usage:
+    python -m app.core.migrate status
+    python -m app.core.migrate up                  # apply everything pending
+    python -m app.core.migrate up --target 8 --dry-run
+    python -m app.core.migrate up --baseline 7     # first run on a DB migrated by hand
+
+- One runner at a time: a session advisory lock is held for the whole run
+  (a second deploy waits up to --lock-wait seconds, then exits 1)
+- Default: a migration runs in one transaction with lock_timeout, so DDL
+  that can't get its table lock fails fast instead of queueing every query
+  behind it; lock timeouts are retried with backoff
+- "-- migrate:no-transaction" as a file's first line runs it statement by
+  statement in autocommit, for CREATE INDEX CONCURRENTLY. Such files must
+  be re-runnable (IF NOT EXISTS): if one fails, the invalid index left by
+  a failed concurrent build is dropped before the next attempt
+- "-- migrate:backfill batch_size=N sleep_ms=M" before a statement repeats
+  it, one committed batch at a time, until it touches no rows. The
+  statement takes at most {batch_size} rows per run, e.g.
+      UPDATE t SET c = ... WHERE id IN (SELECT id FROM t WHERE c IS NULL LIMIT {batch_size})
+  Backfills imply no-transaction
+- Applied files are checksummed: status flags files edited after the fact
+"""
+import argparse
+import hashlib
+import logging
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional
+
+import psycopg2
+from psycopg2 import errors
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "migrations"
+ADVISORY_LOCK_KEY = 0x4D49_4752  # "MIGR"
+LOCK_TIMEOUT = "5s"  # Transactional DDL gives up waiting for its table lock after this
+LOCK_RETRIES = 5
+
+VERSION_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    duration_ms INTEGER,
+    baseline BOOLEAN NOT NULL DEFAULT FALSE
+)
+"""
+
+_FILENAME = re.compile(r"^(\d+)_([\w-]+)\.sql$")
+_BACKFILL = re.compile(r"^--\s*migrate:backfill\b(.*)$", re.MULTILINE)
+_CONCURRENT_INDEX = re.compile(
+    r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?(\"?[\w.]+\"?)",
+    re.IGNORECASE,
+)
+
+
+# =========================================================
+# MIGRATION FILES
+# =========================================================
+
+@dataclass
+class Step:
+    sql: str
+    backfill: Optional[dict] = None  # {"batch_size": int, "sleep_ms": int}
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    path: Path
+    sql: str
+    checksum: str
+    transactional: bool
+    steps: List[Step] = field(default_factory=list)
+
+
+def load_migrations(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    migrations = []
+    for path in sorted(directory.glob("*.sql")):
+        match = _FILENAME.match(path.name)
+        if not match:
+            logger.warning(f"[MIGRATE] Ignoring unnumbered file | File: {path.name}")
+            continue
+        sql = path.read_text()
+        steps = parse_steps(sql)
+        no_transaction = sql.lstrip().lower().startswith("-- migrate:no-transaction")
+        migrations.append(Migration(
+            version=int(match.group(1)),
+            name=match.group(2),
+            path=path,
+            sql=sql,
+            checksum=hashlib.sha256(sql.encode()).hexdigest(),
+            transactional=not no_transaction and not any(step.backfill for step in steps),
+            steps=steps,
+        ))
+    versions = [migration.version for migration in migrations]
+    duplicates = sorted({version for version in versions if versions.count(version) > 1})
+    if duplicates:
+        raise RuntimeError(f"Duplicate migration versions: {duplicates}")
+    return sorted(migrations, key=lambda migration: migration.version)
+
+
+def split_statements(sql: str) -> List[str]:
+    """Split on top-level semicolons (not inside quotes, dollar quotes or comments)."""
+    statements, start, i, n = [], 0, 0, len(sql)
+    while i < n:
+        char = sql[i]
+        if sql.startswith("--", i):
+            i = sql.find("\n", i)
+            i = n if i == -1 else i
+        elif sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+        elif char in ("'", '"'):
+            end = sql.find(char, i + 1)
+            while end != -1 and sql.startswith(char * 2, end):  # '' escape
+                end = sql.find(char, end + 2)
+            i = n if end == -1 else end + 1
+        elif char == "$" and (tag := re.match(r"\$[A-Za-z_]*\$", sql[i:])):
+            end = sql.find(tag.group(0), i + len(tag.group(0)))
+            i = n if end == -1 else end + len(tag.group(0))
+        elif char == ";":
+            statements.append(sql[start:i + 1])
+            start = i = i + 1
+        else:
+            i += 1
+    statements.append(sql[start:])
+    return [statement.strip() for statement in statements if _has_code(statement)]
+
+
+def _has_code(statement: str) -> bool:
+    return any(line.strip() and not line.strip().startswith("--") for line in statement.splitlines())
+
+
+def parse_steps(sql: str) -> List[Step]:
+    steps = []
+    for statement in split_statements(sql):
+        directive = _BACKFILL.search(statement)
+        backfill = None
+        if directive:
+            options = dict(part.split("=", 1) for part in directive.group(1).split())
+            backfill = {
+                "batch_size": int(options.get("batch_size", 1000)),
+                "sleep_ms": int(options.get("sleep_ms", 100)),
+            }
+        steps.append(Step(statement, backfill))
+    return steps
+
+
+# =========================================================
+# RUNNER
+# =========================================================
+
+class MigrationRunner:
+    def __init__(self, conn, migrations: List[Migration]):
+        self.conn = conn
+        self.migrations = migrations
+
+    # ---------------------------------------------------------
+    # Version table & lock
+    # ---------------------------------------------------------
+    def ensure_version_table(self):
+        self.conn.autocommit = True
+        with self.conn.cursor() as cur:
+            cur.execute(VERSION_TABLE_DDL)
+
+    def applied(self) -> dict:
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT version, name, checksum, applied_at, baseline FROM schema_migrations ORDER BY version")
+            return {row[0]: {"name": row[1], "checksum": row[2], "applied_at": row[3], "baseline": row[4]} for row in cur}
+
+    def acquire_lock(self, wait_seconds: float):
+        deadline = time.monotonic() + wait_seconds
+        with self.conn.cursor() as cur:
+            while True:
+                cur.execute("SELECT pg_try_advisory_lock(%s)", (ADVISORY_LOCK_KEY,))
+                if cur.fetchone()[0]:
+                    return
+                if time.monotonic() >= deadline:
+                    raise RuntimeError("Another migration run holds the lock")
+                logger.info("[MIGRATE] Waiting for another migration run to finish")
+                time.sleep(1.0)
+
+    def release_lock(self):
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (ADVISORY_LOCK_KEY,))
+
+    # ---------------------------------------------------------
+    # Commands
+    # ---------------------------------------------------------
+    def status(self) -> List[dict]:
+        applied = self.applied()
+        rows = []
+        for migration in self.migrations:
+            record = applied.get(migration.version)
+            state = "pending"
+            if record:
+                state = "baseline" if record["baseline"] else "applied"
+                if record["checksum"] != migration.checksum and not record["baseline"]:
+                    state += " (file changed since)"
+            rows.append({"version": migration.version, "name": migration.name, "state": state})
+        return rows
+
+    def baseline(self, version: int):
+        """Record every migration up to `version` as applied without running it."""
+        if self.applied():
+            raise RuntimeError("--baseline only applies to a database without migration history")
+        with self.conn.cursor() as cur:
+            for migration in self.migrations:
+                if migration.version <= version:
+                    cur.execute(
+                        "INSERT INTO schema_migrations (version, name, checksum, baseline) VALUES (%s, %s, %s, TRUE)",
+                        (migration.version, migration.name, migration.checksum),
+                    )
+        logger.info(f"[MIGRATE] Baseline recorded | UpTo: {version}")
+
+    def pending(self, target: Optional[int] = None) -> List[Migration]:
+        applied = self.applied()
+        return [
+            migration for migration in self.migrations
+            if migration.version not in applied and (target is None or migration.version <= target)
+        ]
+
+    def guard_unrecorded_database(self):
+        """
+        Migrations 001-007 were applied by hand before this runner existed,
+        and 003 rewrites balances: never replay them on such a database.
+        """
+        if self.applied():
+            return
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = 'users' AND column_name = 'subscription_status'
+            """)
+            if cur.fetchone():
+                raise RuntimeError(
+                    "Database has migrated tables but no migration history: "
+                    "rerun with --baseline <highest version applied by hand>"
+                )
+
+    def up(self, target: Optional[int] = None) -> List[int]:
+        done = []
+        for migration in self.pending(target):
+            started = time.perf_counter()
+            logger.info(
+                f"[MIGRATE] Applying | Version: {migration.version:03d} | Name: {migration.name} | "
+                f"Mode: {'transaction' if migration.transactional else 'no-transaction'}"
+            )
+            if migration.transactional:
+                self._apply_transactional(migration, started)
+            else:
+                self._apply_online(migration, started)
+            done.append(migration.version)
+            logger.info(f"[MIGRATE] Applied | Version: {migration.version:03d} | {time.perf_counter() - started:.2f}s")
+        return done
+
+    # ---------------------------------------------------------
+    # Apply
+    # ---------------------------------------------------------
+    def _record(self, cur, migration: Migration, started: float):
+        cur.execute(
+            "INSERT INTO schema_migrations (version, name, checksum, duration_ms) VALUES (%s, %s, %s, %s)",
+            (migration.version, migration.name, migration.checksum, int((time.perf_counter() - started) * 1000)),
+        )
+
+    def _apply_transactional(self, migration: Migration, started: float):
+        self.conn.autocommit = False
+        for attempt in range(1, LOCK_RETRIES + 1):
+            try:
+                with self.conn.cursor() as cur:
+                    cur.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+                    cur.execute(migration.sql)
+                    self._record(cur, migration, started)
+                self.conn.commit()
+                break
+            except errors.LockNotAvailable:
+                self.conn.rollback()
+                if attempt == LOCK_RETRIES:
+                    raise
+                logger.warning(f"[MIGRATE] Table lock busy, retrying | Version: {migration.version:03d} | Attempt: {attempt}")
+                time.sleep(min(30.0, 2 ** attempt))
+            except Exception:
+                self.conn.rollback()
+                raise
+        self.conn.autocommit = True
+
+    def _apply_online(self, migration: Migration, started: float):
+        self.conn.autocommit = True
+        with self.conn.cursor() as cur:
+            for step in migration.steps:
+                if step.backfill:
+                    self._backfill(cur, step)
+                    continue
+                index = _CONCURRENT_INDEX.search(step.sql)
+                if index:
+                    self._drop_invalid_index(cur, index.group(1))
+                    # Concurrent builds wait for older transactions: no lock_timeout
+                    cur.execute("SET lock_timeout = 0")
+                else:
+                    cur.execute(f"SET lock_timeout = '{LOCK_TIMEOUT}'")
+                cur.execute(step.sql)
+            cur.execute("RESET lock_timeout")
+            self._record(cur, migration, started)
+
+    def _drop_invalid_index(self, cur, name: str):
+        cur.execute(
+            """
+            SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = %s AND c.relnamespace = current_schema()::regnamespace AND NOT i.indisvalid
+            """,
+            (name.strip('"').split(".")[-1],),
+        )
+        if cur.fetchone():
+            logger.warning(f"[MIGRATE] Dropping invalid index from a failed concurrent build | Index: {name}")
+            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+    def _backfill(self, cur, step: Step):
+        batch_size, sleep_ms = step.backfill["batch_size"], step.backfill["sleep_ms"]
+        sql = step.sql.replace("{batch_size}", str(batch_size))
+        cur.execute(f"SET lock_timeout = '{LOCK_TIMEOUT}'")
+        total, batches, started = 0, 0, time.perf_counter()
+        while True:
+            cur.execute(sql)  # autocommit: every batch commits and releases its row locks
+            if cur.rowcount <= 0:
+                break
+            total += cur.rowcount
+            batches += 1
+            if batches % 50 == 0:
+                logger.info(f"[MIGRATE] Backfill progress | Rows: {total} | Batches: {batches}")
+            time.sleep(sleep_ms / 1000)
+        logger.info(f"[MIGRATE] Backfill done | Rows: {total} | Batches: {batches} | {time.perf_counter() - started:.1f}s")
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def connect(database_url: str):
+    from app.core.config import settings
+    return psycopg2.connect(database_url, sslmode=settings.DATABASE_SSLMODE, application_name="migrate")
+
+
+def main(argv=None) -> int:
+    from app.utils.logger import configure_logging, shutdown_logging
+
+    parser = argparse.ArgumentParser(prog="python -m app.core.migrate", description=__doc__.split("\n")[1])
+    parser.add_argument("command", nargs="?", choices=("up", "status"), default="up")
+    parser.add_argument("--database-url", help="Default: DATABASE_URL")
+    parser.add_argument("--migrations-dir", type=Path, default=MIGRATIONS_DIR)
+    parser.add_argument("--target", type=int, help="Apply up to and including this version")
+    parser.add_argument("--baseline", type=int, help="Record versions <= N as already applied (first run only)")
+    parser.add_argument("--dry-run", action="store_true", help="List what would be applied")
+    parser.add_argument("--lock-wait", type=float, default=60.0, help="Seconds to wait for a concurrent run")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    conn = None
+    try:
+        from app.core.config import settings
+        conn = connect(args.database_url or settings.DATABASE_URL)
+        runner = MigrationRunner(conn, load_migrations(args.migrations_dir))
+        runner.ensure_version_table()
+        if args.command == "status":
+            for row in runner.status():
+                print(f"{row['version']:03d}  {row['name']:<40} {row['state']}")
+            return 0
+
+        runner.acquire_lock(args.lock_wait)
+        try:
+            if args.baseline is not None:
+                runner.baseline(args.baseline)
+            runner.guard_unrecorded_database()
+            if args.dry_run:
+                for migration in runner.pending(args.target):
+                    print(f"{migration.version:03d}  {migration.name}")
+                return 0
+            applied = runner.up(args.target)
+            logger.info(f"[MIGRATE] Done | Applied: {len(applied)}")
+        finally:
+            runner.release_lock()
+        return 0
+    except Exception as e:
+        logger.error(f"[MIGRATE] Aborted | Error: {str(e)}")
+        return 1
+    finally:
+        if conn is not None:
+            conn.close()
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Prepared Statements - Hot Queries Parsed Once per Connection
+psycopg2 interpolates parameters client-side, so Postgres parses, analyzes
+and plans every call of the same few statements from scratch. Statements
+registered here are PREPAREd on a pooled connection the first time they
+run there and executed by name afterwards:
+
+    cur.execute_prepared(CREDITS_BY_ID, (user_id,))   # instead of cur.execute(sql, ...)
+
+- The SQL keeps psycopg2's %s placeholders; they become $1..$n in PREPARE,
+  and parameter types are inferred by Postgres unless given
+- Each PooledConnection remembers which names it has prepared. A prepared
+  statement survives ROLLBACK, and a discarded connection takes its
+  statements with it, so nothing needs cleaning up
+- After the fifth execution Postgres may switch to a cached generic plan,
+  which skips planning entirely (plan_cache_mode); parsing is always saved
+- Schema changes invalidate and re-plan prepared statements server-side;
+  only a change of a statement's result columns needs a worker restart
+- DB_PREPARED_STATEMENTS=false runs the plain SQL instead: required behind
+  a transaction-mode pooler (PgBouncer), where the next transaction may
+  land on a server connection that never saw the PREPARE
+"""
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+
+@dataclass(frozen=True)
+class PreparedStatement:
+    name: str
+    sql: str
+    param_types: Tuple[str, ...] = ()
+
+    @property
+    def arity(self) -> int:
+        return self.sql.count("%s")
+
+    @property
+    def prepare_sql(self) -> str:
+        parts = self.sql.split("%s")
+        body = parts[0] + "".join(f"${i}{part}" for i, part in enumerate(parts[1:], start=1))
+        types = f" ({', '.join(self.param_types)})" if self.param_types else ""
+        return f"PREPARE {self.name}{types} AS {body.replace('%%', '%')}"
+
+    @property
+    def execute_sql(self) -> str:
+        if not self.arity:
+            return f"EXECUTE {self.name}"
+        return f"EXECUTE {self.name} ({', '.join(['%s'] * self.arity)})"
+
+
+class PreparedStatementRegistry:
+    """Name → statement; names are global, as they are per Postgres session."""
+
+    def __init__(self):
+        self._statements: Dict[str, PreparedStatement] = {}
+
+    def register(self, name: str, sql: str, param_types: Tuple[str, ...] = ()) -> PreparedStatement:
+        if name in self._statements:
+            raise ValueError(f"Duplicate prepared statement: {name}")
+        statement = PreparedStatement(name, sql, tuple(param_types))
+        if param_types and len(param_types) != statement.arity:
+            raise ValueError(f"Prepared statement {name}: {statement.arity} parameters, {len(param_types)} types")
+        self._statements[name] = statement
+        return statement
+
+    def get(self, name: str) -> PreparedStatement:
+        return self._statements[name]
+
+    @property
+    def names(self) -> list:
+        return sorted(self._statements)
+
+
+# Global instance
+prepared_statements = PreparedStatementRegistry()
+prepared = prepared_statements.register
+
+
+# =========================================================
+# HOT STATEMENTS
+# =========================================================
+
+# Balance reads (/video/generate tells a short balance from a missing user)
+CREDITS_BY_ID = prepared("credits_by_id", "SELECT credits FROM users WHERE id = %s")
+
+# Subscription gate (app.core.subscription)
+SUBSCRIPTION_STATUS_BY_ID = prepared(
+    "subscription_status_by_id", "SELECT subscription_status FROM users WHERE id = %s"
+)
+
+# /usage/balance and /usage/consume
+BALANCE_BY_ID = prepared(
+    "balance_by_id", "SELECT plan, credits, subscription_status, renewal_date FROM users WHERE id = %s"
+)
+CONSUME_STATE_BY_ID = prepared(
+    "consume_state_by_id", "SELECT credits, subscription_status FROM users WHERE id = %s"
+)
+
+# Credit updates: atomic, so a concurrent debit or grant is never
+# overwritten. A debit returns no row when the balance is short (or the
+# user doesn't exist); parameters: (amount, amount, user_id)
+DEBIT_CREDITS = prepared(
+    "debit_credits",
+    "UPDATE users SET credits = credits - %s WHERE credits >= %s AND id = %s RETURNING credits",
+)
+GRANT_CREDITS = prepared(
+    "grant_credits", "UPDATE users SET credits = COALESCE(credits, 0) + %s WHERE id = %s RETURNING credits"
+)
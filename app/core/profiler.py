@@ -0,0 +1,196 @@
+"""
+On-Demand Profiler - CPU Sampling & Memory Growth
+Nothing runs until an admin asks: a CPU profile starts a sampler thread for
+N seconds, a memory profile turns tracemalloc on for N seconds. Outside
+those windows the cost is zero.
+
+- CPU: samples every thread's stack via sys._current_frames() at `hz` and
+  aggregates them into collapsed stacks ("thread;file:func;file:func N"),
+  the input format of flamegraph tools, or renders an SVG flamegraph
+- Memory: two tracemalloc snapshots N seconds apart, diffed by allocation
+  site, largest growth first
+- One profile at a time per worker process
+"""
+import asyncio
+import html
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import zlib
+from collections import Counter
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilerBusyError(RuntimeError):
+    """Raised when a profile is already running in this worker."""
+
+
+# =========================================================
+# CPU SAMPLER
+# =========================================================
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{os.path.basename(code.co_filename)}:{name}".replace(";", ":")
+
+
+class StackSampler(threading.Thread):
+    """Background thread recording collapsed stacks until stopped."""
+
+    def __init__(self, hz: int):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.interval = 1.0 / hz
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own_ident = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(names.get(ident, f"thread-{ident}").replace(";", ":"))
+                labels.reverse()
+                self.stacks[";".join(labels)] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def collapsed(stacks: Counter) -> str:
+    return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
+
+
+# =========================================================
+# SVG FLAMEGRAPH
+# =========================================================
+
+_FRAME_HEIGHT = 16
+_SVG_WIDTH = 1200
+
+
+def flamegraph_svg(stacks: Counter, title: str) -> str:
+    """Render collapsed stacks as a self-contained SVG flamegraph (root at bottom)."""
+    root: Dict = {"count": 0, "children": {}}
+    for stack, count in stacks.items():
+        node = root
+        node["count"] += count
+        for label in stack.split(";"):
+            node = node["children"].setdefault(label, {"count": 0, "children": {}})
+            node["count"] += count
+
+    total = root["count"] or 1
+    rects: List[Tuple[int, float, float, str, int]] = []  # depth, x, width, label, count
+    max_depth = 0
+
+    def layout(node: Dict, depth: int, x: float):
+        nonlocal max_depth
+        for label, child in sorted(node["children"].items()):
+            width = child["count"] / total * _SVG_WIDTH
+            if width >= 0.5:
+                rects.append((depth, x, width, label, child["count"]))
+                max_depth = max(max_depth, depth)
+                layout(child, depth + 1, x)
+            x += width
+
+    layout(root, 0, 0.0)
+
+    height = (max_depth + 1) * _FRAME_HEIGHT + 40
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{_SVG_WIDTH}" height="{height}" '
+        f'font-family="monospace" font-size="11">',
+        f'<text x="4" y="16" font-size="13">{html.escape(title)}</text>',
+    ]
+    for depth, x, width, label, count in rects:
+        y = height - (depth + 1) * _FRAME_HEIGHT
+        hue = zlib.crc32(label.encode()) % 60  # warm palette, stable per frame
+        text = html.escape(label)
+        tooltip = f"{text} ({count} samples, {count / total * 100:.1f}%)"
+        parts.append(
+            f'<g><title>{tooltip}</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{width:.1f}" height="{_FRAME_HEIGHT - 1}" '
+            f'fill="hsl({hue},80%,60%)"/>'
+        )
+        if width > 40:
+            chars = int(width / 7)
+            shown = text if len(label) <= chars else html.escape(label[: max(chars - 2, 1)]) + ".."
+            parts.append(f'<text x="{x + 3:.1f}" y="{y + 11}">{shown}</text>')
+        parts.append("</g>")
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+# =========================================================
+# PROFILER
+# =========================================================
+
+class Profiler:
+    """Per-worker entry point used by the admin profiling endpoints."""
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+
+    def _acquire(self):
+        if self._lock.locked():
+            raise ProfilerBusyError(f"A profile is already running on worker {os.getpid()}")
+
+    async def cpu(self, seconds: float, hz: int) -> Tuple[Counter, int]:
+        """Sample all threads for `seconds`; returns (collapsed stacks, samples)."""
+        self._acquire()
+        async with self._lock:
+            sampler = StackSampler(hz)
+            started = time.perf_counter()
+            sampler.start()
+            try:
+                # The event loop keeps serving (and being sampled) meanwhile
+                await asyncio.sleep(seconds)
+            finally:
+                await asyncio.to_thread(sampler.stop)
+            logger.info(
+                f"[PROFILER] CPU profile done | PID: {os.getpid()} | Seconds: {time.perf_counter() - started:.1f} "
+                f"| Samples: {sampler.samples} | Stacks: {len(sampler.stacks)}"
+            )
+            return sampler.stacks, sampler.samples
+
+    async def memory(self, seconds: float, top: int, frames: int = 1) -> List[str]:
+        """Diff tracemalloc snapshots taken `seconds` apart; largest growth first."""
+        self._acquire()
+        async with self._lock:
+            started_here = not tracemalloc.is_tracing()
+            if started_here:
+                tracemalloc.start(frames)
+            try:
+                before = tracemalloc.take_snapshot()
+                await asyncio.sleep(seconds)
+                after = tracemalloc.take_snapshot()
+            finally:
+                if started_here:
+                    tracemalloc.stop()
+
+            key = "traceback" if frames > 1 else "lineno"
+            diff = await asyncio.to_thread(after.compare_to, before, key)
+            lines = []
+            for stat in diff[:top]:
+                lines.append(str(stat))
+                if frames > 1:
+                    lines.extend(f"    {line}" for line in stat.traceback.format())
+            logger.info(f"[PROFILER] Memory diff done | PID: {os.getpid()} | Seconds: {seconds} | Sites: {len(diff)}")
+            return lines
+
+
+# Global profiler for this worker process
+profiler = Profiler()
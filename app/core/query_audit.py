@@ -0,0 +1,195 @@
+"""
+SQL Statement Audit - Per-Request Query Log & N+1 Detection
+Every statement executed on a cursor from get_connection() is recorded
+against the current request: normalized fingerprint, duration and row count.
+
+- Statements slower than SQL_SLOW_QUERY_MS are logged (fingerprint only,
+  never parameters)
+- Each route has a statement budget: SQL_STATEMENT_BUDGET by default, or
+  @statement_budget(n) on the endpoint
+- The same fingerprint executed more than SQL_REPEAT_LIMIT times in one
+  request is flagged as a likely N+1 loop
+- SQL_STRICT_MODE (tests / CI) turns violations into QueryBudgetExceeded
+"""
+import contextvars
+import logging
+import re
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in strict mode when a request breaks its statement budget."""
+
+
+# =========================================================
+# FINGERPRINTS
+# =========================================================
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(query: str) -> str:
+    """
+    Normalize a statement so executions that differ only in values match:
+    literals and placeholders become ?, value lists collapse, whitespace folds.
+    """
+    normalized = _STRING_LITERAL.sub("?", query)
+    normalized = _PLACEHOLDER.sub("?", normalized)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _VALUE_LIST.sub("(...)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+# =========================================================
+# BUDGETS
+# =========================================================
+
+def statement_budget(max_statements: int):
+    """
+    Declare how many statements an endpoint may run per request.
+
+    @router.get("/dashboard")
+    @statement_budget(2)
+    async def get_dashboard(...): ...
+    """
+    def decorator(endpoint):
+        endpoint.__statement_budget__ = max_statements
+        return endpoint
+    return decorator
+
+
+# =========================================================
+# PER-REQUEST LOG
+# =========================================================
+
+class Statement(NamedTuple):
+    fingerprint: str
+    duration: float
+    rowcount: int
+
+
+class QueryLog:
+    """Statements executed while serving one request."""
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope
+        self.statements: List[Statement] = []
+        self.total_seconds = 0.0
+        self.violations: List[str] = []
+        self._repeats: Dict[str, int] = {}
+        self._budget: Optional[int] = None
+
+    @property
+    def route(self) -> str:
+        scope = self.scope or {}
+        return f"{scope.get('method', '-')} {scope.get('path', '-')}"
+
+    @property
+    def budget(self) -> int:
+        # Resolved on first use: the route is matched before the endpoint runs
+        if self._budget is None:
+            endpoint = getattr((self.scope or {}).get("route"), "endpoint", None)
+            self._budget = getattr(endpoint, "__statement_budget__", settings.SQL_STATEMENT_BUDGET)
+        return self._budget
+
+    def record(self, query_fingerprint: str, duration: float, rowcount: int):
+        self.statements.append(Statement(query_fingerprint, duration, rowcount))
+        self.total_seconds += duration
+
+        repeats = self._repeats.get(query_fingerprint, 0) + 1
+        self._repeats[query_fingerprint] = repeats
+
+        if len(self.statements) == self.budget + 1:
+            self._violation(f"{len(self.statements)} statements exceed budget of {self.budget}")
+        if repeats == settings.SQL_REPEAT_LIMIT + 1:
+            self._violation(f"statement repeated {repeats}x (likely N+1): {query_fingerprint[:200]}")
+
+    def _violation(self, message: str):
+        self.violations.append(message)
+        logger.warning(f"[SQL] Budget violation | Route: {self.route} | {message}")
+        if settings.SQL_STRICT_MODE:
+            raise QueryBudgetExceeded(f"{self.route}: {message}")
+
+    def summary(self) -> dict:
+        return {
+            "statements": len(self.statements),
+            "db_ms": round(self.total_seconds * 1000, 2),
+            "rows": sum(max(s.rowcount, 0) for s in self.statements),
+            "budget": self.budget,
+            "violations": list(self.violations),
+        }
+
+
+_current_log: contextvars.ContextVar[Optional[QueryLog]] = contextvars.ContextVar(
+    "query_log", default=None
+)
+
+
+def current_query_log() -> Optional[QueryLog]:
+    return _current_log.get()
+
+
+def record_statement(query, duration: float, rowcount: int):
+    """Called by the instrumented cursor after every successful execute()."""
+    log = _current_log.get()
+    slow = duration * 1000 >= settings.SQL_SLOW_QUERY_MS
+    if log is None and not slow:
+        return
+
+    if isinstance(query, bytes):
+        query = query.decode(errors="replace")
+    query_fingerprint = fingerprint(query) if isinstance(query, str) else "?"
+
+    if slow:
+        route = log.route if log is not None else "-"
+        logger.warning(
+            f"[SQL] Slow query | Duration: {duration * 1000:.1f}ms | Rows: {rowcount} "
+            f"| Route: {route} | Query: {query_fingerprint[:300]}"
+        )
+    if log is not None:
+        log.record(query_fingerprint, duration, rowcount)
+
+
+# =========================================================
+# MIDDLEWARE
+# =========================================================
+
+class QueryAuditMiddleware:
+    """
+    Pure ASGI middleware giving each HTTP request its own QueryLog.
+    The log is also left in scope["query_log"] for outer middleware
+    (per-route metrics). Work started via run_in_threadpool inherits the
+    request's context, so sync DB helpers record into the same log.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        log = QueryLog(scope)
+        scope["query_log"] = log
+        token = _current_log.set(log)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_log.reset(token)
+
+        if log.statements:
+            logger.debug(f"[SQL] Request summary | Route: {log.route} | {log.summary()}")
+        # Violations swallowed by a route's own except-block still fail the test
+        if settings.SQL_STRICT_MODE and log.violations:
+            raise QueryBudgetExceeded(f"{log.route}: {'; '.join(log.violations)}")
@@ -0,0 +1,193 @@
+"""
+Read Replica Routing - Lag-Aware, Read-Your-Writes
+Reads that tolerate a little staleness ask for a replica connection:
+
+    conn = get_connection(ROUTE_REPLICA, user_id=user_id)
+
+and get one from the DATABASE_READ_URL pool unless:
+
+- no replica is configured (everything stays on the primary)
+- the user wrote recently: write paths call replica_router.pin_user(user_id)
+  after committing, and that user's reads stay on the primary for
+  DB_READ_YOUR_WRITES_SECONDS (e.g. the balance right after a credit grant)
+- the replica's replay lag, re-measured at most every
+  DB_REPLICA_LAG_CHECK_SECONDS per worker on the connection being handed
+  out, is over DB_REPLICA_MAX_LAG_SECONDS
+- the replica pool is exhausted (after DB_READ_POOL_TIMEOUT_SECONDS) or the
+  replica is unreachable (it is then skipped until the next lag check)
+
+Pins live in anonymous shared memory created at import, so workers forked by
+app.server see each other's pins (a webhook's grant on one worker pins the
+user's reads on all of them). The table is a fixed array of deadlines keyed
+by a hash of the user ID: a collision only keeps another user on the primary.
+Lag counts as 0 when the standby has replayed all WAL it has received; a
+standby whose WAL stream stopped looks caught up, so monitor replication
+itself too.
+"""
+import logging
+import mmap
+import threading
+import time
+import zlib
+from typing import Any, Optional
+
+from psycopg2.extras import RealDictCursor
+from psycopg2.pool import PoolError
+
+from app.core.config import settings
+from app.core.metrics import record_db_read_route, set_db_replica_lag
+
+logger = logging.getLogger(__name__)
+
+ROUTE_PRIMARY = "primary"
+ROUTE_REPLICA = "replica"
+
+PIN_SLOTS = 16384
+
+REPLICA_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END AS lag_seconds
+"""
+
+
+class WritePins:
+    """Per-user "stay on the primary until" deadlines (wall clock), shared across forks."""
+
+    def __init__(self, slots: int = PIN_SLOTS):
+        self.slots = slots
+        self._memory = mmap.mmap(-1, slots * 8)  # MAP_SHARED | MAP_ANONYMOUS
+        self._deadlines = memoryview(self._memory).cast("d")
+
+    def _slot(self, user_id: Any) -> int:
+        return zlib.crc32(str(user_id).encode()) % self.slots
+
+    def pin(self, user_id: Any, seconds: float):
+        slot = self._slot(user_id)
+        deadline = time.time() + seconds
+        if self._deadlines[slot] < deadline:
+            self._deadlines[slot] = deadline
+
+    def pinned(self, user_id: Any) -> bool:
+        return self._deadlines[self._slot(user_id)] > time.time()
+
+
+class ReplicaRouter:
+    """
+    Decides, per replica-routed read, whether it runs on the replica.
+
+    Usage (app.core.database does this for get_connection(ROUTE_REPLICA)):
+        conn = replica_router.checkout(replica_pool, user_id)   # None → use the primary
+    """
+
+    def __init__(self):
+        self.pins = WritePins()
+        self._lag: Optional[float] = None
+        self._checked_at = 0.0
+        self._down_until = 0.0
+        self._down = False
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(settings.DATABASE_READ_URL)
+
+    def pin_user(self, user_id: Any):
+        """Keep `user_id`'s reads on the primary while the write replicates."""
+        if user_id and self.enabled:
+            self.pins.pin(user_id, settings.DB_READ_YOUR_WRITES_SECONDS)
+
+    # ---------------------------------------------------------
+    # Routing
+    # ---------------------------------------------------------
+    def checkout(self, pool, user_id: Any = None):
+        if user_id and self.pins.pinned(user_id):
+            record_db_read_route(ROUTE_PRIMARY, "pinned")
+            return None
+
+        now = time.monotonic()
+        if now < self._down_until:
+            record_db_read_route(ROUTE_PRIMARY, "replica_down")
+            return None
+        check_due = now - self._checked_at >= settings.DB_REPLICA_LAG_CHECK_SECONDS
+        if not check_due and not self._lag_ok():
+            record_db_read_route(ROUTE_PRIMARY, "lag")
+            return None
+
+        try:
+            conn = pool.getconn()
+        except PoolError:
+            record_db_read_route(ROUTE_PRIMARY, "replica_busy")
+            return None
+        except Exception as e:
+            self._mark_down(e)
+            record_db_read_route(ROUTE_PRIMARY, "replica_down")
+            return None
+
+        if check_due and self._lock.acquire(blocking=False):
+            try:
+                self._measure(conn)
+            except Exception as e:
+                conn.close()  # the pool drops it if the session is broken
+                self._mark_down(e)
+                record_db_read_route(ROUTE_PRIMARY, "replica_down")
+                return None
+            finally:
+                self._lock.release()
+
+        if not self._lag_ok():
+            conn.close()
+            record_db_read_route(ROUTE_PRIMARY, "lag")
+            return None
+
+        record_db_read_route(ROUTE_REPLICA, "ok")
+        return conn
+
+    def _lag_ok(self) -> bool:
+        return self._lag is not None and self._lag <= settings.DB_REPLICA_MAX_LAG_SECONDS
+
+    def _measure(self, conn):
+        # Plain cursor: the probe isn't the request's statement, so it stays
+        # out of its query log, budget and statement metrics
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            cur.execute(REPLICA_LAG_SQL)
+            lag = cur.fetchone()["lag_seconds"]
+        finally:
+            cur.close()
+            conn.rollback()
+
+        previous_ok = self._lag_ok()
+        self._lag = float(lag) if lag is not None else None
+        self._checked_at = time.monotonic()
+        self._down = False
+        set_db_replica_lag(self._lag if self._lag is not None else -1)
+        if previous_ok != self._lag_ok():
+            log = logger.info if self._lag_ok() else logger.warning
+            log(
+                f"[DB REPLICA] {'Serving reads' if self._lag_ok() else 'Lagging, reads on primary'} | "
+                f"Lag: {self._lag}s | Max: {settings.DB_REPLICA_MAX_LAG_SECONDS}s"
+            )
+
+    def _mark_down(self, error: Exception):
+        self._lag = None
+        self._checked_at = time.monotonic()
+        self._down_until = self._checked_at + settings.DB_REPLICA_LAG_CHECK_SECONDS
+        set_db_replica_lag(-1)
+        if not self._down:
+            self._down = True
+            logger.warning(f"[DB REPLICA] Unavailable, reads on primary | Error: {str(error)}")
+
+    def status(self) -> dict:
+        return {
+            "lag_seconds": self._lag,
+            "max_lag_seconds": settings.DB_REPLICA_MAX_LAG_SECONDS,
+            "serving": self._lag_ok() and time.monotonic() >= self._down_until,
+            "checked_ago_seconds": round(time.monotonic() - self._checked_at, 2) if self._checked_at else None,
+        }
+
+
+# Global instance
+replica_router = ReplicaRouter()
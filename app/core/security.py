@@ -33,3 +33,10 @@ def get_current_user(credentials=Depends(security)):
     token = credentials.credentials
     payload = decode_token(token)
     return payload
+
+def require_admin(current_user: dict = Depends(get_current_user)):
+    """Allow only users whose email is listed in ADMIN_EMAILS."""
+    email = (current_user.get("email") or "").lower()
+    if not email or email not in settings.admin_emails_list:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
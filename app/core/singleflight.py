@@ -0,0 +1,155 @@
+"""
+Single-Flight Request Coalescing
+Shares one in-flight fetch among concurrent identical reads within a worker
+
+- Counters (executed, coalesced, window_hits, errors) are exported as
+  singleflight_calls_total and kept per route for stats()
+- invalidate_user() after a write: drops the user's windowed results and
+  bumps the user's generation, so a fetch that was already running (and may
+  have read the old row) is neither joined nor cached when it finishes.
+  Safe to call from threadpool code; it hops onto the loop
+"""
+import asyncio
+import logging
+import threading
+import time
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import record_singleflight_call
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key onto one execution.
+
+    Keys are (route, user_id) tuples. The first caller for a key starts the
+    fetch as a task; callers arriving while it is running await the same task.
+    An optional result window keeps the finished result for `result_ttl`
+    seconds so a burst that arrives just after the fetch also reuses it.
+
+    Usage:
+        return await read_coalescer.do(
+            ("usage.balance", user_id),
+            lambda: run_in_threadpool(_fetch_balance, user_id),
+        )
+    """
+
+    def __init__(self, result_ttl: float = 0.0, name: str = "reads"):
+        self.result_ttl = result_ttl
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._results: Dict[Hashable, Tuple[float, Any]] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        # user_id → [generation, fetches running]; only users with a fetch running
+        self._users: Dict[Any, List[int]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+
+    async def do(self, key: Tuple[str, Any], fn: Callable[[], Awaitable[Any]]) -> Any:
+        route = key[0]
+
+        if self.result_ttl > 0:
+            cached = self._results.get(key)
+            if cached is not None:
+                expires_at, result = cached
+                if expires_at > time.monotonic():
+                    self._count(route, "window_hits")
+                    return result
+                self._results.pop(key, None)
+
+        task = self._inflight.get(key)
+        if task is None:
+            # Run as a task so a disconnecting leader doesn't cancel the fetch
+            # for everyone else waiting on it
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self._bind_loop()
+            user = self._users.setdefault(key[1], [0, 0])
+            user[1] += 1
+            task.add_done_callback(partial(self._settle, key, user[0]))
+            self._count(route, "executed")
+        else:
+            self._count(route, "coalesced")
+
+        return await asyncio.shield(task)
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._loop_thread = loop, threading.get_ident()
+
+    def _settle(self, key: Hashable, generation: int, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        user = self._users[key[1]]
+        user[1] -= 1
+        current = user[0]
+        if not user[1]:
+            del self._users[key[1]]
+
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            self._count(key[0], "errors")
+            return
+        # A write invalidated the user while this fetch ran: its result may be stale
+        if self.result_ttl > 0 and generation == current:
+            self._results[key] = (time.monotonic() + self.result_ttl, task.result())
+
+    def invalidate_user(self, user_id: Any):
+        """Forget a user's results and running fetches after a write (credits, status)."""
+        if self._loop is None:
+            return  # nothing fetched yet
+        if threading.get_ident() == self._loop_thread:
+            self._invalidate(user_id)
+            return
+        try:
+            # Queued ahead of the threadpool call's own completion, so the
+            # writer's response can't go out before it runs
+            self._loop.call_soon_threadsafe(self._invalidate, user_id)
+        except RuntimeError:
+            pass  # loop closed
+
+    def _invalidate(self, user_id: Any):
+        user = self._users.get(user_id)
+        if user is not None:
+            user[0] += 1
+            for key in [k for k in self._inflight if k[1] == user_id]:
+                del self._inflight[key]  # later callers start a fresh fetch
+        if self._results:
+            for key in [k for k in self._results if k[1] == user_id]:
+                self._results.pop(key, None)
+
+    def _count(self, route: str, name: str):
+        counters = self._stats.get(route)
+        if counters is None:
+            counters = self._stats[route] = {
+                "executed": 0,
+                "coalesced": 0,
+                "window_hits": 0,
+                "errors": 0,
+            }
+        counters[name] += 1
+        record_singleflight_call(self.name, route, name)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-route counters plus the current number of in-flight fetches."""
+        return {
+            "in_flight": self.in_flight,
+            "routes": {route: dict(counters) for route, counters in self._stats.items()},
+        }
+
+
+# Global coalescer for hot per-user reads
+read_coalescer = SingleFlight(result_ttl=settings.SINGLEFLIGHT_RESULT_TTL_MS / 1000)
+
+# Global coalescer for a user's simultaneous identical checkout creates
+checkout_coalescer = SingleFlight(name="checkout")
@@ -0,0 +1,139 @@
+"""
+Startup Profiler - Import Timing & Readiness Report
+Measures where a new worker's cold start goes, so autoscaling latency can
+be attacked module by module.
+
+- An import hook times every module's execution (self time, excluding the
+  modules it imports in turn, and cumulative time)
+- Named phases (imports, app, startup) are marked along the way
+- report() logs the time to ready, the phases and the slowest modules once
+  startup is complete, then removes the hook
+
+Only the standard library is imported here: install() must run before
+anything heavy is imported.
+"""
+import logging
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _TimedLoader:
+    """Wraps a module's loader for the duration of exec_module."""
+
+    def __init__(self, loader, profile: "StartupProfile"):
+        self.loader = loader
+        self.profile = profile
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        # Hand the real loader back before the module body can look at it
+        # (importlib.resources, pkgutil and friends check its type)
+        if module.__spec__ is not None:
+            module.__spec__.loader = self.loader
+        module.__loader__ = self.loader
+        self.profile._enter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.profile._exit(module.__name__)
+
+
+class StartupProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.modules: Dict[str, Tuple[float, float]] = {}  # name -> (self, cumulative) seconds
+        self.phases: List[Tuple[str, float]] = []
+        self._installed = False
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    # ---------------------------------------------------------
+    # Import hook (sys.meta_path finder)
+    # ---------------------------------------------------------
+    def install(self):
+        with self._lock:
+            if self._installed:
+                return
+            self._installed = True
+            sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        with self._lock:
+            if self in sys.meta_path:
+                sys.meta_path.remove(self)
+            self._installed = False
+
+    def find_spec(self, fullname, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = _TimedLoader(spec.loader, self)
+            return spec
+        return None
+
+    def _enter(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append([time.perf_counter(), 0.0])  # started, time spent in child imports
+
+    def _exit(self, name: str):
+        stack = self._local.stack
+        started, children = stack.pop()
+        elapsed = time.perf_counter() - started
+        if stack:
+            stack[-1][1] += elapsed
+        self.modules[name] = (elapsed - children, elapsed)
+
+    # ---------------------------------------------------------
+    # Phases & report
+    # ---------------------------------------------------------
+    def mark(self, phase: str):
+        self.phases.append((phase, time.perf_counter()))
+
+    def slowest(self, top: int) -> List[Tuple[str, float, float]]:
+        ranked = sorted(self.modules.items(), key=lambda item: item[1][0], reverse=True)
+        return [(name, own, cumulative) for name, (own, cumulative) in ranked[:top]]
+
+    def report(self, top: int, uninstall: bool = True) -> Optional[float]:
+        """Log the readiness summary; returns the time to ready in ms."""
+        if not self.phases:
+            return None
+        ready_ms = (self.phases[-1][1] - self.started) * 1000
+
+        previous = self.started
+        phases = []
+        for phase, at in self.phases:
+            phases.append(f"{phase}={(at - previous) * 1000:.0f}ms")
+            previous = at
+        logger.info(
+            f"[STARTUP] Ready in {ready_ms:.0f}ms | Phases: {', '.join(phases)} "
+            f"| Modules imported: {len(self.modules)}"
+        )
+        if top > 0 and self.modules:
+            slowest = ", ".join(
+                f"{name}={own * 1000:.1f}ms (cum {cumulative * 1000:.1f}ms)"
+                for name, own, cumulative in self.slowest(top)
+            )
+            logger.info(f"[STARTUP] Slowest imports (self time) | {slowest}")
+
+        if uninstall:
+            self.uninstall()
+        return ready_ms
+
+
+# Global profile, started when this module is first imported
+startup_profile = StartupProfile()
@@ -5,6 +5,8 @@ Enforces active subscription requirement for paid features
 from fastapi import HTTPException, Depends
 from app.core.security import get_current_user
 from app.core.database import get_connection
+from app.core.replica import ROUTE_REPLICA
+from app.core.prepared import SUBSCRIPTION_STATUS_BY_ID
 import logging
 
 logger = logging.getLogger(__name__)
@@ -33,15 +35,12 @@ def require_active_subscription(current_user: dict = Depends(get_current_user)):
     """
     user_id = current_user["user_id"]
     
-    conn = get_connection()
+    conn = get_connection(ROUTE_REPLICA, user_id=user_id)
     cur = conn.cursor()
     
     try:
         # Check subscription_status column (not has_active_subscription)
-        cur.execute(
-            "SELECT subscription_status FROM users WHERE id = %s",
-            (user_id,)
-        )
+        cur.execute_prepared(SUBSCRIPTION_STATUS_BY_ID, (user_id,))
         user = cur.fetchone()
         
         if not user:
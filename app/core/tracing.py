@@ -0,0 +1,379 @@
+"""
+Distributed Tracing - Request, SQL & Outbound Call Spans
+Minimal W3C-compatible tracer: one server span per sampled HTTP request,
+child spans for SQL statements, Stripe, Coinbase and video-provider calls.
+
+- Head-based sampling: the decision is made once per request (an incoming
+  `traceparent` with the sampled flag wins, otherwise TRACING_SAMPLE_RATE)
+  and unsampled requests create no child spans and export nothing
+- `traceparent` is read from requests and injected into outbound HTTP calls
+- Exporters: "otlp" (OTLP/HTTP JSON, batched on a background thread),
+  "memory" (tests), "none" (default, tracing off)
+
+Usage:
+    with start_span("preflight_check_price", price_id=price_id):
+        ...
+"""
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# OTLP SpanKind values
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+
+def _new_id(nbytes: int) -> str:
+    return random.getrandbits(nbytes * 8).to_bytes(nbytes, "big").hex()
+
+
+# =========================================================
+# SPANS
+# =========================================================
+
+class Span:
+    __slots__ = (
+        "trace_id", "span_id", "parent_id", "name", "kind",
+        "start_ns", "end_ns", "attributes", "error", "sampled",
+    )
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: str = "internal",
+                 sampled: bool = True, attributes: Optional[dict] = None, start_ns: Optional[int] = None):
+        self.trace_id = trace_id
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes or {}
+        self.error: Optional[str] = None
+        self.sampled = sampled
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def record_error(self, exc: BaseException):
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KINDS.get(self.kind, 1),
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items() if v is not None],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+# =========================================================
+# EXPORTERS
+# =========================================================
+
+class InMemorySpanExporter:
+    """Keeps finished spans in a list (tests, local debugging)."""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, span: Span):
+        self.spans.append(span)
+
+    def clear(self):
+        self.spans.clear()
+
+    def shutdown(self):
+        pass
+
+
+class OtlpJsonExporter:
+    """
+    Batches spans and POSTs them as OTLP/HTTP JSON from a background
+    thread, so request handlers only pay for a queue put. The thread is
+    started lazily (and again after fork) by the process that exports.
+    """
+
+    def __init__(self, endpoint: str, service_name: str, batch_size: int = 256, interval: float = 2.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=batch_size * 16)
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+
+    def export(self, span: Span):
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._queue = queue.Queue(maxsize=self.batch_size * 16)
+        self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=self.interval))
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if None in batch:
+                self._send([s for s in batch if s is not None])
+                return
+            if batch:
+                self._send(batch)
+
+    def _send(self, spans: List[Span]):
+        if not spans:
+            return
+        body = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+                "scopeSpans": [{
+                    "scope": {"name": "studio_genie"},
+                    "spans": [s.to_otlp() for s in spans],
+                }],
+            }]
+        }
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(body).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                response.read()
+        except Exception as e:
+            logger.warning(f"[TRACING] Export failed | Spans: {len(spans)} | Error: {str(e)}")
+
+    def shutdown(self, timeout: float = 5.0):
+        """Flush queued spans (called on worker shutdown)."""
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+
+def _build_exporter():
+    kind = settings.TRACING_EXPORTER.lower()
+    if kind == "otlp":
+        return OtlpJsonExporter(settings.TRACING_OTLP_ENDPOINT, settings.TRACING_SERVICE_NAME)
+    if kind == "memory":
+        return InMemorySpanExporter()
+    return None
+
+
+# Set to None to turn tracing off entirely
+exporter = _build_exporter()
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+# =========================================================
+# API
+# =========================================================
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def _finish(span: Span):
+    span.end_ns = time.time_ns()
+    if exporter is not None:
+        exporter.export(span)
+
+
+@contextmanager
+def start_span(name: str, kind: str = "internal", **attributes):
+    """Child span of the current one; a no-op outside sampled traces."""
+    parent = _current_span.get()
+    if parent is None or not parent.sampled:
+        yield None
+        return
+
+    span = Span(name, parent.trace_id, parent.span_id, kind, attributes=attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        _finish(span)
+
+
+def record_span(name: str, duration: float, kind: str = "client", error: Optional[str] = None, **attributes):
+    """
+    Record an already-finished child span (e.g. a SQL statement timed by
+    the cursor) without wrapping the call in a context manager.
+    """
+    parent = _current_span.get()
+    if parent is None or not parent.sampled:
+        return
+    end_ns = time.time_ns()
+    span = Span(name, parent.trace_id, parent.span_id, kind, attributes=attributes,
+                start_ns=end_ns - int(duration * 1e9))
+    span.error = error
+    span.end_ns = end_ns
+    if exporter is not None:
+        exporter.export(span)
+
+
+def inject_headers(headers: Dict[str, str]) -> Dict[str, str]:
+    """Add `traceparent` for the current span to outbound HTTP headers."""
+    span = _current_span.get()
+    if span is not None:
+        headers = {**headers, "traceparent": span.traceparent}
+    return headers
+
+
+def shutdown_tracing():
+    if exporter is not None:
+        exporter.shutdown()
+
+
+# =========================================================
+# ROUTE TEMPLATES
+# =========================================================
+
+def _route_templates(app) -> Dict[int, str]:
+    """
+    Map each endpoint route to its full template. Routes inside included
+    routers only know their own path (/me), not the prefix (/users/me).
+    """
+    templates: Dict[int, str] = {}
+    for route in getattr(app, "routes", []):
+        if hasattr(route, "effective_route_contexts"):
+            for context in route.effective_route_contexts():
+                templates[id(context.original_route)] = context.path_format
+        elif hasattr(route, "path"):
+            templates[id(route)] = route.path
+    return templates
+
+
+_templates_by_app: Dict[int, Dict[int, str]] = {}
+
+
+def route_template(scope) -> str:
+    """Matched route template for an ASGI scope, or "unmatched"."""
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    app = scope.get("app")
+    templates = _templates_by_app.get(id(app))
+    if templates is None:
+        templates = _templates_by_app[id(app)] = _route_templates(app)
+    return templates.get(id(route)) or getattr(route, "path", None) or "unmatched"
+
+
+# =========================================================
+# MIDDLEWARE
+# =========================================================
+
+class TracingMiddleware:
+    """
+    Pure ASGI middleware opening the server span for each sampled request.
+    Does nothing when no exporter is configured.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or exporter is None:
+            await self.app(scope, receive, send)
+            return
+
+        trace_id, parent_id, sampled = None, None, None
+        for name, value in scope.get("headers", ()):
+            if name == b"traceparent":
+                match = _TRACEPARENT.match(value.decode("latin-1").strip().lower())
+                if match:
+                    trace_id, parent_id = match.group(1), match.group(2)
+                    sampled = bool(int(match.group(3), 16) & 1)
+                break
+        if sampled is None:
+            sampled = random.random() < settings.TRACING_SAMPLE_RATE
+
+        span = Span(
+            f"{scope['method']} {scope['path']}",
+            trace_id or _new_id(16),
+            parent_id,
+            kind="server",
+            sampled=sampled,
+        )
+        token = _current_span.set(span)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            if sampled:
+                template = route_template(scope)
+                span.name = f"{scope['method']} {template}"
+                span.attributes.update({
+                    "http.request.method": scope["method"],
+                    "http.route": template,
+                    "url.path": scope["path"],
+                    "http.response.status_code": status_code,
+                })
+                if status_code >= 500 and span.error is None:
+                    span.error = f"HTTP {status_code}"
+                _finish(span)
@@ -0,0 +1,176 @@
+"""
+Webhook Partitions - Per-Customer Ordering, Cross-Customer Parallelism
+Stripe events for one customer are handled one at a time in arrival order, so
+customer.subscription.deleted can't interleave with invoice.paid for the same
+customer; different customers are handled in parallel.
+
+- Events hash (crc32 of the Stripe customer ID) onto WEBHOOK_PARTITIONS
+  queues per worker, each drained by a single consumer task
+- The webhook request awaits its event's result, so Stripe still sees the
+  real outcome (and retries) exactly as before
+- Workers are separate processes: with WEBHOOK_CUSTOMER_LOCK the consumer
+  also holds a Postgres advisory lock on the customer (in a transaction on
+  its own pooled connection) while the handler runs, so one customer is never handled
+  concurrently anywhere
+- Lag (queued → handler start) and depth are exported per partition; total
+  depth is reported by /health/deep; on shutdown queued events are finished
+"""
+import asyncio
+import logging
+import time
+import zlib
+from typing import Any, Awaitable, Callable, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.database import get_connection
+from app.core.lifecycle import shutdown_coordinator
+from app.core.metrics import observe_webhook_partition_lag, set_webhook_partition_depth
+
+logger = logging.getLogger(__name__)
+
+# First key of pg_advisory_xact_lock(int, int); the second is hashtext(customer_id)
+ADVISORY_LOCK_NAMESPACE = 0x5748  # "WH"
+
+
+def _lock_customer(customer_id: str):
+    """
+    Take the customer's lock in a transaction left open on its own connection;
+    rolling that transaction back releases it (3 round trips, not 6 with a
+    session lock + commits).
+    """
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_advisory_xact_lock(%s, hashtext(%s))", (ADVISORY_LOCK_NAMESPACE, customer_id))
+        cur.close()
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+
+def _unlock_customer(conn, customer_id: str):
+    try:
+        conn.rollback()
+    except Exception as e:
+        logger.error(f"[WEBHOOK PARTITIONS] Unlock failed, discarding connection | Customer: {customer_id} | Error: {str(e)}")
+        conn.discard()
+        return
+    conn.close()
+
+
+class WebhookPartitions:
+    """
+    Routes each event to a partition by customer and runs it there.
+
+    Usage:
+        result = await webhook_partitions.submit(customer_id, lambda: handle(event))
+    """
+
+    def __init__(self):
+        self._queues: List[asyncio.Queue] = []
+        self._pending: List[int] = []  # queued + running, per partition
+        self._consumers: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def partitions(self) -> int:
+        return len(self._queues)
+
+    @property
+    def depth(self) -> int:
+        return sum(self._pending)
+
+    def partition_for(self, customer_id: str) -> int:
+        return zlib.crc32(customer_id.encode()) % max(1, settings.WEBHOOK_PARTITIONS)
+
+    # ---------------------------------------------------------
+    # Lifecycle
+    # ---------------------------------------------------------
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._queues = [asyncio.Queue() for _ in range(max(1, settings.WEBHOOK_PARTITIONS))]
+        self._pending = [0] * len(self._queues)
+        self._consumers = [
+            asyncio.create_task(self._consume(index, queue), name=f"webhook-partition-{index}")
+            for index, queue in enumerate(self._queues)
+        ]
+        shutdown_coordinator.register_drain_hook("webhook_partitions", self.drain)
+        logger.info(
+            f"[WEBHOOK PARTITIONS] Started | Partitions: {len(self._queues)} | "
+            f"CustomerLock: {settings.WEBHOOK_CUSTOMER_LOCK}"
+        )
+
+    async def drain(self, timeout: float):
+        """Finish queued events (their requests are still waiting), then stop."""
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues)), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"[WEBHOOK PARTITIONS] Drain deadline hit | Pending: {self.depth}")
+        for task in self._consumers:
+            task.cancel()
+        self._consumers = []
+        self._loop = None
+
+    # ---------------------------------------------------------
+    # Submit
+    # ---------------------------------------------------------
+    async def submit(self, customer_id: Optional[str], handler: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `handler` after every earlier event for `customer_id`; returns its
+        result or raises its exception. Events without a customer run inline.
+        """
+        if not customer_id:
+            return await handler()
+
+        self.start()
+        index = self.partition_for(customer_id)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[index] += 1
+        set_webhook_partition_depth(index, self._pending[index])
+        self._queues[index].put_nowait((time.monotonic(), customer_id, handler, future))
+        return await future
+
+    # ---------------------------------------------------------
+    # Consumers
+    # ---------------------------------------------------------
+    async def _consume(self, index: int, queue: asyncio.Queue):
+        while True:
+            queued_at, customer_id, handler, future = await queue.get()
+            try:
+                observe_webhook_partition_lag(index, time.monotonic() - queued_at)
+                if not future.cancelled():
+                    await self._run(customer_id, handler, future)
+            finally:
+                queue.task_done()
+                self._pending[index] -= 1
+                set_webhook_partition_depth(index, self._pending[index])
+
+    async def _run(self, customer_id: str, handler: Callable[[], Awaitable[Any]], future: asyncio.Future):
+        lock_conn = None
+        try:
+            if settings.WEBHOOK_CUSTOMER_LOCK:
+                lock_conn = await run_in_threadpool(_lock_customer, customer_id)
+            result = await handler()
+        except asyncio.CancelledError:
+            if not future.done():
+                future.cancel()
+            raise
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(result)
+        finally:
+            if lock_conn is not None:
+                await run_in_threadpool(_unlock_customer, lock_conn, customer_id)
+
+
+# Global instance
+webhook_partitions = WebhookPartitions()
@@ -0,0 +1,121 @@
+"""
+Webhook Recorder - Archive Verified Webhook Bodies for Replay
+Appends every signature-verified webhook body to gzip'd JSON-lines files so
+real traffic (e.g. a month-start renewal storm) can be replayed against a
+test deployment with benchmarks/webhook_replay.py.
+
+- Off unless WEBHOOK_RECORD_DIR is set
+- Only verified bodies are recorded, byte-for-byte as received (the replayer
+  re-signs them with a test secret)
+- Writes happen on a background thread; the request path only enqueues and
+  drops (counted) when the queue is full
+- One file per worker process and hour:
+  <dir>/<source>-<YYYYmmddHH>-<pid>.jsonl.gz
+
+Each line: {"received_at": <unix seconds>, "source", "id", "type", "body"}
+
+Bodies contain customer data (emails, customer ids): point the directory at
+private storage and delete recordings once replayed.
+"""
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookRecorder:
+    def __init__(self, directory: str, queue_size: int = 10_000, flush_interval: float = 1.0):
+        self.directory = Path(directory) if directory else None
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self.recorded = 0
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def record(self, source: str, body: bytes, event_id: str, event_type: str):
+        """Queue one verified webhook body; never blocks the caller."""
+        if self.directory is None:
+            return
+        if self._pid != os.getpid():
+            self._start()
+        entry = {
+            "received_at": round(time.time(), 6),
+            "source": source,
+            "id": event_id,
+            "type": event_type,
+            "body": body.decode("utf-8"),
+        }
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="webhook-recorder", daemon=True)
+        self._thread.start()
+        logger.info(f"[WEBHOOK_RECORDER] Recording webhooks | Dir: {self.directory} | PID: {self._pid}")
+
+    def _path(self, source: str, received_at: float) -> Path:
+        hour = time.strftime("%Y%m%d%H", time.gmtime(received_at))
+        return self.directory / f"{source}-{hour}-{self._pid}.jsonl.gz"
+
+    def _run(self):
+        files = {}
+        try:
+            while True:
+                try:
+                    entry = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    # Sync flush: everything written so far is readable even if the
+                    # worker is killed before the gzip trailer goes out
+                    for handle in files.values():
+                        handle.flush(zlib.Z_SYNC_FLUSH)
+                    continue
+                if entry is None:
+                    return
+
+                path = self._path(entry["source"], entry["received_at"])
+                handle = files.get(path)
+                if handle is None:
+                    for stale in files.values():  # hour rolled over
+                        stale.close()
+                    files = {path: gzip.open(path, "ab")}
+                    handle = files[path]
+                handle.write(json.dumps(entry, separators=(",", ":")).encode() + b"\n")
+                self.recorded += 1
+        except Exception as e:
+            logger.error(f"[WEBHOOK_RECORDER] Recorder stopped | Error: {str(e)}", exc_info=True)
+        finally:
+            for handle in files.values():
+                handle.close()
+
+    def close(self, timeout: float = 5.0):
+        """Flush and close the current files (called on worker shutdown)."""
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        logger.info(f"[WEBHOOK_RECORDER] Closed | Recorded: {self.recorded} | Dropped: {self.dropped}")
+
+
+# Global instance
+webhook_recorder = WebhookRecorder(settings.WEBHOOK_RECORD_DIR)
@@ -0,0 +1,107 @@
+"""
+Webhook Handler Registry - Table-Driven Stripe Dispatch
+Handlers register per event type with their own limits:
+
+    @webhook_handler("invoice.paid", max_in_flight=16, timeout=20.0, redeliver_on_timeout=True)
+    async def handle_invoice_paid(event): ...
+
+- max_in_flight: handlers of this type running at once per worker
+  (0 = unlimited). Partitions bound events that have a customer;
+  checkout events often have none and run inline, so this is what keeps
+  a burst of one type from taking the whole threadpool and DB pool
+- timeout: seconds before the handler is abandoned at its next await.
+  Handlers run their DB work via run_in_threadpool, which isn't abandoned:
+  the timeout is raised once that work has committed or rolled back, so
+  the customer's next event never overlaps it
+- redeliver_on_timeout: the handler is idempotent per event, so a
+  timed-out event is answered 500 and Stripe redelivers it; anything else
+  gets 200 + error
+- sniff_event_type(): reads the type off the raw body so event types
+  without a handler are dropped before signature verification and parsing
+"""
+import asyncio
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT_SECONDS = 30.0
+
+# Stripe serializes "type" as an event's last key: anchored at the closing
+# brace it can only be the top-level one (nested objects have "type" too)
+_TRAILING_TYPE = re.compile(rb'"type"\s*:\s*"([A-Za-z0-9_.:-]{1,128})"\s*}\s*$')
+_TAIL_BYTES = 256
+
+
+def sniff_event_type(payload: bytes) -> Optional[str]:
+    """Top-level event type without parsing the body, or None if it isn't the last key."""
+    match = _TRAILING_TYPE.search(payload[-_TAIL_BYTES:])
+    return match.group(1).decode() if match else None
+
+
+@dataclass
+class WebhookHandler:
+    event_type: str
+    fn: Callable[[Any], Awaitable[Any]]
+    max_in_flight: int = 0
+    timeout: float = DEFAULT_TIMEOUT_SECONDS
+    redeliver_on_timeout: bool = False
+    _semaphore: Optional[asyncio.Semaphore] = field(default=None, repr=False)
+    _loop: Optional[asyncio.AbstractEventLoop] = field(default=None, repr=False)
+
+    def _limit(self) -> Optional[asyncio.Semaphore]:
+        if self.max_in_flight <= 0:
+            return None
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Semaphores bind to the loop they are first awaited on
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._semaphore
+
+    async def run(self, event) -> Any:
+        """
+        Run under this type's max_in_flight; raises asyncio.TimeoutError
+        past `timeout` (time spent waiting for a slot doesn't count).
+        """
+        limit = self._limit()
+        if limit is None:
+            return await asyncio.wait_for(self.fn(event), self.timeout)
+        async with limit:
+            return await asyncio.wait_for(self.fn(event), self.timeout)
+
+
+class WebhookRegistry:
+    """Event type → handler for one provider."""
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self._handlers: Dict[str, WebhookHandler] = {}
+
+    def handler(
+        self,
+        event_type: str,
+        max_in_flight: int = 0,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS,
+        redeliver_on_timeout: bool = False,
+    ):
+        def register(fn):
+            if event_type in self._handlers:
+                raise ValueError(f"Duplicate {self.provider} webhook handler for {event_type}")
+            self._handlers[event_type] = WebhookHandler(event_type, fn, max_in_flight, timeout, redeliver_on_timeout)
+            return fn
+        return register
+
+    def get(self, event_type: Optional[str]) -> Optional[WebhookHandler]:
+        return self._handlers.get(event_type)
+
+    @property
+    def event_types(self) -> list:
+        return sorted(self._handlers)
+
+
+# Global instance
+stripe_webhooks = WebhookRegistry("stripe")
+webhook_handler = stripe_webhooks.handler
@@ -1,8 +1,29 @@
-from fastapi import FastAPI
+# Import timing must start before FastAPI, Stripe & co. are imported
+from app.core.startup_profile import startup_profile
+startup_profile.install()
+
+import logging
+
+from fastapi import FastAPI, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.api.routes import init_routes
 from app.utils.logger import logger
+from app.core.health import health_monitor
+from app.core.lifecycle import DrainMiddleware, shutdown_coordinator
+from app.core.loop_monitor import loop_monitor
+from app.core.metrics import MetricsMiddleware, render_metrics
+from app.core.query_audit import QueryAuditMiddleware
+from app.core.tracing import TracingMiddleware, shutdown_tracing
+from app.core.singleflight import read_coalescer
+from app.core.webhook_partitions import webhook_partitions
+from app.core.webhook_recorder import webhook_recorder
+from app.services.coinbase_service import coinbase_service
+from app.services.stripe_gateway import StripeUnavailableError, stripe_gateway
+from app.api.routes import init_routes
+
+startup_profile.mark("imports")
 
 # =========================================================
 # FastAPI App
@@ -16,6 +37,18 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# =========================================================
+# SQL AUDIT (innermost - one query log per request)
+# =========================================================
+
+app.add_middleware(QueryAuditMiddleware)
+
+# =========================================================
+# SHUTDOWN DRAINING (inside CORS so 503s still carry CORS headers)
+# =========================================================
+
+app.add_middleware(DrainMiddleware)
+
 # =========================================================
 # CORS - MUST BE BEFORE ROUTERS
 # =========================================================
@@ -35,6 +68,18 @@ app.add_middleware(
     max_age=3600,  # Cache preflight for 1 hour
 )
 
+# =========================================================
+# METRICS (outermost - times everything, including CORS and 503s)
+# =========================================================
+
+app.add_middleware(MetricsMiddleware)
+
+# =========================================================
+# TRACING (outermost - the server span covers the whole request)
+# =========================================================
+
+app.add_middleware(TracingMiddleware)
+
 # =========================================================
 # STARTUP (CLEAN + SAFE)
 # =========================================================
@@ -42,6 +87,7 @@ app.add_middleware(
 @app.on_event("startup")
 async def startup_event():
     """Application startup"""
+    startup_profile.mark("until_startup")
     logger.info("🚀 Starting Studio Génie API…")
     logger.info(f"Environment: {settings.ENVIRONMENT}")
     
@@ -49,9 +95,15 @@ async def startup_event():
     # STRIPE CONFIGURATION VALIDATION
     # =========================================================
     try:
-        from app.services.stripe_validator import validate_stripe_configuration
-        logger.info("Running Stripe configuration validation...")
-        validate_stripe_configuration()
+        from app.services.stripe_validator import (
+            is_stripe_configuration_validated,
+            validate_stripe_configuration,
+        )
+        if is_stripe_configuration_validated():
+            logger.info("Stripe configuration already validated by the server parent process")
+        else:
+            logger.info("Running Stripe configuration validation...")
+            validate_stripe_configuration()
     except RuntimeError as e:
         logger.error(f"❌ STARTUP FAILED: {str(e)}")
         logger.error("Application cannot start with invalid Stripe configuration")
@@ -60,15 +112,40 @@ async def startup_event():
         logger.error(f"❌ Unexpected error during Stripe validation: {str(e)}")
         raise
     
-    # 🔍 DEBUG: Print all registered routes
-    logger.info("=" * 60)
-    logger.info("REGISTERED ROUTES:")
-    logger.info("=" * 60)
+    # Route table: one summary line; the full list only at DEBUG
+    # (included routers are expanded to their endpoints with the full prefix)
+    routes = []
     for route in app.routes:
-        if hasattr(route, 'path') and hasattr(route, 'methods'):
-            methods = ','.join(route.methods) if route.methods else 'N/A'
-            logger.info(f"{methods:10} {route.path}")
-    logger.info("=" * 60)
+        if hasattr(route, 'effective_route_contexts'):
+            for context in route.effective_route_contexts():
+                routes.append((getattr(context.original_route, 'methods', None), context.path_format))
+        elif hasattr(route, 'path') and hasattr(route, 'methods'):
+            routes.append((route.methods, route.path))
+    logger.info(f"[STARTUP] Routes registered | Count: {len(routes)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        for methods, path in routes:
+            methods = ','.join(sorted(methods)) if methods else 'N/A'
+            logger.debug(f"{methods:10} {path}")
+
+    # =========================================================
+    # EVENT-LOOP WATCHDOG (feeds /health/deep, so start it first)
+    # =========================================================
+    loop_monitor.start()
+
+    # =========================================================
+    # WEBHOOK PARTITION CONSUMERS (drained on shutdown)
+    # =========================================================
+    webhook_partitions.start()
+
+    # =========================================================
+    # DEEP HEALTH REFRESHER
+    # =========================================================
+    health_monitor.register_queue("singleflight_in_flight", lambda: read_coalescer.in_flight)
+    health_monitor.register_queue("webhook_partitions", lambda: webhook_partitions.depth)
+    health_monitor.start()
+
+    startup_profile.mark("startup")
+    startup_profile.report(settings.STARTUP_PROFILE_TOP)
 
 # =========================================================
 # SHUTDOWN
@@ -77,6 +154,13 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("🛑 Shutting down Studio Génie API…")
+    await shutdown_coordinator.drain(settings.SHUTDOWN_DRAIN_TIMEOUT_SECONDS)
+    await health_monitor.stop()
+    await loop_monitor.stop()
+    await run_in_threadpool(shutdown_tracing)
+    await run_in_threadpool(webhook_recorder.close)
+    await stripe_gateway.close()
+    await coinbase_service.close()
 
 # =========================================================
 # HEALTHCHECK
@@ -95,20 +179,50 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/health/deep")
+async def deep_health_check():
+    """
+    Dependency status for load balancers.
+    Served from a snapshot refreshed in the background - no I/O per probe.
+    503 when the database is unreachable or the refresher has stalled.
+    """
+    status_code, body = health_monitor.snapshot()
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+# =========================================================
+# METRICS
+# =========================================================
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint (aggregated across workers)."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 # =========================================================
 # ROUTES (AUTH, BILLING, COINBASE, VIDEOS, ETC.)
 # =========================================================
 
 init_routes(app)
+startup_profile.mark("app")
 
 # =========================================================
 # GLOBAL EXCEPTION HANDLER
 # =========================================================
 
+@app.exception_handler(StripeUnavailableError)
+async def stripe_unavailable_handler(request, exc):
+    # Fail fast while Stripe is degraded instead of holding the request
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Payment provider temporarily unavailable. Please retry shortly."},
+        headers={"Retry-After": str(int(exc.retry_after + 0.999))},
+    )
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     logger.error(f"Unhandled exception: {str(exc)}", exc_info=True)
-    return {"detail": "Internal server error."}
+    return JSONResponse(status_code=500, content={"detail": "Internal server error."})
 
 # =========================================================
 # LOCAL UVICORN RUNNER (DEV ONLY)
@@ -31,14 +31,11 @@ class CheckoutSessionResponse(BaseModel):
 class CoinbaseLinkRequest(BaseModel):
     """
     Request to create a Coinbase Commerce checkout link
-    using an internal pack key like:
-    - starter
-    - creator
-    - pro
-    - credits_30
-    - credits_100
-    - credits_300
-    - credits_1000
+    using a pack key from COINBASE_PACKS:
+    - 30
+    - 100
+    - 300
+    - 1000
     """
     pack_key: str = Field(..., description="Internal credit pack key")
     success_url: str
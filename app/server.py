@@ -0,0 +1,356 @@
+"""
+Production Server - Pre-forking Uvicorn Supervisor
+
+Usage:
+    python -m app.server
+
+The parent process imports the app (routes, pricing tables, Stripe client)
+and validates Stripe configuration ONCE, freezes the GC so those objects stay
+in shared copy-on-write pages, binds the listening socket, then forks uvicorn
+workers that all accept on it.
+
+- Worker count defaults to min(2 x CPUs + 1, memory / WORKER_MEMORY_MB),
+  honouring cgroup CPU and memory limits (override with WEB_CONCURRENCY)
+- Each worker exits gracefully after WORKER_MAX_REQUESTS (+ random jitter so
+  workers don't all recycle at once) and is replaced by the parent
+- SIGTERM/SIGINT is forwarded to workers, which drain before exiting: they
+  keep listening and answer new requests 503 until in-flight work is done,
+  then stop uvicorn, all within SHUTDOWN_DRAIN_TIMEOUT_SECONDS
+- PROMETHEUS_MULTIPROC_DIR is prepared before the app is imported so /metrics
+  aggregates every worker
+"""
+import asyncio
+import gc
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+import uvicorn
+
+from app.utils.lazy_import import lazy_import, resolve_lazy_imports
+from app.utils.logger import configure_logging, shutdown_logging
+
+logger = logging.getLogger("studio_genie.server")
+
+# A worker that dies sooner than this after starting counts as a crash
+CRASH_WINDOW_SECONDS = 5.0
+MAX_RESPAWN_BACKOFF_SECONDS = 30.0
+
+
+# =========================================================
+# WORKER SIZING
+# =========================================================
+
+def _cpu_count() -> int:
+    """CPUs available to this process, honouring affinity and cgroup v2 quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+
+    return cpus
+
+
+def _memory_limit_mb() -> int | None:
+    """Memory available to the container (cgroup v2/v1 limit or MemTotal)."""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            if value != "max" and int(value) < 1 << 60:
+                return int(value) // (1024 * 1024)
+        except (OSError, ValueError):
+            continue
+
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def compute_worker_count(configured: int, worker_memory_mb: int) -> int:
+    if configured > 0:
+        return configured
+
+    by_cpu = 2 * _cpu_count() + 1
+    memory_mb = _memory_limit_mb()
+    if memory_mb is None:
+        return by_cpu
+    by_memory = max(1, memory_mb // worker_memory_mb)
+    return max(1, min(by_cpu, by_memory))
+
+
+# =========================================================
+# PRELOAD (PARENT)
+# =========================================================
+
+def preload():
+    """Import and validate everything workers can share read-only."""
+    started = time.perf_counter()
+
+    from app.main import app
+    from app.core.config import settings
+    from app.services.stripe_validator import validate_stripe_configuration
+
+    validate_stripe_configuration()
+
+    # Workers inherit lazily imported modules (Stripe, requests) already loaded
+    lazy_modules = resolve_lazy_imports()
+
+    # Drop HTTP connections opened during validation; each worker opens its own
+    stripe = lazy_import("stripe")
+    stripe.default_http_client = None
+
+    # Move everything imported so far out of GC tracking so collections in the
+    # workers don't touch (and un-share) those pages
+    gc.collect()
+    gc.freeze()
+
+    logger.info(
+        f"[SERVER] Preloaded app in {(time.perf_counter() - started) * 1000:.0f}ms "
+        f"| Frozen objects: {gc.get_freeze_count()} | Lazy modules loaded: {', '.join(lazy_modules) or '-'}"
+    )
+    return app, settings
+
+
+def prepare_metrics_dir() -> str:
+    """
+    Point prometheus_client at a shared directory (must run before it is
+    imported) and clear samples left by a previous run.
+    """
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not path:
+        path = tempfile.mkdtemp(prefix="studio_genie_metrics_")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
+    return path
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+# =========================================================
+# WORKER (CHILD)
+# =========================================================
+
+def _flush_logs_and_reraise(signum, frame):
+    """Die from the signal as usual, but only after queued log lines are written."""
+    shutdown_logging()
+    signal.signal(signum, signal.SIG_DFL)
+    signal.raise_signal(signum)
+
+
+class DrainingServer(uvicorn.Server):
+    """
+    uvicorn closes its listening socket as soon as a signal arrives, so the
+    app would only learn about shutdown once it could no longer say so.
+    Here the first signal starts draining instead: new requests get 503 +
+    Retry-After and /health/deep reports draining while in-flight work
+    finishes; then uvicorn stops as usual. uvicorn's graceful wait and the
+    lifespan shutdown get what's left of the same deadline. A second signal
+    stops uvicorn immediately.
+    """
+
+    def __init__(self, config, coordinator, drain_timeout: float):
+        super().__init__(config)
+        self.coordinator = coordinator
+        self.drain_timeout = drain_timeout
+        self._drain_requested = False
+        self._drain_task = None
+
+    def handle_exit(self, sig, frame):
+        if self._drain_requested or self.should_exit:
+            super().handle_exit(sig, frame)
+            return
+        self._captured_signals.append(sig)  # re-raised after a graceful stop, like uvicorn's
+        self._drain_requested = True
+
+    async def on_tick(self, counter: int) -> bool:
+        # Signal handlers only set a flag; the drain starts on the loop
+        if self._drain_requested and self._drain_task is None:
+            self.coordinator.begin_drain(self.drain_timeout)
+            self._drain_task = asyncio.create_task(self.coordinator.drain_work())
+        if self._drain_task is not None and self._drain_task.done():
+            self.should_exit = True
+        return await super().on_tick(counter)
+
+    async def shutdown(self, sockets=None):
+        # Recycling (max requests) starts the budget here; a signal started it already
+        self.coordinator.begin_drain(self.drain_timeout)
+        self.config.timeout_graceful_shutdown = self.coordinator.remaining
+        await super().shutdown(sockets=sockets)
+
+
+def run_worker(app, settings, sock: socket.socket, max_requests: int | None):
+    from app.core.lifecycle import shutdown_coordinator
+
+    # Parent's handlers must not run in the child. uvicorn installs its own
+    # and, after a graceful stop, restores these and re-raises the signal
+    signal.signal(signal.SIGTERM, _flush_logs_and_reraise)
+    signal.signal(signal.SIGINT, _flush_logs_and_reraise)
+    random.seed()
+
+    config = uvicorn.Config(
+        app,
+        lifespan="on",
+        limit_max_requests=max_requests,
+        proxy_headers=True,
+        forwarded_allow_ips="*",
+        log_config=None,  # Keep the queue-based pipeline from app.utils.logger
+    )
+    server = DrainingServer(config, shutdown_coordinator, settings.SHUTDOWN_DRAIN_TIMEOUT_SECONDS)
+    server.run(sockets=[sock])
+
+
+# =========================================================
+# SUPERVISOR (PARENT)
+# =========================================================
+
+class Supervisor:
+    def __init__(self, app, settings, sock: socket.socket, workers: int):
+        self.app = app
+        self.settings = settings
+        self.sock = sock
+        self.workers = workers
+        self.children: dict[int, float] = {}  # pid -> started_at
+        self.stopping = False
+        self._crash_streak = 0
+
+    def _max_requests(self) -> int | None:
+        limit = self.settings.WORKER_MAX_REQUESTS
+        if limit <= 0:
+            return None
+        return limit + random.randint(0, max(0, self.settings.WORKER_MAX_REQUESTS_JITTER))
+
+    def spawn(self):
+        max_requests = self._max_requests()
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.app, self.settings, self.sock, max_requests)
+            except BaseException:
+                logger.exception("[SERVER] Worker crashed")
+                code = 1
+            finally:
+                shutdown_logging()
+                logging.shutdown()
+                os._exit(code)
+
+        self.children[pid] = time.monotonic()
+        logger.info(f"[SERVER] Spawned worker | PID: {pid} | MaxRequests: {max_requests or 'unlimited'}")
+
+    def _handle_stop(self, signum, frame):
+        self.stopping = True
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+
+            started_at = self.children.pop(pid, None)
+            if started_at is None:
+                continue
+
+            # Drop the dead worker's live gauges (counters/histograms are kept)
+            from prometheus_client import multiprocess
+            multiprocess.mark_process_dead(pid)
+
+            code = os.waitstatus_to_exitcode(status)
+            uptime = time.monotonic() - started_at
+            # uvicorn re-raises SIGTERM after a graceful stop; that's not a crash
+            if code not in (0, -signal.SIGTERM) and uptime < CRASH_WINDOW_SECONDS:
+                self._crash_streak += 1
+            else:
+                self._crash_streak = 0
+            logger.info(f"[SERVER] Worker exited | PID: {pid} | Code: {code} | Uptime: {uptime:.0f}s")
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        logger.info(f"[SERVER] Starting {self.workers} worker(s) | PID: {os.getpid()}")
+        while not self.stopping:
+            self.reap()
+            if len(self.children) < self.workers and not self.stopping:
+                if self._crash_streak:
+                    backoff = min(MAX_RESPAWN_BACKOFF_SECONDS, 2 ** self._crash_streak)
+                    logger.error(f"[SERVER] Workers crashing on start | Streak: {self._crash_streak} | Backoff: {backoff}s")
+                    time.sleep(backoff)
+                    if self.stopping:
+                        break
+                self.spawn()
+                continue
+            time.sleep(0.5)
+
+        self.shutdown()
+
+    def shutdown(self):
+        logger.info(f"[SERVER] Stopping {len(self.children)} worker(s)")
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        # Workers drain for SHUTDOWN_DRAIN_TIMEOUT_SECONDS; allow a little extra
+        deadline = time.monotonic() + self.settings.SHUTDOWN_DRAIN_TIMEOUT_SECONDS + 5
+        while self.children and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+
+        for pid in list(self.children):
+            logger.warning(f"[SERVER] Killing worker past drain deadline | PID: {pid}")
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.sock.close()
+        logger.info("[SERVER] Stopped")
+
+
+def main():
+    configure_logging()
+    metrics_dir = prepare_metrics_dir()
+    app, settings = preload()
+    workers = compute_worker_count(settings.WEB_CONCURRENCY, settings.WORKER_MEMORY_MB)
+    sock = bind_socket(settings.HOST, settings.PORT)
+    logger.info(f"[SERVER] Listening on {settings.HOST}:{settings.PORT} | Workers: {workers} | CPUs: {_cpu_count()} | MemoryMB: {_memory_limit_mb()} | MetricsDir: {metrics_dir}")
+
+    Supervisor(app, settings, sock, workers).run()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
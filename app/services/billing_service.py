@@ -1,10 +1,12 @@
 import logging
-import stripe
 from app.core.config import settings
 from datetime import datetime, timedelta
 from app.core.database import get_connection
+from app.core.prepared import GRANT_CREDITS
+from app.core.replica import replica_router
+from app.core.singleflight import read_coalescer
+from app.services.stripe_gateway import stripe_gateway
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
 logger = logging.getLogger(__name__)
 
 
@@ -13,33 +15,22 @@ class BillingService:
     # ADD CREDITS
     def add_credits(self, user_id: str, amount: int):
         try:
-            conn = get_connection()
-            cur = conn.cursor()
+            with get_connection() as conn:
+                cur = conn.cursor()
             
-            # Get current credits
-            cur.execute(
-                "SELECT credits FROM users WHERE id = %s",
-                (user_id,)
-            )
-            result = cur.fetchone()
+                # Add credits (atomic increment)
+                cur.execute_prepared(GRANT_CREDITS, (amount, user_id))
+                result = cur.fetchone()
             
-            if not result:
-                cur.close()
-                conn.close()
-                logger.error(f"[CREDITS ERROR] User {user_id} not found")
-                return
-            
-            current = result["credits"] or 0
-            new_amount = current + amount
+                if not result:
+                    cur.close()
+                    logger.error(f"[CREDITS ERROR] User {user_id} not found")
+                    return
             
-            # Update credits
-            cur.execute(
-                "UPDATE users SET credits = %s WHERE id = %s",
-                (new_amount, user_id)
-            )
-            conn.commit()
-            cur.close()
-            conn.close()
+                conn.commit()
+                cur.close()
+            replica_router.pin_user(user_id)
+            read_coalescer.invalidate_user(user_id)
             
             logger.info(f"[CREDITS] Added {amount} → {user_id}")
 
@@ -52,22 +43,23 @@ class BillingService:
             plan = self.map_plan(price_id)
             renewal_date = datetime.utcnow() + timedelta(days=30)
             
-            conn = get_connection()
-            cur = conn.cursor()
+            with get_connection() as conn:
+                cur = conn.cursor()
             
-            cur.execute(
-                """
-                UPDATE users 
-                SET plan = %s, 
-                    subscription_status = %s, 
-                    renewal_date = %s
-                WHERE id = %s
-                """,
-                (plan, "active", renewal_date, user_id)
-            )
-            conn.commit()
-            cur.close()
-            conn.close()
+                cur.execute(
+                    """
+                    UPDATE users 
+                    SET plan = %s, 
+                        subscription_status = %s, 
+                        renewal_date = %s
+                    WHERE id = %s
+                    """,
+                    (plan, "active", renewal_date, user_id)
+                )
+                conn.commit()
+                cur.close()
+            replica_router.pin_user(user_id)
+            read_coalescer.invalidate_user(user_id)
             
             logger.info(f"[SUBSCRIPTION] Activated {plan} for {user_id}")
         except Exception as e:
@@ -76,22 +68,23 @@ class BillingService:
     # CANCEL SUBscription
     def cancel_subscription(self, user_id: str):
         try:
-            conn = get_connection()
-            cur = conn.cursor()
+            with get_connection() as conn:
+                cur = conn.cursor()
             
-            cur.execute(
-                """
-                UPDATE users 
-                SET plan = %s, 
-                    subscription_status = %s, 
-                    renewal_date = NULL
-                WHERE id = %s
-                """,
-                ("free", "canceled", user_id)
-            )
-            conn.commit()
-            cur.close()
-            conn.close()
+                cur.execute(
+                    """
+                    UPDATE users 
+                    SET plan = %s, 
+                        subscription_status = %s, 
+                        renewal_date = NULL
+                    WHERE id = %s
+                    """,
+                    ("free", "canceled", user_id)
+                )
+                conn.commit()
+                cur.close()
+            replica_router.pin_user(user_id)
+            read_coalescer.invalidate_user(user_id)
             
             logger.info(f"[SUBSCRIPTION] Canceled for {user_id}")
         except Exception as e:
@@ -109,16 +102,15 @@ class BillingService:
     # RENEWAl via EMAIL
     def apply_subscription_by_email(self, email: str, price_id: str):
         try:
-            conn = get_connection()
-            cur = conn.cursor()
+            with get_connection() as conn:
+                cur = conn.cursor()
             
-            cur.execute(
-                "SELECT id FROM users WHERE email = %s",
-                (email,)
-            )
-            user = cur.fetchone()
-            cur.close()
-            conn.close()
+                cur.execute(
+                    "SELECT id FROM users WHERE email = %s",
+                    (email,)
+                )
+                user = cur.fetchone()
+                cur.close()
 
             if user:
                 self.activate_subscription(user["id"], price_id)
@@ -129,13 +121,13 @@ class BillingService:
     # CREATE CHECKOUT SESSION
     async def create_session(self, price_id: str):
         try:
-            session = stripe.checkout.Session.create(
-                mode="subscription",
-                payment_method_types=["card"],
-                line_items=[{"price": price_id, "quantity": 1}],
-                success_url=f"{settings.APP_URL}/dashboard?success=true&session_id={{CHECKOUT_SESSION_ID}}",
-                cancel_url=f"{settings.APP_URL}/pricing?cancelled=true",
-            )
+            session = await stripe_gateway.create_checkout_session({
+                "mode": "subscription",
+                "payment_method_types": ["card"],
+                "line_items": [{"price": price_id, "quantity": 1}],
+                "success_url": f"{settings.APP_URL}/dashboard?success=true&session_id={{CHECKOUT_SESSION_ID}}",
+                "cancel_url": f"{settings.APP_URL}/pricing?cancelled=true",
+            })
             return session.url
         except Exception as e:
             logger.error(f"[STRIPE ERROR] {e}")
@@ -0,0 +1,119 @@
+"""
+Checkout Session Index - session_id → (user_id, price_id, mode)
+Recorded when StripeService creates a Checkout Session, so the
+checkout.session.completed webhook can resolve the purchased price with one
+primary-key lookup instead of a Session.retrieve round trip to Stripe.
+
+- Best effort on write: the session already exists at Stripe, so a failed
+  insert only costs the webhook a Stripe call later
+- A miss (sessions created before migrations/004, or by another client)
+  falls back to Stripe in the webhook
+- Reuse (migrations/005): a user's newest open session for the same price,
+  mode and return URL is handed back instead of creating another one
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.core.database import get_connection
+from app.core.metrics import record_checkout_index_lookup
+
+logger = logging.getLogger(__name__)
+
+# A reused session must stay payable for at least this long
+REUSE_MIN_REMAINING_SECONDS = 300
+
+
+def record_checkout_session(
+    session_id: str,
+    user_id: Optional[str],
+    price_id: str,
+    mode: str,
+    url: Optional[str] = None,
+    success_url: Optional[str] = None,
+    expires_at: Optional[int] = None,
+):
+    try:
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                INSERT INTO checkout_sessions (session_id, user_id, price_id, mode, url, success_url, expires_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (session_id) DO NOTHING
+                """,
+                (
+                    session_id, user_id, price_id, mode, url, success_url,
+                    datetime.fromtimestamp(expires_at, timezone.utc).replace(tzinfo=None) if expires_at else None,
+                ),
+            )
+            conn.commit()
+            cur.close()
+    except Exception as e:
+        logger.warning(f"[CHECKOUT INDEX] Insert failed | SessionID: {session_id} | Error: {str(e)}")
+
+
+def find_checkout_session(session_id: str) -> Optional[dict]:
+    """The indexed session, or None on a miss (or DB error: the caller asks Stripe)."""
+    try:
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT session_id, user_id, price_id, mode, created_at FROM checkout_sessions WHERE session_id = %s",
+                (session_id,),
+            )
+            row = cur.fetchone()
+            cur.close()
+    except Exception as e:
+        logger.warning(f"[CHECKOUT INDEX] Lookup failed | SessionID: {session_id} | Error: {str(e)}")
+        row = None
+    record_checkout_index_lookup("hit" if row else "miss")
+    return row
+
+
+def find_open_checkout_session(
+    user_id: str, price_id: str, mode: str, success_url: str, max_age_seconds: int
+) -> Optional[dict]:
+    """
+    The user's newest unpaid session for this price/mode/return URL created in
+    the last `max_age_seconds` and not about to expire, or None (also on a DB
+    error: the caller creates a new session).
+    """
+    try:
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                SELECT session_id, url
+                FROM checkout_sessions
+                WHERE user_id = %s AND price_id = %s AND mode = %s
+                  AND completed_at IS NULL
+                  AND success_url = %s AND url IS NOT NULL
+                  AND created_at > NOW() - make_interval(secs => %s)
+                  AND expires_at > (NOW() AT TIME ZONE 'UTC') + make_interval(secs => %s)
+                ORDER BY created_at DESC
+                LIMIT 1
+                """,
+                (user_id, price_id, mode, success_url, max_age_seconds, REUSE_MIN_REMAINING_SECONDS),
+            )
+            row = cur.fetchone()
+            cur.close()
+        return row
+    except Exception as e:
+        logger.warning(f"[CHECKOUT INDEX] Reuse lookup failed | UserID: {user_id} | Error: {str(e)}")
+        return None
+
+
+def mark_checkout_session_completed(session_id: str):
+    """Paid sessions are never reused; best effort like the insert."""
+    try:
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "UPDATE checkout_sessions SET completed_at = NOW() WHERE session_id = %s AND completed_at IS NULL",
+                (session_id,),
+            )
+            conn.commit()
+            cur.close()
+    except Exception as e:
+        logger.warning(f"[CHECKOUT INDEX] Completion update failed | SessionID: {session_id} | Error: {str(e)}")
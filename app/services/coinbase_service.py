@@ -1,26 +1,39 @@
+"""
+Coinbase Commerce Service - Crypto Credit Top-Ups
+Hosted charges for credit packs; confirmed charges become credits (+20% bonus)
+
+- One keep-alive httpx.AsyncClient per worker (COINBASE_MAX_CONNECTIONS),
+  created lazily after fork and closed on shutdown, like the Stripe gateway
+- charge:confirmed is applied in one statement: the payments row claims the
+  charge ID (unique per provider, migrations/007) and only a claimed charge
+  credits the user, so a redelivered webhook is a no-op and a payment can
+  never be recorded without its credits or the other way round
+"""
 import hmac
 import hashlib
 import logging
-from typing import Dict, Any
+import os
+import uuid
+from typing import Dict, Any, Optional
 
-import requests
 from fastapi import HTTPException
 
 from app.core.config import settings
 from app.core.database import get_connection
-from app.services.credit_service import credit_service
+from app.core.metrics import observe_coinbase, record_credits_granted
+from app.core.replica import replica_router
+from app.core.singleflight import read_coalescer
+from app.core.tracing import inject_headers
+from app.utils.lazy_import import lazy_import
+
+httpx = lazy_import("httpx")
 
 logger = logging.getLogger(__name__)
 
 # -------------------------------------------------------------
 # COINBASE CONFIG
 # -------------------------------------------------------------
-COINBASE_API_BASE = "https://api.commerce.coinbase.com/charges"
-COINBASE_HEADERS = {
-    "X-CC-Api-Key": settings.COINBASE_API_KEY,
-    "X-CC-Version": "2018-03-22",
-    "Content-Type": "application/json",
-}
+COINBASE_API_VERSION = "2018-03-22"
 
 # REAL CREDIT PACKS (MATCHES YOUR UI)
 # prices in USD, credits in internal units
@@ -50,20 +63,64 @@ COINBASE_PACKS: Dict[str, Dict[str, Any]] = {
 # BONUS % FOR COINBASE PAYMENTS
 BONUS_RATE = 0.20  # 20%
 
+# Claim the charge and credit the user in one statement
+APPLY_CHARGE_SQL = """
+WITH paid AS (
+    INSERT INTO payments (user_id, provider, external_id, amount, bonus, total_credits, status)
+    SELECT id, 'coinbase', %(charge_id)s, %(amount)s, %(bonus)s, %(total)s, 'completed'
+    FROM users
+    WHERE id = %(user_id)s
+    ON CONFLICT (provider, external_id) DO NOTHING
+    RETURNING user_id, total_credits
+)
+UPDATE users u
+SET credits = u.credits + paid.total_credits
+FROM paid
+WHERE u.id = paid.user_id
+RETURNING u.credits
+"""
+
+
+def pack_credits(pack_key: str) -> Dict[str, int]:
+    base_credits = COINBASE_PACKS[pack_key]["credits"]
+    bonus_credits = int(base_credits * BONUS_RATE)
+    return {"base": base_credits, "bonus": bonus_credits, "total": base_credits + bonus_credits}
+
 
 class CoinbaseService:
+    def __init__(self):
+        self._client = None
+        self._pid = None
+
+    def _http(self):
+        if self._pid != os.getpid():
+            # Connection pools must not cross a fork (app.server preloads)
+            self._pid = os.getpid()
+            self._client = httpx.AsyncClient(
+                base_url=settings.COINBASE_API_BASE,
+                timeout=settings.COINBASE_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=settings.COINBASE_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.COINBASE_MAX_CONNECTIONS,
+                ),
+            )
+        return self._client
+
     # ---------------------------------------------------------
     # CREATE CHARGE & RETURN HOSTED URL
     # ---------------------------------------------------------
-    def generate_checkout_link(self, pack_key: str, user_id: str) -> str:
+    async def generate_checkout_link(
+        self, pack_key: str, user_id: str, success_url: Optional[str] = None, cancel_url: Optional[str] = None
+    ) -> dict:
         """
-        Create a Coinbase Commerce charge for a credit pack and return
-        the hosted checkout URL.
+        Create a Coinbase Commerce charge for a credit pack.
+        Returns hosted_url, charge_id, amount_usd and credits (bonus included).
         """
         if pack_key not in COINBASE_PACKS:
             raise HTTPException(status_code=400, detail="Invalid Coinbase credit pack")
 
         pack = COINBASE_PACKS[pack_key]
+        credits = pack_credits(pack_key)
 
         payload = {
             "name": pack["name"],
@@ -74,38 +131,43 @@ class CoinbaseService:
             },
             "pricing_type": "fixed_price",
             "metadata": {
-                "user_id": user_id,
+                "user_id": str(user_id),
                 "pack_key": pack_key,
             },
         }
-
+        if success_url:
+            payload["redirect_url"] = success_url
+        if cancel_url:
+            payload["cancel_url"] = cancel_url
+
+        headers = {
+            "X-CC-Api-Key": settings.COINBASE_API_KEY,
+            "X-CC-Version": COINBASE_API_VERSION,
+        }
         try:
-            resp = requests.post(
-                COINBASE_API_BASE, json=payload, headers=COINBASE_HEADERS, timeout=10
-            )
-        except Exception as e:
-            logger.error(f"[COINBASE] HTTP error during charge creation: {str(e)}")
+            with observe_coinbase("charge.create"):
+                resp = await self._http().post("/charges", json=payload, headers=inject_headers(headers))
+        except httpx.HTTPError as e:
+            logger.error(f"[COINBASE] HTTP error during charge creation | Error: {type(e).__name__}: {str(e)}")
             raise HTTPException(status_code=502, detail="Coinbase API error")
 
         if resp.status_code != 201:
-            logger.error(f"[COINBASE] Charge creation failed: {resp.text}")
-            raise HTTPException(
-                status_code=502, detail="Failed to create Coinbase charge"
-            )
+            logger.error(f"[COINBASE] Charge creation failed | Status: {resp.status_code} | Body: {resp.text[:500]}")
+            raise HTTPException(status_code=502, detail="Failed to create Coinbase charge")
 
         data = resp.json().get("data", {})
         hosted_url = data.get("hosted_url")
-
         if not hosted_url:
-            logger.error(f"[COINBASE] Missing hosted_url in response: {resp.text}")
-            raise HTTPException(
-                status_code=502, detail="Coinbase charge missing hosted URL"
-            )
-
-        logger.info(
-            f"[COINBASE] Created charge for user={user_id}, pack={pack_key}, url={hosted_url}"
-        )
-        return hosted_url
+            logger.error(f"[COINBASE] Missing hosted_url in response | Body: {resp.text[:500]}")
+            raise HTTPException(status_code=502, detail="Coinbase charge missing hosted URL")
+
+        logger.info(f"[COINBASE] Charge created | ChargeID: {data.get('id')} | User: {user_id} | Pack: {pack_key}")
+        return {
+            "hosted_url": hosted_url,
+            "charge_id": data.get("id"),
+            "amount_usd": float(pack["price"]),
+            "credits": credits["total"],
+        }
 
     # ---------------------------------------------------------
     # VERIFY WEBHOOK SIGNATURE
@@ -114,6 +176,11 @@ class CoinbaseService:
         """
         Validate Coinbase Commerce webhook HMAC signature.
         """
+        if not settings.COINBASE_WEBHOOK_SECRET:
+            # An empty key would accept signatures anyone can compute
+            logger.warning("[COINBASE] COINBASE_WEBHOOK_SECRET not set | Webhook rejected")
+            return False
+
         if not signature:
             logger.warning("[COINBASE] Missing webhook signature")
             return False
@@ -131,77 +198,75 @@ class CoinbaseService:
         return valid
 
     # ---------------------------------------------------------
-    # PROCESS PAYMENT WEBHOOK
+    # APPLY CONFIRMED CHARGE
     # ---------------------------------------------------------
-    def process_payment(self, payload: dict):
+    def apply_confirmed_charge(self, charge: dict) -> dict:
         """
         Convert a confirmed Coinbase charge into credits.
-        - Only handles `charge:confirmed`
         - Uses metadata.user_id + metadata.pack_key
         - Adds 20% bonus credits
-        - Logs to payments table
-        """
-        event = payload.get("event")
-        if not event:
-            raise HTTPException(status_code=400, detail="Invalid Coinbase payload")
-
-        event_type = event.get("type")
-        if event_type != "charge:confirmed":
-            logger.info(f"[COINBASE] Ignored event type: {event_type}")
-            return
-
-        data = event.get("data", {})
-        metadata = data.get("metadata", {}) or {}
+        - Idempotent per charge ID
 
+        Returns {"outcome": "credited" | "duplicate" | "unknown_user" | "invalid", ...}.
+        """
+        charge_id = charge.get("id")
+        metadata = charge.get("metadata") or {}
         user_id = metadata.get("user_id")
         pack_key = metadata.get("pack_key")
 
-        if not user_id or not pack_key:
-            logger.error("[COINBASE] Missing metadata (user_id / pack_key)")
-            raise HTTPException(
-                status_code=400, detail="Coinbase metadata incomplete"
+        if not charge_id or not user_id or pack_key not in COINBASE_PACKS:
+            logger.error(
+                f"[COINBASE] Unusable charge | ChargeID: {charge_id} | User: {user_id} | Pack: {pack_key}"
             )
-
-        if pack_key not in COINBASE_PACKS:
-            logger.error(f"[COINBASE] Unknown pack_key: {pack_key}")
-            raise HTTPException(status_code=400, detail="Invalid Coinbase credit pack")
-
-        base_credits = COINBASE_PACKS[pack_key]["credits"]
-        bonus_credits = int(base_credits * BONUS_RATE)
-        total_credits = base_credits + bonus_credits
-
-        # Stack credits onto user
-        new_balance = credit_service.add_credits(
-            user_id=user_id,
-            amount=total_credits,
-            reason="coinbase_topup",
-        )
-
-        # Log in payments table (optional but recommended)
+            return {"outcome": "invalid"}
         try:
-            conn = get_connection()
+            uuid.UUID(str(user_id))
+        except ValueError:
+            logger.error(f"[COINBASE] Invalid user_id in metadata | ChargeID: {charge_id} | User: {user_id}")
+            return {"outcome": "invalid"}
+
+        credits = pack_credits(pack_key)
+        with get_connection() as conn:
             cur = conn.cursor()
-            
-            cur.execute(
-                """
-                INSERT INTO payments (user_id, provider, amount, bonus, total_credits, status)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                """,
-                (user_id, "coinbase", base_credits, bonus_credits, total_credits, "confirmed")
-            )
+            cur.execute(APPLY_CHARGE_SQL, {
+                "charge_id": charge_id,
+                "user_id": user_id,
+                "amount": credits["base"],
+                "bonus": credits["bonus"],
+                "total": credits["total"],
+            })
+            row = cur.fetchone()
+            if row is None:
+                cur.execute(
+                    "SELECT 1 FROM payments WHERE provider = 'coinbase' AND external_id = %s",
+                    (charge_id,),
+                )
+                duplicate = cur.fetchone() is not None
             conn.commit()
             cur.close()
-            conn.close()
-        except Exception as e:
-            # Don't murder the webhook if logging fails
-            logger.error(f"[COINBASE] Failed to log payment: {str(e)}")
 
+        if row is None:
+            outcome = "duplicate" if duplicate else "unknown_user"
+            logger.info(f"[COINBASE] Charge not applied | ChargeID: {charge_id} | User: {user_id} | Reason: {outcome}")
+            return {"outcome": outcome}
+
+        replica_router.pin_user(user_id)
+        read_coalescer.invalidate_user(user_id)
+        record_credits_granted("coinbase", credits["total"])
         logger.info(
-            f"[COINBASE] User={user_id} bought {base_credits} + {bonus_credits} bonus → "
-            f"{total_credits} credits (new balance {new_balance})"
+            f"[COINBASE] Charge applied | ChargeID: {charge_id} | User: {user_id} | "
+            f"Credits: {credits['base']} + {credits['bonus']} bonus | Balance: {row['credits']}"
         )
+        return {"outcome": "credited", "credits": credits["total"], "new_balance": row["credits"]}
 
-        return new_balance
+    # ---------------------------------------------------------
+    # LIFECYCLE
+    # ---------------------------------------------------------
+    async def close(self):
+        if self._client is not None and self._pid == os.getpid():
+            await self._client.aclose()
+        self._client = None
+        self._pid = None
 
 
 coinbase_service = CoinbaseService()
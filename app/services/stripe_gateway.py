@@ -0,0 +1,259 @@
+"""
+Stripe Gateway - Async Pooled Client, Retries, Bulkhead & Circuit Breaker
+Every Stripe API call made while serving requests goes through here instead
+of the blocking module-level `stripe` resources.
+
+- One keep-alive httpx connection pool per worker (stripe.StripeClient with
+  an async HTTPXClient), created lazily after fork and closed on shutdown
+- Per-operation timeout and retry policy; POST retries reuse one
+  idempotency key so a retried create/modify is never applied twice
+- Bulkhead: at most STRIPE_MAX_CONCURRENCY calls in flight per worker;
+  callers wait up to STRIPE_BULKHEAD_WAIT_SECONDS for a slot, then fail fast
+- Circuit breaker: STRIPE_BREAKER_FAILURES consecutive failed calls
+  (timeouts, connection errors, 5xx, 429) open the circuit; calls fail
+  immediately for STRIPE_BREAKER_RESET_SECONDS, then one probe call decides
+  whether to close it again. Stripe answering 4xx counts as success.
+
+Callers get stripe's own exceptions for errors Stripe reported and
+StripeUnavailableError when Stripe could not be reached in time (the app
+answers 503 with Retry-After, see app/main.py). Startup validation in
+stripe_validator still uses the blocking SDK: it runs before serving.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import observe_stripe, record_stripe_rejected, record_stripe_retry, set_stripe_circuit_open
+from app.utils.lazy_import import lazy_import
+
+stripe = lazy_import("stripe")
+
+logger = logging.getLogger(__name__)
+
+
+class StripeUnavailableError(Exception):
+    """Stripe could not be used right now: circuit open, bulkhead full or retries exhausted."""
+
+    def __init__(self, operation: str, reason: str, retry_after: float):
+        super().__init__(f"Stripe unavailable for {operation}: {reason}")
+        self.operation = operation
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class OperationPolicy:
+    timeout: float  # Seconds per attempt
+    retries: int  # Extra attempts after a retryable failure
+
+
+POLICIES: Dict[str, OperationPolicy] = {
+    "price.retrieve": OperationPolicy(timeout=3.0, retries=2),
+    "checkout.session.create": OperationPolicy(timeout=8.0, retries=2),
+    "checkout.session.retrieve": OperationPolicy(timeout=5.0, retries=2),
+    "subscription.modify": OperationPolicy(timeout=10.0, retries=1),
+}
+
+RETRY_BACKOFF_SECONDS = 0.2  # Doubles per attempt, plus up to 100% jitter
+
+
+def _retryable_errors() -> tuple:
+    return (asyncio.TimeoutError, stripe.APIConnectionError, stripe.APIError, stripe.RateLimitError)
+
+
+# =========================================================
+# CIRCUIT BREAKER
+# =========================================================
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half_open (one probe) -> closed/open."""
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def retry_after(self) -> float:
+        if self.state != "open":
+            return 1.0
+        return max(1.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def abandon(self):
+        """
+        The allowed call ended without an outcome (bulkhead full, cancelled,
+        unexpected error): let the next call probe. No-op after record_*.
+        """
+        self._probing = False
+
+    def record_success(self):
+        if self.state != "closed":
+            logger.info(f"[CIRCUIT] {self.name} closed | Probe succeeded")
+            set_stripe_circuit_open(False)
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+            if self.state == "closed":
+                logger.warning(
+                    f"[CIRCUIT] {self.name} opened | Failures: {self.failures} | Reset: {self.reset_timeout}s"
+                )
+            self.state = "open"
+            self._opened_at = time.monotonic()
+            set_stripe_circuit_open(True)
+
+    def status(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures}
+
+
+# =========================================================
+# GATEWAY
+# =========================================================
+
+class StripeGateway:
+    def __init__(self):
+        self.breaker = CircuitBreaker(
+            "stripe", settings.STRIPE_BREAKER_FAILURES, settings.STRIPE_BREAKER_RESET_SECONDS
+        )
+        self.in_flight = 0
+        self._client = None
+        self._http_client = None
+        self._bulkhead: Optional[asyncio.Semaphore] = None
+        self._pid = None
+
+    def _stripe(self):
+        if self._pid != os.getpid():
+            # Pools and semaphores must not cross a fork (app.server preloads)
+            self._pid = os.getpid()
+            self._http_client = stripe.HTTPXClient(timeout=max(p.timeout for p in POLICIES.values()))
+            self._client = stripe.StripeClient(
+                settings.STRIPE_SECRET_KEY,
+                http_client=self._http_client,
+                base_addresses={"api": settings.STRIPE_API_BASE} if settings.STRIPE_API_BASE else None,
+                max_network_retries=0,  # Retries are ours, so the breaker sees every failure
+            )
+            self._bulkhead = asyncio.Semaphore(settings.STRIPE_MAX_CONCURRENCY)
+        return self._client
+
+    async def _call(self, operation: str, request: Callable[[dict], Awaitable], idempotency_key: Optional[str] = None):
+        policy = POLICIES[operation]
+        client = self._stripe()
+
+        if not self.breaker.allow():
+            record_stripe_rejected(operation, "circuit_open")
+            raise StripeUnavailableError(operation, "circuit open", self.breaker.retry_after())
+        probe = self.breaker.state == "half_open"
+        try:
+            return await self._attempts(operation, policy, client, request, idempotency_key)
+        except BaseException:
+            # Cancelled (webhook timeout, client gone) or failed without an
+            # outcome: the probe must not hold the only half-open slot forever
+            if probe:
+                self.breaker.abandon()
+            raise
+
+    async def _attempts(self, operation: str, policy: OperationPolicy, client, request, idempotency_key: Optional[str]):
+        try:
+            await asyncio.wait_for(self._bulkhead.acquire(), settings.STRIPE_BULKHEAD_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            record_stripe_rejected(operation, "bulkhead_full")
+            raise StripeUnavailableError(operation, "too many concurrent Stripe calls", 1.0)
+
+        options = {"idempotency_key": idempotency_key} if idempotency_key else {}
+        self.in_flight += 1
+        try:
+            for attempt in range(policy.retries + 1):
+                try:
+                    with observe_stripe(operation):
+                        result = await asyncio.wait_for(request(client, options), policy.timeout)
+                except _retryable_errors() as e:
+                    if attempt < policy.retries and self.breaker.state == "closed":
+                        record_stripe_retry(operation)
+                        await asyncio.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt * (1 + random.random()))
+                        continue
+                    self.breaker.record_failure()
+                    reason = "timeout" if isinstance(e, asyncio.TimeoutError) else type(e).__name__
+                    logger.warning(
+                        f"[STRIPE] Call failed | Operation: {operation} | Attempts: {attempt + 1} | Reason: {reason}"
+                    )
+                    raise StripeUnavailableError(operation, reason, self.breaker.retry_after()) from e
+                except stripe.StripeError:
+                    # Stripe answered (bad request, auth, card...): healthy dependency
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_success()
+                return result
+        finally:
+            self.in_flight -= 1
+            self._bulkhead.release()
+
+    # ---------------------------------------------------------
+    # Operations
+    # ---------------------------------------------------------
+    async def retrieve_price(self, price_id: str):
+        return await self._call(
+            "price.retrieve",
+            lambda client, options: client.v1.prices.retrieve_async(price_id, options=options),
+        )
+
+    async def create_checkout_session(self, params: dict, idempotency_key: Optional[str] = None):
+        return await self._call(
+            "checkout.session.create",
+            lambda client, options: client.v1.checkout.sessions.create_async(params, options=options),
+            idempotency_key or str(uuid.uuid4()),
+        )
+
+    async def retrieve_checkout_session(self, session_id: str, expand: Optional[List[str]] = None):
+        params = {"expand": expand} if expand else None
+        return await self._call(
+            "checkout.session.retrieve",
+            lambda client, options: client.v1.checkout.sessions.retrieve_async(session_id, params, options=options),
+        )
+
+    async def modify_subscription(self, subscription_id: str, params: dict, idempotency_key: Optional[str] = None):
+        return await self._call(
+            "subscription.modify",
+            lambda client, options: client.v1.subscriptions.update_async(subscription_id, params, options=options),
+            idempotency_key or str(uuid.uuid4()),
+        )
+
+    # ---------------------------------------------------------
+    # Status & lifecycle
+    # ---------------------------------------------------------
+    def status(self) -> dict:
+        return {**self.breaker.status(), "in_flight": self.in_flight, "max_concurrency": settings.STRIPE_MAX_CONCURRENCY}
+
+    async def close(self):
+        if self._http_client is not None and self._pid == os.getpid():
+            await self._http_client.close_async()
+        self._client = self._http_client = None
+        self._pid = None
+
+
+# Global instance
+stripe_gateway = StripeGateway()
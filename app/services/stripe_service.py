@@ -1,11 +1,22 @@
-import stripe
+import hashlib
 import logging
 import json
+import time
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 from app.core.config import settings
+from app.core.singleflight import checkout_coalescer
+from app.core.tracing import start_span
 from app.services.billing_service import billing_service
+from app.core.metrics import record_checkout_reused
+from app.services.checkout_sessions import find_open_checkout_session, record_checkout_session
+from app.services.stripe_gateway import StripeUnavailableError, stripe_gateway
 from app.services.stripe_validator import preflight_check_price
 from app.core.subscription_prices import SUBSCRIPTION_PRICES, get_all_price_ids
+from app.utils.logger import Lazy
+from app.utils.lazy_import import lazy_import
+
+stripe = lazy_import("stripe")
 
 logger = logging.getLogger(__name__)
 stripe.api_key = settings.STRIPE_SECRET_KEY
@@ -13,49 +24,94 @@ stripe.api_key = settings.STRIPE_SECRET_KEY
 
 
 
+def checkout_idempotency_key(payload: dict) -> str:
+    """
+    Same key for identical session creates within one
+    CHECKOUT_IDEMPOTENCY_WINDOW_SECONDS window, so simultaneous double-clicks
+    (which all miss the reuse lookup) get one session back from Stripe.
+    Only for signed-in users: anonymous payloads are identical across visitors.
+    """
+    window = int(time.time() // max(settings.CHECKOUT_IDEMPOTENCY_WINDOW_SECONDS, 1))
+    digest = hashlib.sha256(f"{json.dumps(payload, sort_keys=True)}:{window}".encode()).hexdigest()
+    return f"checkout-{digest[:40]}"
+
+
 class StripeService:
     # CREATE CHECKOUT SESSION
-    def create_checkout_session(self, price_id, customer_email, user_id, success_url, cancel_url, mode):
-        # ========================================
-        # 🔍 DEBUG: Log Stripe configuration BEFORE API call
-        # ========================================
-        logger.info("=" * 80)
-        logger.info("[STRIPE CHECKOUT] Creating session")
-        logger.info(f"[STRIPE CHECKOUT] Mode: {mode}")
-        logger.info(f"[STRIPE CHECKOUT] Price ID: {price_id}")
-        logger.info(f"[STRIPE CHECKOUT] Customer Email: {customer_email}")
-        logger.info(f"[STRIPE CHECKOUT] User ID: {user_id}")
-        logger.info(f"[STRIPE CHECKOUT] Success URL: {success_url}")
-        logger.info(f"[STRIPE CHECKOUT] Cancel URL: {cancel_url}")
-        logger.info(f"[STRIPE CHECKOUT] Stripe API Key (first 10 chars): {stripe.api_key[:10]}...")
-        logger.info(f"[STRIPE CHECKOUT] Stripe API Key Mode: {'TEST' if 'test' in stripe.api_key else 'LIVE'}")
-        logger.info("=" * 80)
+    async def create_checkout_session(self, price_id, customer_email, user_id, success_url, cancel_url, mode):
+        if not user_id:
+            return await self._create_checkout_session(price_id, customer_email, user_id, success_url, cancel_url, mode)
+        # A user's simultaneous identical clicks on this worker share one
+        # reuse lookup and one Stripe create
+        return await checkout_coalescer.do(
+            ("stripe.checkout", (str(user_id), price_id, mode, success_url)),
+            lambda: self._create_checkout_session(price_id, customer_email, user_id, success_url, cancel_url, mode),
+        )
+
+    async def _create_checkout_session(self, price_id, customer_email, user_id, success_url, cancel_url, mode):
+        # Step-by-step detail is DEBUG in the sampled "stripe.checkout"
+        # category; one INFO line per session, one ERROR line per failure
+        log_fields = {"category": "stripe.checkout", "mode": mode, "price_id": price_id, "user_id": user_id}
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug(
+                "[STRIPE CHECKOUT] Creating session",
+                extra={
+                    **log_fields,
+                    "customer_email": customer_email,
+                    "success_url": success_url,
+                    "cancel_url": cancel_url,
+                    "api_key_mode": Lazy(lambda: "TEST" if "test" in stripe.api_key else "LIVE"),
+                },
+            )
         
         try:
+            # ========================================
+            # REUSE: a double-click or retry gets the still-open session back
+            # ========================================
+            if user_id and settings.CHECKOUT_REUSE_SECONDS > 0:
+                reused = await run_in_threadpool(
+                    find_open_checkout_session,
+                    str(user_id), price_id, mode, success_url, settings.CHECKOUT_REUSE_SECONDS,
+                )
+                if reused:
+                    record_checkout_reused(mode)
+                    logger.info(
+                        "[STRIPE CHECKOUT] Session reused | SessionID: %s | Mode: %s | PriceID: %s | User: %s",
+                        reused["session_id"], mode, price_id, user_id,
+                        extra={**log_fields, "session_id": reused["session_id"]},
+                    )
+                    return {"session_id": reused["session_id"], "url": reused["url"]}
+            
             # Log subscription price validation for subscription mode
-            if mode == "subscription":
-                valid_subscription_prices = get_all_price_ids()
-                logger.info(f"[STRIPE CHECKOUT] Valid LIVE subscription price IDs: {valid_subscription_prices}")
-                logger.info(f"[STRIPE CHECKOUT] Received price_id: {price_id}")
-                logger.info(f"[STRIPE CHECKOUT] Price ID validation: {'✅ VALID' if price_id in valid_subscription_prices else '⚠️ NOT IN LIST (will let Stripe validate)'}")
+            if debug and mode == "subscription":
+                logger.debug(
+                    "[STRIPE CHECKOUT] Subscription price check",
+                    extra={**log_fields, "known_price": Lazy(lambda: price_id in get_all_price_ids())},
+                )
             
             # ========================================
             # PREFLIGHT CHECK: Verify price exists in Stripe
             # ========================================
-            logger.info("[STRIPE CHECKOUT] 🔍 Running preflight check...")
             try:
-                price_info = preflight_check_price(price_id)
-                logger.info(f"[STRIPE CHECKOUT] ✅ Preflight check PASSED")
-                logger.info(f"[STRIPE CHECKOUT]   Price Type: {price_info['type']}")
-                logger.info(f"[STRIPE CHECKOUT]   Price Active: {price_info['active']}")
-                if price_info['recurring']:
-                    logger.info(f"[STRIPE CHECKOUT]   Recurring Interval: {price_info['recurring']['interval']}")
+                with start_span("preflight_check_price", price_id=price_id):
+                    price_info = await preflight_check_price(price_id)
+                if debug:
+                    logger.debug(
+                        "[STRIPE CHECKOUT] Preflight check passed",
+                        extra={
+                            **log_fields,
+                            "price_type": price_info["type"],
+                            "price_active": price_info["active"],
+                            "recurring_interval": getattr(price_info["recurring"], "interval", None),
+                        },
+                    )
             except RuntimeError as e:
-                logger.error(f"[STRIPE CHECKOUT] ❌ PREFLIGHT CHECK FAILED: {str(e)}")
+                logger.error("[STRIPE CHECKOUT] Preflight check failed | Error: %s", e, extra=log_fields)
                 raise HTTPException(400, f"Invalid price ID: {str(e)}")
             
             # ========================================
-            # Log exact payload being sent to Stripe
+            # Build payload sent to Stripe
             # ========================================
             payload = {
                 "mode": mode,
@@ -68,39 +124,38 @@ class StripeService:
                 "expand": ["line_items"],
             }
             
-            logger.info("[STRIPE CHECKOUT] 📦 CHECKOUT PAYLOAD:")
-            logger.info(f"[STRIPE CHECKOUT]   mode: {payload['mode']}")
-            logger.info(f"[STRIPE CHECKOUT]   line_items: {json.dumps(payload['line_items'])}")
-            logger.info(f"[STRIPE CHECKOUT]   customer_email: {payload['customer_email']}")
-            logger.info(f"[STRIPE CHECKOUT]   client_reference_id: {payload['client_reference_id']}")
-            logger.info(f"[STRIPE CHECKOUT]   metadata: {payload['metadata']}")
-            logger.info(f"[STRIPE CHECKOUT]   success_url: {payload['success_url']}")
-            logger.info(f"[STRIPE CHECKOUT]   cancel_url: {payload['cancel_url']}")
-            
-            # Create Stripe checkout session
-            logger.info("[STRIPE CHECKOUT] 🚀 Calling Stripe API: stripe.checkout.Session.create()")
+            if debug:
+                logger.debug(
+                    "[STRIPE CHECKOUT] Calling Stripe checkout.sessions.create",
+                    extra={**log_fields, "payload": Lazy(lambda: json.dumps(payload))},
+                )
             
-            session = stripe.checkout.Session.create(**payload)
+            session = await stripe_gateway.create_checkout_session(
+                payload, idempotency_key=checkout_idempotency_key(payload) if user_id else None
+            )
+            # Lets the completion webhook skip Session.retrieve for the price,
+            # and a repeat click reuse this session
+            await run_in_threadpool(
+                record_checkout_session,
+                session.id, str(user_id) if user_id else None, price_id, mode,
+                session.url, success_url, getattr(session, "expires_at", None),
+            )
             
-            logger.info("[STRIPE CHECKOUT] ✅ SUCCESS! Stripe session created")
-            logger.info(f"[STRIPE CHECKOUT] Session ID: {session.id}")
-            logger.info(f"[STRIPE CHECKOUT] Checkout URL: {session.url}")
-            logger.info("=" * 80)
+            logger.info(
+                "[STRIPE CHECKOUT] Session created | SessionID: %s | Mode: %s | PriceID: %s | User: %s",
+                session.id, mode, price_id, user_id,
+                extra={**log_fields, "session_id": session.id},
+            )
 
             return {"session_id": session.id, "url": session.url}
 
         except stripe.error.InvalidRequestError as e:
             # Stripe API errors (invalid price ID, wrong mode, etc.)
-            logger.error("=" * 80)
-            logger.error("[STRIPE CHECKOUT] ❌ STRIPE INVALID REQUEST ERROR")
-            logger.error(f"[STRIPE CHECKOUT] Error Type: InvalidRequestError")
-            logger.error(f"[STRIPE CHECKOUT] Error Code: {e.code if hasattr(e, 'code') else 'N/A'}")
-            logger.error(f"[STRIPE CHECKOUT] Error Message: {str(e)}")
-            logger.error(f"[STRIPE CHECKOUT] Error Param: {e.param if hasattr(e, 'param') else 'N/A'}")
-            logger.error(f"[STRIPE CHECKOUT] Full Error: {repr(e)}")
-            logger.error(f"[STRIPE CHECKOUT] Price ID attempted: {price_id}")
-            logger.error(f"[STRIPE CHECKOUT] Mode attempted: {mode}")
-            logger.error("=" * 80)
+            logger.error(
+                "[STRIPE CHECKOUT] Stripe InvalidRequestError | Code: %s | Param: %s | Error: %s | PriceID: %s | Mode: %s",
+                getattr(e, "code", "N/A"), getattr(e, "param", "N/A"), e, price_id, mode,
+                extra=log_fields,
+            )
             # Return full error details to help debug
             error_detail = f"Stripe InvalidRequestError: {str(e)}"
             if hasattr(e, 'code'):
@@ -109,15 +164,11 @@ class StripeService:
             
         except stripe.error.AuthenticationError as e:
             # Authentication errors (wrong API key)
-            logger.error("=" * 80)
-            logger.error("[STRIPE CHECKOUT] ❌ STRIPE AUTHENTICATION ERROR")
-            logger.error(f"[STRIPE CHECKOUT] Error Code: {e.code if hasattr(e, 'code') else 'N/A'}")
-            logger.error(f"[STRIPE CHECKOUT] Error Message: {str(e)}")
-            logger.error(f"[STRIPE CHECKOUT] Full Error: {repr(e)}")
-            logger.error(f"[STRIPE CHECKOUT] Check STRIPE_SECRET_KEY in environment")
-            logger.error(f"[STRIPE CHECKOUT] API Key Mode: {'TEST' if 'test' in stripe.api_key else 'LIVE'}")
-            logger.error(f"[STRIPE CHECKOUT] API Key (first 10 chars): {stripe.api_key[:10]}...")
-            logger.error("=" * 80)
+            logger.error(
+                "[STRIPE CHECKOUT] Stripe AuthenticationError - check STRIPE_SECRET_KEY | Code: %s | Error: %s | KeyMode: %s",
+                getattr(e, "code", "N/A"), e, "TEST" if "test" in stripe.api_key else "LIVE",
+                extra=log_fields,
+            )
             error_detail = f"Stripe AuthenticationError: {str(e)}"
             if hasattr(e, 'code'):
                 error_detail = f"[{e.code}] {str(e)}"
@@ -125,34 +176,27 @@ class StripeService:
             
         except stripe.error.StripeError as e:
             # Other Stripe errors
-            logger.error("=" * 80)
-            logger.error("[STRIPE CHECKOUT] ❌ STRIPE ERROR")
-            logger.error(f"[STRIPE CHECKOUT] Error Type: {type(e).__name__}")
-            logger.error(f"[STRIPE CHECKOUT] Error Code: {e.code if hasattr(e, 'code') else 'N/A'}")
-            logger.error(f"[STRIPE CHECKOUT] Error Message: {str(e)}")
-            logger.error(f"[STRIPE CHECKOUT] Full Error: {repr(e)}")
-            logger.error(f"[STRIPE CHECKOUT] Price ID attempted: {price_id}")
-            logger.error(f"[STRIPE CHECKOUT] Mode attempted: {mode}")
-            logger.error("=" * 80)
+            logger.error(
+                "[STRIPE CHECKOUT] Stripe error | Type: %s | Code: %s | Error: %s | PriceID: %s | Mode: %s",
+                type(e).__name__, getattr(e, "code", "N/A"), e, price_id, mode,
+                extra=log_fields,
+            )
             error_detail = f"Stripe Error: {str(e)}"
             if hasattr(e, 'code'):
                 error_detail = f"[{e.code}] {str(e)}"
             raise HTTPException(500, error_detail)
             
-        except HTTPException:
-            # Re-raise HTTPException (already handled above)
+        except (HTTPException, StripeUnavailableError):
+            # Re-raise HTTPException (already handled above); 503 for an unreachable Stripe
             raise
             
         except Exception as e:
             # Unexpected errors
-            logger.error("=" * 80)
-            logger.error("[STRIPE CHECKOUT] ❌ UNEXPECTED ERROR")
-            logger.error(f"[STRIPE CHECKOUT] Error Type: {type(e).__name__}")
-            logger.error(f"[STRIPE CHECKOUT] Error Message: {str(e)}")
-            logger.error(f"[STRIPE CHECKOUT] Full Error: {repr(e)}")
-            logger.error(f"[STRIPE CHECKOUT] Price ID attempted: {price_id}")
-            logger.error(f"[STRIPE CHECKOUT] Mode attempted: {mode}")
-            logger.error("=" * 80)
+            logger.error(
+                "[STRIPE CHECKOUT] Unexpected error | Type: %s | Error: %s | PriceID: %s | Mode: %s",
+                type(e).__name__, e, price_id, mode,
+                extra=log_fields, exc_info=True,
+            )
             raise HTTPException(500, f"Unexpected error: {str(e)}")
 
     # VALIDATE WEBHOOK SIGNATURE
@@ -2,13 +2,27 @@
 Stripe Price Validator - Startup Validation
 Validates all subscription prices on application startup
 """
-import stripe
 import logging
 from app.core.config import settings
+from app.core.metrics import observe_stripe
 from app.core.subscription_prices import SUBSCRIPTION_PRICES, get_all_price_ids
+from app.services.stripe_gateway import StripeUnavailableError, stripe_gateway
+from app.utils.lazy_import import lazy_import
+
+stripe = lazy_import("stripe")
+if settings.STRIPE_API_BASE:
+    # Local stand-in (benchmarks/stripe_stub.py) instead of the real API
+    stripe.api_base = settings.STRIPE_API_BASE
 
 logger = logging.getLogger(__name__)
 
+# Set once validation passes; pre-forked workers inherit it from the parent
+_configuration_validated = False
+
+
+def is_stripe_configuration_validated() -> bool:
+    """True if validation already passed in this process (or the parent it forked from)."""
+    return _configuration_validated
 
 
 def validate_stripe_configuration():
@@ -24,6 +38,7 @@ def validate_stripe_configuration():
     Raises:
         RuntimeError: If any validation fails
     """
+    global _configuration_validated
     stripe.api_key = settings.STRIPE_SECRET_KEY
     
     logger.info("=" * 80)
@@ -60,7 +75,8 @@ def validate_stripe_configuration():
         
         try:
             # Retrieve price from Stripe
-            price = stripe.Price.retrieve(price_id)
+            with observe_stripe("price.retrieve"):
+                price = stripe.Price.retrieve(price_id)
             
             # Log price details
             logger.info(f"[STRIPE VALIDATOR]   price.id: {price.id}")
@@ -69,7 +85,7 @@ def validate_stripe_configuration():
             
             if hasattr(price, 'recurring') and price.recurring:
                 logger.info(f"[STRIPE VALIDATOR]   price.recurring.interval: {price.recurring.interval}")
-                logger.info(f"[STRIPE VALIDATOR]   price.recurring.interval_count: {price.recurring.get('interval_count', 1)}")
+                logger.info(f"[STRIPE VALIDATOR]   price.recurring.interval_count: {getattr(price.recurring, 'interval_count', 1)}")
             else:
                 logger.info(f"[STRIPE VALIDATOR]   price.recurring: None (NOT A RECURRING PRICE)")
             
@@ -116,9 +132,10 @@ def validate_stripe_configuration():
     logger.info("[STRIPE VALIDATOR] ✅ ALL SUBSCRIPTION PRICES ARE VALID")
     logger.info("[STRIPE VALIDATOR] ✅ Stripe configuration validation PASSED")
     logger.info("=" * 80)
+    _configuration_validated = True
 
 
-def preflight_check_price(price_id: str) -> dict:
+async def preflight_check_price(price_id: str) -> dict:
     """
     Pre-flight check: Retrieve price from Stripe before creating checkout session.
     
@@ -130,11 +147,12 @@ def preflight_check_price(price_id: str) -> dict:
         
     Raises:
         RuntimeError: If price cannot be retrieved or is invalid
+        StripeUnavailableError: If Stripe cannot be reached (caller answers 503)
     """
     logger.info(f"[STRIPE PREFLIGHT] Checking price: {price_id}")
     
     try:
-        price = stripe.Price.retrieve(price_id)
+        price = await stripe_gateway.retrieve_price(price_id)
         
         logger.info(f"[STRIPE PREFLIGHT]   ✅ Price found: {price.id}")
         logger.info(f"[STRIPE PREFLIGHT]   Type: {price.type}")
@@ -157,6 +175,8 @@ def preflight_check_price(price_id: str) -> dict:
         error_msg = f"Price {price_id} NOT FOUND in Stripe: {str(e)}"
         logger.error(f"[STRIPE PREFLIGHT]   ❌ {error_msg}")
         raise RuntimeError(error_msg)
+    except StripeUnavailableError:
+        raise
     except Exception as e:
         error_msg = f"Failed to retrieve price {price_id}: {str(e)}"
         logger.error(f"[STRIPE PREFLIGHT]   ❌ {error_msg}")
@@ -2,6 +2,8 @@ import asyncio
 import uuid
 import random
 
+from app.core.tracing import start_span
+
 
 class MockVideoProvider:
     """
@@ -15,7 +17,8 @@ class MockVideoProvider:
         Returns both video URL and thumbnail URL.
         """
         # Simulate processing time (3 seconds)
-        await asyncio.sleep(3)
+        with start_span("video_provider generate", kind="client", duration=duration):
+            await asyncio.sleep(3)
         
         video_id = str(uuid.uuid4())
         
@@ -1,4 +1,5 @@
 from app.core.database import get_connection
+from app.core.replica import ROUTE_REPLICA, replica_router
 from app.core.config import settings
 from fastapi import HTTPException
 import uuid
@@ -28,22 +29,22 @@ class VideoService:
             video_id = str(uuid.uuid4())
             created_at = datetime.utcnow()
             
-            conn = get_connection()
-            cur = conn.cursor()
+            with get_connection() as conn:
+                cur = conn.cursor()
             
-            cur.execute(
-                """
-                INSERT INTO videos (id, user_id, prompt, style, image_url, status, video_url, created_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING id, user_id, prompt, style, image_url, status, video_url, created_at
-                """,
-                (video_id, user_id, prompt, style, image_url, 'queued', None, created_at)
-            )
+                cur.execute(
+                    """
+                    INSERT INTO videos (id, user_id, prompt, style, image_url, status, video_url, created_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    RETURNING id, user_id, prompt, style, image_url, status, video_url, created_at
+                    """,
+                    (video_id, user_id, prompt, style, image_url, 'queued', None, created_at)
+                )
             
-            video_record = cur.fetchone()
-            conn.commit()
-            cur.close()
-            conn.close()
+                video_record = cur.fetchone()
+                conn.commit()
+                cur.close()
+            replica_router.pin_user(user_id)
             
             logger.info(f"Created video record {video_id} for user {user_id}")
             
@@ -65,34 +66,33 @@ class VideoService:
             Updated video record
         """
         try:
-            conn = get_connection()
-            cur = conn.cursor()
-            
-            if video_url:
-                cur.execute(
-                    """
-                    UPDATE videos 
-                    SET status = %s, video_url = %s
-                    WHERE id = %s
-                    RETURNING id, user_id, prompt, style, image_url, status, video_url, created_at
-                    """,
-                    (status, video_url, video_id)
-                )
-            else:
-                cur.execute(
-                    """
-                    UPDATE videos 
-                    SET status = %s
-                    WHERE id = %s
-                    RETURNING id, user_id, prompt, style, image_url, status, video_url, created_at
-                    """,
-                    (status, video_id)
-                )
-            
-            video_record = cur.fetchone()
-            conn.commit()
-            cur.close()
-            conn.close()
+            with get_connection() as conn:
+                cur = conn.cursor()
+            
+                if video_url:
+                    cur.execute(
+                        """
+                        UPDATE videos 
+                        SET status = %s, video_url = %s
+                        WHERE id = %s
+                        RETURNING id, user_id, prompt, style, image_url, status, video_url, created_at
+                        """,
+                        (status, video_url, video_id)
+                    )
+                else:
+                    cur.execute(
+                        """
+                        UPDATE videos 
+                        SET status = %s
+                        WHERE id = %s
+                        RETURNING id, user_id, prompt, style, image_url, status, video_url, created_at
+                        """,
+                        (status, video_id)
+                    )
+            
+                video_record = cur.fetchone()
+                conn.commit()
+                cur.close()
             
             logger.info(f"Updated video {video_id} status to {status}")
             
@@ -113,23 +113,22 @@ class VideoService:
             Video record
         """
         try:
-            conn = get_connection()
-            cur = conn.cursor()
-            
-            if user_id:
-                cur.execute(
-                    "SELECT * FROM videos WHERE id = %s AND user_id = %s",
-                    (video_id, user_id)
-                )
-            else:
-                cur.execute(
-                    "SELECT * FROM videos WHERE id = %s",
-                    (video_id,)
-                )
-            
-            video_record = cur.fetchone()
-            cur.close()
-            conn.close()
+            with get_connection() as conn:
+                cur = conn.cursor()
+            
+                if user_id:
+                    cur.execute(
+                        "SELECT * FROM videos WHERE id = %s AND user_id = %s",
+                        (video_id, user_id)
+                    )
+                else:
+                    cur.execute(
+                        "SELECT * FROM videos WHERE id = %s",
+                        (video_id,)
+                    )
+            
+                video_record = cur.fetchone()
+                cur.close()
             
             if not video_record:
                 raise HTTPException(status_code=404, detail="Video not found")
@@ -154,22 +153,21 @@ class VideoService:
             List of video records
         """
         try:
-            conn = get_connection()
-            cur = conn.cursor()
-            
-            cur.execute(
-                """
-                SELECT * FROM videos 
-                WHERE user_id = %s 
-                ORDER BY created_at DESC 
-                LIMIT %s OFFSET %s
-                """,
-                (user_id, limit, offset)
-            )
-            
-            videos = cur.fetchall()
-            cur.close()
-            conn.close()
+            with get_connection(ROUTE_REPLICA, user_id=user_id) as conn:
+                cur = conn.cursor()
+            
+                cur.execute(
+                    """
+                    SELECT * FROM videos 
+                    WHERE user_id = %s 
+                    ORDER BY created_at DESC 
+                    LIMIT %s OFFSET %s
+                    """,
+                    (user_id, limit, offset)
+                )
+            
+                videos = cur.fetchall()
+                cur.close()
             
             return [dict(video) for video in videos]
         except Exception as e:
@@ -191,17 +189,17 @@ class VideoService:
             # Verify ownership
             self.get_video(video_id, user_id)
             
-            conn = get_connection()
-            cur = conn.cursor()
+            with get_connection() as conn:
+                cur = conn.cursor()
             
-            cur.execute(
-                "DELETE FROM videos WHERE id = %s",
-                (video_id,)
-            )
+                cur.execute(
+                    "DELETE FROM videos WHERE id = %s",
+                    (video_id,)
+                )
             
-            conn.commit()
-            cur.close()
-            conn.close()
+                conn.commit()
+                cur.close()
+            replica_router.pin_user(user_id)
             
             logger.info(f"Deleted video {video_id}")
             
@@ -1,6 +1,10 @@
 """
 Credit Logger Utility - Canonical v1.0
 Explicit logging for all credit mutations
+
+Each line carries its fields as structured `extra` keys. Nothing is built
+when INFO is disabled, and the message is only interpolated by the logging
+listener thread (see app.utils.logger).
 """
 import logging
 from typing import Optional, Dict, Any
@@ -27,15 +31,24 @@ def log_credit_event(
         source: "subscription", "credit_pack", "video_gen", "manual"
         metadata: Additional context (session_id, price_id, etc.)
     """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
     user_display = user_id if user_id else "PENDING"
     meta_display = metadata if metadata else {}
     
     logger.info(
-        f"[CREDITS] {event_type} | "
-        f"User: {user_display} | "
-        f"Δ{delta:+d} → Balance: {new_balance} | "
-        f"Source: {source} | "
-        f"Meta: {meta_display}"
+        "[CREDITS] %s | User: %s | Δ%+d → Balance: %s | Source: %s | Meta: %s",
+        event_type, user_display, delta, new_balance, source, meta_display,
+        extra={
+            "category": "credits",
+            "event_type": event_type,
+            "user_id": user_id,
+            "delta": delta,
+            "new_balance": new_balance,
+            "source": source,
+            "meta": meta_display,
+        },
     )
 
 
@@ -58,16 +71,24 @@ def log_checkout_event(
         success: Whether creation succeeded
         error: Error message if failed
     """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
     status = "SUCCESS" if success else "FAILED"
     user_display = user_id if user_id else "UNAUTHENTICATED"
     
     logger.info(
-        f"[CHECKOUT] {status} | "
-        f"Type: {checkout_type} | "
-        f"User: {user_display} | "
-        f"PriceID: {price_id} | "
-        f"SessionID: {session_id} | "
-        f"Error: {error or 'None'}"
+        "[CHECKOUT] %s | Type: %s | User: %s | PriceID: %s | SessionID: %s | Error: %s",
+        status, checkout_type, user_display, price_id, session_id, error or "None",
+        extra={
+            "category": "checkout",
+            "checkout_type": checkout_type,
+            "user_id": user_id,
+            "price_id": price_id,
+            "session_id": session_id,
+            "success": success,
+            "error": error,
+        },
     )
 
 
@@ -92,17 +113,25 @@ def log_webhook_event(
         success: Whether processing succeeded
         error: Error message if failed
     """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
     status = "SUCCESS" if success else "FAILED"
     user_display = user_id if user_id else "NOT_FOUND"
     
     logger.info(
-        f"[WEBHOOK] {status} | "
-        f"Event: {event_type} | "
-        f"EventID: {stripe_event_id} | "
-        f"Mode: {mode or 'N/A'} | "
-        f"CustomerID: {customer_id} | "
-        f"UserID: {user_display} | "
-        f"Error: {error or 'None'}"
+        "[WEBHOOK] %s | Event: %s | EventID: %s | Mode: %s | CustomerID: %s | UserID: %s | Error: %s",
+        status, event_type, stripe_event_id, mode or "N/A", customer_id, user_display, error or "None",
+        extra={
+            "category": "webhook",
+            "event_type": event_type,
+            "stripe_event_id": stripe_event_id,
+            "mode": mode,
+            "customer_id": customer_id,
+            "user_id": user_id,
+            "success": success,
+            "error": error,
+        },
     )
 
 
@@ -125,13 +154,21 @@ def log_pending_subscription(
         credits: Credits to award
         user_id: User UUID (for CLAIMED action)
     """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
     user_display = user_id if user_id else "PENDING_REGISTRATION"
     
     logger.info(
-        f"[PENDING_SUB] {action} | "
-        f"CustomerID: {customer_id} | "
-        f"SubscriptionID: {subscription_id} | "
-        f"Plan: {plan_name} | "
-        f"Credits: {credits} | "
-        f"ClaimedBy: {user_display}"
+        "[PENDING_SUB] %s | CustomerID: %s | SubscriptionID: %s | Plan: %s | Credits: %s | ClaimedBy: %s",
+        action, customer_id, subscription_id, plan_name, credits, user_display,
+        extra={
+            "category": "pending_subscription",
+            "action": action,
+            "customer_id": customer_id,
+            "subscription_id": subscription_id,
+            "plan_name": plan_name,
+            "credits": credits,
+            "user_id": user_id,
+        },
     )
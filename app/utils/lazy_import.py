@@ -0,0 +1,87 @@
+"""
+Lazy Imports - Defer Heavy Modules Until First Use
+`stripe = lazy_import("stripe")` binds a stand-in that imports the real
+module the first time one of its attributes is read, so rarely used
+dependencies stay off the cold-start path.
+
+- Module-level assignments such as `stripe.api_key = ...` do not trigger
+  the import; they are queued and applied to the real module when it loads
+- The load goes through the regular import system under a lock, so
+  concurrent first use from threadpool workers is safe
+- Use lazy_import everywhere the module is needed: a plain `import stripe`
+  elsewhere would load it without the queued assignments
+- app.server's parent process resolves lazy modules before forking so
+  preloaded workers share them instead of each importing its own copy
+"""
+import importlib
+import sys
+import threading
+from types import ModuleType
+from typing import Dict, List
+
+
+class LazyModule:
+    __slots__ = ("_name", "_module", "_pending", "_lock")
+
+    def __init__(self, name: str):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+        object.__setattr__(self, "_pending", {})
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _load(self) -> ModuleType:
+        module = object.__getattribute__(self, "_module")
+        if module is not None:
+            return module
+        with object.__getattribute__(self, "_lock"):
+            module = object.__getattribute__(self, "_module")
+            if module is None:
+                module = importlib.import_module(object.__getattribute__(self, "_name"))
+                for attr, value in object.__getattribute__(self, "_pending").items():
+                    setattr(module, attr, value)
+                object.__getattribute__(self, "_pending").clear()
+                object.__setattr__(self, "_module", module)
+        return module
+
+    @property
+    def loaded(self) -> bool:
+        return object.__getattribute__(self, "_module") is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        with object.__getattribute__(self, "_lock"):
+            module = object.__getattribute__(self, "_module")
+            if module is None:
+                module = sys.modules.get(object.__getattribute__(self, "_name"))
+            if module is None:
+                object.__getattribute__(self, "_pending")[attr] = value
+                return
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<lazy module {object.__getattribute__(self, '_name')!r} ({state})>"
+
+
+_registry: Dict[str, LazyModule] = {}
+_registry_lock = threading.Lock()
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Shared stand-in for `name`; one per module name."""
+    with _registry_lock:
+        module = _registry.get(name)
+        if module is None:
+            module = _registry[name] = LazyModule(name)
+        return module
+
+
+def resolve_lazy_imports() -> List[str]:
+    """Import every module handed out by lazy_import (pre-fork warm-up)."""
+    with _registry_lock:
+        modules = list(_registry.items())
+    for _, module in modules:
+        module._load()
+    return [name for name, _ in modules]
@@ -1,36 +1,278 @@
+"""
+Logging Pipeline - Queue-Based, Structured, Sampled
+Request handlers never block on stdout: records are enqueued by a
+QueueHandler on the root logger, and a single listener thread formats them
+(JSON or text) and writes them out.
+
+- Formatting happens in the listener: %-style args and Lazy(...) fields in
+  `extra` are only evaluated for records that are actually written
+- Per-category sampling (LOG_SAMPLE_RATES) thins chatty DEBUG lines; INFO
+  and above (session created/reused and other lifecycle lines) are never
+  sampled
+- If the queue is full the record is dropped and counted, never waited on
+"""
+import atexit
+import json
 import logging
+import os
+import queue
+import random
 import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, Dict
+
 from app.core.config import settings
 
 # Configure logging format
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
+# Attributes every LogRecord has; anything else came from `extra`
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class Lazy:
+    """
+    Defer an expensive log field until the record is formatted:
+    logger.debug("...", extra={"payload": Lazy(lambda: json.dumps(payload))})
+    """
+    __slots__ = ("fn",)
+
+    def __init__(self, fn: Callable[[], object]):
+        self.fn = fn
+
+    def __str__(self):
+        return str(self.fn())
+
+    def __repr__(self):
+        return repr(self.fn())
+
+
+def _resolve(value):
+    if isinstance(value, Lazy):
+        try:
+            return value.fn()
+        except Exception as e:
+            return f"<lazy field failed: {e!r}>"
+    return value
+
+
+# =========================================================
+# FORMATTERS
+# =========================================================
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra` fields become top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = _resolve(value)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Classic text lines with `extra` fields appended as key=value."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = [
+            f"{key}={_resolve(value)}"
+            for key, value in record.__dict__.items()
+            if key not in _RESERVED_ATTRS and not key.startswith("_")
+        ]
+        return f"{line} | {' '.join(fields)}" if fields else line
+
+
+# =========================================================
+# SAMPLING
+# =========================================================
+
+def _parse_sample_rates(spec: str) -> Dict[str, float]:
+    """"stripe.checkout=0.1,credits=1" -> {"stripe.checkout": 0.1, "credits": 1.0}"""
+    rates = {}
+    for part in spec.split(","):
+        if "=" in part:
+            category, rate = part.split("=", 1)
+            rates[category.strip()] = max(0.0, min(1.0, float(rate)))
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a fraction of DEBUG records per category. The category is the
+    record's `category` extra, falling back to the logger name.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self.rates or record.levelno > logging.DEBUG:
+            return True
+        rate = self.rates.get(getattr(record, "category", None) or record.name)
+        return rate is None or random.random() < rate
+
+
+# =========================================================
+# QUEUE PIPELINE
+# =========================================================
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Enqueue the raw record without formatting it (the stdlib QueueHandler
+    formats in the caller's thread) and drop instead of blocking when full.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _ReportingListener(QueueListener):
+    """QueueListener that reports records dropped on a full queue."""
+
+    def __init__(self, log_queue, handler, producer: NonBlockingQueueHandler):
+        super().__init__(log_queue, handler, respect_handler_level=True)
+        self.producer = producer
+        self._reported = 0
+
+    def handle(self, record):
+        dropped = self.producer.dropped
+        if dropped != self._reported:
+            super().handle(logging.makeLogRecord({
+                "name": __name__,
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": f"[LOGGING] Queue full, dropped {dropped - self._reported} record(s)",
+            }))
+            self._reported = dropped
+        super().handle(record)
+
+    def enqueue_sentinel(self):
+        # Blocking put: the listener is still draining, so a full queue frees up
+        self.queue.put(self._sentinel)
+
+
+_listener: _ReportingListener | None = None
+_queue_handler: NonBlockingQueueHandler | None = None
+_lock = threading.Lock()
+_fork_hooks_installed = False
+
+
+def _build_output_handler() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stdout)
+    if settings.LOG_JSON:
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(TextFormatter(LOG_FORMAT, DATE_FORMAT))
+    return handler
+
+
+def _start_listener():
+    global _listener, _queue_handler
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    root = logging.getLogger()
+    if _queue_handler is not None:
+        root.removeHandler(_queue_handler)
+
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+    _queue_handler.addFilter(SamplingFilter(_parse_sample_rates(settings.LOG_SAMPLE_RATES)))
+    root.addHandler(_queue_handler)
+
+    _listener = _ReportingListener(log_queue, _build_output_handler(), _queue_handler)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def configure_logging():
+    """
+    Install the queue pipeline on the root logger (idempotent). Existing
+    handlers - basicConfig, uvicorn's own stdout handlers - are replaced so
+    every record goes through the queue exactly once.
+    """
+    global _fork_hooks_installed
+    with _lock:
+        if _listener is not None:
+            return
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.setLevel(logging.INFO if settings.ENVIRONMENT == "production" else logging.DEBUG)
+
+        for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+            uvicorn_logger = logging.getLogger(name)
+            uvicorn_logger.handlers.clear()
+            uvicorn_logger.propagate = True
+
+        _start_listener()
+
+        if _fork_hooks_installed:
+            return
+        _fork_hooks_installed = True
+
+    atexit.register(shutdown_logging)
+    # A listener thread doesn't survive fork(): flush it before forking and
+    # give each child (app.server workers) a fresh queue and thread
+    os.register_at_fork(
+        before=shutdown_logging,
+        after_in_parent=_restart_after_fork,
+        after_in_child=_restart_after_fork,
+    )
+
+
+def _restart_after_fork():
+    with _lock:
+        if _listener is None:
+            _start_listener()
+
 
 def setup_logger(name: str = __name__) -> logging.Logger:
     """Set up and configure logger"""
-    
+    configure_logging()
+
     # Create logger
     logger = logging.getLogger(name)
-    
+
     # Set level based on environment
     if settings.ENVIRONMENT == "production":
         logger.setLevel(logging.INFO)
     else:
         logger.setLevel(logging.DEBUG)
-    
-    # Create console handler
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.DEBUG)
-    
-    # Create formatter
-    formatter = logging.Formatter(LOG_FORMAT, DATE_FORMAT)
-    console_handler.setFormatter(formatter)
-    
-    # Add handler to logger
-    if not logger.handlers:
-        logger.addHandler(console_handler)
-    
+
     return logger
 
 
@@ -0,0 +1,4 @@
+"""
+Benchmark Harness - Local Postgres, Stripe Stand-In, Scenario Runner
+Run with `python -m benchmarks.run`; see benchmarks/run.py for options.
+"""
@@ -0,0 +1,71 @@
+"""
+Benchmark Compare - Diff Two Reports, Fail on Regressions
+Prints per-scenario throughput and latency changes between a baseline and a
+candidate report from benchmarks/run.py, and exits 1 when a scenario got
+slower than the allowed tolerance (for CI).
+
+Usage:
+    python -m benchmarks.compare base.json head.json --tolerance 0.15
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# (metric path, higher is better)
+METRICS = [
+    (("throughput_rps",), True),
+    (("latency_ms", "p50"), False),
+    (("latency_ms", "p95"), False),
+    (("latency_ms", "p99"), False),
+]
+
+
+def _get(result: dict, path):
+    for key in path:
+        result = result[key]
+    return result
+
+
+def compare(base: dict, head: dict, tolerance: float):
+    """Yields (scenario, metric, base, head, relative change, regressed)."""
+    for name, head_result in head["scenarios"].items():
+        base_result = base["scenarios"].get(name)
+        if base_result is None:
+            continue
+        for path, higher_is_better in METRICS:
+            before, after = _get(base_result, path), _get(head_result, path)
+            change = (after - before) / before if before else 0.0
+            worse = -change if higher_is_better else change
+            yield name, ".".join(path), before, after, change, worse > tolerance
+        if head_result["errors"] > base_result["errors"]:
+            yield name, "errors", base_result["errors"], head_result["errors"], 0.0, True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    base = json.loads(Path(args.base).read_text())
+    head = json.loads(Path(args.head).read_text())
+    if base.get("environment", {}).get("scale") != head.get("environment", {}).get("scale"):
+        print("warning: reports were produced at different scales", file=sys.stderr)
+
+    regressions = 0
+    print(f"{'scenario':24} {'metric':16} {'base':>12} {'head':>12} {'change':>9}")
+    for name, metric, before, after, change, regressed in compare(base, head, args.tolerance):
+        regressions += regressed
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:24} {metric:16} {before:>12} {after:>12} {change:>+8.1%}{flag}")
+
+    base_commit = (base.get("git") or {}).get("commit") or "?"
+    head_commit = (head.get("git") or {}).get("commit") or "?"
+    print(f"\n{base_commit[:12]} -> {head_commit[:12]} | Regressions: {regressions} | Tolerance: {args.tolerance:.0%}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""
+Credit Contention - Concurrent Debits/Grants and a Conservation Check
+Drives the real credit handlers in-process from a thread pool against a
+local Postgres, then checks every touched balance against a ledger of what
+the handlers reported applying. Any drift is a lost update (or a write the
+handler did not report).
+
+- Paths: consume_credits (usage), generate_video, POST /videos,
+  invoice.paid grant, credit-pack grant, Coinbase charge:confirmed (each
+  charge delivered twice, so duplicates must grant nothing)
+- Each path runs alone against one user (row contention) and spread over
+  --users users, then all paths mixed
+- Lock wait is sampled from pg_stat_activity (backends waiting on a lock
+  x sample interval), so it is attributable to the phase, not per statement
+- Handlers are called directly (no HTTP, no auth) with the app's own pool;
+  each call runs in its own event loop on a worker thread, so DB work
+  really overlaps the way it does across workers
+
+Usage:
+    python -m benchmarks.contention --output contention.json
+    python -m benchmarks.contention --paths consume_credits,invoice_paid --requests 1000 --concurrency 64
+    python -m benchmarks.contention --database-url postgresql://localhost/bench --no-seed
+
+Exits 1 when any phase does not conserve credits. Uses the benchmark
+database: balances of the target users are reset before every phase.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+import psycopg2
+
+from benchmarks.load import summarize
+from benchmarks.run import _git_revision, _start_pgserver, app_environment
+from benchmarks.scenarios import invoice_paid_event
+from benchmarks.seed import SCALES, load_seeded, seed_database
+
+logger = logging.getLogger("benchmarks")
+
+START_BALANCE = 1_000_000
+
+
+@dataclass
+class CreditPath:
+    name: str
+    # Runs one operation for a target user; returns the signed balance change
+    # the handler reports, 0 when it refused (not enough credits)
+    call: Callable[[dict, int], Awaitable[int]]
+
+
+class Refused(Exception):
+    pass
+
+
+def credit_paths() -> Dict[str, CreditPath]:
+    """Imported late: app settings are read from the environment main() sets up."""
+    from fastapi import HTTPException
+    from fastapi.concurrency import run_in_threadpool
+
+    from app.api.routes.usage import consume_credits
+    from app.api.routes.video import generate_video
+    from app.api.routes.videos import create_video
+    from app.api.routes.webhook_stripe import CREDIT_PACK_AMOUNTS, handle_credit_pack_purchase, handle_invoice_paid
+    from app.core.subscription_prices import SUBSCRIPTION_PRICES
+    from app.services.coinbase_service import coinbase_service, pack_credits
+
+    pack_price_id = next(iter(CREDIT_PACK_AMOUNTS))
+
+    async def consume(target: dict, i: int) -> int:
+        try:
+            result = await consume_credits(amount=2, user={"user_id": target["id"]})
+        except HTTPException as e:
+            raise Refused(e.detail)
+        return -result["used"]
+
+    async def generate(target: dict, i: int) -> int:
+        try:
+            result = await generate_video(
+                prompt=f"contention {i}", duration_seconds=10, current_user={"user_id": target["id"]},
+            )
+        except HTTPException as e:
+            raise Refused(e.detail)
+        return -result["credits_used"]
+
+    async def create(target: dict, i: int) -> int:
+        result = await create_video({"script": f"contention {i}", "language": "en"}, current_user={"user_id": target["id"]})
+        if isinstance(result, tuple):  # ({"error": ...}, 400)
+            raise Refused(result[0]["error"])
+        return -3
+
+    async def invoice_paid(target: dict, i: int) -> int:
+        await handle_invoice_paid(invoice_paid_event(target["customer_id"], target["price_id"], target["subscription_id"]))
+        return SUBSCRIPTION_PRICES[target["price_id"]]["monthly_credits"]
+
+    async def credit_pack(target: dict, i: int) -> int:
+        session = {
+            "id": f"cs_bench_{uuid.uuid4().hex[:16]}",
+            "mode": "payment",
+            "customer": target["customer_id"],
+            "client_reference_id": target["id"],
+            "line_items": {"data": [{"price": {"id": pack_price_id}}]},
+        }
+        await handle_credit_pack_purchase(session, f"evt_bench_{uuid.uuid4().hex}")
+        return CREDIT_PACK_AMOUNTS[pack_price_id]
+
+    run_token = uuid.uuid4().hex[:8]
+
+    async def coinbase_charge(target: dict, i: int) -> int:
+        # Every charge is delivered twice (i, i+1), often concurrently: one grant only
+        charge = {
+            "id": f"chg_{run_token}_{target['id'][:8]}_{i // 2}",
+            "metadata": {"user_id": target["id"], "pack_key": "30"},
+        }
+        result = await run_in_threadpool(coinbase_service.apply_confirmed_charge, charge)
+        return pack_credits("30")["total"] if result["outcome"] == "credited" else 0
+
+    return {
+        path.name: path
+        for path in (
+            CreditPath("consume_credits", consume),
+            CreditPath("generate_video", generate),
+            CreditPath("videos_create", create),
+            CreditPath("invoice_paid", invoice_paid),
+            CreditPath("credit_pack", credit_pack),
+            CreditPath("coinbase_charge", coinbase_charge),
+        )
+    }
+
+
+# =========================================================
+# LOCK-WAIT SAMPLER
+# =========================================================
+
+class LockWaitSampler:
+    """Integrates 'backends waiting on a lock' over time from pg_stat_activity."""
+
+    QUERY = """
+        SELECT count(*) FROM pg_stat_activity
+        WHERE datname = current_database() AND wait_event_type = 'Lock' AND pid <> pg_backend_pid()
+    """
+
+    def __init__(self, database_url: str, interval: float):
+        self.database_url = database_url
+        self.interval = interval
+        self.wait_seconds = 0.0
+        self.max_waiting = 0
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, name="lock-wait-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        conn = psycopg2.connect(self.database_url)
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                last = time.perf_counter()
+                while not self._stop.wait(self.interval):
+                    cur.execute(self.QUERY)
+                    waiting = cur.fetchone()[0]
+                    now = time.perf_counter()
+                    self.wait_seconds += waiting * (now - last)
+                    self.max_waiting = max(self.max_waiting, waiting)
+                    self.samples += 1
+                    last = now
+        finally:
+            conn.close()
+
+
+# =========================================================
+# PHASES
+# =========================================================
+
+def _set_balances(database_url: str, user_ids: List[str]):
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute("UPDATE users SET credits = %s WHERE id = ANY(%s::uuid[])", (START_BALANCE, user_ids))
+    finally:
+        conn.close()
+
+
+def _balances(database_url: str, user_ids: List[str]) -> Dict[str, int]:
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id::text, credits FROM users WHERE id = ANY(%s::uuid[])", (user_ids,))
+            return dict(cur.fetchall())
+    finally:
+        conn.close()
+
+
+def run_phase(database_url: str, paths: List[CreditPath], targets: List[dict], total: int,
+              concurrency: int, sample_interval: float) -> dict:
+    user_ids = [target["id"] for target in targets]
+    _set_balances(database_url, user_ids)
+
+    lock = threading.Lock()
+    ledger: Dict[str, int] = defaultdict(int)
+    outcomes: Dict[str, Counter] = {path.name: Counter() for path in paths}
+    latencies: List[float] = []
+
+    def operation(i: int):
+        path, target = paths[i % len(paths)], targets[i % len(targets)]
+        started = time.perf_counter()
+        try:
+            delta = asyncio.run(path.call(target, i))
+            outcome = "applied"
+        except Refused:
+            delta, outcome = 0, "refused"
+        except Exception as e:
+            delta, outcome = 0, f"error:{type(e).__name__}"
+        elapsed = time.perf_counter() - started
+        with lock:
+            ledger[target["id"]] += delta
+            outcomes[path.name][outcome] += 1
+            latencies.append(elapsed)
+
+    with LockWaitSampler(database_url, sample_interval) as sampler:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="contention") as pool:
+            list(pool.map(operation, range(total)))
+        elapsed = time.perf_counter() - started
+
+    actual = _balances(database_url, user_ids)
+    drift = {user_id: actual[user_id] - (START_BALANCE + ledger[user_id]) for user_id in user_ids}
+    drifted = {user_id: value for user_id, value in drift.items() if value}
+
+    result = summarize(latencies, Counter(), elapsed, concurrency)
+    result.pop("status_codes")
+    result["errors"] = sum(
+        count for counter in outcomes.values() for outcome, count in counter.items() if outcome.startswith("error:")
+    )
+    result["outcomes"] = {name: dict(sorted(counter.items())) for name, counter in outcomes.items()}
+    result["users"] = len(user_ids)
+    result["lock_wait"] = {
+        "total_s": round(sampler.wait_seconds, 3),
+        "per_op_ms": round(sampler.wait_seconds / total * 1000, 3) if total else 0.0,
+        "max_waiting_backends": sampler.max_waiting,
+        "samples": sampler.samples,
+    }
+    result["conservation"] = {
+        "conserved": not drifted,
+        "expected_delta": sum(ledger.values()),
+        "actual_delta": sum(actual.values()) - START_BALANCE * len(user_ids),
+        # > 0: debits lost (user kept credits), < 0: grants lost
+        "drift": sum(drifted.values()),
+        "users_drifted": len(drifted),
+    }
+    return result
+
+
+def run_suite(database_url: str, subscribed: List[dict], names: List[str], total: int,
+              concurrency: int, spread_users: int, sample_interval: float) -> dict:
+    paths = credit_paths()
+    phases = []
+    for name in names:
+        phases.append((f"{name}/same_user", [paths[name]], subscribed[:1]))
+        phases.append((f"{name}/spread", [paths[name]], subscribed[:spread_users]))
+    if len(names) > 1:
+        mixed = [paths[name] for name in names]
+        phases.append(("mixed/same_user", mixed, subscribed[:1]))
+        phases.append(("mixed/spread", mixed, subscribed[:spread_users]))
+
+    results = {}
+    for phase, phase_paths, targets in phases:
+        result = run_phase(database_url, phase_paths, targets, total, concurrency, sample_interval)
+        results[phase] = result
+        conservation = result["conservation"]
+        logger.info(
+            f"[CONTENTION] {phase} | {result['throughput_rps']} ops/s | p99 {result['latency_ms']['p99']}ms "
+            f"| Lock wait {result['lock_wait']['total_s']}s (max {result['lock_wait']['max_waiting_backends']} waiting) "
+            f"| Errors: {result['errors']} | {'conserved' if conservation['conserved'] else 'DRIFT ' + str(conservation['drift'])}"
+        )
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Credit path contention and conservation check")
+    parser.add_argument("--database-url", default=os.environ.get("BENCH_DATABASE_URL"))
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--no-seed", action="store_true", help="Reuse the data from the previous run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--paths", default="consume_credits,generate_video,videos_create,invoice_paid,credit_pack")
+    parser.add_argument("--requests", type=int, default=400, help="Operations per phase")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent operations (threads)")
+    parser.add_argument("--users", type=int, default=64, help="Users in the spread phases")
+    parser.add_argument("--pool-max", type=int, help="DB_POOL_MAX for the handlers (default: --concurrency)")
+    parser.add_argument("--sample-ms", type=float, default=5.0, help="pg_stat_activity sampling interval")
+    parser.add_argument("--output", default="contention.json")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    logging.getLogger("app").setLevel(logging.ERROR)  # slow-query warnings are expected here
+    names = [name.strip() for name in args.paths.split(",") if name.strip()]
+
+    workdir = Path(tempfile.mkdtemp(prefix="studio_genie_contention_"))
+    database_url = args.database_url or _start_pgserver(str(workdir / "pgdata"))
+    seeded = load_seeded(database_url) if args.no_seed else seed_database(database_url, args.scale, args.seed)
+    if len(seeded["subscribed"]) < args.users:
+        parser.error(f"Only {len(seeded['subscribed'])} subscribed users seeded; lower --users or raise --scale")
+
+    os.environ.update(app_environment(database_url, ""))
+    os.environ["DB_POOL_MAX"] = str(args.pool_max or args.concurrency)
+    unknown = set(names) - set(credit_paths())
+    if unknown:
+        parser.error(f"Unknown path(s): {', '.join(sorted(unknown))}")
+
+    results = run_suite(
+        database_url, seeded["subscribed"], names, args.requests, args.concurrency, args.users, args.sample_ms / 1000,
+    )
+
+    report = {
+        "schema_version": 1,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": _git_revision(),
+        "environment": {
+            "scale": args.scale,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "pool_max": int(os.environ["DB_POOL_MAX"]),
+            "start_balance": START_BALANCE,
+        },
+        "seed": seeded["counts"],
+        "scenarios": results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+    drifted = [phase for phase, result in results.items() if not result["conservation"]["conserved"]]
+    logger.info(f"[CONTENTION] Report written | Path: {args.output} | Drifted phases: {len(drifted)}")
+    raise SystemExit(1 if drifted else 0)
+
+
+if __name__ == "__main__":
+    main()
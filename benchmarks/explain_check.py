@@ -0,0 +1,169 @@
+"""
+Explain Check - Hot Queries Stay on Their Indexes
+Seeds the benchmark database (benchmarks/schema.sql carries the indexes of
+migrations/009_hot_path_indexes.sql) and EXPLAINs every hot query with real
+parameters:
+
+- each query must read its table with an Index Scan or Index Only Scan on
+  the expected index (a Bitmap Heap Scan or Seq Scan fails)
+- the video listings must come back in index order, without a Sort node
+- the plans are written to the report, so a regression shows what changed
+
+Usage:
+    python -m benchmarks.explain_check --scale medium --output explain.json
+    python -m benchmarks.explain_check --database-url postgresql://localhost/bench --no-seed
+
+Exits 1 when any query misses its index.
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+import psycopg2
+
+from benchmarks.run import _git_revision, _start_pgserver
+from benchmarks.seed import SCALES, load_seeded, seed_database
+
+logger = logging.getLogger("benchmarks")
+
+INDEX_SCANS = ("Index Scan", "Index Only Scan")
+
+# name → (SQL as the app sends it, parameter keys, table, allowed scans, expected index, sort allowed)
+HOT_QUERIES = {
+    # app/core/subscription.py
+    "subscription_gate": (
+        "SELECT subscription_status FROM users WHERE id = %s",
+        ("user_id",), "users", ("Index Only Scan",), "idx_users_id_subscription", False,
+    ),
+    # app/api/routes/usage.py
+    "usage_balance": (
+        "SELECT plan, credits, subscription_status, renewal_date FROM users WHERE id = %s",
+        ("user_id",), "users", INDEX_SCANS, None, False,
+    ),
+    # app/api/routes/videos.py, app/api/routes/video.py
+    "credit_check": (
+        "SELECT credits FROM users WHERE id = %s",
+        ("user_id",), "users", INDEX_SCANS, None, False,
+    ),
+    # app/api/routes/users.py
+    "users_me": (
+        "SELECT id, email, credits, subscription_status, subscription_plan FROM users WHERE id = %s",
+        ("user_id",), "users", INDEX_SCANS, None, False,
+    ),
+    # app/api/routes/auth.py (login)
+    "login": (
+        "SELECT id, email, password_hash FROM users WHERE lower(email) = lower(%s) ORDER BY email = %s DESC LIMIT 1",
+        ("email", "email"), "users", INDEX_SCANS, "idx_users_email_lower", True,
+    ),
+    # app/api/routes/auth.py (register: an account in any case already exists)
+    "register_email": (
+        "SELECT 1 FROM users WHERE lower(email) = %s",
+        ("email_lower",), "users", INDEX_SCANS, "idx_users_email_lower", False,
+    ),
+    # app/api/routes/webhook_stripe.py (invoice.paid, customer.subscription.deleted)
+    "webhook_customer": (
+        "SELECT id, email FROM users WHERE stripe_customer_id = %s",
+        ("customer_id",), "users", INDEX_SCANS, None, False,
+    ),
+    # app/api/routes/me.py (dashboard)
+    "dashboard_videos": (
+        "SELECT id, prompt, status, video_url, created_at FROM videos WHERE user_id = %s "
+        "ORDER BY created_at DESC LIMIT 100",
+        ("video_user_id",), "videos", INDEX_SCANS, "idx_videos_user_created", False,
+    ),
+    # app/services/video_service.py (listing, later pages)
+    "video_listing": (
+        "SELECT * FROM videos WHERE user_id = %s ORDER BY created_at DESC LIMIT %s OFFSET %s",
+        ("video_user_id", "page_size", "offset"), "videos", INDEX_SCANS, "idx_videos_user_created", False,
+    ),
+}
+
+
+def _nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _nodes(child)
+
+
+def check_query(cur, name: str, params: dict) -> dict:
+    sql, keys, table, scans, index, sort_allowed = HOT_QUERIES[name]
+    cur.execute("EXPLAIN (FORMAT JSON) " + sql, tuple(params[key] for key in keys))
+    plan = cur.fetchone()[0][0]["Plan"]
+    nodes = list(_nodes(plan))
+
+    problems = []
+    reads = [node for node in nodes if node.get("Relation Name") == table]
+    if not reads:
+        problems.append(f"{table} is not read")
+    for node in reads:
+        if node["Node Type"] not in scans:
+            problems.append(f"{node['Node Type']} on {table}")
+        elif index and node.get("Index Name") != index:
+            problems.append(f"uses {node.get('Index Name')}, expected {index}")
+    if not sort_allowed and any(node["Node Type"] == "Sort" for node in nodes):
+        problems.append("sorts instead of reading the index in order")
+
+    return {
+        "scans": [f"{node['Node Type']} using {node.get('Index Name')}" for node in reads],
+        "total_cost": plan["Total Cost"],
+        "problems": problems,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="EXPLAIN check for the hot queries")
+    parser.add_argument("--database-url", default=os.environ.get("BENCH_DATABASE_URL"))
+    parser.add_argument("--scale", choices=sorted(SCALES), default="medium")
+    parser.add_argument("--no-seed", action="store_true", help="Reuse the data from the previous run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="explain.json")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    workdir = Path(tempfile.mkdtemp(prefix="studio_genie_explain_"))
+    database_url = args.database_url or _start_pgserver(str(workdir / "pgdata"))
+    seeded = load_seeded(database_url) if args.no_seed else seed_database(database_url, args.scale, args.seed)
+
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cur:
+            # The user with the most videos: the listing most tempted to sort
+            cur.execute("SELECT user_id::text FROM videos GROUP BY user_id ORDER BY count(*) DESC LIMIT 1")
+            video_user_id = cur.fetchone()[0]
+            user = seeded["users"][len(seeded["users"]) // 2]
+            params = {
+                "user_id": user["id"],
+                "email": user["email"].upper(),
+                "email_lower": user["email"].lower(),
+                "customer_id": seeded["subscribed"][0]["customer_id"],
+                "video_user_id": video_user_id,
+                "page_size": 20,
+                "offset": 40,
+            }
+            results = {name: check_query(cur, name, params) for name in HOT_QUERIES}
+    finally:
+        conn.close()
+
+    failures = [f"{name}: {problem}" for name, result in results.items() for problem in result["problems"]]
+    for name, result in results.items():
+        logger.info(f"[EXPLAIN] {name} | {', '.join(result['scans'])} | {'OK' if not result['problems'] else 'FAIL'}")
+
+    report = {
+        "schema_version": 1,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": _git_revision(),
+        "environment": {"scale": None if args.no_seed else args.scale, "counts": seeded["counts"]},
+        "queries": results,
+        "failures": failures,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+    logger.info(f"[EXPLAIN] Report written | Path: {args.output} | Failures: {len(failures)}")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Load Generator - Closed-Loop Concurrency & Latency Summary
+`concurrency` virtual clients each send their next request as soon as the
+previous one answers, until `total` requests have been sent. Latency is
+measured client-side, from send to fully read response.
+"""
+import asyncio
+import time
+from collections import Counter
+from typing import Awaitable, Callable, List
+
+import httpx
+
+RequestFn = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list (q in 0..100)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(q / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float], statuses: Counter, elapsed: float, concurrency: int) -> dict:
+    ordered = sorted(latencies)
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+    return {
+        "requests": len(ordered),
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(ordered, 50) * 1000, 2),
+            "p95": round(percentile(ordered, 95) * 1000, 2),
+            "p99": round(percentile(ordered, 99) * 1000, 2),
+            "max": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+            "mean": round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0.0,
+        },
+        "status_codes": dict(sorted(statuses.items())),
+        "errors": errors,
+    }
+
+
+async def closed_loop(client: httpx.AsyncClient, request: RequestFn, total: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    counter = iter(range(total))
+
+    async def virtual_client():
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                response = await request(client, i)
+                await response.aread()
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError as e:
+                statuses[f"error:{type(e).__name__}"] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_client() for _ in range(concurrency)))
+    return summarize(latencies, statuses, time.perf_counter() - started, concurrency)
@@ -0,0 +1,202 @@
+"""
+Online Migration Check - Writer Stalls During Schema Changes
+Applies the same change (new index + backfill of a new column) to a hot
+table twice through app.core.migrate while writer threads keep updating
+random rows, and reports the writers' latency during each run:
+
+- blocking: one transactional migration (plain CREATE INDEX, one UPDATE of
+  every row): writers wait for the index build and for the UPDATE's row locks
+- online: "-- migrate:no-transaction" with CREATE INDEX CONCURRENTLY and a
+  "-- migrate:backfill" in committed batches
+
+Usage:
+    python -m benchmarks.online_migration --rows 1000000 --writers 8 --output online_migration.json
+    python -m benchmarks.online_migration --database-url postgresql://localhost/bench --rows 200000
+
+Works in its own schema (online_migration_bench), dropped afterwards.
+Exits 1 when the online run stalls writers longer than the blocking run.
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import psycopg2
+
+from benchmarks.load import percentile
+from benchmarks.run import _git_revision, _start_pgserver, app_environment
+
+logger = logging.getLogger("benchmarks")
+
+SCHEMA = "online_migration_bench"
+
+SETUP_SQL = f"""
+DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+CREATE SCHEMA {SCHEMA};
+CREATE TABLE {SCHEMA}.events (
+    id BIGSERIAL PRIMARY KEY,
+    account INTEGER NOT NULL,
+    amount INTEGER NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+INSERT INTO {SCHEMA}.events (account, amount)
+SELECT (random() * 100000)::int, (random() * 1000)::int FROM generate_series(1, %(rows)s);
+ALTER TABLE {SCHEMA}.events ADD COLUMN amount_cents BIGINT;
+"""
+
+MIGRATIONS = {
+    "blocking": """
+-- Add the account index and backfill amount_cents in one transaction
+CREATE INDEX IF NOT EXISTS idx_events_account ON events(account, created_at);
+
+UPDATE events SET amount_cents = amount * 100 WHERE amount_cents IS NULL;
+""",
+    "online": """-- migrate:no-transaction
+-- Same change without blocking writers
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_events_account ON events(account, created_at);
+
+-- migrate:backfill batch_size={batch_size} sleep_ms={sleep_ms}
+UPDATE events SET amount_cents = amount * 100
+WHERE id IN (SELECT id FROM events WHERE amount_cents IS NULL LIMIT {{batch_size}});
+""",
+}
+
+
+def _connect(database_url: str):
+    return psycopg2.connect(database_url, options=f"-c search_path={SCHEMA}")
+
+
+class Writers:
+    """Threads updating random rows (autocommit), recording each statement's latency."""
+
+    def __init__(self, database_url: str, count: int, rows: int):
+        self.database_url = database_url
+        self.count = count
+        self.rows = rows
+        self.latencies = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def __enter__(self):
+        for i in range(self.count):
+            thread = threading.Thread(target=self._run, args=(i,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self, seed: int):
+        import random
+        rng = random.Random(seed)
+        conn = _connect(self.database_url)
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            while not self._stop.is_set():
+                started = time.perf_counter()
+                cur.execute("UPDATE events SET amount = amount + 1 WHERE id = %s", (rng.randint(1, self.rows),))
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self.latencies.append(elapsed)
+                time.sleep(0.002)
+        conn.close()
+
+
+def run_phase(database_url: str, name: str, args) -> dict:
+    from app.core.migrate import MigrationRunner, load_migrations
+
+    conn = psycopg2.connect(database_url)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(SETUP_SQL, {"rows": args.rows})
+        cur.execute("ANALYZE " + SCHEMA + ".events")
+    conn.close()
+
+    directory = Path(tempfile.mkdtemp(prefix="online_migration_"))
+    (directory / f"001_{name}.sql").write_text(
+        MIGRATIONS[name].format(batch_size=args.batch_size, sleep_ms=args.sleep_ms)
+    )
+
+    runner_conn = _connect(database_url)
+    runner = MigrationRunner(runner_conn, load_migrations(directory))
+    runner.ensure_version_table()
+    with Writers(database_url, args.writers, args.rows) as writers:
+        time.sleep(1.0)  # steady state first
+        baseline = len(writers.latencies)
+        started = time.perf_counter()
+        runner.acquire_lock(10)
+        runner.up()
+        runner.release_lock()
+        duration = time.perf_counter() - started
+    # After the writers stopped: writes blocked until the migration finished count too
+    during = sorted(writers.latencies[baseline:])
+    runner_conn.close()
+
+    return {
+        "migration_s": round(duration, 2),
+        "writes": len(during),
+        "writes_per_s": round(len(during) / duration, 1),
+        "write_latency_ms": {
+            "p50": round(percentile(during, 50) * 1000, 2),
+            "p99": round(percentile(during, 99) * 1000, 2),
+            "max": round(during[-1] * 1000, 2) if during else 0.0,
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Writer stalls during blocking vs online migrations")
+    parser.add_argument("--database-url", default=os.environ.get("BENCH_DATABASE_URL"))
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--sleep-ms", type=int, default=20)
+    parser.add_argument("--output", default="online_migration.json")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    workdir = Path(tempfile.mkdtemp(prefix="studio_genie_online_"))
+    database_url = args.database_url or _start_pgserver(str(workdir / "pgdata"))
+    os.environ.update(app_environment(database_url, "http://127.0.0.1:9"))
+
+    phases = {}
+    for name in ("blocking", "online"):
+        phases[name] = run_phase(database_url, name, args)
+        logger.info(
+            f"[ONLINE MIGRATION] {name} | {phases[name]['migration_s']}s | "
+            f"Writes/s: {phases[name]['writes_per_s']} | Write max: {phases[name]['write_latency_ms']['max']}ms"
+        )
+
+    conn = psycopg2.connect(database_url)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    conn.close()
+
+    failures = []
+    if phases["online"]["write_latency_ms"]["max"] > phases["blocking"]["write_latency_ms"]["max"]:
+        failures.append("online migration stalled writers longer than the blocking one")
+    report = {
+        "schema_version": 1,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": _git_revision(),
+        "environment": {"rows": args.rows, "writers": args.writers, "batch_size": args.batch_size, "sleep_ms": args.sleep_ms},
+        "phases": phases,
+        "failures": failures,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+    logger.info(f"[ONLINE MIGRATION] Report written | Path: {args.output} | Failures: {len(failures)}")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
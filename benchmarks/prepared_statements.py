@@ -0,0 +1,149 @@
+"""
+Prepared Statement Benchmark - Parse/Plan Once vs Every Call
+Runs each app.core.prepared hot statement through the app's own pooled
+connection and InstrumentedCursor, once as plain SQL (DB_PREPARED_STATEMENTS
+off) and once by name (on), against a seeded local Postgres:
+
+- latency per call, measured at the client, rotating through seeded users
+- server planning time from EXPLAIN (ANALYZE, SUMMARY): the plain statement
+  is planned every call; the prepared one, once Postgres has switched to a
+  generic plan, not at all
+- the rows each variant returns are compared; credit UPDATEs run in
+  transactions of 100 calls that are rolled back
+
+Usage:
+    python -m benchmarks.prepared_statements --iterations 20000 --output prepared.json
+    python -m benchmarks.prepared_statements --database-url postgresql://localhost/bench --no-seed
+
+Exits 1 when a prepared statement returns different rows than its SQL.
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.load import percentile
+from benchmarks.run import _git_revision, _start_pgserver, app_environment
+from benchmarks.seed import SCALES, load_seeded, seed_database
+
+logger = logging.getLogger("benchmarks")
+
+
+def _params(statement, user_id: str) -> tuple:
+    # Every hot statement takes the user ID last; leading parameters are amounts
+    return (0,) * (statement.arity - 1) + (user_id,)
+
+
+def _run(cur, statement, user_ids: list, iterations: int) -> list:
+    latencies = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        cur.execute_prepared(statement, _params(statement, user_ids[i % len(user_ids)]))
+        if cur.description:
+            cur.fetchall()
+        latencies.append(time.perf_counter() - started)
+        if i % 100 == 99:
+            cur.connection.rollback()  # keep UPDATEs from piling row versions into one transaction
+    cur.connection.rollback()
+    return latencies
+
+
+def _planning_ms(cur, query: str, params: tuple, runs: int = 20) -> float:
+    timings = []
+    for _ in range(runs):
+        cur.execute("EXPLAIN (ANALYZE, SUMMARY, FORMAT JSON) " + query, params)
+        timings.append(cur.fetchone()["QUERY PLAN"][0]["Planning Time"])
+    return round(sorted(timings)[len(timings) // 2], 4)
+
+
+def _summary(latencies: list) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "mean_us": round(sum(ordered) / len(ordered) * 1e6, 1),
+        "p50_us": round(percentile(ordered, 50) * 1e6, 1),
+        "p99_us": round(percentile(ordered, 99) * 1e6, 1),
+    }
+
+
+def bench_statement(statement, user_ids: list, iterations: int) -> dict:
+    from app.core.config import settings
+    from app.core.database import get_connection
+
+    result = {}
+    rows = {}
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        for mode, enabled in (("plain", False), ("prepared", True)):
+            settings.DB_PREPARED_STATEMENTS = enabled
+            _run(cur, statement, user_ids, min(iterations, 200))  # warm caches (and the generic plan)
+            result[mode] = _summary(_run(cur, statement, user_ids, iterations))
+            cur.execute_prepared(statement, _params(statement, user_ids[0]))
+            rows[mode] = cur.fetchall() if cur.description else cur.rowcount
+        conn.rollback()
+
+        params = _params(statement, user_ids[0])
+        result["plain"]["planning_ms"] = _planning_ms(cur, statement.sql, params)
+        result["prepared"]["planning_ms"] = _planning_ms(cur, statement.execute_sql, params)
+        conn.rollback()
+        cur.close()
+    finally:
+        conn.close()
+
+    result["speedup"] = round(result["plain"]["mean_us"] / result["prepared"]["mean_us"], 2)
+    result["same_rows"] = rows["plain"] == rows["prepared"]
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prepared vs plain hot statements")
+    parser.add_argument("--database-url", default=os.environ.get("BENCH_DATABASE_URL"))
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--no-seed", action="store_true", help="Reuse the data from the previous run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=5000, help="Calls per statement and mode")
+    parser.add_argument("--output", default="prepared.json")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    workdir = Path(tempfile.mkdtemp(prefix="studio_genie_prepared_"))
+    database_url = args.database_url or _start_pgserver(str(workdir / "pgdata"))
+    seeded = load_seeded(database_url) if args.no_seed else seed_database(database_url, args.scale, args.seed)
+    os.environ.update(app_environment(database_url, "http://127.0.0.1:9"))
+    logging.getLogger("app").setLevel(logging.WARNING)
+
+    from app.core.database import close_pool
+    from app.core.prepared import prepared_statements
+
+    user_ids = [user["id"] for user in seeded["users"]]
+    statements = {}
+    for name in prepared_statements.names:
+        statements[name] = bench_statement(prepared_statements.get(name), user_ids, args.iterations)
+        result = statements[name]
+        logger.info(
+            f"[PREPARED] {name} | Plain: {result['plain']['mean_us']}us "
+            f"(plan {result['plain']['planning_ms']}ms) | Prepared: {result['prepared']['mean_us']}us "
+            f"(plan {result['prepared']['planning_ms']}ms) | x{result['speedup']}"
+        )
+    close_pool()
+
+    failures = [f"{name}: rows differ" for name, result in statements.items() if not result["same_rows"]]
+    report = {
+        "schema_version": 1,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": _git_revision(),
+        "environment": {"scale": None if args.no_seed else args.scale, "iterations": args.iterations},
+        "statements": statements,
+        "failures": failures,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+    logger.info(f"[PREPARED] Report written | Path: {args.output} | Failures: {len(failures)}")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
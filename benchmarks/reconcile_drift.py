@@ -0,0 +1,230 @@
+"""
+Reconciliation Drift Check - Known Drift In, Same Drift Out
+Loads --customers subscribed users into a fresh benchmark schema, gives
+the Stripe stand-in a matching subscription and paid invoice for each,
+injects a known number of drifts of every kind, then runs
+app.billing.reconcile against it.
+
+- Drift kinds: canceled at Stripe (deactivate), inactive locally (activate),
+  plan changed at Stripe (activate), invoice never granted (grant_credits),
+  invoice for an unknown customer (orphan_invoice)
+- Not drift: users whose subscription Stripe's listing doesn't return, as
+  when they subscribe (or a trial converts) while the job streams. They
+  must get no plan entry and still be active after --apply
+- Passes when the plan finds exactly the injected drift, --apply repairs it
+  (credits added, statuses fixed), and a second dry run finds nothing but
+  the report-only orphans
+- Reports Stripe streaming time and staged rows; --trace-memory adds the
+  reconciler's peak Python memory (tracemalloc), which stays flat as
+  --customers grows (~5 MB at 2k and 20k customers)
+
+Usage:
+    python -m benchmarks.reconcile_drift --customers 100000 --output reconcile.json
+    python -m benchmarks.reconcile_drift --customers 20000 --trace-memory
+    python -m benchmarks.reconcile_drift --database-url postgresql://localhost/bench --drift 50
+
+Exits 1 when the plan or the repair does not match the injected drift.
+Recreates the benchmark schema: never point it at real data.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import psycopg2
+
+from benchmarks.run import _git_revision, _start_pgserver, app_environment
+from benchmarks.seed import PASSWORD_HASH, SCHEMA_PATH, _copy
+from benchmarks.stripe_stub import StripeStub
+
+logger = logging.getLogger("benchmarks")
+
+# Per-customer kinds, in customer index order (orphan invoices get customers of their own)
+CUSTOMER_KINDS = ("canceled_at_stripe", "inactive_locally", "plan_changed", "missing_grant", "subscribed_mid_run")
+
+
+def build_world(database_url: str, customers: int, drift: int, seed: int) -> dict:
+    """Load users + grant ledger; return the Stripe fixture and the expected plan."""
+    from app.core.subscription_prices import SUBSCRIPTION_PRICES
+
+    rng = random.Random(seed)
+    price_ids = list(SUBSCRIPTION_PRICES)
+    now = int(time.time())
+    if customers < drift * len(CUSTOMER_KINDS):
+        raise SystemExit(f"--customers must be at least {len(CUSTOMER_KINDS)} x --drift ({drift * len(CUSTOMER_KINDS)})")
+
+    # Disjoint drifted customers: [0, drift) canceled, [drift, 2d) inactive locally,
+    # [2d, 3d) plan changed, [3d, 4d) missing grant, [4d, 5d) subscribed mid-run
+    users, ledger, subscriptions, invoices = [], [], [], []
+    for i in range(customers):
+        customer_id, subscription_id = f"cus_rec_{i:07d}", f"sub_rec_{i:07d}"
+        price_id = price_ids[i % len(price_ids)]
+        kind = CUSTOMER_KINDS[i // drift] if i < drift * len(CUSTOMER_KINDS) else None
+        user_id = f"00000000-0000-4000-8000-{i:012d}"
+        created = now - rng.randint(35, 400) * 86400
+
+        users.append((
+            user_id, f"rec-user-{i}@example.com", PASSWORD_HASH, 100, SUBSCRIPTION_PRICES[price_id]["plan_name"],
+            "inactive" if kind == "inactive_locally" else "active", SUBSCRIPTION_PRICES[price_id]["plan_name"],
+            customer_id, subscription_id,
+        ))
+        if kind == "canceled_at_stripe":
+            subscriptions.append((subscription_id, customer_id, "canceled", price_id, created))
+        elif kind != "subscribed_mid_run":  # created after the listing passed: not returned
+            stripe_price = price_ids[(i + 1) % len(price_ids)] if kind == "plan_changed" else price_id
+            subscriptions.append((subscription_id, customer_id, "active", stripe_price, created))
+        invoice_id = f"in_rec_{i:07d}"
+        invoices.append((
+            invoice_id, customer_id, subscription_id, price_id,
+            SUBSCRIPTION_PRICES[price_id]["price_usd"] * 100, now - rng.randint(1, 25) * 86400 - 3600,
+        ))
+        if kind != "missing_grant":
+            ledger.append((invoice_id, user_id, SUBSCRIPTION_PRICES[price_id]["monthly_credits"]))
+
+    for i in range(drift):
+        price_id = price_ids[i % len(price_ids)]
+        invoices.append((
+            f"in_orphan_{i:07d}", f"cus_orphan_{i:07d}", f"sub_orphan_{i:07d}", price_id,
+            SUBSCRIPTION_PRICES[price_id]["price_usd"] * 100, now - rng.randint(1, 25) * 86400 - 3600,
+        ))
+
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(SCHEMA_PATH.read_text())
+            _copy(cur, "users", (
+                "id", "email", "password_hash", "credits", "plan", "subscription_status",
+                "subscription_plan", "stripe_customer_id", "stripe_subscription_id",
+            ), users)
+            _copy(cur, "stripe_invoice_grants", ("invoice_id", "user_id", "credits"), ledger)
+            # Ledger predates the invoice window, as after a month of webhooks
+            cur.execute("UPDATE stripe_invoice_grants SET granted_at = NOW() - INTERVAL '30 days'")
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("VACUUM ANALYZE")
+    finally:
+        conn.close()
+
+    missing = range(drift * 3, drift * 4)
+    return {
+        "subscribed_mid_run": [f"cus_rec_{i:07d}" for i in range(drift * 4, drift * 5)],
+        "subscriptions": sorted(subscriptions, key=lambda row: -row[-1]),
+        "invoices": sorted(invoices, key=lambda row: -row[-1]),
+        "expected": {
+            "activate": drift * 2,
+            "deactivate": drift,
+            "grant_credits": drift,
+            "orphan_invoice": drift,
+        },
+        "expected_credits": sum(SUBSCRIPTION_PRICES[price_ids[i % len(price_ids)]]["monthly_credits"] for i in missing),
+    }
+
+
+def _plan_counts(report: dict) -> dict:
+    return {action: summary["count"] for action, summary in (report.get("plan") or {}).items()}
+
+
+def _inactive_customers(database_url: str, customer_ids: list) -> list:
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT stripe_customer_id FROM users WHERE stripe_customer_id = ANY(%s) AND subscription_status <> 'active'",
+                (customer_ids,),
+            )
+            return [row[0] for row in cur.fetchall()]
+    finally:
+        conn.close()
+
+
+def _total_credits(database_url: str) -> int:
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COALESCE(SUM(credits), 0) FROM users")
+            return int(cur.fetchone()[0])
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stripe reconciliation drift check")
+    parser.add_argument("--database-url", default=os.environ.get("BENCH_DATABASE_URL"))
+    parser.add_argument("--customers", type=int, default=20_000)
+    parser.add_argument("--drift", type=int, default=25, help="Injected drifts of each kind")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--stripe-latency-ms", type=float, default=0.0, help="Per Stripe page")
+    parser.add_argument("--trace-memory", action="store_true", help="Report peak Python memory (runs ~5x slower)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="reconcile.json")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    workdir = Path(tempfile.mkdtemp(prefix="studio_genie_reconcile_"))
+    database_url = args.database_url or _start_pgserver(str(workdir / "pgdata"))
+
+    stub = StripeStub(latency_ms=args.stripe_latency_ms).start()
+    os.environ.update(app_environment(database_url, stub.url))
+    logging.getLogger("app").setLevel(logging.WARNING)  # per-batch progress lines
+    logging.getLogger("stripe").setLevel(logging.WARNING)  # one line per page request
+    from app.billing.reconcile import reconcile
+
+    started = time.perf_counter()
+    world = build_world(database_url, args.customers, args.drift, args.seed)
+    stub.load_billing(world["subscriptions"], world["invoices"])
+    logger.info(f"[RECONCILE] World loaded | Customers: {args.customers} | {time.perf_counter() - started:.1f}s")
+
+    runs, failures = {}, []
+    credits_before = _total_credits(database_url)
+    for name, apply in (("plan", False), ("apply", True), ("after", False)):
+        if args.trace_memory:
+            tracemalloc.start()
+        report = reconcile(str(workdir / f"{name}.jsonl"), apply=apply, batch_size=args.batch_size)
+        if args.trace_memory:
+            report["peak_python_mb"] = round(tracemalloc.get_traced_memory()[1] / 1e6, 1)
+            tracemalloc.stop()
+        report["stripe_calls"] = dict(sorted(stub.reset_counts().items()))
+        runs[name] = report
+        logger.info(
+            f"[RECONCILE] {name} | Plan: {_plan_counts(report)} | {report['duration_s']}s"
+            f" | Peak: {report.get('peak_python_mb', '-')} MB"
+        )
+
+    if _plan_counts(runs["plan"]) != world["expected"]:
+        failures.append(f"plan {_plan_counts(runs['plan'])} != injected {world['expected']}")
+    credits_added = _total_credits(database_url) - credits_before
+    if credits_added != world["expected_credits"]:
+        failures.append(f"apply added {credits_added} credits, expected {world['expected_credits']}")
+    wrongly_deactivated = _inactive_customers(database_url, world["subscribed_mid_run"])
+    if wrongly_deactivated:
+        failures.append(f"apply deactivated {len(wrongly_deactivated)} users subscribed mid-run")
+    leftover = {action: count for action, count in _plan_counts(runs["after"]).items() if action != "orphan_invoice"}
+    if leftover:
+        failures.append(f"drift left after apply: {leftover}")
+
+    stub.stop()
+    report = {
+        "schema_version": 1,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": _git_revision(),
+        "environment": {"customers": args.customers, "drift": args.drift, "batch_size": args.batch_size},
+        "expected": world["expected"],
+        "credits_added": credits_added,
+        "runs": runs,
+        "failures": failures,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2, default=str) + "\n")
+    logger.info(f"[RECONCILE] Report written | Path: {args.output} | Failures: {len(failures)}")
+    for failure in failures:
+        logger.error(f"[RECONCILE] {failure}")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
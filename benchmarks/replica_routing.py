@@ -0,0 +1,247 @@
+"""
+Replica Routing Check - Read-Your-Writes and Lag Fallback
+Drives app.core.database.get_connection(ROUTE_REPLICA, user_id=...) against a
+primary and a streaming standby of it, checking every read for where it ran
+(pg_is_in_recovery()) and what it saw:
+
+- steady: balance reads for random users; all should land on the replica
+- read_your_writes: grant a credit on the primary, pin the user the way the
+  write paths do, read the balance straight back; a stale read fails the run.
+  The same with pinning disabled shows what the pin prevents
+- lag: replay is paused on the standby while a writer keeps committing on
+  the primary; reads must move to the primary once lag passes
+  DB_REPLICA_MAX_LAG_SECONDS, and no read may see data older than that
+  (plus one lag-check interval). Replay is then resumed and reads must
+  return to the replica
+
+Usage:
+    python -m benchmarks.replica_routing --database-url postgresql://localhost/bench \\
+        --read-url postgresql://localhost:5433/bench --output replica.json
+
+Needs superuser on the standby (pg_wal_replay_pause). Exits 1 on a stale
+read-your-writes read, a read staler than the bound, or a stuck fallback.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+import psycopg2
+
+from benchmarks.run import _git_revision, app_environment
+from benchmarks.seed import SCALES, load_seeded, seed_database
+
+logger = logging.getLogger("benchmarks")
+
+
+def _read_balance(user_id: str):
+    """(ran on the replica?, credits) through the app's routing."""
+    from app.core.database import get_connection
+    from app.core.replica import ROUTE_REPLICA
+
+    conn = get_connection(ROUTE_REPLICA, user_id=user_id)
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_is_in_recovery() AS replica, credits FROM users WHERE id = %s", (user_id,))
+        row = cur.fetchone()
+        cur.close()
+    finally:
+        conn.close()
+    return row["replica"], row["credits"]
+
+
+def _grant(conn, user_id: str) -> int:
+    with conn.cursor() as cur:
+        cur.execute("UPDATE users SET credits = credits + 1 WHERE id = %s RETURNING credits", (user_id,))
+        credits = cur.fetchone()[0]
+    conn.commit()
+    return credits
+
+
+def _wait_for_catch_up(primary, read_url: str, timeout: float = 30.0):
+    with primary.cursor() as cur:
+        cur.execute("SELECT pg_current_wal_lsn()")
+        target = cur.fetchone()[0]
+    standby = psycopg2.connect(read_url)
+    standby.autocommit = True
+    deadline = time.monotonic() + timeout
+    try:
+        with standby.cursor() as cur:
+            while True:
+                cur.execute("SELECT pg_last_wal_replay_lsn() >= %s::pg_lsn", (target,))
+                if cur.fetchone()[0]:
+                    return
+                if time.monotonic() > deadline:
+                    raise SystemExit("Standby did not catch up with the primary")
+                time.sleep(0.1)
+    finally:
+        standby.close()
+
+
+def phase_steady(user_ids: list, reads: int) -> dict:
+    where = Counter()
+    for _ in range(reads):
+        replica, _credits = _read_balance(random.choice(user_ids))
+        where["replica" if replica else "primary"] += 1
+    return dict(where)
+
+
+def phase_read_your_writes(primary, user_ids: list, writes: int, pin: bool) -> dict:
+    from app.core.replica import replica_router
+
+    where, stale = Counter(), 0
+    for user_id in random.sample(user_ids, writes):
+        granted = _grant(primary, user_id)
+        if pin:
+            replica_router.pin_user(user_id)
+        replica, credits = _read_balance(user_id)
+        where["replica" if replica else "primary"] += 1
+        stale += credits < granted
+    return {"reads": dict(where), "stale": stale}
+
+
+def phase_lag(primary, read_url: str, marker: str, reader_ids: list, seconds: float, max_lag: float) -> dict:
+    """Pause replay; a writer bumps `marker` every 20ms while reads record route and staleness."""
+    committed = []  # (credits, commit time)
+    stop = threading.Event()
+
+    def writer():
+        while not stop.is_set():
+            committed.append((_grant(primary, marker), time.time()))
+            time.sleep(0.02)
+
+    standby = psycopg2.connect(read_url)
+    standby.autocommit = True
+    thread = threading.Thread(target=writer, daemon=True)
+    timeline = []
+    try:
+        with standby.cursor() as cur:
+            cur.execute("SELECT pg_wal_replay_pause()")
+        thread.start()
+        started = time.time()
+        while time.time() - started < seconds:
+            replica, seen = _read_balance(marker)
+            now = time.time()
+            # Age of the oldest commit this read missed (0 = current)
+            missed = next((at for credits, at in list(committed) if credits > seen), None)
+            timeline.append((round(now - started, 3), replica, round(now - missed, 3) if missed else 0.0))
+            _read_balance(random.choice(reader_ids))
+            time.sleep(0.01)
+        with standby.cursor() as cur:
+            cur.execute("SELECT pg_wal_replay_resume()")
+        stop.set()
+        thread.join()
+
+        resumed_at = time.time()
+        back_on_replica = None
+        while time.time() - resumed_at < 10.0:
+            replica, _seen = _read_balance(random.choice(reader_ids))
+            if replica:
+                back_on_replica = round(time.time() - resumed_at, 3)
+                break
+            time.sleep(0.05)
+    finally:
+        with standby.cursor() as cur:
+            cur.execute("SELECT pg_wal_replay_resume()")
+        standby.close()
+        stop.set()
+
+    on_replica = [t for t, replica, _age in timeline if replica]
+    on_primary = [t for t, replica, _age in timeline if not replica]
+    return {
+        "reads": len(timeline),
+        "on_replica": len(on_replica),
+        "on_primary": len(on_primary),
+        "first_primary_read_s": on_primary[0] if on_primary else None,
+        "max_staleness_s": max((age for _t, replica, age in timeline if replica), default=0.0),
+        "back_on_replica_after_s": back_on_replica,
+        "max_lag_s": max_lag,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replica routing: read-your-writes and lag fallback")
+    parser.add_argument("--database-url", default=os.environ.get("BENCH_DATABASE_URL"))
+    parser.add_argument("--read-url", required=True, help="Streaming standby of --database-url")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--no-seed", action="store_true", help="Reuse the data from the previous run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--writes", type=int, default=300)
+    parser.add_argument("--max-lag", type=float, default=1.0, help="DB_REPLICA_MAX_LAG_SECONDS")
+    parser.add_argument("--check-interval", type=float, default=0.25, help="DB_REPLICA_LAG_CHECK_SECONDS")
+    parser.add_argument("--pause-seconds", type=float, default=4.0, help="How long replay stays paused")
+    parser.add_argument("--output", default="replica.json")
+    args = parser.parse_args(argv)
+    if not args.database_url:
+        parser.error("--database-url (the primary) is required")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    seeded = load_seeded(args.database_url) if args.no_seed else seed_database(args.database_url, args.scale, args.seed)
+    os.environ.update(app_environment(args.database_url, "http://127.0.0.1:9"))
+    os.environ.update({
+        "DATABASE_READ_URL": args.read_url,
+        "DB_REPLICA_MAX_LAG_SECONDS": str(args.max_lag),
+        "DB_REPLICA_LAG_CHECK_SECONDS": str(args.check_interval),
+    })
+    logging.getLogger("app").setLevel(logging.WARNING)
+
+    from app.core.config import settings
+    from app.core.database import close_pool
+
+    primary = psycopg2.connect(args.database_url)
+    _wait_for_catch_up(primary, args.read_url)
+    user_ids = [user["id"] for user in seeded["users"]]
+    marker, readers = user_ids[0], user_ids[1:]
+
+    phases = {"steady": phase_steady(readers, args.reads)}
+    phases["read_your_writes"] = phase_read_your_writes(primary, readers, args.writes, pin=True)
+    pin_seconds, settings.DB_READ_YOUR_WRITES_SECONDS = settings.DB_READ_YOUR_WRITES_SECONDS, 0.0
+    phases["read_your_writes_unpinned"] = phase_read_your_writes(primary, readers, args.writes, pin=True)
+    settings.DB_READ_YOUR_WRITES_SECONDS = pin_seconds
+    _wait_for_catch_up(primary, args.read_url)
+    phases["lag"] = phase_lag(primary, args.read_url, marker, readers, args.pause_seconds, args.max_lag)
+    primary.close()
+    close_pool()
+
+    for name, result in phases.items():
+        logger.info(f"[REPLICA] {name} | {result}")
+
+    lag = phases["lag"]
+    bound = args.max_lag + args.check_interval
+    failures = []
+    if phases["steady"].get("replica", 0) < args.reads * 0.9:
+        failures.append("steady reads did not use the replica")
+    if phases["read_your_writes"]["stale"]:
+        failures.append(f"read-your-writes: {phases['read_your_writes']['stale']} stale reads")
+    if lag["max_staleness_s"] > bound:
+        failures.append(f"a replica read was {lag['max_staleness_s']}s stale (bound {bound}s)")
+    if not lag["on_primary"]:
+        failures.append("reads never fell back to the primary while replay was paused")
+    if lag["back_on_replica_after_s"] is None:
+        failures.append("reads did not return to the replica after replay resumed")
+
+    report = {
+        "schema_version": 1,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": _git_revision(),
+        "environment": {
+            "scale": None if args.no_seed else args.scale, "max_lag_s": args.max_lag,
+            "check_interval_s": args.check_interval, "pause_s": args.pause_seconds,
+        },
+        "phases": phases,
+        "failures": failures,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+    logger.info(f"[REPLICA] Report written | Path: {args.output} | Failures: {len(failures)}")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Benchmark Runner - Seed, Start, Load, Report
+Seeds a local Postgres, starts the Stripe stand-in and the app
+(python -m app.server) against both, runs the scenarios and writes a JSON
+report that CI can diff between commits (see benchmarks/compare.py).
+
+Usage:
+    python -m benchmarks.run --database-url postgresql://localhost/bench --output bench.json
+    python -m benchmarks.run --scale medium --scenarios balance_reads,consume_burst
+    python -m benchmarks.run --app-url http://127.0.0.1:8000 --no-seed   # app already running
+
+Without --database-url (or BENCH_DATABASE_URL) a throwaway Postgres is
+started with the optional `pgserver` package. The database is DROPPED and
+recreated: never point this at real data.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from benchmarks.load import closed_loop
+from benchmarks.scenarios import SCENARIOS, BenchContext
+from benchmarks.seed import SCALES, load_seeded, seed_database
+from benchmarks.stripe_stub import StripeStub
+
+logger = logging.getLogger("benchmarks")
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SECRET_KEY = "benchmark-secret-key"
+WEBHOOK_SECRET = "whsec_benchmark"
+STRIPE_KEY = "sk_live_benchmark_stand_in"  # startup validation insists on a live key
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _git_revision() -> dict:
+    def git(*args):
+        result = subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True)
+        return result.stdout.strip() if result.returncode == 0 else None
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(status) if status is not None else None}
+
+
+def _start_pgserver(data_dir: str) -> str:
+    try:
+        import pgserver
+    except ImportError:
+        raise SystemExit("No --database-url given and the optional `pgserver` package is not installed")
+    server = pgserver.get_server(data_dir, cleanup_mode="stop")
+    return server.get_uri()
+
+
+# =========================================================
+# APP UNDER TEST
+# =========================================================
+
+def app_environment(database_url: str, stripe_url: str) -> dict:
+    """Settings for the app under test (also used by in-process suites such as benchmarks/contention.py)."""
+    return {
+        "DATABASE_URL": database_url,
+        "DATABASE_SSLMODE": "disable",
+        "SECRET_KEY": SECRET_KEY,
+        "STRIPE_SECRET_KEY": STRIPE_KEY,
+        "STRIPE_PUBLISHABLE_KEY": "pk_live_benchmark",
+        "STRIPE_WEBHOOK_SECRET": WEBHOOK_SECRET,
+        "STRIPE_API_BASE": stripe_url,
+        "STRIPE_STARTER_PRICE_ID": "price_bench_starter",
+        "STRIPE_CREATOR_PRICE_ID": "price_bench_creator",
+        "STRIPE_PRO_PRICE_ID": "price_bench_pro",
+        "ENVIRONMENT": "production",
+    }
+
+
+def start_app(database_url: str, stripe_url: str, port: int, workers: int, log_path: Path) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        **app_environment(database_url, stripe_url),
+        "HOST": "127.0.0.1",
+        "PORT": str(port),
+        "WEB_CONCURRENCY": str(workers),
+        "PROMETHEUS_MULTIPROC_DIR": tempfile.mkdtemp(prefix="bench_metrics_"),
+        "PYTHONPATH": str(REPO_ROOT),
+    }
+    log_file = open(log_path, "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", "app.server"], cwd=REPO_ROOT, env=env, stdout=log_file, stderr=subprocess.STDOUT,
+    )
+
+
+def wait_until_ready(base_url: str, process: Optional[subprocess.Popen], timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise SystemExit(f"App exited during startup (code {process.returncode}); see the app log")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"App not ready after {timeout:.0f}s")
+
+
+def stop_app(process: subprocess.Popen):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+# =========================================================
+# RUN
+# =========================================================
+
+async def run_scenarios(base_url: str, context: BenchContext, stub: Optional[StripeStub], names, load: float) -> dict:
+    results = {}
+    limits = httpx.Limits(max_connections=max(SCENARIOS[name].concurrency for name in names))
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        for name in names:
+            scenario = SCENARIOS[name]
+            request = scenario.build(context)
+            total = max(1, int(scenario.requests * load))
+            # Warm-up: connections, pools, caches - not measured
+            await closed_loop(client, request, min(total, scenario.concurrency * 2), scenario.concurrency)
+            if stub is not None:
+                stub.reset_counts()
+
+            result = await closed_loop(client, request, total, scenario.concurrency)
+            if stub is not None:
+                result["stripe_calls"] = dict(sorted(stub.reset_counts().items()))
+            results[name] = result
+            logger.info(
+                f"[BENCH] {name} | {result['throughput_rps']} req/s | p50 {result['latency_ms']['p50']}ms "
+                f"| p95 {result['latency_ms']['p95']}ms | p99 {result['latency_ms']['p99']}ms | Errors: {result['errors']}"
+            )
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Studio Génie end-to-end benchmark")
+    parser.add_argument("--database-url", default=os.environ.get("BENCH_DATABASE_URL"))
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset")
+    parser.add_argument("--load", type=float, default=1.0, help="Multiplier for each scenario's request count")
+    parser.add_argument("--workers", type=int, default=2, help="WEB_CONCURRENCY for the app")
+    parser.add_argument("--stripe-latency-ms", type=float, default=80.0, help="Simulated Stripe round trip")
+    parser.add_argument("--app-url", help="Benchmark an already running app instead of starting one")
+    parser.add_argument("--no-seed", action="store_true", help="Reuse the data from the previous run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench.json")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    workdir = Path(tempfile.mkdtemp(prefix="studio_genie_bench_"))
+    database_url = args.database_url or _start_pgserver(str(workdir / "pgdata"))
+
+    if args.no_seed:
+        seeded = load_seeded(database_url)
+    else:
+        seeded = seed_database(database_url, args.scale, args.seed)
+
+    stub = StripeStub(latency_ms=args.stripe_latency_ms).start() if not args.app_url else None
+    process = None
+    base_url = args.app_url
+    if base_url is None:
+        port = _free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        log_path = workdir / "app.log"
+        logger.info(f"[BENCH] Starting app | URL: {base_url} | Workers: {args.workers} | Log: {log_path}")
+        process = start_app(database_url, stub.url, port, args.workers, log_path)
+    try:
+        wait_until_ready(base_url, process)
+        context = BenchContext(seeded, SECRET_KEY, WEBHOOK_SECRET)
+        results = asyncio.run(run_scenarios(base_url, context, stub, names, args.load))
+    finally:
+        if process is not None:
+            stop_app(process)
+        if stub is not None:
+            stub.stop()
+
+    report = {
+        "schema_version": 1,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": _git_revision(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "workers": args.workers if process is not None else None,
+            "scale": args.scale,
+            "load": args.load,
+            "stripe_latency_ms": args.stripe_latency_ms if stub is not None else None,
+        },
+        "seed": seeded["counts"],
+        "scenarios": results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+    logger.info(f"[BENCH] Report written | Path: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark Scenarios - What a Run Exercises
+Each scenario builds the request for the i-th call from the seeded data;
+`requests` and `concurrency` are the defaults at --load 1.0.
+
+- balance_reads: GET /users/me across many users
+- dashboard_loads: GET /me/dashboard (user row + latest 100 videos)
+- consume_burst: POST /videos on a few hot users (row contention)
+- checkout_creation: POST /api/stripe/checkout/subscription (Stripe stand-in)
+- checkout_double_click: the same, every request sent twice by one user
+- renewal_webhook_storm: signed invoice.paid events for subscribed users
+- unhandled_webhook_storm: signed events of types no handler is registered
+  for (invoice.created & co., several per renewal at Stripe)
+"""
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Dict
+
+import httpx
+from jose import jwt
+
+from app.core.subscription_prices import SUBSCRIPTION_PRICES
+from benchmarks.load import RequestFn
+from benchmarks.stripe_stub import sign_payload
+
+
+@dataclass
+class Scenario:
+    name: str
+    requests: int
+    concurrency: int
+    build: Callable[["BenchContext"], RequestFn]
+
+
+class BenchContext:
+    """Seeded data plus the secrets the app under test was started with."""
+
+    def __init__(self, seeded: dict, secret_key: str, webhook_secret: str, algorithm: str = "HS256", seed: int = 7):
+        self.users = seeded["users"]
+        self.subscribed = seeded["subscribed"]
+        self.hot_users = [user for user in self.users if user["hot"]]
+        self.webhook_secret = webhook_secret
+        self.rng = random.Random(seed)
+        self._secret_key = secret_key
+        self._algorithm = algorithm
+        self._expires = int(time.time()) + 24 * 3600
+        self._tokens: Dict[str, str] = {}
+
+    def auth(self, user: dict) -> dict:
+        token = self._tokens.get(user["id"])
+        if token is None:
+            claims = {"user_id": user["id"], "email": user["email"], "exp": self._expires}
+            token = self._tokens[user["id"]] = jwt.encode(claims, self._secret_key, algorithm=self._algorithm)
+        return {"Authorization": f"Bearer {token}"}
+
+
+def _balance_reads(ctx: BenchContext) -> RequestFn:
+    def request(client: httpx.AsyncClient, i: int):
+        return client.get("/users/me", headers=ctx.auth(ctx.rng.choice(ctx.users)))
+    return request
+
+
+def _dashboard_loads(ctx: BenchContext) -> RequestFn:
+    def request(client: httpx.AsyncClient, i: int):
+        return client.get("/me/dashboard", headers=ctx.auth(ctx.rng.choice(ctx.users)))
+    return request
+
+
+def _consume_burst(ctx: BenchContext) -> RequestFn:
+    def request(client: httpx.AsyncClient, i: int):
+        user = ctx.hot_users[i % len(ctx.hot_users)]
+        return client.post("/videos", headers=ctx.auth(user), json={"script": f"bench video {i}", "language": "en"})
+    return request
+
+
+def _checkout_creation(ctx: BenchContext) -> RequestFn:
+    price_ids = list(SUBSCRIPTION_PRICES)
+
+    def request(client: httpx.AsyncClient, i: int):
+        return client.post(
+            "/api/stripe/checkout/subscription",
+            headers=ctx.auth(ctx.rng.choice(ctx.users)),
+            json={"priceId": price_ids[i % len(price_ids)]},
+        )
+    return request
+
+
+def _checkout_double_click(ctx: BenchContext) -> RequestFn:
+    price_ids = list(SUBSCRIPTION_PRICES)
+
+    def request(client: httpx.AsyncClient, i: int):
+        # Calls 2k and 2k+1 are one user's click and its repeat
+        pair = i // 2
+        return client.post(
+            "/api/stripe/checkout/subscription",
+            headers=ctx.auth(ctx.users[pair % len(ctx.users)]),
+            json={"priceId": price_ids[pair % len(price_ids)]},
+        )
+    return request
+
+
+def invoice_paid_event(customer_id: str, price_id: str, subscription_id: str) -> dict:
+    invoice_id = f"in_bench_{uuid.uuid4().hex[:16]}"
+    return {
+        "id": f"evt_bench_{uuid.uuid4().hex}",
+        "object": "event",
+        "created": int(time.time()),
+        "data": {"object": {
+            "id": invoice_id,
+            "object": "invoice",
+            "customer": customer_id,
+            "subscription": subscription_id,
+            "billing_reason": "subscription_cycle",
+            "lines": {"object": "list", "data": [{"id": f"il_{invoice_id}", "price": {"id": price_id}}]},
+        }},
+        "type": "invoice.paid",  # last, as Stripe serializes it
+    }
+
+
+def _renewal_webhook_storm(ctx: BenchContext) -> RequestFn:
+    def request(client: httpx.AsyncClient, i: int):
+        target = ctx.rng.choice(ctx.subscribed)
+        event = invoice_paid_event(target["customer_id"], target["price_id"], target["subscription_id"])
+        payload = json.dumps(event).encode()
+        return client.post(
+            "/webhook/stripe",
+            content=payload,
+            headers={"Content-Type": "application/json", "Stripe-Signature": sign_payload(payload, ctx.webhook_secret)},
+        )
+    return request
+
+
+# Types Stripe sends around a renewal that no handler is registered for
+UNHANDLED_EVENT_TYPES = ("invoice.created", "invoice.finalized", "invoice.payment_succeeded", "customer.updated")
+
+
+def _unhandled_webhook_storm(ctx: BenchContext) -> RequestFn:
+    def request(client: httpx.AsyncClient, i: int):
+        target = ctx.rng.choice(ctx.subscribed)
+        event = invoice_paid_event(target["customer_id"], target["price_id"], target["subscription_id"])
+        event["type"] = UNHANDLED_EVENT_TYPES[i % len(UNHANDLED_EVENT_TYPES)]
+        payload = json.dumps(event).encode()
+        return client.post(
+            "/webhook/stripe",
+            content=payload,
+            headers={"Content-Type": "application/json", "Stripe-Signature": sign_payload(payload, ctx.webhook_secret)},
+        )
+    return request
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    scenario.name: scenario
+    for scenario in (
+        Scenario("balance_reads", requests=5000, concurrency=64, build=_balance_reads),
+        Scenario("dashboard_loads", requests=2000, concurrency=32, build=_dashboard_loads),
+        Scenario("consume_burst", requests=2000, concurrency=64, build=_consume_burst),
+        Scenario("checkout_creation", requests=500, concurrency=16, build=_checkout_creation),
+        Scenario("checkout_double_click", requests=500, concurrency=16, build=_checkout_double_click),
+        Scenario("renewal_webhook_storm", requests=2000, concurrency=64, build=_renewal_webhook_storm),
+        Scenario("unhandled_webhook_storm", requests=4000, concurrency=64, build=_unhandled_webhook_storm),
+    )
+}
@@ -0,0 +1,103 @@
+-- Benchmark schema: the tables and columns the application code actually
+-- queries (database_schema.sql predates the credits/subscription columns).
+-- Recreated from scratch on every seeded run - never point this at real data.
+
+DROP TABLE IF EXISTS stripe_webhook_events, stripe_invoice_grants, checkout_sessions, payments, videos, pending_subscriptions, users CASCADE;
+
+CREATE TABLE users (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    email TEXT UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    credits INTEGER DEFAULT 0,
+    plan TEXT,
+    has_trial_used BOOLEAN DEFAULT FALSE,
+    subscription_status TEXT DEFAULT 'inactive',
+    subscription_plan TEXT,
+    renewal_date TIMESTAMP,
+    stripe_customer_id VARCHAR(255) UNIQUE,
+    stripe_subscription_id VARCHAR(255),
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX idx_users_subscription_status ON users(subscription_status);
+-- migrations/009_hot_path_indexes.sql
+CREATE INDEX idx_users_id_subscription ON users(id) INCLUDE (subscription_status, subscription_plan, plan, renewal_date);
+CREATE INDEX idx_users_email_lower ON users(lower(email));
+
+CREATE TABLE videos (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    prompt TEXT NOT NULL,
+    style TEXT NOT NULL,
+    image_url TEXT,
+    status TEXT DEFAULT 'queued' CHECK (status IN ('queued', 'processing', 'done', 'failed')),
+    video_url TEXT,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX idx_videos_user_created ON videos(user_id, created_at DESC, id);
+CREATE INDEX idx_videos_status ON videos(status);
+CREATE INDEX idx_videos_created_at ON videos(created_at DESC);
+
+CREATE TABLE pending_subscriptions (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    stripe_customer_id VARCHAR(255) UNIQUE NOT NULL,
+    stripe_subscription_id VARCHAR(255),
+    plan_name VARCHAR(100) NOT NULL,
+    price_id VARCHAR(255) NOT NULL,
+    credits_to_award INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW(),
+    claimed_at TIMESTAMP NULL,
+    claimed_by_user_id UUID NULL REFERENCES users(id) ON DELETE SET NULL
+);
+
+CREATE INDEX idx_pending_subs_claimed ON pending_subscriptions(claimed_at) WHERE claimed_at IS NULL;
+
+CREATE TABLE payments (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    provider TEXT NOT NULL,
+    amount INTEGER,
+    bonus INTEGER,
+    total_credits INTEGER,
+    status TEXT,
+    external_id VARCHAR(255),
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX idx_payments_user_id ON payments(user_id);
+CREATE UNIQUE INDEX idx_payments_provider_external_id ON payments(provider, external_id);
+
+CREATE TABLE checkout_sessions (
+    session_id VARCHAR(255) PRIMARY KEY,
+    user_id UUID NULL,
+    price_id VARCHAR(255) NOT NULL,
+    mode VARCHAR(20) NOT NULL,
+    url TEXT,
+    success_url TEXT,
+    expires_at TIMESTAMP,
+    completed_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX idx_checkout_sessions_created_at ON checkout_sessions(created_at);
+CREATE INDEX idx_checkout_sessions_open
+    ON checkout_sessions(user_id, price_id, mode, created_at DESC) WHERE completed_at IS NULL;
+
+CREATE TABLE stripe_invoice_grants (
+    invoice_id VARCHAR(255) PRIMARY KEY,
+    user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    credits INTEGER NOT NULL,
+    source VARCHAR(20) NOT NULL DEFAULT 'webhook',
+    granted_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX idx_stripe_invoice_grants_granted_at ON stripe_invoice_grants(granted_at);
+
+CREATE TABLE stripe_webhook_events (
+    event_id VARCHAR(255) PRIMARY KEY,
+    event_type VARCHAR(100) NOT NULL,
+    processed_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX idx_stripe_webhook_events_processed_at ON stripe_webhook_events(processed_at);
@@ -0,0 +1,162 @@
+"""
+Benchmark Seeding - Realistic Volumes in a Local Postgres
+Recreates benchmarks/schema.sql and bulk-loads users, videos and pending
+subscriptions with COPY. The data is deterministic for a given scale and
+seed, so runs on different commits measure the same database.
+
+- A share of users have an active subscription (stripe_customer_id set),
+  the targets of renewal webhooks
+- Video counts per user are skewed: most users have a few, some have
+  hundreds (the dashboard reads the latest 100)
+- A small set of "hot" users with a large balance absorbs consume bursts
+"""
+import csv
+import io
+import logging
+import random
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict
+
+import psycopg2
+
+from app.core.subscription_prices import SUBSCRIPTION_PRICES
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_PATH = Path(__file__).with_name("schema.sql")
+
+SCALES: Dict[str, dict] = {
+    "small": {"users": 1_000, "avg_videos": 10, "pending_subscriptions": 200, "hot_users": 16},
+    "medium": {"users": 20_000, "avg_videos": 20, "pending_subscriptions": 2_000, "hot_users": 32},
+    "large": {"users": 200_000, "avg_videos": 25, "pending_subscriptions": 20_000, "hot_users": 64},
+}
+
+SUBSCRIBED_SHARE = 0.4
+HOT_USER_CREDITS = 10_000_000
+# bcrypt("benchmark") for every seeded user
+PASSWORD_HASH = "$2b$12$VHQJUtJZAZGvnsuT0bS9V.5MMl8PT.11xCH4dy9NnMBWW7VXQ52/i"
+
+_PRICE_IDS = list(SUBSCRIPTION_PRICES)
+_STATUSES = ["done"] * 8 + ["failed", "processing", "queued"]
+
+
+def _copy(cur, table: str, columns, rows):
+    # None is written as an unquoted empty field, which COPY ... csv reads as NULL
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def seed_database(database_url: str, scale: str = "small", seed: int = 42) -> dict:
+    """Recreate the schema and load `scale` volumes; returns what scenarios need."""
+    volumes = SCALES[scale]
+    rng = random.Random(seed)
+    now = datetime(2026, 1, 1)
+
+    users, subscribed = [], []
+    user_rows = []
+    for i in range(volumes["users"]):
+        user_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        email = f"bench-user-{i}@example.com"
+        hot = i < volumes["hot_users"]
+        active = hot or rng.random() < SUBSCRIBED_SHARE
+        price_id = rng.choice(_PRICE_IDS)
+        plan = SUBSCRIPTION_PRICES[price_id]["plan_name"] if active else None
+        customer_id = f"cus_bench_{i:07d}" if active else None
+        user_rows.append((
+            user_id, email, PASSWORD_HASH,
+            HOT_USER_CREDITS if hot else rng.randint(0, 300),
+            plan or "free",
+            "active" if active else "inactive",
+            plan,
+            (now + timedelta(days=rng.randint(1, 30))).isoformat() if active else None,
+            customer_id,
+            f"sub_bench_{i:07d}" if active else None,
+            (now - timedelta(days=rng.randint(0, 365))).isoformat(),
+        ))
+        users.append({"id": user_id, "email": email, "hot": hot})
+        if active:
+            subscribed.append({
+                "id": user_id, "customer_id": customer_id, "price_id": price_id,
+                "subscription_id": f"sub_bench_{i:07d}",
+            })
+
+    video_rows = []
+    for user in users:
+        count = min(int(rng.expovariate(1 / volumes["avg_videos"])), volumes["avg_videos"] * 15)
+        for _ in range(count):
+            status = rng.choice(_STATUSES)
+            video_rows.append((
+                user["id"],
+                f"Product demo #{rng.randint(1, 10_000)} for a skincare brand, upbeat voice-over",
+                rng.choice(["ugc", "testimonial", "unboxing"]),
+                status,
+                f"https://cdn.example.com/videos/{uuid.UUID(int=rng.getrandbits(128), version=4)}.mp4" if status == "done" else None,
+                (now - timedelta(minutes=rng.randint(0, 525_600))).isoformat(),
+            ))
+
+    pending_rows = []
+    for i in range(volumes["pending_subscriptions"]):
+        price_id = rng.choice(_PRICE_IDS)
+        pending_rows.append((
+            f"cus_pending_{i:07d}", f"sub_pending_{i:07d}",
+            SUBSCRIPTION_PRICES[price_id]["plan_name"], price_id,
+            SUBSCRIPTION_PRICES[price_id]["monthly_credits"],
+        ))
+
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(SCHEMA_PATH.read_text())
+            _copy(cur, "users", (
+                "id", "email", "password_hash", "credits", "plan", "subscription_status",
+                "subscription_plan", "renewal_date", "stripe_customer_id", "stripe_subscription_id", "created_at",
+            ), user_rows)
+            _copy(cur, "videos", ("user_id", "prompt", "style", "status", "video_url", "created_at"), video_rows)
+            _copy(cur, "pending_subscriptions", (
+                "stripe_customer_id", "stripe_subscription_id", "plan_name", "price_id", "credits_to_award",
+            ), pending_rows)
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("VACUUM ANALYZE")
+    finally:
+        conn.close()
+
+    counts = {
+        "users": len(user_rows),
+        "videos": len(video_rows),
+        "pending_subscriptions": len(pending_rows),
+        "subscribed_users": len(subscribed),
+    }
+    logger.info(f"[BENCH] Seeded database | Scale: {scale} | {counts}")
+    return {"counts": counts, "users": users, "subscribed": subscribed}
+
+
+def load_seeded(database_url: str) -> dict:
+    """Rebuild seed_database()'s return value from an already seeded database (--no-seed)."""
+    price_by_plan = {info["plan_name"]: price_id for price_id, info in SUBSCRIPTION_PRICES.items()}
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT id::text, email, credits >= %s, stripe_customer_id, stripe_subscription_id, subscription_plan "
+                "FROM users WHERE email LIKE 'bench-user-%%' ORDER BY created_at, id",
+                (HOT_USER_CREDITS // 2,),
+            )
+            rows = cur.fetchall()
+            cur.execute("SELECT (SELECT count(*) FROM videos), (SELECT count(*) FROM pending_subscriptions)")
+            videos, pending = cur.fetchone()
+    finally:
+        conn.close()
+
+    users = [{"id": row[0], "email": row[1], "hot": row[2]} for row in rows]
+    subscribed = [
+        {"id": row[0], "customer_id": row[3], "price_id": price_by_plan[row[5]], "subscription_id": row[4]}
+        for row in rows
+        if row[3] and row[5] in price_by_plan
+    ]
+    counts = {"users": len(users), "videos": videos, "pending_subscriptions": pending, "subscribed_users": len(subscribed)}
+    return {"counts": counts, "users": users, "subscribed": subscribed}
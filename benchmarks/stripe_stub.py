@@ -0,0 +1,252 @@
+"""
+Stripe Stand-In - Local Fake of the Stripe API & Webhook Signing
+Serves the handful of endpoints the app calls so checkout and validation
+run end to end without network access or a Stripe account. The app is
+pointed at it with STRIPE_API_BASE.
+
+- GET  /v1/prices/{id}               (subscription prices are recurring/month)
+- POST /v1/checkout/sessions         (returns a cs_bench_... session;
+                                      honours Idempotency-Key)
+- GET  /v1/checkout/sessions/{id}    (line_items expanded)
+- POST /v1/subscriptions/{id}        (subscription change)
+- GET  /v1/subscriptions, /v1/invoices (paginated lists of what
+  load_billing() was given; filtered by status and created[gte])
+- Every response waits `latency_ms` to mimic the real round trip
+- Calls are counted per endpoint so a run can report how many Stripe
+  calls each scenario cost
+
+sign_payload() produces the Stripe-Signature header stripe.Webhook
+verifies, for webhook scenarios.
+"""
+import hashlib
+import hmac
+import json
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qsl, urlparse
+
+from app.core.subscription_prices import SUBSCRIPTION_PRICES
+
+_ROUTES = [
+    ("GET", re.compile(r"^/v1/prices/(?P<id>[^/]+)$"), "price.retrieve"),
+    ("POST", re.compile(r"^/v1/checkout/sessions$"), "checkout.session.create"),
+    ("GET", re.compile(r"^/v1/checkout/sessions/(?P<id>[^/]+)$"), "checkout.session.retrieve"),
+    ("POST", re.compile(r"^/v1/subscriptions/(?P<id>[^/]+)$"), "subscription.modify"),
+    ("GET", re.compile(r"^/v1/subscriptions$"), "subscription.list"),
+    ("GET", re.compile(r"^/v1/invoices$"), "invoice.list"),
+]
+
+
+def sign_payload(payload: bytes, secret: str, timestamp: Optional[int] = None) -> str:
+    """Stripe-Signature header value for `payload` (v1 scheme, HMAC-SHA256)."""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signature = hmac.new(secret.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def price_object(price_id: str) -> dict:
+    recurring = price_id in SUBSCRIPTION_PRICES
+    return {
+        "id": price_id,
+        "object": "price",
+        "active": True,
+        "currency": "usd",
+        "livemode": True,
+        "type": "recurring" if recurring else "one_time",
+        "recurring": {"interval": "month", "interval_count": 1} if recurring else None,
+        "unit_amount": SUBSCRIPTION_PRICES.get(price_id, {}).get("price_usd", 25) * 100,
+    }
+
+
+def _session_object(session_id: str, form: dict) -> dict:
+    price_id = form.get("line_items[0][price]", next(iter(SUBSCRIPTION_PRICES)))
+    return {
+        "id": session_id,
+        "object": "checkout.session",
+        "mode": form.get("mode", "subscription"),
+        "client_reference_id": form.get("client_reference_id"),
+        "customer": form.get("customer"),
+        "customer_email": form.get("customer_email"),
+        "metadata": {"user_id": form.get("metadata[user_id]")},
+        "status": "open",
+        "expires_at": int(time.time()) + 24 * 3600,
+        "url": f"https://checkout.stripe.test/c/pay/{session_id}",
+        "line_items": {
+            "object": "list",
+            "data": [{"id": f"li_{session_id}", "object": "item", "quantity": 1, "price": price_object(price_id)}],
+        },
+    }
+
+
+def _subscription_object(row: tuple) -> dict:
+    subscription_id, customer_id, status, price_id, created = row
+    return {
+        "id": subscription_id,
+        "object": "subscription",
+        "customer": customer_id,
+        "status": status,
+        "created": created,
+        "items": {
+            "object": "list",
+            "data": [{"id": f"si_{subscription_id}", "object": "subscription_item", "price": price_object(price_id)}],
+        },
+    }
+
+
+def _invoice_object(row: tuple) -> dict:
+    # Current API shape: subscription and price moved under parent/pricing
+    invoice_id, customer_id, subscription_id, price_id, amount_paid, created = row
+    return {
+        "id": invoice_id,
+        "object": "invoice",
+        "customer": customer_id,
+        "status": "paid",
+        "amount_paid": amount_paid,
+        "created": created,
+        "parent": {"type": "subscription_details", "subscription_details": {"subscription": subscription_id}},
+        "lines": {
+            "object": "list",
+            "data": [{"id": f"il_{invoice_id}", "object": "line_item", "pricing": {"price_details": {"price": price_id}}}],
+        },
+    }
+
+
+class StripeStub:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.calls: Counter = Counter()
+        self._sessions = {}
+        self._idempotent = {}
+        self._billing = {"subscription.list": [], "invoice.list": []}
+        self._billing_index = {"subscription.list": {}, "invoice.list": {}}
+        self._lock = threading.RLock()  # _respond re-enters it under an idempotent replay
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StripeStub":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stripe-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def load_billing(self, subscriptions: list, invoices: list):
+        """
+        Serve the list endpoints from compact rows, newest first like Stripe:
+        (id, customer, status, price_id, created) subscriptions and
+        (id, customer, subscription, price_id, amount_paid, created) paid invoices.
+        Objects are built per page, so 100k+ customers stay cheap.
+        """
+        for name, rows in (("subscription.list", subscriptions), ("invoice.list", invoices)):
+            self._billing[name] = rows
+            self._billing_index[name] = {row[0]: i for i, row in enumerate(rows)}
+
+    def _list(self, name: str, form: dict) -> dict:
+        rows = self._billing[name]
+        limit = int(form.get("limit", 10))
+        start = self._billing_index[name].get(form.get("starting_after"), -1) + 1
+        status = form.get("status")
+        created_gte = int(form.get("created[gte]", 0))
+        build = _subscription_object if name == "subscription.list" else _invoice_object
+
+        page, i = [], start
+        while i < len(rows) and len(page) < limit:
+            row = rows[i]
+            i += 1
+            if name == "subscription.list" and status not in (None, "all") and row[2] != status:
+                continue
+            if row[-1] < created_gte:
+                i = len(rows)  # Newest first: everything after is older too
+                break
+            page.append(build(row))
+        return {
+            "object": "list",
+            "url": "/v1/subscriptions" if name == "subscription.list" else "/v1/invoices",
+            "has_more": i < len(rows),
+            "data": page,
+        }
+
+    def reset_counts(self) -> Counter:
+        with self._lock:
+            calls, self.calls = self.calls, Counter()
+        return calls
+
+    def handle(self, method: str, path: str, form: dict, idempotency_key: Optional[str] = None):
+        for route_method, pattern, name in _ROUTES:
+            match = pattern.match(path) if method == route_method else None
+            if match is None:
+                continue
+            with self._lock:
+                self.calls[name] += 1
+            if self.latency:
+                time.sleep(self.latency)
+            if idempotency_key and method == "POST":
+                with self._lock:
+                    if idempotency_key not in self._idempotent:
+                        self._idempotent[idempotency_key] = self._respond(name, match.groupdict().get("id"), form)
+                    return 200, self._idempotent[idempotency_key]
+            return 200, self._respond(name, match.groupdict().get("id"), form)
+        return 404, {"error": {"type": "invalid_request_error", "message": f"Unrecognized request URL ({method}: {path})"}}
+
+    def _respond(self, name: str, object_id: Optional[str], form: dict) -> dict:
+        if name == "price.retrieve":
+            return price_object(object_id)
+        if name == "checkout.session.create":
+            session = _session_object(f"cs_bench_{uuid.uuid4().hex}", form)
+            with self._lock:
+                self._sessions[session["id"]] = session
+            return session
+        if name in ("subscription.list", "invoice.list"):
+            return self._list(name, form)
+        if name == "checkout.session.retrieve":
+            with self._lock:
+                return self._sessions.get(object_id) or _session_object(object_id, {})
+        # subscription.modify
+        return {"id": object_id, "object": "subscription", "status": "active"}
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+            def _dispatch(self, method: str):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length).decode() if length else ""
+                url = urlparse(self.path)
+                form = dict(parse_qsl(body or url.query, keep_blank_values=True))
+                status, payload = stub.handle(method, url.path, form, self.headers.get("Idempotency-Key"))
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("Request-Id", f"req_{uuid.uuid4().hex[:14]}")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def do_DELETE(self):
+                self._dispatch("DELETE")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
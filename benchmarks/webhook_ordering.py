@@ -0,0 +1,204 @@
+"""
+Webhook Ordering Check - Per-Customer Serial, Cross-Customer Parallel
+Runs app.core.webhook_partitions in several worker processes at once (like
+app.server's forked workers) against a local Postgres. Every worker submits
+the same per-customer event sequence and records when each handler ran:
+
+- --handler sleep (default): the handler just sleeps --handler-ms
+- --handler invoice_paid: the registered Stripe invoice.paid handler, with a
+  fresh invoice per event for seeded subscribed customers, under
+  LOOP_STRICT_MODE: a psycopg2 statement or blocking socket call on the
+  event loop fails the event, and so the run
+
+- Passes when no two handler runs for one customer overlapped in time, in
+  any worker (WEBHOOK_CUSTOMER_LOCK), and each worker ran every customer's
+  events in submission order
+- --no-lock shows what the advisory lock prevents: overlaps across workers
+- Reports throughput and per-partition queue lag (queued → handler start);
+  compare --partitions 1 with 4 for what cross-customer parallelism buys
+
+Usage:
+    python -m benchmarks.webhook_ordering --workers 2 --customers 50 --events 2000 --output ordering.json
+    python -m benchmarks.webhook_ordering --partitions 1 --output ordering.json   # serial baseline
+    python -m benchmarks.webhook_ordering --database-url postgresql://localhost/bench --no-lock
+    python -m benchmarks.webhook_ordering --handler invoice_paid --customers 20 --events 500
+
+Exits 1 when ordering is violated or a handler failed.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.load import percentile
+from benchmarks.run import _git_revision, _start_pgserver, app_environment
+from benchmarks.scenarios import invoice_paid_event
+from benchmarks.seed import SCALES, load_seeded, seed_database
+
+logger = logging.getLogger("benchmarks")
+
+
+def _worker(worker: int, args: argparse.Namespace, customers: list, results, barrier) -> None:
+    """One app worker: submit every event, concurrently, in sequence order."""
+    from app.core.webhook_partitions import webhook_partitions
+
+    logging.getLogger("app").setLevel(logging.WARNING)  # spawned: nothing inherited
+    if args.handler == "invoice_paid":
+        import app.api.routes.webhook_stripe  # noqa: F401 - registers the handlers
+        from app.core.loop_monitor import install_strict_mode
+        from app.core.webhook_registry import stripe_webhooks
+
+        invoice_paid = stripe_webhooks.get("invoice.paid")
+        install_strict_mode()
+
+    runs, lags, errors = [], defaultdict(list), []
+    barrier.wait()  # all workers start submitting together
+
+    async def main():
+        def handler(customer: dict, seq: int, queued_at: float):
+            async def run():
+                started = time.time()
+                lags[webhook_partitions.partition_for(customer["customer_id"])].append((started - queued_at) * 1000)
+                if args.handler == "invoice_paid":
+                    await invoice_paid.run(
+                        invoice_paid_event(customer["customer_id"], customer["price_id"], customer["subscription_id"])
+                    )
+                else:
+                    await asyncio.sleep(args.handler_ms / 1000)
+                runs.append((worker, customer["customer_id"], seq, started, time.time()))
+            return run
+
+        async def submit(customer: dict, seq: int):
+            try:
+                await webhook_partitions.submit(customer["customer_id"], handler(customer, seq, time.time()))
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+
+        started = time.perf_counter()
+        tasks = []
+        for seq in range(args.events):
+            tasks.append(asyncio.create_task(submit(customers[seq % len(customers)], seq)))
+        await asyncio.gather(*tasks)
+        duration = time.perf_counter() - started
+        await webhook_partitions.drain(1.0)
+        return duration
+
+    duration = asyncio.run(main())
+    results.put({
+        "worker": worker,
+        "duration_s": duration,
+        "runs": runs,
+        "errors": errors,
+        "lag_ms": {str(partition): _lag_summary(values) for partition, values in sorted(lags.items())},
+    })
+
+
+def _lag_summary(values: list) -> dict:
+    ordered = sorted(values)
+    return {"p50": round(percentile(ordered, 50), 2), "p99": round(percentile(ordered, 99), 2), "max": round(ordered[-1], 2)}
+
+
+def check(runs: list) -> dict:
+    """Count same-customer overlaps (any worker) and out-of-order runs (per worker)."""
+    by_customer = defaultdict(list)
+    for worker, customer, seq, started, finished in runs:
+        by_customer[customer].append((started, finished, worker, seq))
+
+    overlaps = out_of_order = 0
+    for intervals in by_customer.values():
+        intervals.sort()
+        latest_finish = 0.0
+        last_seq = {}
+        for started, finished, worker, seq in intervals:
+            if started < latest_finish:
+                overlaps += 1
+            latest_finish = max(latest_finish, finished)
+            if seq < last_seq.get(worker, -1):
+                out_of_order += 1
+            last_seq[worker] = seq
+    return {"overlaps": overlaps, "out_of_order": out_of_order}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Webhook partition ordering check")
+    parser.add_argument("--database-url", default=os.environ.get("BENCH_DATABASE_URL"))
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--partitions", type=int, default=4)
+    parser.add_argument("--customers", type=int, default=50)
+    parser.add_argument("--events", type=int, default=2000, help="Events per worker")
+    parser.add_argument("--handler", choices=("sleep", "invoice_paid"), default="sleep")
+    parser.add_argument("--handler-ms", type=float, default=2.0, help="--handler sleep only")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="--handler invoice_paid only")
+    parser.add_argument("--no-seed", action="store_true", help="Reuse the data from the previous run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-lock", action="store_true", help="Disable WEBHOOK_CUSTOMER_LOCK")
+    parser.add_argument("--output", default="ordering.json")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    workdir = Path(tempfile.mkdtemp(prefix="studio_genie_ordering_"))
+    database_url = args.database_url or _start_pgserver(str(workdir / "pgdata"))
+    os.environ.update(app_environment(database_url, "http://127.0.0.1:9"))
+    os.environ["WEBHOOK_PARTITIONS"] = str(args.partitions)
+    os.environ["WEBHOOK_CUSTOMER_LOCK"] = "false" if args.no_lock else "true"
+    logging.getLogger("app").setLevel(logging.WARNING)
+
+    if args.handler == "invoice_paid":
+        seeded = load_seeded(database_url) if args.no_seed else seed_database(database_url, args.scale, args.seed)
+        customers = seeded["subscribed"][:args.customers]
+        if len(customers) < args.customers:
+            parser.error(f"only {len(customers)} subscribed customers seeded; lower --customers or raise --scale")
+    else:
+        customers = [{"customer_id": f"cus_order_{i:05d}"} for i in range(args.customers)]
+
+    # Fresh processes (not forks of this one): each gets its own pool and loop
+    context = multiprocessing.get_context("spawn")
+    results, barrier = context.Queue(), context.Barrier(args.workers)
+    workers = [context.Process(target=_worker, args=(i, args, customers, results, barrier)) for i in range(args.workers)]
+    for process in workers:
+        process.start()
+    reports = [results.get() for _ in workers]
+    for process in workers:
+        process.join()
+
+    runs = [run for report in reports for run in report["runs"]]
+    violations = check(runs)
+    total_events = args.events * args.workers
+    duration = max(report["duration_s"] for report in reports)
+    errors = [error for report in reports for error in report["errors"]]
+    failures = [] if args.no_lock else [f"{name}: {count}" for name, count in violations.items() if count]
+    if errors:
+        failures.append(f"handler errors: {len(errors)} (first: {errors[0]})")
+
+    report = {
+        "schema_version": 1,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": _git_revision(),
+        "environment": {
+            "workers": args.workers, "partitions": args.partitions, "customers": args.customers,
+            "events_per_worker": args.events, "handler": args.handler,
+            "handler_ms": args.handler_ms if args.handler == "sleep" else None, "customer_lock": not args.no_lock,
+        },
+        "throughput_eps": round(total_events / duration, 1),
+        "duration_s": round(duration, 3),
+        "violations": violations,
+        "lag_ms": {f"worker_{report['worker']}": report["lag_ms"] for report in sorted(reports, key=lambda r: r["worker"])},
+        "failures": failures,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+    logger.info(
+        f"[ORDERING] {total_events} events | {report['throughput_eps']} events/s | "
+        f"Overlaps: {violations['overlaps']} | Out of order: {violations['out_of_order']} | Errors: {len(errors)}"
+    )
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
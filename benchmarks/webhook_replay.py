@@ -0,0 +1,308 @@
+"""
+Webhook Replay - Re-Sign and Fire Recorded Stripe Traffic
+Replays recordings written by app/core/webhook_recorder.py (or a synthetic
+month-start renewal storm) against /webhook/stripe, re-signing every body
+with the test deployment's webhook secret at send time.
+
+- --speedup N: keep the recorded arrival pattern, N times faster
+  (a 6 h renewal storm at --speedup 360 takes one minute)
+- --rate R: ignore recorded timing, send R events/s
+- neither: as fast as --concurrency allows
+- Open loop: events are due at their scheduled time whether or not the app
+  keeps up; --concurrency caps requests in flight, and anything waiting on
+  it counts as lag
+
+Processing lag is measured from an event's scheduled arrival to the app's
+200 (handlers process inline before answering), so it grows once the storm
+outruns the app; latency is send-to-response only.
+
+Usage:
+    python -m benchmarks.webhook_replay synthesize --database-url postgresql://localhost/bench \\
+        --events 20000 --window-hours 6 --output storm.jsonl.gz
+    python -m benchmarks.webhook_replay replay storm.jsonl.gz --url http://127.0.0.1:8000 \\
+        --secret whsec_test --speedup 360 --concurrency 64 --output replay.json
+    python -m benchmarks.webhook_replay replay /var/lib/webhooks/ --database-url postgresql://localhost/bench
+
+Without --url the Stripe stand-in and the app are started locally (see
+benchmarks/run.py) against --database-url, which must already hold the
+customers the recording refers to.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+
+import httpx
+
+from benchmarks.load import percentile, summarize
+from benchmarks.run import WEBHOOK_SECRET, _free_port, start_app, stop_app, wait_until_ready
+from benchmarks.scenarios import invoice_paid_event
+from benchmarks.seed import load_seeded
+from benchmarks.stripe_stub import StripeStub, sign_payload
+
+logger = logging.getLogger("benchmarks")
+
+
+# =========================================================
+# RECORDINGS
+# =========================================================
+
+def _recording_files(paths: List[str]) -> List[Path]:
+    files = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.glob("*.jsonl.gz")) if path.is_dir() else [path])
+    return files
+
+
+def read_recordings(paths: List[str], source: str = "stripe", types: Optional[set] = None) -> List[dict]:
+    """Recorded entries in arrival order; tolerates files cut short by a killed worker."""
+    entries = []
+    for path in _recording_files(paths):
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as handle:
+                for line in handle:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # partial last line
+                    if entry.get("source", "stripe") == source and (not types or entry["type"] in types):
+                        entries.append(entry)
+        except (EOFError, zlib.error, gzip.BadGzipFile) as e:
+            logger.warning(f"[REPLAY] Truncated recording, using what was readable | File: {path} | Error: {str(e)}")
+    entries.sort(key=lambda entry: entry["received_at"])
+    return entries
+
+
+def synthesize_storm(subscribed: List[dict], events: int, window_hours: float, seed: int = 42) -> List[dict]:
+    """
+    invoice.paid for seeded subscribers, shaped like a month-start renewal
+    run: most billing anchors sit on the 1st at 00:00 UTC, so arrivals decay
+    exponentially from midnight across the window.
+    """
+    rng = random.Random(seed)
+    month_start = datetime.now(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0).timestamp()
+    window = window_hours * 3600
+    entries = []
+    for _ in range(events):
+        target = rng.choice(subscribed)
+        received_at = month_start + min(rng.expovariate(4 / window), window)
+        event = invoice_paid_event(target["customer_id"], target["price_id"], target["subscription_id"])
+        event["created"] = int(received_at)
+        entries.append({
+            "received_at": round(received_at, 6),
+            "source": "stripe",
+            "id": event["id"],
+            "type": event["type"],
+            "body": json.dumps(event),
+        })
+    entries.sort(key=lambda entry: entry["received_at"])
+    return entries
+
+
+def write_recording(entries: List[dict], path: str):
+    with gzip.open(path, "wt", encoding="utf-8") as handle:
+        for entry in entries:
+            handle.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+
+# =========================================================
+# REPLAY
+# =========================================================
+
+def schedule(entries: List[dict], speedup: Optional[float], rate: Optional[float]) -> List[float]:
+    """Offset (seconds from replay start) at which each entry is due."""
+    if rate:
+        return [i / rate for i in range(len(entries))]
+    if speedup:
+        first = entries[0]["received_at"]
+        return [(entry["received_at"] - first) / speedup for entry in entries]
+    return [0.0] * len(entries)
+
+
+def _fresh_id(body: str, i: int) -> bytes:
+    event = json.loads(body)
+    event["id"] = f"{event['id']}_replay{i}"
+    return json.dumps(event).encode()
+
+
+async def replay(base_url: str, entries: List[dict], offsets: List[float], secret: str,
+                 concurrency: int, fresh_ids: bool = False) -> dict:
+    latencies: List[float] = []
+    lags: List[float] = []
+    slips: List[float] = []
+    statuses: Counter = Counter()
+    slots = asyncio.Semaphore(concurrency)
+
+    async def send(client: httpx.AsyncClient, i: int, due: float):
+        try:
+            body = _fresh_id(entries[i]["body"], i) if fresh_ids else entries[i]["body"].encode()
+            sent = time.perf_counter()
+            slips.append(sent - due)
+            try:
+                response = await client.post(
+                    "/webhook/stripe",
+                    content=body,
+                    headers={"Content-Type": "application/json", "Stripe-Signature": sign_payload(body, secret)},
+                )
+                # The handler answers 200 with {"status": "error"} when processing fails
+                failed = response.status_code == 200 and response.json().get("status") == "error"
+                statuses["200:handler_error" if failed else str(response.status_code)] += 1
+            except httpx.HTTPError as e:
+                statuses[f"error:{type(e).__name__}"] += 1
+            done = time.perf_counter()
+            latencies.append(done - sent)
+            lags.append(done - due)
+        finally:
+            slots.release()
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        tasks = []
+        started = time.perf_counter()
+        for i, offset in enumerate(offsets):
+            due = started + offset
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await slots.acquire()
+            tasks.append(asyncio.create_task(send(client, i, due)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    result = summarize(latencies, statuses, elapsed, concurrency)
+    result["errors"] += statuses.get("200:handler_error", 0)
+    ordered_lags, ordered_slips = sorted(lags), sorted(slips)
+    result["processing_lag_ms"] = {
+        "p50": round(percentile(ordered_lags, 50) * 1000, 2),
+        "p95": round(percentile(ordered_lags, 95) * 1000, 2),
+        "p99": round(percentile(ordered_lags, 99) * 1000, 2),
+        "max": round(ordered_lags[-1] * 1000, 2) if ordered_lags else 0.0,
+    }
+    result["max_behind_schedule_ms"] = round(ordered_slips[-1] * 1000, 2) if ordered_slips else 0.0
+    return result
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def _synthesize(args):
+    if not args.database_url:
+        raise SystemExit("--database-url (or BENCH_DATABASE_URL) is required to pick seeded customers")
+    subscribed = load_seeded(args.database_url)["subscribed"]
+    if not subscribed:
+        raise SystemExit("No subscribed users found; seed the database with benchmarks/run.py first")
+    entries = synthesize_storm(subscribed, args.events, args.window_hours, args.seed)
+    write_recording(entries, args.output)
+    logger.info(f"[REPLAY] Storm written | Events: {len(entries)} | Window: {args.window_hours}h | Path: {args.output}")
+
+
+def _replay(args):
+    types = {t.strip() for t in args.types.split(",") if t.strip()} if args.types else None
+    entries = read_recordings(args.recordings, types=types)
+    if args.limit:
+        entries = entries[:args.limit]
+    if not entries:
+        raise SystemExit("Nothing to replay")
+    offsets = schedule(entries, args.speedup, args.rate)
+    recorded_span = entries[-1]["received_at"] - entries[0]["received_at"]
+    logger.info(
+        f"[REPLAY] Loaded | Events: {len(entries)} | Recorded span: {recorded_span:.1f}s "
+        f"| Replay span: {offsets[-1]:.1f}s | Types: {dict(Counter(e['type'] for e in entries).most_common(5))}"
+    )
+
+    stub, process, base_url = None, None, args.url
+    secret = args.secret or (os.environ.get("STRIPE_WEBHOOK_SECRET") if base_url else WEBHOOK_SECRET)
+    if not secret:
+        raise SystemExit("--secret (or STRIPE_WEBHOOK_SECRET) is required with --url")
+    if base_url is None:
+        if not args.database_url:
+            raise SystemExit("Give --url for a running app, or --database-url to start one locally")
+        stub = StripeStub(latency_ms=args.stripe_latency_ms).start()
+        port = _free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        log_path = Path(tempfile.mkdtemp(prefix="studio_genie_replay_")) / "app.log"
+        logger.info(f"[REPLAY] Starting app | URL: {base_url} | Workers: {args.workers} | Log: {log_path}")
+        process = start_app(args.database_url, stub.url, port, args.workers, log_path)
+    try:
+        wait_until_ready(base_url, process)
+        result = asyncio.run(replay(base_url, entries, offsets, secret, args.concurrency, args.fresh_ids))
+    finally:
+        if process is not None:
+            stop_app(process)
+        if stub is not None:
+            stub.stop()
+
+    result.update({
+        "events": len(entries),
+        "recorded_span_s": round(recorded_span, 3),
+        "scheduled_span_s": round(offsets[-1], 3),
+        "offered_rps": round(len(entries) / offsets[-1], 2) if offsets[-1] else None,
+        "speedup": args.speedup,
+        "rate": args.rate,
+    })
+    logger.info(
+        f"[REPLAY] Done | {result['throughput_rps']} req/s | Lag p50 {result['processing_lag_ms']['p50']}ms "
+        f"| p99 {result['processing_lag_ms']['p99']}ms | max {result['processing_lag_ms']['max']}ms "
+        f"| Latency p99 {result['latency_ms']['p99']}ms | Errors: {result['errors']}"
+    )
+    if args.output:
+        report = {
+            "schema_version": 1,
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "recordings": [str(path) for path in _recording_files(args.recordings)],
+            "scenarios": {"webhook_replay": result},
+        }
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+        logger.info(f"[REPLAY] Report written | Path: {args.output}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded Stripe webhooks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    synth = commands.add_parser("synthesize", help="Write a synthetic month-start renewal storm")
+    synth.add_argument("--database-url", default=os.environ.get("BENCH_DATABASE_URL"))
+    synth.add_argument("--events", type=int, default=10_000)
+    synth.add_argument("--window-hours", type=float, default=6.0)
+    synth.add_argument("--seed", type=int, default=42)
+    synth.add_argument("--output", default="storm.jsonl.gz")
+
+    rep = commands.add_parser("replay", help="Fire recorded webhooks at /webhook/stripe")
+    rep.add_argument("recordings", nargs="+", help="*.jsonl.gz files or directories of them")
+    rep.add_argument("--url", help="Running app to target (default: start one locally)")
+    rep.add_argument("--secret", help="Webhook secret of the target (default: STRIPE_WEBHOOK_SECRET)")
+    rep.add_argument("--database-url", default=os.environ.get("BENCH_DATABASE_URL"))
+    rep.add_argument("--speedup", type=float, help="Replay recorded timing N times faster")
+    rep.add_argument("--rate", type=float, help="Fixed events per second instead of recorded timing")
+    rep.add_argument("--concurrency", type=int, default=64, help="Max requests in flight")
+    rep.add_argument("--types", help="Comma-separated event types to replay (default: all)")
+    rep.add_argument("--limit", type=int, help="Replay only the first N events")
+    rep.add_argument("--fresh-ids", action="store_true", help="Suffix event ids so replays are not deduplicated")
+    rep.add_argument("--workers", type=int, default=2, help="WEB_CONCURRENCY when starting the app")
+    rep.add_argument("--stripe-latency-ms", type=float, default=80.0)
+    rep.add_argument("--output", help="Write a JSON report (same shape as benchmarks/run.py)")
+
+    args = parser.parse_args(argv)
+    if args.command == "replay" and args.speedup and args.rate:
+        parser.error("--speedup and --rate are mutually exclusive")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if args.command == "synthesize":
+        _synthesize(args)
+    else:
+        _replay(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 -- Studio Génie Database Schema
--- Execute these SQL statements in your Supabase SQL Editor
+-- Execute these SQL statements in your Supabase SQL Editor, then apply
+-- migrations/ in order with: python -m app.core.migrate
 
 -- Enable UUID extension
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
@@ -8,9 +9,9 @@ CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 CREATE TABLE IF NOT EXISTS users (
   id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
   email TEXT UNIQUE NOT NULL,
-  hashed_password TEXT NOT NULL,
+  password_hash TEXT NOT NULL,
   has_trial_used BOOLEAN DEFAULT FALSE,
-  credits_remaining INTEGER DEFAULT 0,
+  credits INTEGER DEFAULT 0,
   plan TEXT,
   created_at TIMESTAMP DEFAULT NOW()
 );
@@ -31,7 +32,7 @@ CREATE TABLE IF NOT EXISTS videos (
 );
 
 -- Create indexes for faster queries
-CREATE INDEX IF NOT EXISTS idx_videos_user_id ON videos(user_id);
+-- videos(user_id, created_at DESC, id): migrations/009_hot_path_indexes.sql
 CREATE INDEX IF NOT EXISTS idx_videos_status ON videos(status);
 CREATE INDEX IF NOT EXISTS idx_videos_created_at ON videos(created_at DESC);
 
@@ -40,8 +41,9 @@ CREATE TABLE IF NOT EXISTS payments (
   id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
   user_id UUID REFERENCES users(id) ON DELETE CASCADE,
   provider TEXT NOT NULL CHECK (provider IN ('stripe', 'coinbase')),
-  credits_added INTEGER NOT NULL,
-  amount_usd NUMERIC(10, 2) NOT NULL,
+  amount INTEGER,
+  bonus INTEGER,
+  total_credits INTEGER,
   status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'completed', 'failed')),
   created_at TIMESTAMP DEFAULT NOW()
 );
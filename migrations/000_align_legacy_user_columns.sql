@@ -0,0 +1,24 @@
+-- Migration: Align legacy users column names with the code
+-- Applied by python -m app.core.migrate (first: 001-003 use these names)
+--
+-- database_schema.sql used to create users.hashed_password and
+-- users.credits_remaining; the code reads and writes users.password_hash and
+-- users.credits. Databases created from the old file are renamed in place;
+-- databases already on the code's names are untouched.
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_schema = current_schema() AND table_name = 'users' AND column_name = 'hashed_password')
+       AND NOT EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_schema = current_schema() AND table_name = 'users' AND column_name = 'password_hash') THEN
+        ALTER TABLE users RENAME COLUMN hashed_password TO password_hash;
+    END IF;
+
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_schema = current_schema() AND table_name = 'users' AND column_name = 'credits_remaining')
+       AND NOT EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_schema = current_schema() AND table_name = 'users' AND column_name = 'credits') THEN
+        ALTER TABLE users RENAME COLUMN credits_remaining TO credits;
+    END IF;
+END $$;
@@ -1,5 +1,5 @@
 -- Migration: Add pending_subscriptions table
--- Run this SQL directly on your PostgreSQL database
+-- Applied by python -m app.core.migrate
 
 CREATE TABLE IF NOT EXISTS pending_subscriptions (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -1,5 +1,5 @@
 -- Migration: Add subscription_status and subscription_plan columns to users table
--- Run this SQL directly on your Render PostgreSQL database
+-- Applied by python -m app.core.migrate
 
 -- Add subscription_status column (default 'inactive')
 ALTER TABLE users 
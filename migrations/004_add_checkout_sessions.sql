@@ -0,0 +1,21 @@
+-- Migration: Add checkout_sessions index
+-- Applied by python -m app.core.migrate
+--
+-- Written when the API creates a Stripe Checkout Session; the
+-- checkout.session.completed webhook resolves the price from here with one
+-- primary-key lookup instead of Session.retrieve(expand=["line_items"]).
+-- No foreign key: rows are written best-effort and user_id is NULL for
+-- landing-page checkouts made before signup.
+
+CREATE TABLE IF NOT EXISTS checkout_sessions (
+    session_id VARCHAR(255) PRIMARY KEY,
+    user_id UUID NULL,
+    price_id VARCHAR(255) NOT NULL,
+    mode VARCHAR(20) NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+-- For pruning old sessions (Checkout Sessions expire after 24 hours):
+--   DELETE FROM checkout_sessions WHERE created_at < NOW() - INTERVAL '30 days';
+CREATE INDEX IF NOT EXISTS idx_checkout_sessions_created_at
+    ON checkout_sessions(created_at);
@@ -0,0 +1,24 @@
+-- Migration: Reuse still-open checkout sessions
+-- Applied by python -m app.core.migrate (after 004)
+--
+-- A second "Subscribe"/"Buy" click, or a frontend retry, gets the user's
+-- still-open session back instead of a new Stripe Checkout Session.
+-- completed_at is set by the checkout.session.completed webhook so a paid
+-- session is never handed out again.
+
+ALTER TABLE checkout_sessions
+ADD COLUMN IF NOT EXISTS url TEXT;
+
+ALTER TABLE checkout_sessions
+ADD COLUMN IF NOT EXISTS success_url TEXT;
+
+ALTER TABLE checkout_sessions
+ADD COLUMN IF NOT EXISTS expires_at TIMESTAMP;
+
+ALTER TABLE checkout_sessions
+ADD COLUMN IF NOT EXISTS completed_at TIMESTAMP;
+
+-- Reuse lookup: newest open session for (user, price, mode)
+CREATE INDEX IF NOT EXISTS idx_checkout_sessions_open
+ON checkout_sessions(user_id, price_id, mode, created_at DESC)
+WHERE completed_at IS NULL;
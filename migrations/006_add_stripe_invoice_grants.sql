@@ -0,0 +1,18 @@
+-- Migration: Ledger of subscription invoices that granted credits
+-- Applied by python -m app.core.migrate
+--
+-- invoice.paid inserts one row per invoice in the same transaction as the
+-- credit grant, so a redelivered invoice never grants twice. The Stripe
+-- reconciliation job (python -m app.billing.reconcile) diffs paid invoices
+-- against this table to find grants that never happened.
+
+CREATE TABLE IF NOT EXISTS stripe_invoice_grants (
+    invoice_id VARCHAR(255) PRIMARY KEY,
+    user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    credits INTEGER NOT NULL,
+    source VARCHAR(20) NOT NULL DEFAULT 'webhook',  -- webhook | reconcile
+    granted_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_stripe_invoice_grants_granted_at
+ON stripe_invoice_grants(granted_at);
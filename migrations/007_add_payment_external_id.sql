@@ -0,0 +1,13 @@
+-- Migration: Provider reference on payments (Coinbase charge dedupe)
+-- Applied by python -m app.core.migrate
+--
+-- A Coinbase charge:confirmed webhook claims its charge ID here in the same
+-- statement that grants the credits, so a redelivered or replayed webhook
+-- never grants twice. NULLs never conflict, so rows without a provider
+-- reference are unaffected.
+
+ALTER TABLE payments
+ADD COLUMN IF NOT EXISTS external_id VARCHAR(255);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_payments_provider_external_id
+ON payments(provider, external_id);
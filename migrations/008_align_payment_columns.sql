@@ -0,0 +1,30 @@
+-- Migration: Columns the code uses that database_schema.sql never had
+-- Applied by python -m app.core.migrate (after 007)
+--
+-- payments was created with credits_added/amount_usd only; Coinbase grants
+-- write amount/bonus/total_credits (the legacy columns stay for old rows but
+-- are no longer required). /usage reads users.renewal_date.
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_schema = current_schema() AND table_name = 'payments' AND column_name = 'credits_added') THEN
+        ALTER TABLE payments ALTER COLUMN credits_added DROP NOT NULL;
+    END IF;
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_schema = current_schema() AND table_name = 'payments' AND column_name = 'amount_usd') THEN
+        ALTER TABLE payments ALTER COLUMN amount_usd DROP NOT NULL;
+    END IF;
+END $$;
+
+ALTER TABLE users
+ADD COLUMN IF NOT EXISTS renewal_date TIMESTAMP;
+
+ALTER TABLE payments
+ADD COLUMN IF NOT EXISTS amount INTEGER;
+
+ALTER TABLE payments
+ADD COLUMN IF NOT EXISTS bonus INTEGER;
+
+ALTER TABLE payments
+ADD COLUMN IF NOT EXISTS total_credits INTEGER;
@@ -0,0 +1,31 @@
+-- migrate:no-transaction
+-- Migration: Hot-path index pack (users, videos)
+-- Apply with: python -m app.core.migrate (builds concurrently, no table locks)
+--
+-- Checked by benchmarks/explain_check.py, which EXPLAINs every hot query
+-- against a seeded database and fails on a sequential scan or sort.
+--
+-- Subscription gate and /usage/balance: users by id, covering the
+-- subscription columns so the gate can be answered from the index.
+-- credits is deliberately NOT included: it changes on every consume and
+-- grant, and an indexed column there would turn those HOT updates into
+-- updates of every index on users. Balance reads stay a primary-key
+-- index scan.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_id_subscription
+ON users(id) INCLUDE (subscription_status, subscription_plan, plan, renewal_date);
+
+-- Login and email lookups, case-insensitive: WHERE lower(email) = lower(%s)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_email_lower
+ON users(lower(email));
+
+-- Dashboard and video listings: a user's newest videos without a sort
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_videos_user_created
+ON videos(user_id, created_at DESC, id);
+
+-- Superseded by idx_videos_user_created (same leading column, also serves
+-- the ON DELETE CASCADE lookup)
+DROP INDEX CONCURRENTLY IF EXISTS idx_videos_user_id;
+
+-- Statistics for the lower(email) expression
+ANALYZE users;
+ANALYZE videos;
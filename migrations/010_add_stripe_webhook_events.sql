@@ -0,0 +1,19 @@
+-- Migration: Stripe events that have granted credits
+-- Applied by python -m app.core.migrate (after 009)
+--
+-- checkout.session.completed claims its event ID here in the same
+-- transaction as the credit grant, so an event delivered twice (a
+-- redelivery, or one account with both /webhook/stripe and the legacy
+-- /billing/webhook configured) never grants twice. invoice.paid is already
+-- idempotent per invoice (stripe_invoice_grants).
+
+CREATE TABLE IF NOT EXISTS stripe_webhook_events (
+    event_id VARCHAR(255) PRIMARY KEY,
+    event_type VARCHAR(100) NOT NULL,
+    processed_at TIMESTAMP DEFAULT NOW()
+);
+
+-- For pruning (Stripe stops redelivering after 3 days):
+--   DELETE FROM stripe_webhook_events WHERE processed_at < NOW() - INTERVAL '30 days';
+CREATE INDEX IF NOT EXISTS idx_stripe_webhook_events_processed_at
+ON stripe_webhook_events(processed_at);
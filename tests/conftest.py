@@ -0,0 +1,90 @@
+"""
+Test configuration: placeholder settings (nothing talks to Stripe), and an
+optional Postgres for the tests that need a real connection:
+
+    TEST_DATABASE_URL=postgresql://localhost/studio_genie_test python -m pytest
+
+Tests using the `database_url` or `create_migrated_database` fixtures are
+skipped without it.
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import psycopg2
+import pytest
+from psycopg2.extensions import make_dsn
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Supabase provides auth.uid() for the RLS policies in database_schema.sql
+SUPABASE_AUTH_STUB = """
+CREATE SCHEMA IF NOT EXISTS auth;
+CREATE OR REPLACE FUNCTION auth.uid() RETURNS uuid LANGUAGE sql AS 'SELECT NULL::uuid';
+"""
+
+for name, value in {
+    "DATABASE_URL": os.environ.get("TEST_DATABASE_URL", "postgresql://localhost/studio_genie_test"),
+    "DATABASE_SSLMODE": "disable",
+    "SECRET_KEY": "test-secret",
+    "STRIPE_SECRET_KEY": "sk_test_placeholder",
+    "STRIPE_PUBLISHABLE_KEY": "pk_test_placeholder",
+    "STRIPE_WEBHOOK_SECRET": "whsec_placeholder",
+    "STRIPE_STARTER_PRICE_ID": "price_starter",
+    "STRIPE_CREATOR_PRICE_ID": "price_creator",
+    "STRIPE_PRO_PRICE_ID": "price_pro",
+}.items():
+    os.environ.setdefault(name, value)
+
+
+@pytest.fixture
+def database_url() -> str:
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL not set")
+    return url
+
+
+@pytest.fixture(scope="session")
+def create_migrated_database():
+    """
+    create(name) -> DSN of a fresh database `name` built like production:
+    database_schema.sql, then `python -m app.core.migrate up`. Dropped at
+    the end of the session.
+    """
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL not set")
+
+    admin = psycopg2.connect(url)
+    admin.autocommit = True
+    created = []
+
+    def create(name: str) -> str:
+        with admin.cursor() as cur:
+            cur.execute(f"DROP DATABASE IF EXISTS {name}")
+            cur.execute(f"CREATE DATABASE {name}")
+        created.append(name)
+        dsn = make_dsn(url, dbname=name)
+
+        conn = psycopg2.connect(dsn)
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                cur.execute(SUPABASE_AUTH_STUB)
+                cur.execute((ROOT / "database_schema.sql").read_text())
+        finally:
+            conn.close()
+        subprocess.run(
+            [sys.executable, "-m", "app.core.migrate", "up", "--database-url", dsn],
+            cwd=ROOT, check=True, capture_output=True,
+        )
+        return dsn
+
+    yield create
+
+    with admin.cursor() as cur:
+        for name in created:
+            cur.execute(f"DROP DATABASE IF EXISTS {name}")
+    admin.close()
@@ -0,0 +1,125 @@
+import asyncio
+import time
+import uuid
+
+import psycopg2
+import pytest
+
+from app.api.routes import webhook_stripe
+from app.api.routes.webhook_stripe import resolve_checkout_price_id
+from app.core.database import ConnectionPool, InstrumentedCursor
+from app.services import checkout_sessions
+from app.services.checkout_sessions import (
+    find_checkout_session,
+    find_open_checkout_session,
+    mark_checkout_session_completed,
+    record_checkout_session,
+)
+
+SUCCESS_URL = "https://app.example.com/success"
+
+
+@pytest.fixture(scope="module")
+def checkout_dsn(create_migrated_database):
+    return create_migrated_database("studio_genie_checkout_test")
+
+
+@pytest.fixture
+def db(checkout_dsn, monkeypatch):
+    pool = ConnectionPool(checkout_dsn, maxconn=2, timeout=5.0, cursor_factory=InstrumentedCursor)
+    monkeypatch.setattr(checkout_sessions, "get_connection", pool.getconn)
+    conn = psycopg2.connect(checkout_dsn)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE checkout_sessions")
+    yield conn
+    conn.close()
+    pool.close()
+
+
+def record(session_id, user_id, price_id="price_starter", expires_in=3600):
+    record_checkout_session(
+        session_id, user_id, price_id, "subscription",
+        url=f"https://checkout.stripe.com/{session_id}", success_url=SUCCESS_URL,
+        expires_at=int(time.time()) + expires_in,
+    )
+
+
+def find_open(user_id, price_id="price_starter", max_age_seconds=600):
+    return find_open_checkout_session(user_id, price_id, "subscription", SUCCESS_URL, max_age_seconds)
+
+
+# ---------------------------------------------------------
+# Index
+# ---------------------------------------------------------
+
+def test_recorded_session_is_found_and_first_write_wins(db):
+    user_id = str(uuid.uuid4())
+    record("cs_1", user_id)
+    record("cs_1", user_id, price_id="price_other")
+    row = find_checkout_session("cs_1")
+    assert (str(row["user_id"]), row["price_id"], row["mode"]) == (user_id, "price_starter", "subscription")
+    assert find_checkout_session("cs_missing") is None
+
+
+def test_newest_open_session_is_reused(db):
+    user_id = str(uuid.uuid4())
+    record("cs_old", user_id)
+    with db.cursor() as cur:
+        cur.execute("UPDATE checkout_sessions SET created_at = created_at - INTERVAL '1 minute'")
+    record("cs_new", user_id)
+    assert find_open(user_id)["session_id"] == "cs_new"
+    assert find_open(user_id, price_id="price_other") is None
+    assert find_open(str(uuid.uuid4())) is None
+
+
+def test_completed_expiring_or_old_sessions_are_not_reused(db):
+    paid, expiring, old = (str(uuid.uuid4()) for _ in range(3))
+    record("cs_paid", paid)
+    mark_checkout_session_completed("cs_paid")
+    record("cs_expiring", expiring, expires_in=checkout_sessions.REUSE_MIN_REMAINING_SECONDS - 60)
+    record("cs_old", old)
+    with db.cursor() as cur:
+        cur.execute("UPDATE checkout_sessions SET created_at = created_at - INTERVAL '20 minutes' WHERE session_id = 'cs_old'")
+    assert find_open(paid) is None
+    assert find_open(expiring) is None
+    assert find_open(old) is None
+    assert find_open(old, max_age_seconds=3600)["session_id"] == "cs_old"
+
+
+# ---------------------------------------------------------
+# Webhook price resolution: event, then index, then Stripe
+# ---------------------------------------------------------
+
+class FakeGateway:
+    def __init__(self):
+        self.retrieved = []
+
+    async def retrieve_checkout_session(self, session_id, expand=None):
+        self.retrieved.append(session_id)
+        return {"line_items": {"data": [{"price": {"id": "price_from_stripe"}}]}}
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    gateway = FakeGateway()
+    monkeypatch.setattr(webhook_stripe, "stripe_gateway", gateway)
+    return gateway
+
+
+def test_line_items_in_the_event_win(db, gateway):
+    record("cs_1", str(uuid.uuid4()))
+    session = {"id": "cs_1", "line_items": {"data": [{"price": {"id": "price_in_event"}}]}}
+    assert asyncio.run(resolve_checkout_price_id(session)) == "price_in_event"
+    assert gateway.retrieved == []
+
+
+def test_indexed_session_skips_stripe(db, gateway):
+    record("cs_1", str(uuid.uuid4()))
+    assert asyncio.run(resolve_checkout_price_id({"id": "cs_1"})) == "price_starter"
+    assert gateway.retrieved == []
+
+
+def test_index_miss_asks_stripe(db, gateway):
+    assert asyncio.run(resolve_checkout_price_id({"id": "cs_unknown", "line_items": None})) == "price_from_stripe"
+    assert gateway.retrieved == ["cs_unknown"]
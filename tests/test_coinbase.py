@@ -0,0 +1,123 @@
+import hashlib
+import hmac
+import threading
+import uuid
+
+import psycopg2
+import pytest
+
+from app.core.config import settings
+from app.core.database import ConnectionPool, InstrumentedCursor
+from app.services import coinbase_service as coinbase_module
+from app.services.coinbase_service import CoinbaseService, pack_credits
+
+BODY = b'{"event": {"type": "charge:confirmed"}}'
+
+
+def sign(body: bytes, secret: str) -> str:
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+# ---------------------------------------------------------
+# Signature
+# ---------------------------------------------------------
+
+def test_signature_with_the_secret_is_accepted(monkeypatch):
+    monkeypatch.setattr(settings, "COINBASE_WEBHOOK_SECRET", "cb_secret")
+    service = CoinbaseService()
+    assert service.verify_signature(BODY, sign(BODY, "cb_secret"))
+    assert not service.verify_signature(BODY, sign(BODY, "other"))
+    assert not service.verify_signature(BODY, "")
+
+
+def test_empty_secret_rejects_everything(monkeypatch):
+    monkeypatch.setattr(settings, "COINBASE_WEBHOOK_SECRET", "")
+    # Anyone can compute an HMAC with an empty key
+    assert not CoinbaseService().verify_signature(BODY, sign(BODY, ""))
+
+
+# ---------------------------------------------------------
+# Apply once (APPLY_CHARGE_SQL)
+# ---------------------------------------------------------
+
+@pytest.fixture(scope="module")
+def coinbase_dsn(create_migrated_database):
+    return create_migrated_database("studio_genie_coinbase_test")
+
+
+@pytest.fixture
+def db(coinbase_dsn, monkeypatch):
+    pool = ConnectionPool(coinbase_dsn, maxconn=4, timeout=5.0, cursor_factory=InstrumentedCursor)
+    monkeypatch.setattr(coinbase_module, "get_connection", pool.getconn)
+    conn = psycopg2.connect(coinbase_dsn)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE users, payments CASCADE")
+    yield conn
+    conn.close()
+    pool.close()
+
+
+def add_user(conn, credits) -> str:
+    user_id = str(uuid.uuid4())
+    with conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO users (id, email, password_hash, credits) VALUES (%s, %s, 'hash', %s)",
+            (user_id, f"{user_id}@example.com", credits),
+        )
+    return user_id
+
+
+def state(conn, user_id):
+    with conn.cursor() as cur:
+        cur.execute("SELECT credits FROM users WHERE id = %s", (user_id,))
+        credits = cur.fetchone()[0]
+        cur.execute("SELECT count(*) FROM payments WHERE provider = 'coinbase'")
+        return credits, cur.fetchone()[0]
+
+
+def charge(user_id, charge_id="chg_1", pack_key="30"):
+    return {"id": charge_id, "metadata": {"user_id": user_id, "pack_key": pack_key}}
+
+
+def test_replayed_charge_is_applied_once(db):
+    user_id = add_user(db, credits=5)
+    total = pack_credits("30")["total"]
+    service = CoinbaseService()
+
+    first = service.apply_confirmed_charge(charge(user_id))
+    assert first == {"outcome": "credited", "credits": total, "new_balance": 5 + total}
+    assert service.apply_confirmed_charge(charge(user_id)) == {"outcome": "duplicate"}
+    assert state(db, user_id) == (5 + total, 1)
+
+
+def test_concurrent_deliveries_credit_once(db):
+    user_id = add_user(db, credits=0)
+    service = CoinbaseService()
+    outcomes = []
+    threads = [
+        threading.Thread(target=lambda: outcomes.append(service.apply_confirmed_charge(charge(user_id))["outcome"]))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5.0)
+    assert sorted(outcomes) == ["credited", "duplicate", "duplicate", "duplicate"]
+    assert state(db, user_id) == (pack_credits("30")["total"], 1)
+
+
+def test_unknown_user_records_no_payment(db):
+    assert CoinbaseService().apply_confirmed_charge(charge(str(uuid.uuid4()))) == {"outcome": "unknown_user"}
+    with db.cursor() as cur:
+        cur.execute("SELECT count(*) FROM payments")
+        assert cur.fetchone()[0] == 0
+
+
+@pytest.mark.parametrize("bad", [
+    {"id": "chg_1", "metadata": {"user_id": "not-a-uuid", "pack_key": "30"}},
+    {"id": "chg_1", "metadata": {"user_id": str(uuid.uuid4()), "pack_key": "7"}},
+    {"metadata": {"user_id": str(uuid.uuid4()), "pack_key": "30"}},
+])
+def test_unusable_charge_is_invalid(db, bad):
+    assert CoinbaseService().apply_confirmed_charge(bad) == {"outcome": "invalid"}
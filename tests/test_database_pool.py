@@ -0,0 +1,44 @@
+import pytest
+
+from app.core.database import ConnectionPool, InstrumentedCursor
+
+
+@pytest.fixture
+def pool(database_url):
+    pool = ConnectionPool(database_url, maxconn=1, timeout=0.5, cursor_factory=InstrumentedCursor, sslmode="disable")
+    yield pool
+    pool.close()
+
+
+def test_with_block_returns_connection_when_body_raises(pool):
+    with pytest.raises(ValueError):
+        with pool.getconn() as conn:
+            cur = conn.cursor()
+            cur.execute("CREATE TEMP TABLE leak_check (id int)")
+            raise ValueError("handler failed")
+
+    assert pool.status()["in_use"] == 0
+    # The only slot is free again, and the open transaction was rolled back
+    with pool.getconn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT to_regclass('pg_temp.leak_check') AS table_name")
+        assert cur.fetchone()["table_name"] is None
+
+
+def test_with_block_does_not_commit(pool):
+    with pool.getconn() as conn:
+        cur = conn.cursor()
+        cur.execute("CREATE TEMP TABLE uncommitted (id int)")
+
+    with pool.getconn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT to_regclass('pg_temp.uncommitted') AS table_name")
+        assert cur.fetchone()["table_name"] is None
+
+
+def test_double_close_is_harmless(pool):
+    conn = pool.getconn()
+    conn.close()
+    conn.close()
+    assert pool.status()["idle"] == 1
+    assert pool.status()["in_use"] == 0
@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core import health as health_module
+from app.core.config import settings
+from app.core.health import HealthMonitor
+
+
+class Dependencies:
+    def __init__(self, monkeypatch):
+        self.db = {"ok": True, "latency_ms": 1.0}
+        self.pool = {"max": 10, "in_use": 2, "idle": 8, "waiting": 0}
+        self.stripe = {"ok": True}
+        self.lag_ms = 0.0
+        monkeypatch.setattr(health_module, "pool_status", lambda: dict(self.pool))
+        monkeypatch.setattr(health_module.loop_monitor, "take_max_lag", lambda: self.lag_ms)
+
+        async def ping_stripe():
+            return dict(self.stripe)
+
+        monkeypatch.setattr(health_module, "_ping_stripe", ping_stripe)
+
+    def monitor(self) -> HealthMonitor:
+        monitor = HealthMonitor()
+        monitor._ping_database = lambda: dict(self.db)
+        return monitor
+
+
+@pytest.fixture
+def deps(monkeypatch):
+    monkeypatch.setattr(settings, "HEALTH_LOOP_LAG_WARN_MS", 100.0)
+    return Dependencies(monkeypatch)
+
+
+def status(monitor: HealthMonitor):
+    asyncio.run(monitor.refresh())
+    code, body = monitor.snapshot()
+    return code, json.loads(body)["status"]
+
+
+def test_all_dependencies_up_is_ok(deps):
+    assert status(deps.monitor()) == (200, "ok")
+
+
+def test_unreachable_database_is_unhealthy(deps):
+    deps.db = {"ok": False, "error": "connection refused"}
+    assert status(deps.monitor()) == (503, "unhealthy")
+
+
+@pytest.mark.parametrize("pool", [
+    {"max": 10, "in_use": 10, "idle": 0, "waiting": 0},
+    {"max": 10, "in_use": 3, "idle": 0, "waiting": 2},
+])
+def test_saturated_pool_is_degraded_not_unhealthy(deps, pool):
+    deps.pool = pool
+    assert status(deps.monitor()) == (200, "degraded")
+
+
+def test_stripe_down_is_degraded(deps):
+    deps.stripe = {"ok": False, "error": "circuit open"}
+    assert status(deps.monitor()) == (200, "degraded")
+
+
+def test_loop_lag_is_degraded(deps):
+    deps.lag_ms = 250.0
+    assert status(deps.monitor()) == (200, "degraded")
+
+
+def test_never_refreshed_or_stale_snapshot_is_unhealthy(deps):
+    monitor = deps.monitor()
+    assert monitor.snapshot()[0] == 503
+    asyncio.run(monitor.refresh())
+    monitor._refreshed_at -= 3 * settings.HEALTH_REFRESH_INTERVAL_SECONDS + 1
+    code, body = monitor.snapshot()
+    assert code == 503
+    assert json.loads(body)["reason"] == "health snapshot stale"
+
+
+def test_draining_overrides_the_snapshot(deps, monkeypatch):
+    monitor = deps.monitor()
+    asyncio.run(monitor.refresh())
+    monkeypatch.setattr(health_module.shutdown_coordinator, "draining", True)
+    code, body = monitor.snapshot()
+    assert code == 503
+    assert json.loads(body)["status"] == "draining"
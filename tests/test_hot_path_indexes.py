@@ -0,0 +1,62 @@
+"""
+EXPLAIN regression test for the hot queries, against the schema production
+gets: database_schema.sql plus `python -m app.core.migrate up` (so
+migrations/009_hot_path_indexes.sql, not benchmarks/schema.sql).
+"""
+import psycopg2
+import pytest
+
+from benchmarks.explain_check import HOT_QUERIES, check_query
+
+SEED_SQL = """
+INSERT INTO users (email, password_hash, credits, stripe_customer_id, subscription_status, subscription_plan)
+SELECT 'user' || i || '@example.com', 'hash', 10, 'cus_' || i,
+       CASE WHEN i % 3 = 0 THEN 'active' ELSE 'inactive' END, 'starter'
+FROM generate_series(1, 5000) AS i;
+
+-- 0-39 videos per user, about 20 on average, and 400 for every 500th user
+-- (like the benchmark seed's hot users), inserted in random order: a
+-- user's videos are spread over the heap
+INSERT INTO videos (user_id, prompt, style, status, created_at)
+SELECT u.id, 'prompt', 'cinematic', 'done', NOW() - g * INTERVAL '1 minute'
+FROM (
+    SELECT id, row_number() OVER (ORDER BY email) AS n FROM users
+) AS u
+CROSS JOIN LATERAL generate_series(1, CASE WHEN u.n % 500 = 0 THEN 400 ELSE u.n % 40 END) AS g
+ORDER BY random();
+"""
+
+
+@pytest.fixture(scope="module")
+def migrated_database(create_migrated_database):
+    conn = psycopg2.connect(create_migrated_database("studio_genie_explain_test"))
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(SEED_SQL)
+            cur.execute("VACUUM ANALYZE users")  # index-only scans need the visibility map
+            cur.execute("VACUUM ANALYZE videos")
+            cur.execute("SELECT user_id::text FROM videos GROUP BY user_id ORDER BY count(*) DESC LIMIT 1")
+            video_user_id = cur.fetchone()[0]
+            cur.execute("SELECT id::text, email FROM users WHERE email = 'user2500@example.com'")
+            user_id, email = cur.fetchone()
+        params = {
+            "user_id": user_id,
+            "email": email.upper(),
+            "email_lower": email,
+            "customer_id": "cus_2500",
+            "video_user_id": video_user_id,
+            "page_size": 20,
+            "offset": 40,
+        }
+        yield conn, params
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_uses_its_index(migrated_database, name):
+    conn, params = migrated_database
+    with conn.cursor() as cur:
+        result = check_query(cur, name, params)
+    assert result["problems"] == [], f"{name}: {result['scans']}"
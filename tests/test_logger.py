@@ -0,0 +1,80 @@
+import json
+import logging
+import queue
+import threading
+
+import pytest
+
+from app.utils.logger import JsonFormatter, Lazy, NonBlockingQueueHandler, SamplingFilter, _ReportingListener
+
+
+def record(level=logging.DEBUG, category=None, **extra) -> logging.LogRecord:
+    fields = {"category": category, **extra} if category else extra
+    return logging.makeLogRecord({
+        "name": "app.services.stripe_service", "levelno": level, "levelname": logging.getLevelName(level),
+        "msg": "[STRIPE CHECKOUT] %s", "args": ("step",), **fields,
+    })
+
+
+# ---------------------------------------------------------
+# Queue handler
+# ---------------------------------------------------------
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=2))
+    caller = threading.Thread(target=lambda: [handler.handle(record(logging.INFO)) for _ in range(5)])
+    caller.start()
+    caller.join(1.0)
+    assert not caller.is_alive()
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+
+def test_records_are_enqueued_unformatted():
+    evaluated = []
+    handler = NonBlockingQueueHandler(queue.Queue())
+    handler.handle(record(logging.INFO, payload=Lazy(lambda: evaluated.append(1) or "{}")))
+    queued = handler.queue.get_nowait()
+    assert evaluated == []
+    assert queued.args == ("step",)  # %-args not merged in the caller's thread
+
+
+def test_listener_reports_drops_once():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    for _ in range(3):
+        handler.handle(record(logging.INFO))
+    written = []
+
+    class Collect(logging.Handler):
+        def emit(self, rec):
+            written.append(rec.getMessage())
+
+    listener = _ReportingListener(handler.queue, Collect(), handler)
+    listener.handle(handler.queue.get_nowait())
+    listener.handle(record(logging.INFO))
+    assert written == [
+        "[LOGGING] Queue full, dropped 2 record(s)",
+        "[STRIPE CHECKOUT] step",
+        "[STRIPE CHECKOUT] step",
+    ]
+
+
+# ---------------------------------------------------------
+# Sampling and formatting
+# ---------------------------------------------------------
+
+@pytest.mark.parametrize("level", [logging.INFO, logging.WARNING, logging.ERROR])
+def test_sampling_never_drops_info_or_above(level):
+    assert SamplingFilter({"stripe.checkout": 0.0}).filter(record(level, category="stripe.checkout"))
+
+
+def test_sampling_applies_to_debug_by_category_then_logger():
+    sampling = SamplingFilter({"stripe.checkout": 0.0, "app.services.stripe_service": 0.0})
+    assert not sampling.filter(record(category="stripe.checkout"))
+    assert not sampling.filter(record())  # no category: the logger name
+    assert sampling.filter(record(category="credits"))
+
+
+def test_json_formatter_resolves_lazy_fields():
+    line = json.loads(JsonFormatter().format(record(logging.INFO, price_id="price_1", size=Lazy(lambda: 3))))
+    assert (line["msg"], line["price_id"], line["size"], line["level"]) == ("[STRIPE CHECKOUT] step", "price_1", 3, "INFO")
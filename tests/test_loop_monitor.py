@@ -0,0 +1,78 @@
+import asyncio
+import socket
+
+import pytest
+
+from app.core import loop_monitor as monitor_module
+from app.core.config import settings
+from app.core.database import get_connection
+from app.core.loop_monitor import BlockingCallError, LoopMonitor, check_blocking_call
+
+
+@pytest.fixture
+def strict_mode():
+    monitor_module.install_strict_mode()
+    yield
+    monitor_module.uninstall_strict_mode()
+
+
+def test_blocking_call_on_the_loop_raises(strict_mode):
+    async def handler():
+        check_blocking_call("test call")
+
+    with pytest.raises(BlockingCallError, match="test call"):
+        asyncio.run(handler())
+
+
+def test_get_connection_on_the_loop_raises_before_connecting(strict_mode):
+    async def handler():
+        get_connection()
+
+    with pytest.raises(BlockingCallError, match="psycopg2 get_connection"):
+        asyncio.run(handler())
+
+
+def test_blocking_socket_on_the_loop_raises(strict_mode):
+    async def handler():
+        with socket.socket() as sock:
+            sock.connect(("127.0.0.1", 9))
+
+    with pytest.raises(BlockingCallError, match="socket.connect"):
+        asyncio.run(handler())
+
+
+def test_threadpool_and_sync_code_may_block(strict_mode):
+    async def handler():
+        await asyncio.to_thread(check_blocking_call, "in a worker thread")
+
+    asyncio.run(handler())
+    check_blocking_call("outside any loop")
+
+
+def test_uninstall_restores_socket():
+    original = socket.socket.connect
+    monitor_module.install_strict_mode()
+    assert socket.socket.connect is not original
+    monitor_module.uninstall_strict_mode()
+    assert socket.socket.connect is original
+
+    async def handler():
+        check_blocking_call("after uninstall")
+
+    asyncio.run(handler())
+
+
+def test_loop_strict_mode_setting_installs_with_the_monitor(monkeypatch):
+    monkeypatch.setattr(settings, "LOOP_STRICT_MODE", True)
+    monitor = LoopMonitor()
+
+    async def run():
+        monitor.start()
+        try:
+            with pytest.raises(BlockingCallError):
+                check_blocking_call("while monitored")
+        finally:
+            await monitor.stop()
+        check_blocking_call("after stop")
+
+    asyncio.run(run())
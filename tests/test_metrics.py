@@ -0,0 +1,56 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.core.metrics import MetricsMiddleware, render_metrics
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def requests_total(method: str, route: str, status: str) -> float:
+    return REGISTRY.get_sample_value(
+        "http_requests_total", {"method": method, "route": route, "status": status}
+    ) or 0.0
+
+
+def test_routes_are_labelled_by_template():
+    router = APIRouter(prefix="/metrics-test")
+
+    @router.get("/items/{item_id}")
+    async def get_item(item_id: str):
+        return {"id": item_id}
+
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(MetricsMiddleware)
+
+    before = requests_total("GET", "/metrics-test/items/{item_id}", "200")
+    unmatched = requests_total("GET", "unmatched", "404")
+    with TestClient(app) as client:
+        client.get("/metrics-test/items/a")
+        client.get("/metrics-test/items/b")
+        client.get("/metrics-test/nothing-here")
+
+    assert requests_total("GET", "/metrics-test/items/{item_id}", "200") == before + 2
+    assert requests_total("GET", "unmatched", "404") == unmatched + 1
+    assert REGISTRY.get_sample_value("http_requests_total", {
+        "method": "GET", "route": "/metrics-test/items/a", "status": "200",
+    }) is None
+
+
+WORKER = "import sys; from app.core.metrics import record_credits_granted; record_credits_granted('multiprocess_test', int(sys.argv[1]))"
+
+
+def test_render_aggregates_every_worker(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    for amount in (3, 4):  # two worker processes, each with its own mmap file
+        subprocess.run([sys.executable, "-c", WORKER, str(amount)], cwd=ROOT, check=True)
+    assert len(list(tmp_path.glob("counter_*.db"))) == 2
+
+    body, content_type = render_metrics()
+    assert content_type.startswith("text/plain")
+    assert 'credits_granted_total{source="multiprocess_test"} 7.0' in body.decode()
@@ -0,0 +1,139 @@
+import psycopg2
+import pytest
+
+from app.core.migrate import MigrationRunner, load_migrations, parse_steps, split_statements
+
+SCHEMA = "migrate_test"
+
+
+def test_split_ignores_semicolons_in_quotes_comments_and_bodies():
+    sql = """
+    -- a comment; not a statement
+    CREATE TABLE t (note TEXT DEFAULT 'a;b' /* block; comment */);
+    CREATE FUNCTION f() RETURNS void AS $$ BEGIN PERFORM 1; END; $$ LANGUAGE plpgsql;
+    -- trailing comment
+    """
+    statements = split_statements(sql)
+    assert len(statements) == 2
+    assert statements[1].endswith("LANGUAGE plpgsql;")
+
+
+def test_backfill_directive_is_parsed():
+    steps = parse_steps(
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx ON t(c);\n"
+        "-- migrate:backfill batch_size=500 sleep_ms=5\n"
+        "UPDATE t SET c = 1 WHERE id IN (SELECT id FROM t WHERE c IS NULL LIMIT {batch_size});"
+    )
+    assert [step.backfill for step in steps] == [None, {"batch_size": 500, "sleep_ms": 5}]
+
+
+def test_load_orders_versions_and_detects_modes(tmp_path):
+    (tmp_path / "002_online.sql").write_text("-- migrate:no-transaction\nCREATE INDEX CONCURRENTLY i ON t(c);")
+    (tmp_path / "001_create.sql").write_text("CREATE TABLE t (c INT);")
+    (tmp_path / "notes.sql").write_text("-- ignored: no version")
+    migrations = load_migrations(tmp_path)
+    assert [(m.version, m.transactional) for m in migrations] == [(1, True), (2, False)]
+
+
+def test_duplicate_versions_are_rejected(tmp_path):
+    (tmp_path / "001_a.sql").write_text("SELECT 1;")
+    (tmp_path / "001_b.sql").write_text("SELECT 1;")
+    with pytest.raises(RuntimeError, match="Duplicate migration versions: \\[1\\]"):
+        load_migrations(tmp_path)
+
+
+# ---------------------------------------------------------
+# Against Postgres, in a scratch schema
+# ---------------------------------------------------------
+
+@pytest.fixture
+def connect(database_url):
+    setup = psycopg2.connect(database_url)
+    setup.autocommit = True
+    with setup.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cur.execute(f"CREATE SCHEMA {SCHEMA}")
+    opened = []
+
+    def connect():
+        conn = psycopg2.connect(database_url, options=f"-c search_path={SCHEMA}")
+        opened.append(conn)
+        return conn
+
+    yield connect
+    for conn in opened:
+        conn.close()
+    with setup.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    setup.close()
+
+
+@pytest.fixture
+def migrations(tmp_path):
+    (tmp_path / "001_create_users.sql").write_text(
+        "CREATE TABLE users (id INT PRIMARY KEY, credits INT);\nINSERT INTO users VALUES (1, 10);"
+    )
+    (tmp_path / "002_add_status.sql").write_text("ALTER TABLE users ADD COLUMN subscription_status TEXT;")
+    (tmp_path / "003_index_status.sql").write_text(
+        "-- migrate:no-transaction\nCREATE INDEX CONCURRENTLY IF NOT EXISTS idx_status ON users(subscription_status);"
+    )
+    return tmp_path
+
+
+def runner(conn, directory) -> MigrationRunner:
+    runner = MigrationRunner(conn, load_migrations(directory))
+    runner.ensure_version_table()
+    return runner
+
+
+def test_second_run_cannot_take_the_lock(connect, migrations):
+    first = runner(connect(), migrations)
+    first.acquire_lock(0)
+    with pytest.raises(RuntimeError, match="holds the lock"):
+        runner(connect(), migrations).acquire_lock(0)
+    first.release_lock()
+    runner(connect(), migrations).acquire_lock(0)
+
+
+def test_up_applies_pending_in_order_once(connect, migrations):
+    migrate = runner(connect(), migrations)
+    assert migrate.up() == [1, 2, 3]
+    assert migrate.up() == []
+    assert [row["state"] for row in migrate.status()] == ["applied"] * 3
+
+
+def test_failed_transactional_migration_records_nothing(connect, migrations):
+    (migrations / "004_broken.sql").write_text("UPDATE users SET credits = 0;\nSELECT no_such_column FROM users;")
+    conn = connect()
+    migrate = runner(conn, migrations)
+    with pytest.raises(psycopg2.Error):
+        migrate.up()
+    assert sorted(migrate.applied()) == [1, 2, 3]
+    with conn.cursor() as cur:
+        cur.execute("SELECT credits FROM users")
+        assert cur.fetchone()[0] == 10  # rolled back with the migration
+
+
+def test_baseline_skips_migrations_applied_by_hand(connect, migrations):
+    conn = connect()
+    with conn.cursor() as cur:
+        cur.execute("CREATE TABLE users (id INT PRIMARY KEY, credits INT, subscription_status TEXT)")
+    conn.commit()
+    migrate = runner(conn, migrations)
+
+    with pytest.raises(RuntimeError, match="no migration history"):
+        migrate.guard_unrecorded_database()
+
+    migrate.baseline(2)
+    migrate.guard_unrecorded_database()
+    assert migrate.up() == [3]
+    assert [row["state"] for row in migrate.status()] == ["baseline", "baseline", "applied"]
+    with pytest.raises(RuntimeError, match="without migration history"):
+        migrate.baseline(3)
+
+
+def test_status_flags_a_file_edited_after_it_was_applied(connect, migrations):
+    runner(connect(), migrations).up()
+    (migrations / "002_add_status.sql").write_text("ALTER TABLE users ADD COLUMN subscription_status VARCHAR(20);")
+    states = [row["state"] for row in runner(connect(), migrations).status()]
+    assert states == ["applied", "applied (file changed since)", "applied"]
@@ -0,0 +1,141 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.routes import usage
+from app.core import query_audit
+from app.core.config import settings
+from app.core.database import ConnectionPool, InstrumentedCursor
+from app.core.prepared import CREDITS_BY_ID, DEBIT_CREDITS, GRANT_CREDITS, PreparedStatementRegistry
+from app.core.query_audit import QueryLog
+
+
+def test_placeholders_become_numbered_parameters():
+    statement = PreparedStatementRegistry().register(
+        "like_email", "SELECT id FROM users WHERE email LIKE '%%' || %s AND credits > %s", ("text", "int")
+    )
+    assert statement.prepare_sql == (
+        "PREPARE like_email (text, int) AS SELECT id FROM users WHERE email LIKE '%' || $1 AND credits > $2"
+    )
+    assert statement.execute_sql == "EXECUTE like_email (%s, %s)"
+
+
+def test_registry_rejects_duplicates_and_wrong_type_counts():
+    registry = PreparedStatementRegistry()
+    registry.register("one", "SELECT %s")
+    with pytest.raises(ValueError, match="Duplicate prepared statement: one"):
+        registry.register("one", "SELECT 1")
+    with pytest.raises(ValueError, match="1 parameters, 2 types"):
+        registry.register("two", "SELECT %s", ("int", "int"))
+
+
+# ---------------------------------------------------------
+# On pooled connections
+# ---------------------------------------------------------
+
+@pytest.fixture(scope="module")
+def prepared_dsn(create_migrated_database):
+    return create_migrated_database("studio_genie_prepared_test")
+
+
+@pytest.fixture
+def pool(prepared_dsn, monkeypatch):
+    monkeypatch.setattr(settings, "DB_PREPARED_STATEMENTS", True)
+    pool = ConnectionPool(prepared_dsn, maxconn=2, timeout=5.0, cursor_factory=InstrumentedCursor)
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def user_id(pool):
+    user_id = str(uuid.uuid4())
+    conn = pool.getconn()
+    with conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO users (id, email, password_hash, credits) VALUES (%s, %s, 'hash', 7)",
+            (user_id, f"{user_id}@example.com"),
+        )
+    conn.commit()
+    conn.close()
+    return user_id
+
+
+def server_prepared(conn) -> list:
+    with conn.cursor() as cur:
+        cur.execute("SELECT name FROM pg_prepared_statements")
+        return [row["name"] for row in cur.fetchall()]
+
+
+def test_prepared_once_per_connection_and_kept_across_rollback(pool, user_id):
+    conn = pool.getconn()
+    for _ in range(2):
+        with conn.cursor() as cur:
+            cur.execute_prepared(CREDITS_BY_ID, (user_id,))
+            assert cur.fetchone()["credits"] == 7
+        conn.rollback()
+    assert conn._prepared == {"credits_by_id"}
+    assert server_prepared(conn) == ["credits_by_id"]
+    conn.close()
+
+
+def test_a_new_connection_prepares_again(pool, user_id):
+    first, second = pool.getconn(), pool.getconn()
+    with first.cursor() as cur:
+        cur.execute_prepared(CREDITS_BY_ID, (user_id,))
+    with second.cursor() as cur:
+        cur.execute_prepared(CREDITS_BY_ID, (user_id,))
+        assert cur.fetchone()["credits"] == 7
+    assert server_prepared(second) == ["credits_by_id"]
+    first.close()
+    second.close()
+
+
+def test_disabled_runs_the_plain_sql(pool, user_id, monkeypatch):
+    monkeypatch.setattr(settings, "DB_PREPARED_STATEMENTS", False)
+    conn = pool.getconn()
+    with conn.cursor() as cur:
+        cur.execute_prepared(CREDITS_BY_ID, (user_id,))
+        assert cur.fetchone()["credits"] == 7
+    assert server_prepared(conn) == []
+    conn.close()
+
+
+def test_recorded_under_the_statement_sql_once(pool, user_id):
+    log = QueryLog({"method": "GET", "path": "/usage/balance"})
+    token = query_audit._current_log.set(log)
+    try:
+        conn = pool.getconn()
+        with conn.cursor() as cur:
+            cur.execute_prepared(CREDITS_BY_ID, (user_id,))
+            cur.execute_prepared(CREDITS_BY_ID, (user_id,))
+        conn.close()
+    finally:
+        query_audit._current_log.reset(token)
+    assert [s.fingerprint for s in log.statements] == [query_audit.fingerprint(CREDITS_BY_ID.sql)] * 2
+
+
+def test_debit_applies_only_when_the_balance_covers_it(pool, user_id):
+    conn = pool.getconn()
+    with conn.cursor() as cur:
+        cur.execute_prepared(DEBIT_CREDITS, (5, 5, user_id))
+        assert cur.fetchone()["credits"] == 2
+        cur.execute_prepared(DEBIT_CREDITS, (5, 5, user_id))
+        assert cur.fetchone() is None
+        cur.execute_prepared(GRANT_CREDITS, (4, user_id))
+        assert cur.fetchone()["credits"] == 6
+    conn.rollback()
+    conn.close()
+
+
+def test_consume_refuses_instead_of_overdrawing(pool, user_id, monkeypatch):
+    monkeypatch.setattr(usage, "get_connection", pool.getconn)
+
+    def consume():
+        return asyncio.run(usage.consume_credits(amount=4, user={"user_id": user_id}))
+
+    assert consume()["remaining"] == 3
+    with pytest.raises(HTTPException) as refused:
+        consume()
+    assert refused.value.status_code == 402
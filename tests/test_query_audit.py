@@ -0,0 +1,46 @@
+import pytest
+
+from app.core.config import settings
+from app.core.query_audit import QueryBudgetExceeded, QueryLog, fingerprint
+
+
+@pytest.fixture
+def strict(monkeypatch):
+    monkeypatch.setattr(settings, "SQL_STRICT_MODE", True)
+    monkeypatch.setattr(settings, "SQL_STATEMENT_BUDGET", 3)
+    monkeypatch.setattr(settings, "SQL_REPEAT_LIMIT", 2)
+
+
+def _log() -> QueryLog:
+    return QueryLog({"method": "GET", "path": "/test"})
+
+
+def test_fingerprint_ignores_values():
+    assert fingerprint("SELECT * FROM users WHERE id = 'a' AND credits > 5") == fingerprint(
+        "SELECT *  FROM users WHERE id = %s AND credits > %s"
+    )
+
+
+def test_strict_mode_raises_over_budget(strict):
+    log = _log()
+    for table in ("users", "videos", "payments"):
+        log.record(f"SELECT ? FROM {table}", 0.001, 1)
+    with pytest.raises(QueryBudgetExceeded, match="exceed budget of 3"):
+        log.record("SELECT ? FROM pending_subscriptions", 0.001, 1)
+
+
+def test_strict_mode_raises_on_repeated_statement(strict):
+    log = _log()
+    log.record("SELECT ? FROM videos WHERE id = ?", 0.001, 1)
+    log.record("SELECT ? FROM videos WHERE id = ?", 0.001, 1)
+    with pytest.raises(QueryBudgetExceeded, match="likely N\\+1"):
+        log.record("SELECT ? FROM videos WHERE id = ?", 0.001, 1)
+
+
+def test_violations_are_only_recorded_outside_strict_mode(monkeypatch):
+    monkeypatch.setattr(settings, "SQL_STRICT_MODE", False)
+    monkeypatch.setattr(settings, "SQL_STATEMENT_BUDGET", 1)
+    log = _log()
+    log.record("SELECT ? FROM users", 0.001, 1)
+    log.record("SELECT ? FROM videos", 0.001, 1)
+    assert log.violations == ["2 statements exceed budget of 1"]
@@ -0,0 +1,197 @@
+import time
+import uuid
+
+import psycopg2
+import pytest
+from psycopg2.extras import RealDictCursor
+
+from app.billing import reconcile as reconcile_module
+from app.billing.reconcile import reconcile
+
+STARTER = "price_1SjjxCBBwifSvpdI963oyLLB"
+CREATOR = "price_1SjjxfBBwifSvpdIeWCEYEQY"
+DAY = 86400
+
+
+class FakeList:
+    def __init__(self, objects):
+        self.objects = objects
+
+    def auto_paging_iter(self):
+        return iter(self.objects)
+
+
+class FakeResource:
+    def __init__(self, objects):
+        self.objects = objects
+        self.calls = []
+
+    def list(self, params):
+        self.calls.append(params)
+        return FakeList(self.objects)
+
+
+class FakeStripe:
+    """The v1.subscriptions / v1.invoices listings reconcile reads."""
+
+    def __init__(self, subscriptions, invoices):
+        self.v1 = type("V1", (), {})()
+        self.v1.subscriptions = FakeResource(subscriptions)
+        self.v1.invoices = FakeResource(invoices)
+
+
+def subscription(sub_id, customer_id, status, price_id=STARTER):
+    return {
+        "id": sub_id, "customer": customer_id, "status": status,
+        "items": {"data": [{"price": {"id": price_id}}]},
+        "created": int(time.time()) - 90 * DAY,
+    }
+
+
+def invoice(invoice_id, customer_id, sub_id, days_ago, price_id=STARTER):
+    return {
+        "id": invoice_id, "customer": customer_id, "subscription": sub_id,
+        "lines": {"data": [{"price": {"id": price_id}}]},
+        "amount_paid": 3900, "created": int(time.time()) - days_ago * DAY,
+    }
+
+
+@pytest.fixture(scope="module")
+def reconcile_dsn(create_migrated_database):
+    return create_migrated_database("studio_genie_reconcile_test")
+
+
+@pytest.fixture
+def db(reconcile_dsn, monkeypatch):
+    monkeypatch.setattr(
+        reconcile_module, "get_connection", lambda: psycopg2.connect(reconcile_dsn, cursor_factory=RealDictCursor)
+    )
+    conn = psycopg2.connect(reconcile_dsn, cursor_factory=RealDictCursor)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE users, stripe_invoice_grants, pending_subscriptions CASCADE")
+    yield conn
+    conn.close()
+
+
+def add_user(conn, customer_id, status="active", plan="starter", sub_id=None, credits=0):
+    user_id = str(uuid.uuid4())
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO users (id, email, password_hash, credits, subscription_status, subscription_plan,
+                               stripe_customer_id, stripe_subscription_id)
+            VALUES (%s, %s, 'hash', %s, %s, %s, %s, %s)
+            """,
+            (user_id, f"{customer_id}@example.com", credits, status, plan, customer_id, sub_id),
+        )
+    return user_id
+
+
+def grant(conn, invoice_id, user_id, days_ago=30):
+    with conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO stripe_invoice_grants (invoice_id, user_id, credits, granted_at) "
+            "VALUES (%s, %s, 12, NOW() - make_interval(days => %s))",
+            (invoice_id, user_id, days_ago),
+        )
+
+
+def user(conn, user_id):
+    with conn.cursor() as cur:
+        cur.execute("SELECT subscription_status, subscription_plan, credits FROM users WHERE id = %s", (user_id,))
+        return cur.fetchone()
+
+
+def plan_counts(report):
+    return {action: summary["count"] for action, summary in report["plan"].items()}
+
+
+def test_plan_finds_each_kind_of_drift(db, tmp_path):
+    canceled = add_user(db, "cus_canceled", sub_id="sub_canceled")
+    add_user(db, "cus_inactive", status="inactive", sub_id="sub_inactive")
+    add_user(db, "cus_upgraded", sub_id="sub_upgraded")
+    in_sync = add_user(db, "cus_in_sync", sub_id="sub_in_sync")
+    grant(db, "in_granted", in_sync)
+    stripe = FakeStripe(
+        subscriptions=[
+            subscription("sub_canceled", "cus_canceled", "canceled"),
+            subscription("sub_inactive", "cus_inactive", "active"),
+            subscription("sub_upgraded", "cus_upgraded", "active", CREATOR),
+            subscription("sub_in_sync", "cus_in_sync", "active"),
+        ],
+        invoices=[
+            invoice("in_granted", "cus_in_sync", "sub_in_sync", 20),
+            invoice("in_missing", "cus_in_sync", "sub_in_sync", 2),
+            invoice("in_orphan", "cus_nobody", "sub_nobody", 2),
+        ],
+    )
+
+    report = reconcile(str(tmp_path / "plan.jsonl"), client=stripe)
+
+    assert plan_counts(report) == {"activate": 2, "deactivate": 1, "grant_credits": 1, "orphan_invoice": 1}
+    assert stripe.v1.subscriptions.calls == [{"status": "all", "limit": 100}]
+    assert user(db, canceled)["subscription_status"] == "active"  # dry run
+
+
+def test_unlisted_subscription_is_never_deactivated(db, tmp_path):
+    # Subscribed (or converted from trial) after the listing passed it:
+    # Stripe didn't return the subscription, so the user is paying
+    new_subscriber = add_user(db, "cus_new", sub_id="sub_new")
+    # Old subscription canceled, new one created mid-run
+    resubscribed = add_user(db, "cus_resub", sub_id="sub_resub_new")
+    canceled = add_user(db, "cus_canceled", sub_id="sub_canceled")
+    stripe = FakeStripe(
+        subscriptions=[
+            subscription("sub_resub_old", "cus_resub", "canceled"),
+            subscription("sub_canceled", "cus_canceled", "canceled"),
+        ],
+        invoices=[],
+    )
+
+    report = reconcile(str(tmp_path / "plan.jsonl"), apply=True, force=True, client=stripe)
+
+    assert plan_counts(report) == {"deactivate": 1}
+    assert user(db, canceled)["subscription_status"] == "inactive"
+    assert user(db, new_subscriber)["subscription_status"] == "active"
+    assert user(db, resubscribed)["subscription_status"] == "active"
+
+
+def test_apply_repairs_and_second_run_is_clean(db, tmp_path):
+    inactive = add_user(db, "cus_inactive", status="inactive", plan=None, sub_id="sub_inactive")
+    missing = add_user(db, "cus_missing", sub_id="sub_missing", credits=5)
+    grant(db, "in_old", missing)
+    stripe = FakeStripe(
+        subscriptions=[
+            subscription("sub_inactive", "cus_inactive", "trialing", CREATOR),
+            subscription("sub_missing", "cus_missing", "active"),
+        ],
+        invoices=[
+            invoice("in_old", "cus_missing", "sub_missing", 25),
+            invoice("in_missing", "cus_missing", "sub_missing", 3),
+            invoice("in_in_flight", "cus_missing", "sub_missing", 0),  # within --settle-minutes
+        ],
+    )
+
+    report = reconcile(str(tmp_path / "plan.jsonl"), apply=True, client=stripe)
+
+    assert report["applied"] == {"activate": 1, "deactivate": 0, "grant_credits": 1}
+    assert user(db, inactive)["subscription_status"] == "active"
+    assert user(db, inactive)["subscription_plan"] == "creator"
+    assert user(db, missing)["credits"] == 5 + 12
+
+    again = reconcile(str(tmp_path / "again.jsonl"), apply=True, client=stripe)
+    assert plan_counts(again) == {}
+    assert user(db, missing)["credits"] == 5 + 12
+
+
+def test_apply_refuses_mass_deactivation_without_force(db, tmp_path):
+    for i in range(3):
+        add_user(db, f"cus_{i}", sub_id=f"sub_{i}")
+    stripe = FakeStripe(
+        subscriptions=[subscription(f"sub_{i}", f"cus_{i}", "canceled") for i in range(3)],
+        invoices=[],
+    )
+
+    with pytest.raises(RuntimeError, match="Refusing to deactivate 3 of 3"):
+        reconcile(str(tmp_path / "plan.jsonl"), apply=True, client=stripe)
@@ -0,0 +1,109 @@
+import pytest
+from psycopg2.pool import PoolError
+
+from app.core import query_audit
+from app.core.config import settings
+from app.core.database import ConnectionPool, InstrumentedCursor
+from app.core.query_audit import QueryLog
+from app.core.replica import ReplicaRouter
+
+
+class FakeCursor:
+    def __init__(self, lag):
+        self.lag = lag
+
+    def execute(self, query, vars=None):
+        pass
+
+    def fetchone(self):
+        return {"lag_seconds": self.lag}
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def __init__(self, lag):
+        self.lag = lag
+        self.closed = False
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self.lag)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class FakePool:
+    def __init__(self, lag=0.0, error=None):
+        self.lag = lag
+        self.error = error
+        self.checkouts = 0
+
+    def getconn(self):
+        self.checkouts += 1
+        if self.error is not None:
+            raise self.error
+        return FakeConn(self.lag)
+
+
+@pytest.fixture
+def replica_settings(monkeypatch):
+    monkeypatch.setattr(settings, "DATABASE_READ_URL", "postgresql://replica/test")
+    monkeypatch.setattr(settings, "DB_REPLICA_MAX_LAG_SECONDS", 2.0)
+    monkeypatch.setattr(settings, "DB_REPLICA_LAG_CHECK_SECONDS", 60.0)
+    monkeypatch.setattr(settings, "DB_READ_YOUR_WRITES_SECONDS", 5.0)
+
+
+def test_caught_up_replica_serves_reads(replica_settings):
+    router = ReplicaRouter()
+    assert router.checkout(FakePool(lag=0.5), user_id="u1") is not None
+
+
+def test_pinned_user_reads_from_primary(replica_settings):
+    router = ReplicaRouter()
+    pool = FakePool()
+    router.pin_user("u1")
+    assert router.checkout(pool, user_id="u1") is None
+    assert pool.checkouts == 0
+    assert router.checkout(pool, user_id="u2") is not None
+
+
+def test_lagging_replica_falls_back_until_next_check(replica_settings):
+    router = ReplicaRouter()
+    pool = FakePool(lag=10.0)
+    assert router.checkout(pool) is None
+    # Lag is cached until the next check: no replica checkout meanwhile
+    pool.lag = 0.0
+    assert router.checkout(pool) is None
+    assert pool.checkouts == 1
+
+
+def test_busy_replica_pool_falls_back(replica_settings):
+    router = ReplicaRouter()
+    assert router.checkout(FakePool(error=PoolError("exhausted"))) is None
+
+
+def test_unreachable_replica_is_skipped(replica_settings):
+    router = ReplicaRouter()
+    pool = FakePool(error=OSError("connection refused"))
+    assert router.checkout(pool) is None
+    assert router.checkout(pool) is None
+    assert pool.checkouts == 1
+
+
+def test_lag_probe_stays_out_of_the_request_query_log(replica_settings, database_url):
+    pool = ConnectionPool(database_url, maxconn=1, timeout=0.5, cursor_factory=InstrumentedCursor, sslmode="disable")
+    log = QueryLog({"method": "GET", "path": "/users/me"})
+    token = query_audit._current_log.set(log)
+    try:
+        conn = ReplicaRouter().checkout(pool)
+        assert conn is not None
+        conn.close()
+    finally:
+        query_audit._current_log.reset(token)
+        pool.close()
+    assert log.statements == []
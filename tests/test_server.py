@@ -0,0 +1,85 @@
+"""
+DrainingServer overrides uvicorn internals (handle_exit, on_tick, shutdown
+and the private _captured_signals). These fail if a uvicorn upgrade
+changes them.
+"""
+import asyncio
+import inspect
+import signal
+
+import pytest
+import uvicorn
+
+from app.server import DrainingServer
+
+
+class FakeCoordinator:
+    def __init__(self):
+        self.drain_started = False
+        self.release = asyncio.Event()
+
+    def begin_drain(self, timeout: float):
+        self.drain_started = True
+
+    async def drain_work(self):
+        await self.release.wait()
+
+    @property
+    def remaining(self) -> float:
+        return 1.0
+
+
+async def app(scope, receive, send):
+    pass
+
+
+@pytest.fixture
+def server():
+    return DrainingServer(uvicorn.Config(app), FakeCoordinator(), drain_timeout=5.0)
+
+
+def test_uvicorn_server_internals_are_still_there():
+    base = uvicorn.Server(uvicorn.Config(app))
+    assert base._captured_signals == []
+    assert list(inspect.signature(uvicorn.Server.handle_exit).parameters) == ["self", "sig", "frame"]
+    assert inspect.iscoroutinefunction(uvicorn.Server.on_tick)
+    assert list(inspect.signature(uvicorn.Server.on_tick).parameters) == ["self", "counter"]
+    assert inspect.iscoroutinefunction(uvicorn.Server.shutdown)
+    assert "sockets" in inspect.signature(uvicorn.Server.shutdown).parameters
+    assert hasattr(uvicorn.Config(app), "timeout_graceful_shutdown")
+
+
+def test_first_signal_drains_instead_of_exiting(server):
+    server.handle_exit(signal.SIGTERM, None)
+    assert not server.should_exit
+    assert server._captured_signals == [signal.SIGTERM]
+
+
+def test_second_signal_hands_over_to_uvicorn(server):
+    server.handle_exit(signal.SIGTERM, None)
+    server.handle_exit(signal.SIGTERM, None)
+    assert server.should_exit
+
+
+def test_captured_signal_is_reraised_after_a_graceful_stop(server):
+    received = []
+    previous = signal.signal(signal.SIGTERM, lambda signum, frame: received.append(signum))
+    try:
+        with server.capture_signals():
+            server.handle_exit(signal.SIGTERM, None)
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+    assert received == [signal.SIGTERM]
+
+
+def test_tick_starts_the_drain_and_exits_once_it_finishes(server):
+    async def ticks():
+        server.handle_exit(signal.SIGTERM, None)
+        assert await server.on_tick(1) is False
+        assert server.coordinator.drain_started
+        server.coordinator.release.set()
+        await asyncio.sleep(0)
+        return await server.on_tick(2)
+
+    assert asyncio.run(ticks()) is True
+    assert server.should_exit
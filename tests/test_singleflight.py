@@ -0,0 +1,126 @@
+import asyncio
+import threading
+
+from app.core.singleflight import SingleFlight
+
+
+class Source:
+    """A fetch that returns the current value once released."""
+
+    def __init__(self):
+        self.value = 0
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def fetch(self):
+        self.calls += 1
+        seen = self.value
+        await self.release.wait()
+        return seen
+
+
+def test_concurrent_calls_share_one_fetch():
+    async def main():
+        flight = SingleFlight()
+        source = Source()
+        calls = [asyncio.ensure_future(flight.do(("balance", "u1"), source.fetch)) for _ in range(5)]
+        await asyncio.sleep(0)
+        source.release.set()
+        results = await asyncio.gather(*calls)
+        return results, source.calls, flight.stats()
+
+    results, calls, stats = asyncio.run(main())
+    assert results == [0] * 5
+    assert calls == 1
+    assert stats["routes"]["balance"]["executed"] == 1
+    assert stats["routes"]["balance"]["coalesced"] == 4
+    assert stats["in_flight"] == 0
+
+
+def test_result_window_reuses_a_finished_fetch():
+    async def main():
+        flight = SingleFlight(result_ttl=60.0)
+        source = Source()
+        source.release.set()
+        await flight.do(("balance", "u1"), source.fetch)
+        await flight.do(("balance", "u1"), source.fetch)
+        return source.calls
+
+    assert asyncio.run(main()) == 1
+
+
+def test_invalidate_during_a_fetch_neither_joins_nor_caches_it():
+    async def main():
+        flight = SingleFlight(result_ttl=60.0)
+        source = Source()
+        stale = asyncio.ensure_future(flight.do(("balance", "u1"), source.fetch))
+        while not source.calls:  # the first fetch has read the row
+            await asyncio.sleep(0)
+
+        source.value = 12  # a grant commits while the first fetch runs
+        flight.invalidate_user("u1")
+        fresh = asyncio.ensure_future(flight.do(("balance", "u1"), source.fetch))
+        while source.calls < 2:
+            await asyncio.sleep(0)
+        source.release.set()
+
+        first, second = await asyncio.gather(stale, fresh)
+        after = await flight.do(("balance", "u1"), source.fetch)
+        return first, second, after, source.calls
+
+    first, second, after, calls = asyncio.run(main())
+    assert (first, second) == (0, 12)
+    assert after == 12  # the fresh fetch was cached, the stale one wasn't
+    assert calls == 2
+
+
+def test_invalidate_only_touches_that_user():
+    async def main():
+        flight = SingleFlight(result_ttl=60.0)
+        source = Source()
+        source.release.set()
+        await flight.do(("balance", "u1"), source.fetch)
+        await flight.do(("balance", "u2"), source.fetch)
+        flight.invalidate_user("u1")
+        await flight.do(("balance", "u1"), source.fetch)
+        await flight.do(("balance", "u2"), source.fetch)
+        return source.calls
+
+    assert asyncio.run(main()) == 3
+
+
+def test_invalidate_from_a_worker_thread_hops_onto_the_loop():
+    async def main():
+        flight = SingleFlight(result_ttl=60.0)
+        source = Source()
+        source.release.set()
+        await flight.do(("balance", "u1"), source.fetch)
+
+        source.value = 12
+        thread = threading.Thread(target=flight.invalidate_user, args=("u1",))
+        thread.start()
+        thread.join()
+        await asyncio.sleep(0)  # the queued invalidation runs
+        return await flight.do(("balance", "u1"), source.fetch)
+
+    assert asyncio.run(main()) == 12
+
+
+def test_failed_fetch_is_not_cached():
+    async def main():
+        flight = SingleFlight(result_ttl=60.0)
+        attempts = []
+
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise ConnectionError("db down")
+            return "ok"
+
+        try:
+            await flight.do(("balance", "u1"), flaky)
+        except ConnectionError:
+            pass
+        return await flight.do(("balance", "u1"), flaky), flight.stats()["routes"]["balance"]["errors"]
+
+    assert asyncio.run(main()) == ("ok", 1)
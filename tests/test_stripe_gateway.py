@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from app.services import stripe_gateway as gateway_module
+from app.services.stripe_gateway import CircuitBreaker, StripeGateway, StripeUnavailableError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(gateway_module, "time", clock)
+    return clock
+
+
+def _open(breaker: CircuitBreaker):
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow()
+        breaker.record_failure()
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=30.0)
+    breaker.record_failure()
+    breaker.record_success()  # resets the count
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.retry_after() == 30.0
+
+
+def test_half_open_allows_one_probe(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=30.0)
+    _open(breaker)
+    clock.now += 30.0
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()  # second caller while the probe runs
+
+
+def test_probe_success_closes(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=30.0)
+    _open(breaker)
+    clock.now += 30.0
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+    assert breaker.allow() and breaker.allow()
+
+
+def test_probe_failure_reopens_for_a_full_timeout(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=30.0)
+    _open(breaker)
+    clock.now += 30.0
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.now += 29.0
+    assert not breaker.allow()
+    clock.now += 1.0
+    assert breaker.allow()
+
+
+def test_abandoned_probe_frees_the_slot(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=30.0)
+    _open(breaker)
+    clock.now += 30.0
+    breaker.allow()
+    breaker.abandon()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+def test_cancelled_gateway_probe_lets_the_next_call_probe(clock, monkeypatch):
+    gateway = StripeGateway()
+    gateway.breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30.0)
+    monkeypatch.setattr(gateway, "_stripe", lambda: None)
+    _open(gateway.breaker)
+    clock.now += 30.0
+
+    async def cancelled(*args):
+        raise asyncio.CancelledError
+
+    async def succeeds(*args):
+        gateway.breaker.record_success()  # as _attempts does on a response
+        return "price"
+
+    async def run():
+        monkeypatch.setattr(gateway, "_attempts", cancelled)
+        with pytest.raises(asyncio.CancelledError):
+            await gateway._call("price.retrieve", None)
+        monkeypatch.setattr(gateway, "_attempts", succeeds)
+        return await gateway._call("price.retrieve", None)
+
+    assert asyncio.run(run()) == "price"
+    assert gateway.breaker.state == "closed"
+
+
+def test_open_circuit_fails_fast(clock, monkeypatch):
+    gateway = StripeGateway()
+    gateway.breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30.0)
+    monkeypatch.setattr(gateway, "_stripe", lambda: None)
+    _open(gateway.breaker)
+
+    with pytest.raises(StripeUnavailableError):
+        asyncio.run(gateway._call("price.retrieve", None))
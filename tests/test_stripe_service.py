@@ -0,0 +1,119 @@
+import asyncio
+import time
+import uuid
+from types import SimpleNamespace
+
+import psycopg2
+import pytest
+
+from app.core.config import settings
+from app.core.database import ConnectionPool, InstrumentedCursor
+from app.services import checkout_sessions, stripe_service
+from app.services.stripe_service import StripeService, checkout_idempotency_key
+
+SUCCESS_URL = "https://app.example.com/success"
+
+
+def payload(user_id="u1", price_id="price_starter") -> dict:
+    return {
+        "mode": "subscription",
+        "customer_email": "a@example.com",
+        "client_reference_id": user_id,
+        "metadata": {"user_id": user_id},
+        "line_items": [{"price": price_id, "quantity": 1}],
+        "success_url": SUCCESS_URL,
+        "cancel_url": "https://app.example.com/cancel",
+        "expand": ["line_items"],
+    }
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    monkeypatch.setattr(settings, "CHECKOUT_IDEMPOTENCY_WINDOW_SECONDS", 10)
+    now = [1_700_000_000.0]  # start of a window
+    monkeypatch.setattr(stripe_service.time, "time", lambda: now[0])
+    return now
+
+
+# ---------------------------------------------------------
+# Idempotency key
+# ---------------------------------------------------------
+
+def test_same_payload_in_one_window_shares_a_key(clock):
+    key = checkout_idempotency_key(payload())
+    clock[0] += 9
+    assert checkout_idempotency_key(payload()) == key
+    clock[0] += 1  # next window
+    assert checkout_idempotency_key(payload()) != key
+
+
+def test_key_differs_by_price_and_user(clock):
+    key = checkout_idempotency_key(payload())
+    assert checkout_idempotency_key(payload(price_id="price_pro")) != key
+    assert checkout_idempotency_key(payload(user_id="u2")) != key
+
+
+# ---------------------------------------------------------
+# Open-session reuse
+# ---------------------------------------------------------
+
+class FakeGateway:
+    def __init__(self):
+        self.created = []
+
+    async def create_checkout_session(self, params, idempotency_key=None):
+        self.created.append(idempotency_key)
+        session_id = f"cs_{len(self.created)}"
+        return SimpleNamespace(
+            id=session_id, url=f"https://checkout.stripe.com/{session_id}", expires_at=int(time.time()) + 3600
+        )
+
+
+@pytest.fixture(scope="module")
+def stripe_dsn(create_migrated_database):
+    return create_migrated_database("studio_genie_stripe_service_test")
+
+
+@pytest.fixture
+def gateway(stripe_dsn, monkeypatch):
+    pool = ConnectionPool(stripe_dsn, maxconn=2, timeout=5.0, cursor_factory=InstrumentedCursor)
+    monkeypatch.setattr(checkout_sessions, "get_connection", pool.getconn)
+    monkeypatch.setattr(settings, "CHECKOUT_REUSE_SECONDS", 900)
+    conn = psycopg2.connect(stripe_dsn)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE checkout_sessions")
+    conn.close()
+
+    gateway = FakeGateway()
+    monkeypatch.setattr(stripe_service, "stripe_gateway", gateway)
+
+    async def preflight(price_id):
+        return {"type": "recurring", "active": True, "recurring": None}
+
+    monkeypatch.setattr(stripe_service, "preflight_check_price", preflight)
+    yield gateway
+    pool.close()
+
+
+def checkout(user_id, price_id="price_starter"):
+    return asyncio.run(StripeService().create_checkout_session(
+        price_id, "a@example.com", user_id, SUCCESS_URL, "https://app.example.com/cancel", "subscription"
+    ))
+
+
+def test_second_click_gets_the_open_session_back(gateway):
+    user_id = str(uuid.uuid4())
+    first = checkout(user_id)
+    assert checkout(user_id) == first
+    assert len(gateway.created) == 1
+    assert gateway.created[0].startswith("checkout-")  # signed-in creates carry an idempotency key
+
+
+def test_other_price_or_paid_session_creates_a_new_one(gateway):
+    user_id = str(uuid.uuid4())
+    first = checkout(user_id)
+    assert checkout(user_id, price_id="price_pro") != first
+    checkout_sessions.mark_checkout_session_completed(first["session_id"])
+    assert checkout(user_id) != first
+    assert len(gateway.created) == 3
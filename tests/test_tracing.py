@@ -0,0 +1,78 @@
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import tracing
+from app.core.tracing import InMemorySpanExporter, TracingMiddleware, inject_headers, start_span
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    exporter = InMemorySpanExporter()
+    monkeypatch.setattr(tracing, "exporter", exporter)
+    return exporter
+
+
+@pytest.fixture
+def outbound():
+    return []  # headers each request sent to its "provider"
+
+
+@pytest.fixture
+def client(exporter, outbound):
+    router = APIRouter(prefix="/users")
+
+    @router.get("/{user_id}/videos")
+    async def videos(user_id: str):
+        with start_span("provider call", kind="client"):
+            outbound.append(inject_headers({"X-Api-Key": "k"}))
+        return {"user_id": user_id}
+
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(TracingMiddleware)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_incoming_traceparent_continues_into_outbound_calls(client, exporter, outbound):
+    client.get("/users/u1/videos", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+
+    child, server = exporter.spans
+    assert (server.trace_id, server.parent_id, server.kind) == (TRACE_ID, PARENT_ID, "server")
+    assert (child.trace_id, child.parent_id) == (TRACE_ID, server.span_id)
+
+    headers = outbound[0]
+    assert headers["X-Api-Key"] == "k"
+    assert headers["traceparent"] == f"00-{TRACE_ID}-{child.span_id}-01"
+    assert tracing._TRACEPARENT.match(headers["traceparent"])
+
+
+def test_unsampled_traceparent_exports_nothing_but_still_propagates(client, exporter, outbound):
+    client.get("/users/u1/videos", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"})
+    assert exporter.spans == []
+    assert outbound[0]["traceparent"].startswith(f"00-{TRACE_ID}-")
+    assert outbound[0]["traceparent"].endswith("-00")
+
+
+def test_malformed_traceparent_starts_a_new_trace(client, exporter, monkeypatch):
+    monkeypatch.setattr(tracing.settings, "TRACING_SAMPLE_RATE", 1.0)
+    client.get("/users/u1/videos", headers={"traceparent": "00-not-a-trace-01"})
+    server = exporter.spans[-1]
+    assert server.trace_id != TRACE_ID and len(server.trace_id) == 32
+    assert server.parent_id is None
+
+
+def test_server_span_is_named_by_route_template(client, exporter):
+    client.get("/users/u1/videos", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+    server = exporter.spans[-1]
+    assert server.name == "GET /users/{user_id}/videos"
+    assert server.attributes["http.route"] == "/users/{user_id}/videos"
+    assert server.attributes["url.path"] == "/users/u1/videos"
+
+
+def test_outside_a_request_nothing_is_injected():
+    assert inject_headers({"X-Api-Key": "k"}) == {"X-Api-Key": "k"}
@@ -0,0 +1,97 @@
+import threading
+import time
+import uuid
+
+import psycopg2
+import pytest
+
+from app.api.routes import webhook_stripe
+from app.api.routes.webhook_stripe import activate_subscription, grant_credit_pack, grant_invoice_credits
+from app.core.database import ConnectionPool, InstrumentedCursor
+
+
+@pytest.fixture(scope="module")
+def webhook_dsn(create_migrated_database):
+    return create_migrated_database("studio_genie_webhook_test")
+
+
+@pytest.fixture
+def db(webhook_dsn, monkeypatch):
+    pool = ConnectionPool(webhook_dsn, maxconn=2, timeout=5.0, cursor_factory=InstrumentedCursor)
+    monkeypatch.setattr(webhook_stripe, "get_connection", pool.getconn)
+    conn = psycopg2.connect(webhook_dsn)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE users, stripe_invoice_grants, stripe_webhook_events CASCADE")
+    yield conn
+    conn.close()
+    pool.close()
+
+
+def add_user(conn, credits, customer_id=None) -> str:
+    user_id = str(uuid.uuid4())
+    with conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO users (id, email, password_hash, credits, stripe_customer_id) VALUES (%s, %s, 'hash', %s, %s)",
+            (user_id, f"{user_id}@example.com", credits, customer_id),
+        )
+    return user_id
+
+
+def credits(conn, user_id) -> int:
+    with conn.cursor() as cur:
+        cur.execute("SELECT credits FROM users WHERE id = %s", (user_id,))
+        return cur.fetchone()[0]
+
+
+def test_first_payment_grant_does_not_lose_a_concurrent_consume(db, webhook_dsn):
+    user_id = add_user(db, credits=10)
+    session = {"id": "cs_1", "customer": "cus_1", "subscription": "sub_1", "client_reference_id": user_id}
+
+    # A consume holds the row lock while the webhook arrives
+    consume = psycopg2.connect(webhook_dsn)
+    with consume.cursor() as cur:
+        cur.execute("UPDATE users SET credits = credits - 3 WHERE id = %s", (user_id,))
+    webhook = threading.Thread(target=activate_subscription, args=(session, "evt_1", "starter", 12))
+    webhook.start()
+    time.sleep(0.2)  # the grant is now waiting on the row lock
+    consume.commit()
+    consume.close()
+    webhook.join(5.0)
+
+    assert credits(db, user_id) == 10 - 3 + 12
+    with db.cursor() as cur:
+        cur.execute("SELECT subscription_status, stripe_customer_id FROM users WHERE id = %s", (user_id,))
+        assert cur.fetchone() == ("active", "cus_1")
+
+
+def test_first_payment_for_unknown_user_changes_nothing(db):
+    user_id = add_user(db, credits=10)
+    session = {"id": "cs_1", "customer": "cus_1", "subscription": "sub_1", "client_reference_id": str(uuid.uuid4())}
+    activate_subscription(session, "evt_1", "starter", 12)
+    assert credits(db, user_id) == 10
+
+
+def test_redelivered_invoice_grants_once(db):
+    user_id = add_user(db, credits=5, customer_id="cus_1")
+    grant_invoice_credits("in_1", "cus_1", "sub_1", "starter", 12)
+    grant_invoice_credits("in_1", "cus_1", "sub_1", "starter", 12)
+    assert credits(db, user_id) == 5 + 12
+
+
+def test_checkout_event_delivered_twice_grants_once(db):
+    user_id = add_user(db, credits=5)
+    subscription = {"id": "cs_1", "customer": "cus_1", "subscription": "sub_1", "client_reference_id": user_id}
+    pack = {"id": "cs_2", "customer": "cus_1", "client_reference_id": user_id}
+    for _ in range(2):  # /webhook/stripe and /billing/webhook, or a redelivery
+        activate_subscription(subscription, "evt_1", "starter", 12)
+        grant_credit_pack(pack, "evt_2", "price_pack", 9)
+    assert credits(db, user_id) == 5 + 12 + 9
+
+
+def test_event_for_unknown_user_is_not_claimed(db):
+    session = {"id": "cs_1", "customer": "cus_1", "subscription": "sub_1", "client_reference_id": str(uuid.uuid4())}
+    activate_subscription(session, "evt_1", "starter", 12)
+    user_id = add_user(db, credits=0)
+    activate_subscription({**session, "client_reference_id": user_id}, "evt_1", "starter", 12)
+    assert credits(db, user_id) == 12
@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.core.webhook_partitions import WebhookPartitions
+
+
+@pytest.fixture(autouse=True)
+def partition_settings(monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_PARTITIONS", 4)
+    monkeypatch.setattr(settings, "WEBHOOK_CUSTOMER_LOCK", False)
+
+
+def _run(scenario):
+    async def main():
+        partitions = WebhookPartitions()
+        try:
+            return await scenario(partitions)
+        finally:
+            await partitions.drain(1.0)
+
+    return asyncio.run(main())
+
+
+def test_one_customers_events_run_in_arrival_order_one_at_a_time():
+    log = []
+
+    def event(name, delay):
+        async def handler():
+            log.append(("start", name))
+            await asyncio.sleep(delay)
+            log.append(("end", name))
+            return name
+        return handler
+
+    async def scenario(partitions):
+        # The first event is the slowest: a parallel run would finish it last
+        return await asyncio.gather(*(
+            partitions.submit("cus_1", event(name, delay))
+            for name, delay in (("paid", 0.03), ("deleted", 0.01), ("paid_again", 0.0))
+        ))
+
+    assert _run(scenario) == ["paid", "deleted", "paid_again"]
+    assert log == [
+        ("start", "paid"), ("end", "paid"),
+        ("start", "deleted"), ("end", "deleted"),
+        ("start", "paid_again"), ("end", "paid_again"),
+    ]
+
+
+def test_different_customers_run_in_parallel():
+    async def scenario(partitions):
+        customers = ["cus_a", "cus_b"]
+        while partitions.partition_for(customers[0]) == partitions.partition_for(customers[1]):
+            customers[1] += "x"
+        b_ran = asyncio.Event()
+
+        async def first():
+            # Only finishes if the other customer's event runs meanwhile
+            await asyncio.wait_for(b_ran.wait(), 1.0)
+            return "a"
+
+        async def second():
+            b_ran.set()
+            return "b"
+
+        return await asyncio.gather(
+            partitions.submit(customers[0], first),
+            partitions.submit(customers[1], second),
+        )
+
+    assert _run(scenario) == ["a", "b"]
+
+
+def test_handler_error_reaches_the_caller_and_the_queue_keeps_going():
+    async def fails():
+        raise ValueError("handler failed")
+
+    async def succeeds():
+        return "ok"
+
+    async def scenario(partitions):
+        failed = asyncio.ensure_future(partitions.submit("cus_1", fails))
+        after = asyncio.ensure_future(partitions.submit("cus_1", succeeds))
+        with pytest.raises(ValueError, match="handler failed"):
+            await failed
+        result = await after
+        assert partitions.depth == 0
+        return result
+
+    assert _run(scenario) == "ok"
+
+
+def test_events_without_a_customer_run_inline():
+    async def handler():
+        return "inline"
+
+    async def scenario(partitions):
+        result = await partitions.submit(None, handler)
+        assert partitions.partitions == 0  # never started
+        return result
+
+    assert _run(scenario) == "inline"
+
+
+def test_drain_finishes_queued_events():
+    done = []
+
+    def event(name):
+        async def handler():
+            await asyncio.sleep(0.01)
+            done.append(name)
+        return handler
+
+    async def scenario(partitions):
+        for name in ("one", "two", "three"):
+            asyncio.ensure_future(partitions.submit("cus_1", event(name)))
+        await asyncio.sleep(0)
+        await partitions.drain(1.0)
+
+    _run(scenario)
+    assert done == ["one", "two", "three"]
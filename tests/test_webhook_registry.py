@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import billing_webhook, webhook_stripe
+from app.core.config import settings
+from app.core.webhook_registry import WebhookRegistry, sniff_event_type
+
+
+def event_body(event_type: str, obj=None) -> bytes:
+    # Stripe serializes "type" last
+    return json.dumps({"id": "evt_1", "object": "event", "data": {"object": obj or {"id": "in_1"}}, "type": event_type}).encode()
+
+
+def signature(payload: bytes, secret: str = None) -> str:
+    timestamp = int(time.time())
+    signed = f"{timestamp}.".encode() + payload
+    digest = hmac.new((secret or settings.STRIPE_WEBHOOK_SECRET).encode(), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = WebhookRegistry("stripe")
+    monkeypatch.setattr(webhook_stripe, "stripe_webhooks", registry)
+    return registry
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(webhook_stripe.router)
+    app.include_router(billing_webhook.router)
+    with TestClient(app) as client:
+        yield client
+
+
+def post(client, path: str, payload: bytes, sig: str = None):
+    return client.post(path, content=payload, headers={"stripe-signature": sig if sig is not None else signature(payload)})
+
+
+# ---------------------------------------------------------
+# Type sniff
+# ---------------------------------------------------------
+
+def test_sniff_reads_the_top_level_type():
+    payload = event_body("invoice.paid", {"id": "in_1", "type": "nested.type"})
+    assert sniff_event_type(payload) == "invoice.paid"
+
+
+def test_sniff_is_inconclusive_when_type_is_not_last():
+    payload = json.dumps({"type": "invoice.paid", "data": {"object": {"type": "card"}}, "id": "evt_1"}).encode()
+    assert sniff_event_type(payload) is None
+
+
+def test_sniff_ignores_trailing_whitespace():
+    assert sniff_event_type(event_body("invoice.created") + b"\n  ") == "invoice.created"
+
+
+# ---------------------------------------------------------
+# Registry
+# ---------------------------------------------------------
+
+def test_duplicate_handler_is_rejected():
+    registry = WebhookRegistry("stripe")
+
+    @registry.handler("invoice.paid")
+    async def first(event):
+        pass
+
+    with pytest.raises(ValueError, match="Duplicate stripe webhook handler for invoice.paid"):
+        @registry.handler("invoice.paid")
+        async def second(event):
+            pass
+
+
+def test_the_app_registers_its_money_path_handlers():
+    assert {"invoice.paid", "checkout.session.completed", "customer.subscription.deleted"} <= set(
+        webhook_stripe.stripe_webhooks.event_types
+    )
+
+
+def test_max_in_flight_bounds_one_event_type():
+    registry = WebhookRegistry("stripe")
+    running, peak = [], []
+
+    @registry.handler("checkout.session.completed", max_in_flight=2)
+    async def checkout(event):
+        running.append(event)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(event)
+
+    async def main():
+        handler = registry.get("checkout.session.completed")
+        await asyncio.gather(*(handler.run(i) for i in range(6)))
+
+    asyncio.run(main())
+    assert len(peak) == 6
+    assert max(peak) == 2
+
+
+# ---------------------------------------------------------
+# Dispatch
+# ---------------------------------------------------------
+
+def test_unhandled_type_is_acknowledged_without_verification(registry, client):
+    payload = event_body("invoice.created")
+    assert post(client, "/webhook/stripe", payload, sig="t=1,v1=bad").json() == {"status": "ok"}
+
+
+def test_handled_type_with_bad_signature_is_rejected(registry, client):
+    handled = []
+
+    @registry.handler("invoice.paid")
+    async def handler(event):
+        handled.append(event["id"])
+
+    payload = event_body("invoice.paid")
+    assert post(client, "/webhook/stripe", payload, sig=signature(payload, "whsec_other")).status_code == 400
+    assert handled == []
+
+
+def test_handled_type_runs_its_handler_once(registry, client):
+    handled = []
+
+    @registry.handler("invoice.paid")
+    async def handler(event):
+        handled.append(event["id"])
+
+    assert post(client, "/webhook/stripe", event_body("invoice.paid")).json() == {"status": "ok"}
+    assert handled == ["evt_1"]
+
+
+def test_timeout_is_redelivered_only_for_idempotent_handlers(registry, client):
+    @registry.handler("invoice.paid", timeout=0.01, redeliver_on_timeout=True)
+    async def idempotent(event):
+        await asyncio.sleep(1)
+
+    @registry.handler("checkout.session.completed", timeout=0.01)
+    async def not_idempotent(event):
+        await asyncio.sleep(1)
+
+    assert post(client, "/webhook/stripe", event_body("invoice.paid")).status_code == 500
+    response = post(client, "/webhook/stripe", event_body("checkout.session.completed"))
+    assert response.status_code == 200
+    assert response.json()["status"] == "error"
+
+
+def test_legacy_endpoint_dispatches_through_the_registry(registry, client):
+    handled = []
+
+    @registry.handler("checkout.session.completed")
+    async def handler(event):
+        handled.append(event["id"])
+
+    payload = event_body("checkout.session.completed")
+    assert post(client, "/billing/webhook", payload).json() == {"status": "ok"}
+    assert post(client, "/billing/webhook", payload, sig="t=1,v1=bad").status_code == 400
+    assert post(client, "/billing/webhook", event_body("invoice.created"), sig="t=1,v1=bad").json() == {"status": "ok"}
+    assert handled == ["evt_1"]